@@ -0,0 +1,138 @@
+"""
+Alert API endpoints
+"""
+
+from decimal import Decimal
+from typing import Dict, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import get_db
+from app.db.models import Alert, AlertType, User
+from app.services.alert_service import AlertService
+from app.schemas.alert import (
+    AlertBulkCreate, AlertBulkDelete, AlertCounts, AlertCreate, AlertPage, AlertResponse, AlertUpdate
+)
+from app.api.v1.auth import get_current_user_dependency
+
+router = APIRouter(prefix="/alerts", tags=["alerts"])
+
+
+def _alert_response(alert: Alert, prices: Dict[str, Decimal]) -> AlertResponse:
+    """Armed price alerts show the latest cached price as their current value"""
+    response = AlertResponse.model_validate(alert)
+    if alert.symbol in prices:
+        response.current_value = prices[alert.symbol]
+    return response
+
+
+@router.get("/", response_model=AlertPage)
+async def get_alerts(
+    is_active: Optional[bool] = Query(None, description="Filter by active flag"),
+    alert_type: Optional[AlertType] = Query(None, description="Filter by alert type"),
+    symbol: Optional[str] = Query(None, description="Filter by symbol"),
+    cursor: Optional[str] = Query(None, description="nextCursor of the previous page"),
+    limit: int = Query(50, ge=1, le=500, description="Items per page"),
+    current_user: User = Depends(get_current_user_dependency),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get the user's alerts, newest first, one keyset page at a time"""
+    service = AlertService(db)
+    alerts, next_cursor = await service.list_alerts(
+        user_id=current_user.id,
+        is_active=is_active,
+        alert_type=alert_type,
+        symbol=symbol,
+        cursor=cursor,
+        limit=limit
+    )
+    prices = await service.latest_prices(alerts)
+    return AlertPage(items=[_alert_response(a, prices) for a in alerts], next_cursor=next_cursor)
+
+
+@router.get("/counts", response_model=AlertCounts)
+async def get_alert_counts(
+    current_user: User = Depends(get_current_user_dependency),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get the user's active and triggered alert counts"""
+    service = AlertService(db)
+    return await service.get_counts(current_user.id)
+
+
+@router.post("/", response_model=AlertResponse, status_code=status.HTTP_201_CREATED)
+async def create_alert(
+    alert_data: AlertCreate,
+    current_user: User = Depends(get_current_user_dependency),
+    db: AsyncSession = Depends(get_db)
+):
+    """Create an alert"""
+    service = AlertService(db)
+    alerts = await service.create_alerts(current_user.id, [alert_data])
+    return _alert_response(alerts[0], {})
+
+
+@router.post("/bulk", response_model=List[AlertResponse], status_code=status.HTTP_201_CREATED)
+async def create_alerts(
+    bulk_data: AlertBulkCreate,
+    current_user: User = Depends(get_current_user_dependency),
+    db: AsyncSession = Depends(get_db)
+):
+    """Create many alerts in one transaction"""
+    service = AlertService(db)
+    alerts = await service.create_alerts(current_user.id, bulk_data.alerts)
+    return [_alert_response(a, {}) for a in alerts]
+
+
+@router.post("/bulk-delete", response_model=AlertCounts)
+async def delete_alerts(
+    bulk_data: AlertBulkDelete,
+    current_user: User = Depends(get_current_user_dependency),
+    db: AsyncSession = Depends(get_db)
+):
+    """Delete many alerts; returns the updated counts"""
+    service = AlertService(db)
+    await service.delete_alerts(bulk_data.ids, current_user.id)
+    return await service.get_counts(current_user.id)
+
+
+@router.get("/{alert_id}", response_model=AlertResponse)
+async def get_alert(
+    alert_id: str,
+    current_user: User = Depends(get_current_user_dependency),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get a specific alert"""
+    service = AlertService(db)
+    alert = await service.get_alert(alert_id, current_user.id)
+    return _alert_response(alert, await service.latest_prices([alert]))
+
+
+@router.patch("/{alert_id}", response_model=AlertResponse)
+async def update_alert(
+    alert_id: str,
+    alert_data: AlertUpdate,
+    current_user: User = Depends(get_current_user_dependency),
+    db: AsyncSession = Depends(get_db)
+):
+    """Update, deactivate or re-arm an alert"""
+    service = AlertService(db)
+    alert = await service.update_alert(alert_id, current_user.id, alert_data)
+    return _alert_response(alert, {})
+
+
+@router.delete("/{alert_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_alert(
+    alert_id: str,
+    current_user: User = Depends(get_current_user_dependency),
+    db: AsyncSession = Depends(get_db)
+):
+    """Delete an alert"""
+    service = AlertService(db)
+    deleted = await service.delete_alerts([alert_id], current_user.id)
+
+    if not deleted:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Alert not found"
+        )
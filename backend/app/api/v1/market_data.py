@@ -0,0 +1,53 @@
+"""
+Market data API endpoints
+"""
+
+from datetime import date, datetime, timedelta
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import get_db
+from app.db.models import User, BarResolution, Currency
+from app.schemas.market_data import FxRateResponse, PriceHistoryResponse
+from app.services.fx_service import FxService
+from app.services.history_service import HistoryService
+from app.api.v1.auth import get_current_user_dependency
+
+router = APIRouter(prefix="/market-data", tags=["market-data"])
+
+
+@router.get("/{symbol}/history", response_model=PriceHistoryResponse)
+async def get_price_history(
+    symbol: str,
+    start: Optional[datetime] = Query(None, description="Range start (default: 30 days ago)"),
+    end: Optional[datetime] = Query(None, description="Range end (default: now)"),
+    resolution: Optional[BarResolution] = Query(None, description="Bar size; chosen from the range if omitted"),
+    current_user: User = Depends(get_current_user_dependency),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get OHLCV bars for a symbol"""
+    end = end or datetime.utcnow()
+    start = start or end - timedelta(days=30)
+    if start >= end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must be before end"
+        )
+    
+    resolution, bars = await HistoryService(db).get_bars([symbol], start, end, resolution)
+    return PriceHistoryResponse(symbol=symbol.upper(), resolution=resolution, bars=bars[symbol.upper()])
+
+
+@router.get("/fx/{base}/{quote}", response_model=FxRateResponse)
+async def get_fx_rate(
+    base: Currency,
+    quote: Currency,
+    on: Optional[date] = Query(None, description="Rate date (default: today); the latest rate on or before it is used"),
+    current_user: User = Depends(get_current_user_dependency),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get the exchange rate from base to quote currency"""
+    on = on or datetime.utcnow().date()
+    rate = await FxService(db).get_rate(base, quote, on)
+    return FxRateResponse(base=base, quote=quote, date=on, rate=rate)
@@ -3,20 +3,30 @@ Portfolio API endpoints
 """
 
 import time
-from typing import List
+from datetime import date
+from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from app.core.database import get_db
-from app.db.models import User, Asset
-from app.services.portfolio_service import PortfolioService
+from app.db.models import User, Asset, Currency
+from app.services.portfolio_service import PortfolioService, determine_asset_type
 from app.schemas.portfolio import (
     PortfolioCreate, PortfolioUpdate, PortfolioResponse, PortfolioSummary,
     AssetCreate, AssetUpdate, AssetResponse,
     TransactionCreate, TransactionResponse,
-    AssetAllocation, PerformanceData
+    AssetAllocation, PerformanceData, HouseholdSummary
 )
+from app.schemas.analytics import (
+    BenchmarkCreate, BenchmarkResponse, BenchmarkAnalytics, RiskMethod, RiskMetrics,
+    AllocationTargetItem, AllocationTargetsUpdate, RebalanceRequest, RebalanceResponse,
+    SimulationRequest, SimulationResponse
+)
+from app.services.benchmark_service import BenchmarkService
+from app.services.risk_service import RiskService
+from app.services.rebalance_service import RebalanceService
+from app.services.simulation_service import SimulationService
 from app.api.v1.auth import get_current_user_dependency
 
 router = APIRouter(prefix="/portfolios", tags=["portfolios"])
@@ -32,6 +42,7 @@ async def get_portfolios(
     """Get all portfolios for the current user"""
     service = PortfolioService(db)
     portfolios = await service.get_portfolios(current_user.id, include_assets)
+    await service.overlay_cached_prices(portfolios)
     
     result = []
     for p in portfolios:
@@ -93,6 +104,9 @@ async def get_portfolios(
             updated_at=p.updated_at
         ))
     
+    if include_performance:
+        # Keep valuation days rebuilt while reading
+        await db.commit()
     return result
 
 
@@ -140,6 +154,28 @@ async def get_recent_activities(
     }
 
 
+@router.get("/household", response_model=HouseholdSummary)
+async def get_household_summary(
+    currency: Optional[Currency] = Query(None, description="Reporting currency (defaults to the user's preferred currency)"),
+    current_user: User = Depends(get_current_user_dependency),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get one consolidated view of all the user's portfolios"""
+    service = PortfolioService(db)
+    return await service.get_household_summary(current_user.id, currency or current_user.preferred_currency)
+
+
+@router.post("/rebalance", response_model=List[RebalanceResponse])
+async def rebalance_all_portfolios(
+    rebalance_data: RebalanceRequest,
+    current_user: User = Depends(get_current_user_dependency),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get rebalancing trades for every portfolio of the current user that has targets"""
+    portfolios = await PortfolioService(db).get_portfolios(current_user.id)
+    return await RebalanceService(db).rebalance([p.id for p in portfolios], rebalance_data)
+
+
 @router.get("/{portfolio_id}", response_model=PortfolioResponse)
 async def get_portfolio(
     portfolio_id: str,
@@ -157,6 +193,7 @@ async def get_portfolio(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Portfolio not found"
         )
+    await service.overlay_cached_prices([portfolio])
     
     # Get allocation
     allocation = await service.get_portfolio_allocation(portfolio_id, current_user.id)
@@ -165,6 +202,8 @@ async def get_portfolio(
     performance = None
     if include_performance:
         performance = await service.calculate_portfolio_performance(portfolio_id, current_user.id)
+        # Keep valuation days rebuilt while reading
+        await db.commit()
     
     # Convert assets to response format
     assets_response = []
@@ -375,24 +414,30 @@ async def remove_asset(
 @router.get("/{portfolio_id}/allocation", response_model=List[AssetAllocation])
 async def get_portfolio_allocation(
     portfolio_id: str,
+    currency: Optional[Currency] = Query(None, description="Reporting currency (defaults to the portfolio's)"),
     current_user: User = Depends(get_current_user_dependency),
     db: AsyncSession = Depends(get_db)
 ):
     """Get portfolio asset allocation"""
     service = PortfolioService(db)
-    allocation = await service.get_portfolio_allocation(portfolio_id, current_user.id)
+    allocation = await service.get_portfolio_allocation(portfolio_id, current_user.id, currency)
     return allocation
 
 
 @router.get("/{portfolio_id}/performance", response_model=PerformanceData)
 async def get_portfolio_performance(
     portfolio_id: str,
+    start_date: Optional[date] = Query(None, description="Start of a custom period"),
+    end_date: Optional[date] = Query(None, description="End of a custom period (defaults to today)"),
+    currency: Optional[Currency] = Query(None, description="Reporting currency (defaults to the portfolio's)"),
     current_user: User = Depends(get_current_user_dependency),
     db: AsyncSession = Depends(get_db)
 ):
     """Get portfolio performance metrics"""
     service = PortfolioService(db)
-    performance = await service.calculate_portfolio_performance(portfolio_id, current_user.id)
+    performance = await service.calculate_portfolio_performance(
+        portfolio_id, current_user.id, start_date, end_date, currency
+    )
     
     if not performance:
         raise HTTPException(
@@ -400,9 +445,193 @@ async def get_portfolio_performance(
             detail="Portfolio not found"
         )
     
+    # Keep valuation days rebuilt while reading
+    await db.commit()
     return performance
 
 
+@router.get("/{portfolio_id}/benchmarks", response_model=List[BenchmarkResponse])
+async def get_portfolio_benchmarks(
+    portfolio_id: str,
+    current_user: User = Depends(get_current_user_dependency),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get the benchmarks a portfolio is compared against"""
+    portfolio = await PortfolioService(db).get_portfolio(portfolio_id, current_user.id)
+    if not portfolio:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Portfolio not found"
+        )
+    
+    return await BenchmarkService(db).get_benchmarks(portfolio_id)
+
+
+@router.post("/{portfolio_id}/benchmarks", response_model=BenchmarkResponse, status_code=status.HTTP_201_CREATED)
+async def add_portfolio_benchmark(
+    portfolio_id: str,
+    benchmark_data: BenchmarkCreate,
+    current_user: User = Depends(get_current_user_dependency),
+    db: AsyncSession = Depends(get_db)
+):
+    """Compare a portfolio against a locally stored benchmark series"""
+    portfolio = await PortfolioService(db).get_portfolio(portfolio_id, current_user.id)
+    if not portfolio:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Portfolio not found"
+        )
+    
+    return await BenchmarkService(db).add_benchmark(portfolio_id, benchmark_data.symbol)
+
+
+@router.get("/{portfolio_id}/benchmarks/analytics", response_model=List[BenchmarkAnalytics])
+async def get_benchmark_analytics(
+    portfolio_id: str,
+    symbols: Optional[str] = Query(None, description="Comma-separated benchmark symbols (defaults to configured benchmarks)"),
+    lookback_days: int = Query(365, ge=5, le=3650, description="Lookback window in days"),
+    current_user: User = Depends(get_current_user_dependency),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get beta, alpha, tracking error and information ratio against benchmarks"""
+    portfolio = await PortfolioService(db).get_portfolio(portfolio_id, current_user.id)
+    if not portfolio:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Portfolio not found"
+        )
+    
+    symbol_list = [s.strip() for s in symbols.split(",") if s.strip()] if symbols else None
+    analytics = await BenchmarkService(db).calculate_portfolio_analytics(portfolio, symbol_list, lookback_days)
+    # Keep valuation days rebuilt while reading
+    await db.commit()
+    return analytics
+
+
+@router.delete("/{portfolio_id}/benchmarks/{symbol}", status_code=status.HTTP_204_NO_CONTENT)
+async def remove_portfolio_benchmark(
+    portfolio_id: str,
+    symbol: str,
+    current_user: User = Depends(get_current_user_dependency),
+    db: AsyncSession = Depends(get_db)
+):
+    """Stop comparing a portfolio against a benchmark"""
+    portfolio = await PortfolioService(db).get_portfolio(portfolio_id, current_user.id)
+    if not portfolio:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Portfolio not found"
+        )
+    
+    success = await BenchmarkService(db).remove_benchmark(portfolio_id, symbol)
+    if not success:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Benchmark not found"
+        )
+
+
+@router.get("/{portfolio_id}/risk", response_model=RiskMetrics)
+async def get_portfolio_risk(
+    portfolio_id: str,
+    method: RiskMethod = Query(RiskMethod.HISTORICAL, description="Historical simulation or Monte Carlo"),
+    confidence: float = Query(0.95, gt=0.5, lt=1, description="Confidence level"),
+    lookback_days: int = Query(365, ge=30, le=3650, description="Price history used for estimation"),
+    paths: int = Query(10000, ge=100, le=1000000, description="Monte Carlo paths"),
+    current_user: User = Depends(get_current_user_dependency),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get 1-day and 10-day Value-at-Risk and CVaR"""
+    portfolio = await PortfolioService(db).get_portfolio(portfolio_id, current_user.id)
+    if not portfolio:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Portfolio not found"
+        )
+    
+    return await RiskService(db).calculate_risk(
+        portfolio_id, method, confidence, lookback_days, paths
+    )
+
+
+@router.get("/{portfolio_id}/targets", response_model=List[AllocationTargetItem])
+async def get_allocation_targets(
+    portfolio_id: str,
+    current_user: User = Depends(get_current_user_dependency),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get a portfolio's target allocation"""
+    portfolio = await PortfolioService(db).get_portfolio(portfolio_id, current_user.id)
+    if not portfolio:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Portfolio not found"
+        )
+    
+    return await RebalanceService(db).get_targets(portfolio_id)
+
+
+@router.put("/{portfolio_id}/targets", response_model=List[AllocationTargetItem])
+async def set_allocation_targets(
+    portfolio_id: str,
+    targets_data: AllocationTargetsUpdate,
+    current_user: User = Depends(get_current_user_dependency),
+    db: AsyncSession = Depends(get_db)
+):
+    """Replace a portfolio's target allocation (by asset type or by symbol)"""
+    portfolio = await PortfolioService(db).get_portfolio(portfolio_id, current_user.id)
+    if not portfolio:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Portfolio not found"
+        )
+    
+    return await RebalanceService(db).set_targets(portfolio_id, targets_data.targets)
+
+
+@router.post("/{portfolio_id}/rebalance", response_model=RebalanceResponse)
+async def rebalance_portfolio(
+    portfolio_id: str,
+    rebalance_data: RebalanceRequest,
+    current_user: User = Depends(get_current_user_dependency),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get the trades needed to bring a portfolio back to its target allocation"""
+    portfolio = await PortfolioService(db).get_portfolio(portfolio_id, current_user.id)
+    if not portfolio:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Portfolio not found"
+        )
+    
+    results = await RebalanceService(db).rebalance([portfolio_id], rebalance_data)
+    if not results:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Portfolio has no allocation targets"
+        )
+    
+    return results[0]
+
+
+@router.post("/{portfolio_id}/simulate", response_model=SimulationResponse)
+async def simulate_trades(
+    portfolio_id: str,
+    simulation_data: SimulationRequest,
+    current_user: User = Depends(get_current_user_dependency),
+    db: AsyncSession = Depends(get_db)
+):
+    """Preview hypothetical trades without changing the portfolio"""
+    portfolio = await PortfolioService(db).get_portfolio(portfolio_id, current_user.id)
+    if not portfolio:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Portfolio not found"
+        )
+    
+    return await SimulationService(db).simulate(portfolio_id, simulation_data)
+
+
 @router.post("/{portfolio_id}/recalculate-totals", status_code=status.HTTP_200_OK)
 async def recalculate_portfolio_totals(
     portfolio_id: str,
@@ -491,7 +720,7 @@ async def fix_asset_types(
     
     # Fix asset types for all assets
     for asset in portfolio.assets:
-        correct_type = service._determine_asset_type(asset.symbol)
+        correct_type = determine_asset_type(asset.symbol)
         if asset.asset_type != correct_type:
             asset.asset_type = correct_type
     
@@ -3,11 +3,15 @@ Main API router for v1
 """
 
 from fastapi import APIRouter
-from app.api.v1 import auth, portfolios, transactions
+from app.api.v1 import auth, portfolios, transactions, market_data, alerts, watchlist, stream
 
 api_router = APIRouter()
 
 # Include all route modules
 api_router.include_router(auth.router)
 api_router.include_router(portfolios.router)
-api_router.include_router(transactions.router)
\ No newline at end of file
+api_router.include_router(transactions.router)
+api_router.include_router(market_data.router)
+api_router.include_router(alerts.router)
+api_router.include_router(watchlist.router)
+api_router.include_router(stream.router)
\ No newline at end of file
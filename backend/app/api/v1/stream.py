@@ -0,0 +1,88 @@
+"""
+Server-Sent Events endpoints
+"""
+
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import get_db
+from app.services.auth_service import AuthService
+from app.services.event_hub import Subscription, alert_topic, get_event_hub, quote_topic
+from app.services.quote_cache import get_quote_cache
+
+router = APIRouter(prefix="/stream", tags=["stream"])
+
+optional_bearer = HTTPBearer(auto_error=False)
+
+# Reconnect delay suggested to EventSource clients
+RETRY_MILLISECONDS = 3000
+
+
+async def _event_stream(subscription: Subscription):
+    """Write pending frames as they arrive, with keepalive comments while idle"""
+    try:
+        yield f"retry: {RETRY_MILLISECONDS}\n\n".encode()
+        while True:
+            try:
+                await asyncio.wait_for(subscription.ready.wait(), timeout=settings.SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            if subscription.overflowed:
+                # End the stream; the client reconnects with Last-Event-ID and replays what it missed
+                break
+            frames = subscription.drain()
+            if frames:
+                yield b"".join(encoded.frame for encoded in frames)
+    finally:
+        get_event_hub().unsubscribe(subscription)
+
+
+@router.get("/events")
+async def stream_events(
+    symbols: str = Query("", description="Comma-separated symbols to stream quotes for"),
+    token: Optional[str] = Query(None, description="Access token, for clients that cannot set headers"),
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_bearer),
+    db: AsyncSession = Depends(get_db)
+):
+    """Stream `quote` events for the symbols and `alert` events for the user's triggered alerts.
+
+    A consumer that falls behind receives only the latest quote per symbol.
+    Reconnecting with Last-Event-ID replays the events missed since then.
+    """
+    user = await AuthService(db).get_current_user(token or (credentials.credentials if credentials else ""))
+    user_id = user.id
+    await db.rollback()
+
+    symbol_list = sorted({s.strip().upper() for s in symbols.split(",") if s.strip()})
+    if len(symbol_list) > settings.SSE_MAX_SYMBOLS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.SSE_MAX_SYMBOLS} symbols can be streamed"
+        )
+    try:
+        resume_from = int(last_event_id) if last_event_id else None
+    except ValueError:
+        resume_from = None
+
+    hub = get_event_hub()
+    unseen = [symbol for symbol in symbol_list if quote_topic(symbol) not in hub.latest]
+    if unseen:
+        # Symbols nobody has streamed yet start from the cached quote
+        for symbol, quote in (await get_quote_cache().get_many(unseen)).items():
+            hub.publish(quote_topic(symbol), "quote", {
+                "symbol": symbol, "price": float(quote.price), "timestamp": quote.timestamp.isoformat()
+            }, conflate=True)
+
+    subscription = hub.subscribe([quote_topic(s) for s in symbol_list] + [alert_topic(user_id)], resume_from)
+    return StreamingResponse(
+        _event_stream(subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,53 @@
+"""
+Watchlist API endpoints
+"""
+
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import get_db
+from app.db.models import User
+from app.services.watchlist_service import WatchlistService
+from app.schemas.watchlist import WatchlistItemCreate, WatchlistItemResponse
+from app.api.v1.auth import get_current_user_dependency
+
+router = APIRouter(prefix="/watchlist", tags=["watchlist"])
+
+
+@router.get("/", response_model=List[WatchlistItemResponse])
+async def get_watchlist(
+    current_user: User = Depends(get_current_user_dependency),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get the user's watchlist with latest quotes"""
+    service = WatchlistService(db)
+    return await service.get_watchlist(current_user.id)
+
+
+@router.post("/", response_model=WatchlistItemResponse, status_code=status.HTTP_201_CREATED)
+async def add_to_watchlist(
+    item_data: WatchlistItemCreate,
+    current_user: User = Depends(get_current_user_dependency),
+    db: AsyncSession = Depends(get_db)
+):
+    """Add a symbol to the watchlist"""
+    service = WatchlistService(db)
+    return await service.add_item(current_user.id, item_data)
+
+
+@router.delete("/{symbol}", status_code=status.HTTP_204_NO_CONTENT)
+async def remove_from_watchlist(
+    symbol: str,
+    current_user: User = Depends(get_current_user_dependency),
+    db: AsyncSession = Depends(get_db)
+):
+    """Remove a symbol from the watchlist"""
+    service = WatchlistService(db)
+    removed = await service.remove_item(current_user.id, symbol)
+
+    if not removed:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Symbol not in watchlist"
+        )
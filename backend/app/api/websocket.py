@@ -0,0 +1,117 @@
+"""
+WebSocket endpoint for live portfolio valuations
+"""
+
+import asyncio
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import get_db
+from app.db.models import Portfolio
+from app.services.auth_service import AuthService
+from app.services.valuation_stream import ValuationConnection, get_valuation_hub
+
+router = APIRouter()
+
+PORTFOLIO_CHANNEL = "portfolio:"
+ALL_PORTFOLIOS_CHANNEL = "portfolios"
+
+
+async def _send_updates(websocket: WebSocket, connection: ValuationConnection):
+    """Drain the connection's outbox; a send that stalls past the timeout closes the socket"""
+    while True:
+        for message in await connection.next_messages():
+            await asyncio.wait_for(
+                websocket.send_text(json.dumps(message, separators=(",", ":"))),
+                timeout=settings.WS_SEND_TIMEOUT_SECONDS
+            )
+
+
+async def _channel_portfolios(db: AsyncSession, user_id: str, channel: str):
+    """Portfolio ids a channel covers for the user, or None if it is not theirs"""
+    query = select(Portfolio.id).where(Portfolio.user_id == user_id)
+    if channel.startswith(PORTFOLIO_CHANNEL):
+        query = query.where(Portfolio.id == channel[len(PORTFOLIO_CHANNEL):])
+    elif channel != ALL_PORTFOLIOS_CHANNEL:
+        return None
+    portfolio_ids = list((await db.execute(query)).scalars().all())
+    # Reads are short; don't hold a connection for the life of the socket
+    await db.rollback()
+    return portfolio_ids if portfolio_ids or channel == ALL_PORTFOLIOS_CHANNEL else None
+
+
+@router.websocket("/ws")
+async def valuation_socket(
+    websocket: WebSocket,
+    token: str = Query(""),
+    db: AsyncSession = Depends(get_db)
+):
+    """Stream valuation diffs of subscribed portfolios.
+
+    Authenticate with ?token=<access token>, then send
+    {"type": "subscribe", "channel": "portfolio:<id>"} or the "portfolios"
+    channel for all of the user's portfolios. Each subscription first gets
+    the full valuation, then only fields that changed:
+    {"type": "data", "channel": ..., "data": {"portfolioId": ..., "totalValue": ..., "weights": {...}}}.
+    """
+    try:
+        user = await AuthService(db).get_current_user(token)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    user_id = user.id
+    await db.rollback()
+
+    await websocket.accept()
+    hub = get_valuation_hub()
+    connection = ValuationConnection(user_id)
+    channels = {}
+    sender = asyncio.create_task(_send_updates(websocket, connection))
+    try:
+        while True:
+            receive = asyncio.ensure_future(websocket.receive_text())
+            done, _ = await asyncio.wait({receive, sender}, return_when=asyncio.FIRST_COMPLETED)
+            if sender in done:
+                receive.cancel()
+                if isinstance(sender.exception(), asyncio.TimeoutError):
+                    # Too slow to keep up even with conflated updates
+                    await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+                return
+            try:
+                message = json.loads(receive.result())
+                kind, channel = message.get("type"), message.get("channel")
+            except (ValueError, AttributeError):
+                connection.reply({"type": "error", "message": "Invalid message"})
+                continue
+
+            if kind == "ping":
+                connection.reply({"type": "pong"})
+            elif kind == "subscribe":
+                portfolio_ids = await _channel_portfolios(db, user_id, channel or "")
+                if portfolio_ids is None:
+                    connection.reply({"type": "error", "channel": channel, "message": "Unknown channel"})
+                elif len(connection.channels) + len(portfolio_ids) > settings.WS_MAX_SUBSCRIPTIONS:
+                    connection.reply({
+                        "type": "error", "channel": channel, "message": "Too many subscriptions"
+                    })
+                else:
+                    channels[channel] = portfolio_ids
+                    connection.reply({"type": "subscribed", "channel": channel})
+                    await hub.subscribe(db, connection, channel, portfolio_ids)
+                    await db.rollback()
+            elif kind == "unsubscribe":
+                hub.unsubscribe(connection, [
+                    portfolio_id for portfolio_id in channels.pop(channel, [])
+                    if connection.channels.get(portfolio_id) == channel
+                ])
+                connection.reply({"type": "unsubscribed", "channel": channel})
+            else:
+                connection.reply({"type": "error", "message": "Unknown message type"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        hub.unsubscribe(connection)
@@ -34,6 +34,67 @@ class Settings(BaseSettings):
     # Allowed hosts
     ALLOWED_HOSTS: List[str] = ["*"]
     
+    # Analytics
+    DEFAULT_BENCHMARK_SYMBOL: str = "SPY"
+    RISK_LOOKBACK_DAYS: int = 365
+    RISK_MC_WORKERS: int = 4
+    RISK_MC_CHUNK_PATHS: int = 5000
+    
+    # Market data
+    DAILY_CLOSE_HOUR_UTC: int = 21
+    MARKET_OPEN_HOUR_UTC: float = 14.5
+    MARKET_DATA_PROVIDER: str = ""  # "http" or "replay"; empty disables the price feed
+    MARKET_DATA_POLL_SECONDS: float = 5.0
+    MARKET_DATA_SYMBOL_RELOAD_SECONDS: float = 60.0  # how often the replay feed picks up newly held or watched symbols
+    MARKET_DATA_REPLAY_PATH: str = ""
+    MARKET_DATA_REPLAY_SPEED: float = 1.0
+    MARKET_DATA_REPLAY_LOOP: bool = False
+    MARKET_DATA_HISTORY_PATH: str = ""  # directory of {SYMBOL}.csv files for the "csv" provider
+    BACKFILL_PROVIDER: str = ""  # "csv" or "http"; empty disables history backfill
+    BACKFILL_LOOKBACK_DAYS: int = 730
+    BACKFILL_CHUNK_DAYS: int = 90
+    BACKFILL_CONCURRENCY: int = 4
+    BACKFILL_REQUESTS_PER_SECOND: float = 5.0
+    BACKFILL_INTERVAL_SECONDS: int = 3600
+    QUOTE_CACHE_TTL_SECONDS: float = 15.0
+    QUOTE_CACHE_STALE_SECONDS: float = 60.0
+    QUOTE_REFRESH_BASE_SECONDS: float = 60.0  # interval for a symbol with one reference while its market is open
+    QUOTE_REFRESH_MIN_SECONDS: float = 5.0
+    QUOTE_REFRESH_CLOSED_SECONDS: float = 3600.0
+    QUOTE_REFRESH_ACCESS_WINDOW_SECONDS: float = 300.0
+    QUOTE_REFRESH_DEMAND_RELOAD_SECONDS: float = 300.0
+    QUOTE_REFRESH_MAX_CONCURRENCY: int = 4
+    QUOTE_REFRESH_BATCH_SIZE: int = 100
+    QUOTE_REFRESH_CYCLE_BUDGET: int = 1000  # most symbols refreshed per cycle
+    MARKET_DATA_COMPACTION_INTERVAL_SECONDS: int = 300
+    MARKET_DATA_RAW_RETENTION_DAYS: int = 7
+    PRICE_BAR_MINUTE_RETENTION_DAYS: int = 30
+    PRICE_BAR_HOUR_RETENTION_DAYS: int = 730
+    HISTORY_TARGET_POINTS: int = 60
+    ALERT_PRICE_BUFFER_SIZE: int = 4096  # recent ticks kept per symbol for percent-change alerts
+    NOTIFICATION_SENDER: str = "log"  # "log" prints deliveries, "file" appends JSON lines to NOTIFICATION_FILE_PATH
+    NOTIFICATION_FILE_PATH: str = ""
+    NOTIFICATION_BATCH_SIZE: int = 100
+    NOTIFICATION_DEDUPE_SECONDS: int = 300  # a user gets at most one delivery per window
+    NOTIFICATION_LEASE_SECONDS: int = 300  # claimed rows not finished by then are claimed again
+    NOTIFICATION_MAX_ATTEMPTS: int = 5
+    NOTIFICATION_RETRY_SECONDS: float = 30.0  # first retry delay, doubled after each failed attempt
+    NOTIFICATION_POLL_SECONDS: float = 5.0
+    WS_PUBLISH_SECONDS: float = 1.0  # changed valuations are pushed at most this often
+    WS_SEND_TIMEOUT_SECONDS: float = 10.0  # a client that cannot take a message within this is dropped
+    WS_MAX_SUBSCRIPTIONS: int = 100
+    SSE_REPLAY_EVENTS: int = 10000  # recent events kept for Last-Event-ID resume
+    SSE_RESUME_OVERLAP_SECONDS: float = 2.0  # with several workers, resume also replays this far before Last-Event-ID
+    SSE_MAX_PENDING: int = 1000  # unsent non-conflatable events before a stream is ended
+    SSE_KEEPALIVE_SECONDS: float = 15.0
+    SSE_MAX_SYMBOLS: int = 200
+    MESSAGE_BUS: str = "memory"  # "redis" shares ticks, pushes and cache invalidations between workers via REDIS_URL
+    MESSAGE_BUS_BATCH_SIZE: int = 500
+    MESSAGE_BUS_FLUSH_SECONDS: float = 0.05
+    MESSAGE_BUS_LEADER_LEASE_SECONDS: float = 15.0  # one worker holds the lease and runs the market data loops
+    FX_RATES_PATH: str = ""  # CSV of date,base,quote,rate loaded on startup
+    PRICE_STORE_PATH: str = ""  # directory of per-symbol daily close files; empty disables the store
+    
     # External APIs
     MARKET_DATA_API_KEY: str = ""
     MARKET_DATA_BASE_URL: str = ""
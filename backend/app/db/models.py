@@ -3,13 +3,13 @@ Database Models
 SQLAlchemy models for the FinanceFlow application
 """
 
-from datetime import datetime
+from datetime import datetime, date
 from decimal import Decimal
 from typing import Optional, List
 from uuid import uuid4
 
 from sqlalchemy import (
-    String, DateTime, Numeric, Boolean, Text, ForeignKey, 
+    String, Date, DateTime, Numeric, Boolean, Text, ForeignKey, 
     Enum, Index, CheckConstraint
 )
 from sqlalchemy.dialects.postgresql import UUID
@@ -53,6 +53,12 @@ class TransactionType(str, enum.Enum):
     TRANSFER = "transfer"
 
 
+class BarResolution(str, enum.Enum):
+    MINUTE = "1m"
+    HOUR = "1h"
+    DAY = "1d"
+
+
 class AlertType(str, enum.Enum):
     PRICE_ABOVE = "price_above"
     PRICE_BELOW = "price_below"
@@ -61,6 +67,14 @@ class AlertType(str, enum.Enum):
     ALLOCATION_DRIFT = "allocation_drift"
 
 
+class NotificationStatus(str, enum.Enum):
+    PENDING = "pending"
+    PROCESSING = "processing"
+    SENT = "sent"
+    SKIPPED = "skipped"
+    FAILED = "failed"
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -145,6 +159,8 @@ class Portfolio(Base):
     day_change_percent: Mapped[Decimal] = mapped_column(
         Numeric(8, 4), default=Decimal("0.0000"), nullable=False
     )
+    # Last closed day covered by portfolio_valuations (None until first built)
+    valued_through: Mapped[Optional[date]] = mapped_column(Date, nullable=True)
     
     # Timestamps
     created_at: Mapped[datetime] = mapped_column(
@@ -165,6 +181,15 @@ class Portfolio(Base):
     alerts: Mapped[List["Alert"]] = relationship(
         "Alert", back_populates="portfolio", cascade="all, delete-orphan"
     )
+    valuations: Mapped[List["PortfolioValuation"]] = relationship(
+        "PortfolioValuation", back_populates="portfolio", cascade="all, delete-orphan"
+    )
+    benchmarks: Mapped[List["PortfolioBenchmark"]] = relationship(
+        "PortfolioBenchmark", back_populates="portfolio", cascade="all, delete-orphan"
+    )
+    allocation_targets: Mapped[List["AllocationTarget"]] = relationship(
+        "AllocationTarget", back_populates="portfolio", cascade="all, delete-orphan"
+    )
 
     # Constraints
     __table_args__ = (
@@ -314,25 +339,13 @@ class WatchlistItem(Base):
     )
     symbol: Mapped[str] = mapped_column(String(20), nullable=False, index=True)
     name: Mapped[str] = mapped_column(String(200), nullable=False)
-    
-    # Current market data (updated periodically)
-    current_price: Mapped[Decimal] = mapped_column(
-        Numeric(15, 4), default=Decimal("0.0000"), nullable=False
-    )
-    change: Mapped[Decimal] = mapped_column(
-        Numeric(15, 4), default=Decimal("0.0000"), nullable=False
-    )
-    change_percent: Mapped[Decimal] = mapped_column(
-        Numeric(8, 4), default=Decimal("0.0000"), nullable=False
-    )
-    
+
+    # Market data is not stored per item; reads join symbol_quotes on symbol
+
     # Timestamps
     added_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now(), nullable=False
     )
-    last_price_update: Mapped[Optional[datetime]] = mapped_column(
-        DateTime(timezone=True), nullable=True
-    )
 
     # Relationships
     user: Mapped["User"] = relationship("User", back_populates="watchlist_items")
@@ -366,6 +379,7 @@ class Alert(Base):
     current_value: Mapped[Decimal] = mapped_column(
         Numeric(15, 4), default=Decimal("0.0000"), nullable=False
     )
+    window_minutes: Mapped[Optional[int]] = mapped_column(nullable=True)  # percent_change lookback
     
     is_triggered: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
     is_active: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
@@ -397,6 +411,23 @@ class Alert(Base):
         return f"<Alert(id={self.id}, type={self.alert_type}, user_id={self.user_id})>"
 
 
+class SymbolQuote(Base):
+    __tablename__ = "symbol_quotes"
+
+    symbol: Mapped[str] = mapped_column(String(20), primary_key=True)
+    price: Mapped[Decimal] = mapped_column(Numeric(15, 4), nullable=False)
+    previous_close: Mapped[Optional[Decimal]] = mapped_column(Numeric(15, 4), nullable=True)
+    close_date: Mapped[Optional[date]] = mapped_column(Date, nullable=True)
+
+    # Timestamps
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False
+    )
+
+    def __repr__(self) -> str:
+        return f"<SymbolQuote(symbol={self.symbol}, price={self.price}, previous_close={self.previous_close})>"
+
+
 class MarketData(Base):
     __tablename__ = "market_data"
 
@@ -425,4 +456,236 @@ class MarketData(Base):
     )
 
     def __repr__(self) -> str:
-        return f"<MarketData(symbol={self.symbol}, price={self.price}, timestamp={self.timestamp})>"
\ No newline at end of file
+        return f"<MarketData(symbol={self.symbol}, price={self.price}, timestamp={self.timestamp})>"
+
+
+class PortfolioValuation(Base):
+    __tablename__ = "portfolio_valuations"
+
+    id: Mapped[str] = mapped_column(
+        UUID(as_uuid=False), primary_key=True, default=lambda: str(uuid4())
+    )
+    portfolio_id: Mapped[str] = mapped_column(
+        UUID(as_uuid=False), ForeignKey("portfolios.id"), nullable=False
+    )
+    valuation_date: Mapped[date] = mapped_column(Date, nullable=False)
+    
+    # End-of-day market value and the external cash flow (buys - sells) booked that day
+    total_value: Mapped[Decimal] = mapped_column(
+        Numeric(15, 2), default=Decimal("0.00"), nullable=False
+    )
+    net_flow: Mapped[Decimal] = mapped_column(
+        Numeric(15, 2), default=Decimal("0.00"), nullable=False
+    )
+    
+    # Timestamps
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+    # Relationships
+    portfolio: Mapped["Portfolio"] = relationship("Portfolio", back_populates="valuations")
+
+    # Constraints
+    __table_args__ = (
+        Index("idx_valuation_portfolio_date", "portfolio_id", "valuation_date", unique=True),
+    )
+
+    def __repr__(self) -> str:
+        return f"<PortfolioValuation(portfolio_id={self.portfolio_id}, date={self.valuation_date})>"
+
+
+class PortfolioBenchmark(Base):
+    __tablename__ = "portfolio_benchmarks"
+
+    id: Mapped[str] = mapped_column(
+        UUID(as_uuid=False), primary_key=True, default=lambda: str(uuid4())
+    )
+    portfolio_id: Mapped[str] = mapped_column(
+        UUID(as_uuid=False), ForeignKey("portfolios.id"), nullable=False
+    )
+    # Index series symbol whose prices live in market_data (e.g. SPY as an S&P 500 proxy)
+    symbol: Mapped[str] = mapped_column(String(20), nullable=False, index=True)
+    
+    # Timestamps
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+    # Relationships
+    portfolio: Mapped["Portfolio"] = relationship("Portfolio", back_populates="benchmarks")
+
+    # Constraints
+    __table_args__ = (
+        Index("idx_benchmark_portfolio_symbol", "portfolio_id", "symbol", unique=True),
+    )
+
+    def __repr__(self) -> str:
+        return f"<PortfolioBenchmark(portfolio_id={self.portfolio_id}, symbol={self.symbol})>"
+
+
+class AllocationTarget(Base):
+    __tablename__ = "allocation_targets"
+
+    id: Mapped[str] = mapped_column(
+        UUID(as_uuid=False), primary_key=True, default=lambda: str(uuid4())
+    )
+    portfolio_id: Mapped[str] = mapped_column(
+        UUID(as_uuid=False), ForeignKey("portfolios.id"), nullable=False, index=True
+    )
+    
+    # Exactly one of asset_type or symbol is set
+    asset_type: Mapped[Optional[AssetType]] = mapped_column(Enum(AssetType), nullable=True)
+    symbol: Mapped[Optional[str]] = mapped_column(String(20), nullable=True)
+    target_percent: Mapped[Decimal] = mapped_column(Numeric(8, 4), nullable=False)
+    
+    # Timestamps
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+    # Relationships
+    portfolio: Mapped["Portfolio"] = relationship("Portfolio", back_populates="allocation_targets")
+
+    # Constraints
+    __table_args__ = (
+        CheckConstraint(
+            "(asset_type IS NULL) <> (symbol IS NULL)", name="check_target_type_or_symbol"
+        ),
+        CheckConstraint(
+            "target_percent >= 0 AND target_percent <= 100", name="check_target_percent_range"
+        ),
+    )
+
+    def __repr__(self) -> str:
+        return f"<AllocationTarget(portfolio_id={self.portfolio_id}, asset_type={self.asset_type}, symbol={self.symbol})>"
+
+
+class PriceBar(Base):
+    __tablename__ = "price_bars"
+
+    id: Mapped[str] = mapped_column(
+        UUID(as_uuid=False), primary_key=True, default=lambda: str(uuid4())
+    )
+    symbol: Mapped[str] = mapped_column(String(20), nullable=False)
+    resolution: Mapped[BarResolution] = mapped_column(Enum(BarResolution), nullable=False)
+    bucket_start: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    open: Mapped[Decimal] = mapped_column(Numeric(15, 4), nullable=False)
+    high: Mapped[Decimal] = mapped_column(Numeric(15, 4), nullable=False)
+    low: Mapped[Decimal] = mapped_column(Numeric(15, 4), nullable=False)
+    close: Mapped[Decimal] = mapped_column(Numeric(15, 4), nullable=False)
+    volume: Mapped[Optional[int]] = mapped_column(nullable=True)
+    tick_count: Mapped[int] = mapped_column(default=0, nullable=False)
+
+    # Constraints
+    __table_args__ = (
+        Index("idx_price_bar_symbol_resolution_bucket", "symbol", "resolution", "bucket_start", unique=True),
+        Index("idx_price_bar_resolution_bucket", "resolution", "bucket_start"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<PriceBar(symbol={self.symbol}, resolution={self.resolution}, bucket_start={self.bucket_start})>"
+
+
+class BackfillCheckpoint(Base):
+    __tablename__ = "backfill_checkpoints"
+
+    symbol: Mapped[str] = mapped_column(String(20), primary_key=True)
+    start_date: Mapped[date] = mapped_column(Date, nullable=False)
+    end_date: Mapped[date] = mapped_column(Date, nullable=False)
+    # Days before completed_until are stored; backfill resumes from here
+    completed_until: Mapped[Optional[date]] = mapped_column(Date, nullable=True)
+
+    # Timestamps
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False
+    )
+
+    def __repr__(self) -> str:
+        return f"<BackfillCheckpoint(symbol={self.symbol}, completed_until={self.completed_until})>"
+
+
+class FxRate(Base):
+    __tablename__ = "fx_rates"
+
+    id: Mapped[str] = mapped_column(
+        UUID(as_uuid=False), primary_key=True, default=lambda: str(uuid4())
+    )
+    # One unit of base buys `rate` units of quote
+    base: Mapped[Currency] = mapped_column(Enum(Currency), nullable=False)
+    quote: Mapped[Currency] = mapped_column(Enum(Currency), nullable=False)
+    rate_date: Mapped[date] = mapped_column(Date, nullable=False)
+    rate: Mapped[Decimal] = mapped_column(Numeric(18, 8), nullable=False)
+
+    # Timestamps
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+    # Constraints
+    __table_args__ = (
+        Index("idx_fx_rate_pair_date", "base", "quote", "rate_date", unique=True),
+    )
+
+    def __repr__(self) -> str:
+        return f"<FxRate({self.base.value}/{self.quote.value} {self.rate_date}: {self.rate})>"
+
+
+class AlertNotification(Base):
+    # Outbox row written in the transaction that triggers the alert, delivered later by a worker
+    __tablename__ = "alert_notifications"
+
+    # Sequential ids give the delivery order
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    alert_id: Mapped[str] = mapped_column(
+        UUID(as_uuid=False), ForeignKey("alerts.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    user_id: Mapped[str] = mapped_column(
+        UUID(as_uuid=False), ForeignKey("users.id"), nullable=False
+    )
+    portfolio_id: Mapped[Optional[str]] = mapped_column(UUID(as_uuid=False), nullable=True)
+    message: Mapped[str] = mapped_column(Text, nullable=False)
+
+    status: Mapped[NotificationStatus] = mapped_column(
+        Enum(NotificationStatus), default=NotificationStatus.PENDING, nullable=False
+    )
+    attempts: Mapped[int] = mapped_column(default=0, nullable=False)
+    channels: Mapped[Optional[str]] = mapped_column(String(50), nullable=True)  # e.g. "email,push"
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+
+    # Timestamps
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    claimed_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    next_attempt_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    delivered_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    # Constraints
+    __table_args__ = (
+        Index("idx_alert_notification_status", "status", "id"),
+        Index("idx_alert_notification_user_delivered", "user_id", "delivered_at"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<AlertNotification(alert_id={self.alert_id}, status={self.status})>"
+
+
+class AlertCounter(Base):
+    # Per-user alert counts kept in step with every alert change, for the notification badge
+    __tablename__ = "alert_counters"
+
+    user_id: Mapped[str] = mapped_column(
+        UUID(as_uuid=False), ForeignKey("users.id"), primary_key=True
+    )
+    # Armed alerts (active, not yet triggered) and triggered alerts not yet dismissed
+    active_count: Mapped[int] = mapped_column(default=0, nullable=False)
+    triggered_count: Mapped[int] = mapped_column(default=0, nullable=False)
+
+    # Timestamps
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False
+    )
+
+    def __repr__(self) -> str:
+        return f"<AlertCounter(user_id={self.user_id}, active={self.active_count}, triggered={self.triggered_count})>"
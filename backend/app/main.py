@@ -7,15 +7,33 @@ from fastapi import FastAPI, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
+import asyncio
 import time
 import uuid
 from contextlib import asynccontextmanager
 
 # Core imports
 from app.core.config import settings
-from app.core.database import init_db
+from app.core.database import init_db, AsyncSessionLocal
 from app.api.v1.router import api_router
+from app.api import websocket
 from app.core.seed_data import seed_database
+from app.services.risk_service import shutdown_process_pool
+from app.services.quote_service import run_daily_close_rollover
+from app.services.market_data_provider import get_market_data_provider
+from app.services.price_service import run_price_feed
+from app.services.refresh_scheduler import run_quote_refresh_scheduler
+from app.services.backfill_service import run_history_backfill
+from app.services.quote_cache import configure_quote_cache, DatabaseQuoteProvider
+from app.services.compaction_service import run_market_data_compaction
+from app.services.price_store import get_price_store
+from app.services.holdings_index import get_holdings_index
+from app.services.alert_engine import get_alert_engine
+from app.services.notification_sender import get_notification_sender
+from app.services.notification_service import run_notification_delivery
+from app.services.fx_service import FxService
+from app.services.message_bus import get_message_bus, run_while_leader
+from app.services import alert_engine, event_hub, fx_service, holdings_index, quote_cache, valuation_stream
 
 
 @asynccontextmanager
@@ -34,11 +52,98 @@ async def lifespan(app: FastAPI):
         except Exception as e:
             print(f"Warning: Could not seed database: {e}")
 
+    # Share price ticks, push events, index changes and cache invalidations with the other workers
+    bus = get_message_bus()
+    for module in (alert_engine, event_hub, fx_service, holdings_index, quote_cache, valuation_stream):
+        module.register_bus_handlers(bus)
+    try:
+        await bus.start()
+    except Exception as e:
+        print(f"Warning: Could not connect message bus: {e}")
+    bus_task = asyncio.create_task(bus.run())
+    # Market data loops below run on one worker, the holder of the leader lease
+    leader_task = asyncio.create_task(bus.lead())
+
+    # Load published exchange rates for multi-currency reporting
+    if settings.FX_RATES_PATH:
+        try:
+            async with AsyncSessionLocal() as session:
+                await FxService(session).import_rates_file(settings.FX_RATES_PATH)
+        except Exception as e:
+            print(f"Warning: Could not load FX rates: {e}")
+
+    # Fill the columnar price store for symbols it does not hold yet
+    price_store = get_price_store()
+    if price_store is not None and bus.is_leader:
+        try:
+            async with AsyncSessionLocal() as session:
+                await price_store.rebuild(session, missing_only=True)
+        except Exception as e:
+            print(f"Warning: Could not rebuild price store: {e}")
+
+    # Index positions by symbol so price ticks revalue only their holders
+    async with AsyncSessionLocal() as session:
+        await get_holdings_index().load(session)
+
+    # Index active price alerts by threshold so ticks find crossed alerts without scanning
+    async with AsyncSessionLocal() as session:
+        await get_alert_engine().load(session)
+
+    # Roll previous closes after each daily close
+    rollover_task = asyncio.create_task(
+        run_while_leader(bus, lambda: run_daily_close_rollover(AsyncSessionLocal))
+    )
+
+    # Roll raw ticks into OHLCV bars and apply retention
+    compaction_task = asyncio.create_task(
+        run_while_leader(bus, lambda: run_market_data_compaction(AsyncSessionLocal))
+    )
+
+    # Replays push every recorded tick; polled providers are refreshed by demand
+    provider = get_market_data_provider() if settings.MARKET_DATA_PROVIDER else None
+    feed = run_price_feed if settings.MARKET_DATA_PROVIDER == "replay" else run_quote_refresh_scheduler
+    feed_task = (
+        asyncio.create_task(run_while_leader(bus, lambda: feed(provider, AsyncSessionLocal))) if provider else None
+    )
+
+    # Download daily history for newly held or watched symbols
+    history_provider = get_market_data_provider(settings.BACKFILL_PROVIDER) if settings.BACKFILL_PROVIDER else None
+    backfill_task = (
+        asyncio.create_task(run_while_leader(bus, lambda: run_history_backfill(history_provider, AsyncSessionLocal)))
+        if history_provider else None
+    )
+
+    # Deliver queued alert notifications off the tick path
+    notification_task = asyncio.create_task(
+        run_notification_delivery(get_notification_sender(), AsyncSessionLocal)
+    )
+
+    # Push changed valuations to WebSocket subscribers
+    valuation_task = asyncio.create_task(valuation_stream.run_valuation_stream(AsyncSessionLocal))
+
+    # Price lookups read through the quote cache, backed by the provider or the local quote table
+    configure_quote_cache(provider or DatabaseQuoteProvider(AsyncSessionLocal))
     
     yield
     
     # Shutdown
-
+    rollover_task.cancel()
+    compaction_task.cancel()
+    notification_task.cancel()
+    valuation_task.cancel()
+    if feed_task:
+        feed_task.cancel()
+        await asyncio.gather(feed_task, return_exceptions=True)
+        await provider.close()
+    if backfill_task:
+        backfill_task.cancel()
+        await asyncio.gather(backfill_task, return_exceptions=True)
+        await history_provider.close()
+    await asyncio.gather(rollover_task, compaction_task, return_exceptions=True)
+    leader_task.cancel()
+    bus_task.cancel()
+    await bus.close()
+    shutdown_process_pool()
 
 
 # Create FastAPI application
@@ -64,6 +169,7 @@ app.add_middleware(
 
 # Include API routes
 app.include_router(api_router, prefix="/api/v1")
+app.include_router(websocket.router)
 
 
 # Exception handlers
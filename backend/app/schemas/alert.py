@@ -0,0 +1,83 @@
+"""
+Alert Pydantic Schemas
+"""
+
+from datetime import datetime
+from decimal import Decimal
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field, ConfigDict
+
+from app.db.models import AlertType
+from app.schemas.portfolio import to_camel
+
+
+ConditionOperator = Literal["greater_than", "less_than", "equals"]
+
+# Most alerts created or deleted in one request
+MAX_BULK_ALERTS = 500
+
+
+class AlertCreate(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+    alert_type: AlertType
+    symbol: Optional[str] = Field(None, min_length=1, max_length=20)
+    portfolio_id: Optional[str] = None
+    condition_operator: ConditionOperator = "greater_than"
+    target_value: Decimal = Field(..., ge=0)
+    window_minutes: Optional[int] = Field(None, gt=0, le=1440)
+    message: Optional[str] = Field(None, max_length=500)
+
+
+class AlertUpdate(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+    condition_operator: Optional[ConditionOperator] = None
+    target_value: Optional[Decimal] = Field(None, ge=0)
+    window_minutes: Optional[int] = Field(None, gt=0, le=1440)
+    message: Optional[str] = Field(None, max_length=500)
+    is_active: Optional[bool] = None
+    # False re-arms a triggered alert
+    is_triggered: Optional[Literal[False]] = None
+
+
+class AlertResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True, alias_generator=to_camel, populate_by_name=True)
+
+    id: str
+    alert_type: AlertType
+    symbol: Optional[str] = None
+    portfolio_id: Optional[str] = None
+    condition_operator: str
+    target_value: Decimal
+    current_value: Decimal
+    window_minutes: Optional[int] = None
+    message: str
+    is_active: bool
+    is_triggered: bool
+    created_at: datetime
+    triggered_at: Optional[datetime] = None
+    last_checked_at: Optional[datetime] = None
+
+
+class AlertPage(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+    items: List[AlertResponse]
+    # Pass back as `cursor` for the next page; null on the last page
+    next_cursor: Optional[str] = None
+
+
+class AlertBulkCreate(BaseModel):
+    alerts: List[AlertCreate] = Field(..., min_length=1, max_length=MAX_BULK_ALERTS)
+
+
+class AlertBulkDelete(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=MAX_BULK_ALERTS)
+
+
+class AlertCounts(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+    active: int
+    triggered: int
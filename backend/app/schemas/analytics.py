@@ -0,0 +1,141 @@
+"""
+Portfolio Analytics Pydantic Schemas
+"""
+
+import enum
+from datetime import date, datetime
+from decimal import Decimal
+from typing import List, Optional
+from pydantic import BaseModel, Field, ConfigDict
+
+from app.db.models import AssetType
+from app.schemas.portfolio import AssetAllocation
+
+
+class BenchmarkCreate(BaseModel):
+    symbol: str = Field(..., min_length=1, max_length=20)
+
+
+class BenchmarkResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    portfolio_id: str
+    symbol: str
+    created_at: datetime
+
+
+class BenchmarkAnalytics(BaseModel):
+    symbol: str
+    observations: int
+    beta: Optional[Decimal] = None
+    alpha: Optional[Decimal] = None
+    correlation: Optional[Decimal] = None
+    tracking_error: Optional[Decimal] = None
+    information_ratio: Optional[Decimal] = None
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+
+
+class RiskMethod(str, enum.Enum):
+    HISTORICAL = "historical"
+    MONTE_CARLO = "monte_carlo"
+
+
+class RiskMetrics(BaseModel):
+    method: RiskMethod
+    confidence: Decimal
+    portfolio_value: Decimal
+    var_1d: Decimal
+    cvar_1d: Decimal
+    var_10d: Decimal
+    cvar_10d: Decimal
+    observations: int
+    paths: Optional[int] = None
+    missing_symbols: List[str] = []
+
+
+class AllocationTargetItem(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    asset_type: Optional[AssetType] = None
+    symbol: Optional[str] = Field(None, min_length=1, max_length=20)
+    target_percent: Decimal = Field(..., ge=0, le=100)
+
+
+class AllocationTargetsUpdate(BaseModel):
+    targets: List[AllocationTargetItem]
+
+
+class RebalanceMode(str, enum.Enum):
+    FULL = "full"
+    CASH_ONLY = "cash_only"
+    MIN_TRADE = "min_trade"
+
+
+class RebalanceRequest(BaseModel):
+    mode: RebalanceMode = RebalanceMode.FULL
+    tolerance_percent: Decimal = Field(default=Decimal("5"), ge=0, le=100)
+    cash_amount: Decimal = Field(default=Decimal("0"), ge=0)
+    min_trade_value: Decimal = Field(default=Decimal("0"), ge=0)
+
+
+class RebalanceTrade(BaseModel):
+    asset_id: Optional[str] = None
+    symbol: str
+    asset_type: AssetType
+    action: str
+    quantity: Decimal
+    price: Decimal
+    value: Decimal
+    current_weight: Decimal
+    target_weight: Decimal
+
+
+class RebalanceResponse(BaseModel):
+    portfolio_id: str
+    mode: RebalanceMode
+    total_value: Decimal
+    cash_remaining: Decimal
+    turnover: Decimal
+    trades: List[RebalanceTrade] = []
+    unfilled_targets: List[str] = []
+
+
+class SimulatedTrade(BaseModel):
+    symbol: str = Field(..., min_length=1, max_length=20)
+    action: str = Field(..., pattern="^(buy|sell)$")
+    quantity: Decimal = Field(..., gt=0)
+    price: Optional[Decimal] = Field(None, gt=0)
+    asset_type: AssetType = AssetType.STOCK
+
+
+class SimulationRequest(BaseModel):
+    trades: List[SimulatedTrade] = Field(..., min_length=1, max_length=500)
+    risk_method: RiskMethod = RiskMethod.HISTORICAL
+    confidence: Decimal = Field(Decimal("0.95"), gt=Decimal("0.5"), lt=1)
+
+
+class SimulatedPosition(BaseModel):
+    symbol: str
+    asset_type: AssetType
+    quantity: Decimal
+    quantity_change: Decimal
+    price: Decimal
+    market_value: Decimal
+    total_cost: Decimal
+    weight: Decimal
+
+
+class SimulationResponse(BaseModel):
+    portfolio_id: str
+    total_value: Decimal
+    total_cost: Decimal
+    total_gain_loss: Decimal
+    total_gain_loss_percent: Decimal
+    value_change: Decimal
+    cash_flow: Decimal
+    realized_gain_loss: Decimal
+    positions: List[SimulatedPosition]
+    allocation: List[AssetAllocation]
+    risk: RiskMetrics
@@ -0,0 +1,32 @@
+"""
+Market Data Pydantic Schemas
+"""
+
+from datetime import date, datetime
+from decimal import Decimal
+from typing import List, Optional
+from pydantic import BaseModel
+
+from app.db.models import BarResolution, Currency
+
+
+class PriceBarResponse(BaseModel):
+    timestamp: datetime
+    open: Decimal
+    high: Decimal
+    low: Decimal
+    close: Decimal
+    volume: Optional[int] = None
+
+
+class PriceHistoryResponse(BaseModel):
+    symbol: str
+    resolution: BarResolution
+    bars: List[PriceBarResponse]
+
+
+class FxRateResponse(BaseModel):
+    base: Currency
+    quote: Currency
+    date: date
+    rate: Decimal
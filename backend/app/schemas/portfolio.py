@@ -136,6 +136,7 @@ class PerformanceData(BaseModel):
     three_years: Optional[PerformancePeriod] = None
     five_years: Optional[PerformancePeriod] = None
     inception: Optional[PerformancePeriod] = None
+    custom: Optional[PerformancePeriod] = None
 
 
 class PortfolioResponse(PortfolioBase):
@@ -162,4 +163,35 @@ class PortfolioSummary(BaseModel):
     total_value: Decimal
     day_change: Decimal
     day_change_percent: Decimal
-    updated_at: datetime
\ No newline at end of file
+    updated_at: datetime
+
+
+class HouseholdPosition(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+    symbol: str
+    asset_type: AssetType
+    quantity: Decimal
+    average_cost: Decimal
+    market_value: Decimal
+    total_cost: Decimal
+    unrealized_gain_loss: Decimal
+    day_change: Decimal
+    weight: Decimal
+    portfolio_count: int
+
+
+class HouseholdSummary(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+    user_id: str
+    currency: Currency
+    portfolio_count: int
+    total_value: Decimal
+    total_cost: Decimal
+    total_gain_loss: Decimal
+    total_gain_loss_percent: Decimal
+    day_change: Decimal
+    day_change_percent: Decimal
+    positions: List[HouseholdPosition] = []
+    allocation: List[AssetAllocation] = []
@@ -0,0 +1,32 @@
+"""
+Watchlist Pydantic Schemas
+"""
+
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional
+from pydantic import BaseModel, Field, ConfigDict
+
+from app.schemas.portfolio import to_camel
+
+
+class WatchlistItemCreate(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+    symbol: str = Field(..., min_length=1, max_length=20)
+    name: Optional[str] = Field(None, min_length=1, max_length=200)
+
+
+class WatchlistItemResponse(BaseModel):
+    model_config = ConfigDict(alias_generator=to_camel, populate_by_name=True)
+
+    id: str
+    user_id: str
+    symbol: str
+    name: str
+    # Latest quote for the symbol; zero until the symbol has been priced
+    current_price: Decimal = Decimal("0.0000")
+    change: Decimal = Decimal("0.0000")
+    change_percent: Decimal = Decimal("0.0000")
+    added_at: datetime
+    last_price_update: Optional[datetime] = None
@@ -0,0 +1,607 @@
+"""
+Alert Engine
+Threshold-indexed evaluation of price and percent-change alerts on every tick,
+and of portfolio alerts whenever the portfolio is revalued
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import event, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, aliased
+
+from app.core.config import settings
+from app.db.models import Alert, AlertType, AllocationTarget, Asset, AssetType
+from app.services.alert_service import count_triggered
+from app.services.event_hub import stage_alert_events
+from app.services.message_bus import MessageBus, get_message_bus
+from app.services.notification_service import enqueue_alert_notifications
+from app.services.price_windows import PriceRing
+
+
+PRICE_ALERT_TYPES = (AlertType.PRICE_ABOVE, AlertType.PRICE_BELOW)
+SYMBOL_ALERT_TYPES = PRICE_ALERT_TYPES + (AlertType.PERCENT_CHANGE,)
+PORTFOLIO_ALERT_TYPES = (AlertType.PORTFOLIO_VALUE, AlertType.ALLOCATION_DRIFT)
+
+ALERTS_TOPIC = "index.alerts"
+
+TRIGGER_CHUNK_ROWS = 500
+
+# Session.info keys of the row updates queued and the alerts fired by a session's evaluations
+PENDING_KEY = "alert_engine_pending"
+FIRED_KEY = "alert_engine_fired"
+
+# (symbol, alert_type, window_minutes) of one threshold book; the window is None for price alerts
+BookKey = Tuple[str, AlertType, Optional[int]]
+
+# (book, threshold) an alert is currently indexed under
+IndexKey = Tuple[BookKey, float]
+
+# (symbol, asset_type, market_value) of one position
+Position = Tuple[str, Optional[AssetType], Decimal]
+
+# (asset_type, symbol, target_percent) of one allocation target
+Target = Tuple[Optional[AssetType], Optional[str], Decimal]
+
+
+@dataclass
+class PortfolioAlert:
+    alert_id: str
+    alert_type: AlertType
+    operator: str
+    target_value: Decimal
+    symbol: Optional[str] = None
+
+
+def condition_met(operator: str, value: Decimal, target: Decimal) -> bool:
+    if operator == "greater_than":
+        return value > target
+    if operator == "less_than":
+        return value < target
+    if operator == "equals":
+        return value.quantize(Decimal("0.0001")) == target.quantize(Decimal("0.0001"))
+    return False
+
+
+def allocation_drift(positions: List[Position], targets: List[Target], symbol: Optional[str] = None) -> Decimal:
+    """Largest absolute gap in percentage points between a weight and its target.
+
+    Targets by asset type compare against the summed weight of that type;
+    with a symbol only that symbol's target counts. No targets, no drift.
+    """
+    total = sum((value for _, _, value in positions), Decimal("0"))
+    if total <= 0:
+        return Decimal("0")
+    by_symbol: Dict[str, Decimal] = {}
+    by_type: Dict[AssetType, Decimal] = {}
+    for position_symbol, asset_type, value in positions:
+        by_symbol[position_symbol] = by_symbol.get(position_symbol, Decimal("0")) + value
+        by_type[asset_type] = by_type.get(asset_type, Decimal("0")) + value
+
+    drift = Decimal("0")
+    for asset_type, target_symbol, percent in targets:
+        if symbol is not None and target_symbol != symbol:
+            continue
+        value = by_symbol.get(target_symbol, 0) if target_symbol else by_type.get(asset_type, 0)
+        drift = max(drift, abs(value / total * 100 - percent))
+    return drift
+
+
+class ThresholdBook:
+    """Active thresholds of one symbol and direction, sorted ascending with their alert ids.
+
+    Crossed thresholds are sliced off the end they were crossed from, so
+    after each tick the book holds only alerts the last price has not
+    reached: for PRICE_ABOVE everything left sits above it, for PRICE_BELOW
+    everything left sits below it. The alerts crossed by a move from the
+    previous price to the new one are then exactly the slice up to the
+    new price's bisection point, found in O(log n) and removed as a view.
+    New thresholds are buffered and merged in one pass before the next tick.
+    """
+
+    def __init__(self, above: bool):
+        self.above = above
+        self.values = np.empty(0)
+        self.ids = np.empty(0, dtype=object)
+        self.pending_values: List[float] = []
+        self.pending_ids: List[str] = []
+        self.stale = 0
+
+    def __len__(self) -> int:
+        return len(self.values) + len(self.pending_values)
+
+    def add(self, alert_id: str, threshold: float):
+        self.pending_values.append(threshold)
+        self.pending_ids.append(alert_id)
+
+    def _merge(self):
+        if not self.pending_values:
+            return
+        order = np.argsort(self.pending_values, kind="stable")
+        values = np.asarray(self.pending_values)[order]
+        ids = np.array(self.pending_ids, dtype=object)[order]
+        positions = np.searchsorted(self.values, values, side="right")
+        self.values = np.insert(self.values, positions, values)
+        self.ids = np.insert(self.ids, positions, ids)
+        self.pending_values, self.pending_ids = [], []
+
+    def take_crossed(self, price: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Remove and return (ids, thresholds) of every threshold the price has reached"""
+        self._merge()
+        if self.above:
+            cut = np.searchsorted(self.values, price, side="right")
+            crossed = self.ids[:cut], self.values[:cut]
+            self.values, self.ids = self.values[cut:], self.ids[cut:]
+        else:
+            cut = np.searchsorted(self.values, price, side="left")
+            crossed = self.ids[cut:], self.values[cut:]
+            self.values, self.ids = self.values[:cut], self.ids[:cut]
+        return crossed
+
+    def compact(self, is_live: Callable[[str, float], bool]):
+        """Drop entries no longer live, e.g. alerts removed since they were indexed"""
+        self._merge()
+        keep = np.fromiter(
+            (is_live(alert_id, value) for alert_id, value in zip(self.ids, self.values)),
+            dtype=bool, count=len(self.values)
+        )
+        self.values, self.ids = self.values[keep], self.ids[keep]
+        self.stale = 0
+
+
+class AlertEngine:
+    """Threshold alerts indexed as (symbol, type, window) -> ThresholdBook, portfolio alerts by portfolio_id.
+
+    Only active, untriggered alerts are indexed. PRICE_ABOVE fires once the
+    price reaches or exceeds its target and PRICE_BELOW once it reaches or
+    falls under it. PERCENT_CHANGE fires once the price has moved at least
+    its target percent, up or down, within its window_minutes; every
+    alerted symbol keeps a ring buffer of recent ticks whose rolling
+    min/max gives each window's move in O(1), which is then matched
+    against a threshold book like a price. PORTFOLIO_VALUE compares the
+    portfolio's total value and ALLOCATION_DRIFT its largest drift from
+    allocation targets with the alert's condition_operator; they are
+    checked only when their portfolio is revalued. Alert inserts, updates
+    and deletes reach the engine through session events once committed,
+    and the other workers' engines over the message bus.
+    Removed threshold alerts leave stale entries behind that are skipped
+    when crossed and dropped when they make up half a book. Evaluations
+    queue row updates on the evaluating session that flush() writes in
+    one executemany, so concurrent sessions never write, commit or drop
+    each other's; alerts they fire leave the index at once and are put
+    back if that session rolls back, unless a change to the alert was
+    committed in the meantime. An alert is triggered only by the statement
+    that flips its is_triggered, so one fired by two evaluations is
+    counted and notified once.
+    """
+
+    def __init__(self, ring_capacity: Optional[int] = None):
+        self.books: Dict[BookKey, ThresholdBook] = {}
+        self.indexed: Dict[str, IndexKey] = {}
+        self.rings: Dict[str, PriceRing] = {}
+        self.ring_capacity = ring_capacity or settings.ALERT_PRICE_BUFFER_SIZE
+        self.by_portfolio: Dict[str, Dict[str, PortfolioAlert]] = {}
+        self.portfolio_of: Dict[str, str] = {}
+        self.targets: Dict[str, List[Target]] = {}
+        # Alert id -> info of the session whose evaluation fired it and may put it back
+        self.fired_by: Dict[str, dict] = {}
+        self.loaded = False
+
+    async def load(self, db: AsyncSession) -> int:
+        """Index every active, untriggered threshold and portfolio alert; returns the number indexed"""
+        self.clear()
+        query = select(
+            Alert.id, Alert.symbol, Alert.portfolio_id, Alert.alert_type,
+            Alert.condition_operator, Alert.target_value, Alert.window_minutes
+        ).where(
+            Alert.is_active.is_(True),
+            Alert.is_triggered.is_(False),
+            Alert.alert_type.in_(SYMBOL_ALERT_TYPES + PORTFOLIO_ALERT_TYPES)
+        )
+        for row in (await db.execute(query)).all():
+            self.add_alert(
+                row.id, row.alert_type, row.target_value, row.symbol, row.portfolio_id,
+                row.condition_operator, row.window_minutes
+            )
+        self.loaded = True
+        return len(self.indexed) + len(self.portfolio_of)
+
+    def clear(self):
+        self.books.clear()
+        self.indexed.clear()
+        self.rings.clear()
+        self.by_portfolio.clear()
+        self.portfolio_of.clear()
+        self.targets.clear()
+        self.fired_by.clear()
+        self.loaded = False
+
+    def add_alert(
+        self,
+        alert_id: str,
+        alert_type: AlertType,
+        target_value: Decimal,
+        symbol: Optional[str] = None,
+        portfolio_id: Optional[str] = None,
+        operator: str = "greater_than",
+        window_minutes: Optional[int] = None
+    ):
+        """Index an alert under whichever structure evaluates its type"""
+        if alert_type in PRICE_ALERT_TYPES and symbol:
+            self.add(alert_id, symbol, alert_type, target_value)
+        elif alert_type == AlertType.PERCENT_CHANGE and symbol and window_minutes:
+            self.add(alert_id, symbol, alert_type, target_value, window_minutes)
+        elif alert_type in PORTFOLIO_ALERT_TYPES and portfolio_id:
+            self.add_portfolio_alert(
+                alert_id, portfolio_id, alert_type, operator, target_value, symbol.upper() if symbol else None
+            )
+        else:
+            self.remove(alert_id)
+
+    def add_portfolio_alert(
+        self,
+        alert_id: str,
+        portfolio_id: str,
+        alert_type: AlertType,
+        operator: str,
+        target_value: Decimal,
+        symbol: Optional[str] = None
+    ):
+        self.remove(alert_id)
+        self.by_portfolio.setdefault(portfolio_id, {})[alert_id] = PortfolioAlert(
+            alert_id, alert_type, operator, Decimal(target_value), symbol
+        )
+        self.portfolio_of[alert_id] = portfolio_id
+
+    def add(
+        self,
+        alert_id: str,
+        symbol: str,
+        alert_type: AlertType,
+        target_value: Decimal,
+        window_minutes: Optional[int] = None
+    ):
+        """Index a price or percent-change alert; the latter needs its window"""
+        self.remove(alert_id)
+        symbol = symbol.upper()
+        book_key = (symbol, alert_type, window_minutes if alert_type == AlertType.PERCENT_CHANGE else None)
+        book = self.books.get(book_key)
+        if book is None:
+            book = self.books[book_key] = ThresholdBook(above=alert_type != AlertType.PRICE_BELOW)
+        if alert_type == AlertType.PERCENT_CHANGE:
+            ring = self.rings.get(symbol)
+            if ring is None:
+                ring = self.rings[symbol] = PriceRing(self.ring_capacity)
+            ring.window(window_minutes * 60)
+        book.add(alert_id, float(target_value))
+        self.indexed[alert_id] = (book_key, float(target_value))
+
+    def remove(self, alert_id: str):
+        portfolio_id = self.portfolio_of.pop(alert_id, None)
+        if portfolio_id is not None:
+            alerts = self.by_portfolio[portfolio_id]
+            del alerts[alert_id]
+            if not alerts:
+                del self.by_portfolio[portfolio_id]
+                self.targets.pop(portfolio_id, None)
+
+        key = self.indexed.pop(alert_id, None)
+        if key is None:
+            return
+        book_key = key[0]
+        book = self.books[book_key]
+        book.stale += 1
+        if book.stale * 2 > len(book):
+            book.compact(lambda alert_id, value: self.indexed.get(alert_id) == (book_key, value))
+            if not len(book):
+                del self.books[book_key]
+                if book_key[2] is not None:
+                    self.rings[book_key[0]].windows.pop(book_key[2] * 60, None)
+
+    def evaluate_prices(
+        self,
+        db: AsyncSession,
+        prices: Dict[str, Decimal],
+        now: Optional[datetime] = None
+    ) -> List[str]:
+        """Fire every indexed alert crossed by the new prices; returns the fired alert ids.
+
+        Percent-change alerts are evaluated on the move within their window
+        ending at this tick, with the move recorded as their current_value.
+        """
+        now = now or datetime.utcnow()
+        timestamp = now.replace(tzinfo=timezone.utc).timestamp() if now.tzinfo is None else now.timestamp()
+        fired = []
+        for symbol, price in prices.items():
+            symbol = symbol.upper()
+            for alert_type in PRICE_ALERT_TYPES:
+                book_key = (symbol, alert_type, None)
+                if book_key in self.books:
+                    fired += self._fire(db, book_key, float(price), price, now)
+
+            ring = self.rings.get(symbol)
+            if ring is None:
+                continue
+            ring.append(timestamp, float(price))
+            for seconds, window in ring.windows.items():
+                book_key = (symbol, AlertType.PERCENT_CHANGE, seconds // 60)
+                if book_key in self.books:
+                    move = window.move_percent(ring)
+                    fired += self._fire(db, book_key, move, Decimal(str(round(move, 4))), now)
+        return fired
+
+    def _fire(
+        self,
+        db: AsyncSession,
+        book_key: BookKey,
+        level: float,
+        current_value: Decimal,
+        now: datetime
+    ) -> List[str]:
+        """Take the thresholds crossed by level from a book and queue their triggers"""
+        book = self.books[book_key]
+        fired = []
+        for alert_id, value in zip(*book.take_crossed(level)):
+            if self.indexed.get(alert_id) != (book_key, value):
+                # Removed or re-indexed since this entry was added
+                book.stale = max(book.stale - 1, 0)
+                continue
+            del self.indexed[alert_id]
+            symbol, alert_type, window_minutes = book_key
+            self._stage_fired(db, alert_id, (alert_type, value, symbol, None, "greater_than", window_minutes))
+            self._record(db, alert_id, current_value, now, triggered=True)
+            fired.append(alert_id)
+        return fired
+
+    def _stage_fired(self, db: AsyncSession, alert_id: str, arguments: tuple):
+        """Keep add_alert arguments of a fired alert on the session until its transaction ends"""
+        db.info.setdefault(FIRED_KEY, {})[alert_id] = arguments
+        self.fired_by[alert_id] = db.info
+
+    def restore_fired(self, info: dict, alert_id: str, arguments: tuple):
+        """Re-index an alert a rolled-back session fired, if no change to it was committed since"""
+        if self.fired_by.get(alert_id) is info:
+            del self.fired_by[alert_id]
+            self.add_alert(alert_id, *arguments)
+
+    def committed(self, alert_id: str):
+        """A change to the alert was committed here or on another worker; it supersedes any staged firing"""
+        self.fired_by.pop(alert_id, None)
+
+    def forget_targets(self, portfolio_id: str):
+        """Drop cached allocation targets here and on other workers so the next evaluation reads them again"""
+        self.targets.pop(portfolio_id, None)
+        get_message_bus().publish(ALERTS_TOPIC, {"targets": portfolio_id})
+
+    async def _load_targets(self, db: AsyncSession, portfolio_ids: Iterable[str]):
+        missing = [
+            pid for pid in portfolio_ids
+            if pid not in self.targets
+            and any(a.alert_type == AlertType.ALLOCATION_DRIFT for a in self.by_portfolio[pid].values())
+        ]
+        if not missing:
+            return
+        query = select(
+            AllocationTarget.portfolio_id, AllocationTarget.asset_type,
+            AllocationTarget.symbol, AllocationTarget.target_percent
+        ).where(AllocationTarget.portfolio_id.in_(missing))
+        for pid in missing:
+            self.targets[pid] = []
+        for row in (await db.execute(query)).all():
+            self.targets[row.portfolio_id].append((row.asset_type, row.symbol, row.target_percent))
+
+    async def evaluate_portfolios(
+        self,
+        db: AsyncSession,
+        positions: Dict[str, List[Position]],
+        now: Optional[datetime] = None
+    ) -> List[str]:
+        """Check the alerts of revalued portfolios against their positions; returns the fired alert ids.
+
+        Every checked alert gets its current_value and last_checked_at queued;
+        portfolios without alerts are skipped before any work is done.
+        """
+        positions = {pid: rows for pid, rows in positions.items() if pid in self.by_portfolio}
+        if not positions:
+            return []
+        now = now or datetime.utcnow()
+        await self._load_targets(db, positions)
+
+        fired = []
+        for portfolio_id, rows in positions.items():
+            total = sum((value for _, _, value in rows), Decimal("0"))
+            for alert in list(self.by_portfolio[portfolio_id].values()):
+                if alert.alert_type == AlertType.PORTFOLIO_VALUE:
+                    value = total
+                else:
+                    value = allocation_drift(rows, self.targets.get(portfolio_id, []), alert.symbol)
+                triggered = condition_met(alert.operator, value, alert.target_value)
+                self._record(db, alert.alert_id, value, now, triggered)
+                if triggered:
+                    self._stage_fired(db, alert.alert_id, (
+                        alert.alert_type, alert.target_value, alert.symbol, portfolio_id, alert.operator, None
+                    ))
+                    self.remove(alert.alert_id)
+                    fired.append(alert.alert_id)
+        return fired
+
+    async def evaluate_portfolio_ids(
+        self,
+        db: AsyncSession,
+        portfolio_ids: Iterable[str],
+        now: Optional[datetime] = None
+    ) -> List[str]:
+        """Read positions of the given portfolios that have alerts and check them"""
+        ids = [pid for pid in set(portfolio_ids) if pid in self.by_portfolio]
+        if not ids:
+            return []
+        query = select(Asset.portfolio_id, Asset.symbol, Asset.asset_type, Asset.market_value).where(
+            Asset.portfolio_id.in_(ids)
+        )
+        return await self.evaluate_portfolios(db, await self._positions(db, query, ids), now)
+
+    async def evaluate_holders(
+        self,
+        db: AsyncSession,
+        symbols: List[str],
+        now: Optional[datetime] = None
+    ) -> List[str]:
+        """Check the alerts of every alerted portfolio holding the symbols, read in one query"""
+        if not self.by_portfolio:
+            return []
+        holder = aliased(Asset)
+        query = select(Asset.portfolio_id, Asset.symbol, Asset.asset_type, Asset.market_value).where(
+            Asset.portfolio_id.in_(select(holder.portfolio_id).where(holder.symbol.in_(symbols))),
+            Asset.portfolio_id.in_(select(Alert.portfolio_id).where(
+                Alert.is_active.is_(True),
+                Alert.is_triggered.is_(False),
+                Alert.alert_type.in_(PORTFOLIO_ALERT_TYPES)
+            ))
+        )
+        return await self.evaluate_portfolios(db, await self._positions(db, query), now)
+
+    @staticmethod
+    async def _positions(db: AsyncSession, query, portfolio_ids: Iterable[str] = ()) -> Dict[str, List[Position]]:
+        positions: Dict[str, List[Position]] = {pid: [] for pid in portfolio_ids}
+        for row in (await db.execute(query)).all():
+            positions.setdefault(row.portfolio_id, []).append(
+                (row.symbol.upper(), row.asset_type, Decimal(row.market_value or 0))
+            )
+        return positions
+
+    @staticmethod
+    def _record(db: AsyncSession, alert_id: str, value: Decimal, now: datetime, triggered: bool):
+        update_row = db.info.setdefault(PENDING_KEY, {}).setdefault(alert_id, {"id": alert_id})
+        update_row.update(current_value=value, last_checked_at=now)
+        if triggered:
+            update_row.update(is_triggered=True, triggered_at=now)
+
+    async def flush(self, db: AsyncSession) -> int:
+        """Write this session's queued checks by primary key, then triggers, and queue notifications of the triggered.
+
+        Returns the number of alert rows written. Alerts fired stay staged
+        on the session until its transaction ends.
+        """
+        updates = list(db.info.pop(PENDING_KEY, {}).values())
+        if updates:
+            await db.execute(
+                update(Alert).where(Alert.is_triggered.is_(False)).execution_options(synchronize_session=False),
+                [
+                    {"id": row["id"], "current_value": row["current_value"], "last_checked_at": row["last_checked_at"]}
+                    for row in updates
+                ]
+            )
+
+        fired_at: Dict[datetime, List[str]] = {}
+        for row in updates:
+            if row.get("is_triggered"):
+                fired_at.setdefault(row["triggered_at"], []).append(row["id"])
+        triggered = []
+        for moment, ids in fired_at.items():
+            for start in range(0, len(ids), TRIGGER_CHUNK_ROWS):
+                # Only rows still untriggered flip, so a trigger already written elsewhere is not repeated
+                result = await db.execute(
+                    update(Alert)
+                    .where(Alert.id.in_(ids[start:start + TRIGGER_CHUNK_ROWS]), Alert.is_triggered.is_(False))
+                    .values(is_triggered=True, triggered_at=moment)
+                    .returning(Alert.id)
+                    .execution_options(synchronize_session=False)
+                )
+                triggered += result.scalars().all()
+
+        # Badge counts and notifications change in the same transaction; the outbox worker delivers them
+        await count_triggered(db, triggered)
+        await enqueue_alert_notifications(db, triggered)
+        await stage_alert_events(db, triggered)
+        # Note: Commit is handled by the calling function
+        return len(updates)
+
+
+def _snapshot(alert: Alert) -> Optional[tuple]:
+    """add_alert arguments for an alert, or None when it should not be indexed"""
+    if alert.is_active is False or alert.is_triggered:
+        return None
+    return (
+        alert.alert_type, Decimal(alert.target_value), alert.symbol, alert.portfolio_id,
+        alert.condition_operator, alert.window_minutes
+    )
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_alert_changes(session: Session, flush_context):
+    """Stage alert changes on the session until its transaction commits"""
+    if not _alert_engine.loaded:
+        return
+    changes = session.info.setdefault("alert_engine_changes", [])
+    for alert in session.deleted:
+        if isinstance(alert, Alert):
+            changes.append((alert.id, None))
+    for alert in list(session.new) + list(session.dirty):
+        if isinstance(alert, Alert) and alert not in session.deleted:
+            changes.append((alert.id, _snapshot(alert)))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_alert_changes(session: Session):
+    fired = session.info.pop(FIRED_KEY, {})
+    # Alerts fired after the last flush stay staged until their trigger is written
+    unflushed = session.info.get(PENDING_KEY, {})
+    if unflushed:
+        session.info[FIRED_KEY] = {k: v for k, v in fired.items() if k in unflushed}
+        fired = {k: v for k, v in fired.items() if k not in unflushed}
+    changes = session.info.pop("alert_engine_changes", [])
+    if not (fired or changes):
+        return
+    bus = get_message_bus()
+    for alert_id in fired:
+        _alert_engine.committed(alert_id)
+        bus.publish(ALERTS_TOPIC, {"id": alert_id, "alert": None})
+    for alert_id, snapshot in changes:
+        _alert_engine.committed(alert_id)
+        if snapshot is None:
+            _alert_engine.remove(alert_id)
+        else:
+            _alert_engine.add_alert(alert_id, *snapshot)
+        bus.publish(ALERTS_TOPIC, {"id": alert_id, "alert": list(snapshot) if snapshot else None})
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_alert_changes(session: Session):
+    session.info.pop("alert_engine_changes", None)
+    session.info.pop(PENDING_KEY, None)
+    for alert_id, arguments in session.info.pop(FIRED_KEY, {}).items():
+        if _alert_engine.loaded:
+            _alert_engine.restore_fired(session.info, alert_id, arguments)
+
+
+def register_bus_handlers(bus: MessageBus):
+    """Follow alerts changed or fired and allocation targets replaced on other workers"""
+    def apply_change(topic: str, data: dict):
+        if not _alert_engine.loaded:
+            return
+        if "targets" in data:
+            _alert_engine.targets.pop(data["targets"], None)
+            return
+        _alert_engine.committed(data["id"])
+        if data["alert"] is None:
+            _alert_engine.remove(data["id"])
+        else:
+            alert_type, target_value, symbol, portfolio_id, operator, window_minutes = data["alert"]
+            _alert_engine.add_alert(
+                data["id"], AlertType(alert_type), Decimal(str(target_value)), symbol, portfolio_id,
+                operator, window_minutes
+            )
+
+    bus.subscribe(ALERTS_TOPIC, apply_change)
+
+
+_alert_engine = AlertEngine()
+
+
+def get_alert_engine() -> AlertEngine:
+    """The process-wide engine; empty and unused until load() is called on startup"""
+    return _alert_engine
@@ -0,0 +1,283 @@
+"""
+Alert Service
+Alert CRUD with keyset pagination and incrementally maintained per-user counts
+"""
+
+import base64
+import json
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import select, update, func, and_, or_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Alert, AlertCounter, AlertType, Portfolio
+from app.schemas.alert import AlertCreate, AlertUpdate, AlertCounts
+from app.services.quote_cache import get_quote_cache
+
+
+SYMBOL_TYPES = (AlertType.PRICE_ABOVE, AlertType.PRICE_BELOW, AlertType.PERCENT_CHANGE)
+PORTFOLIO_TYPES = (AlertType.PORTFOLIO_VALUE, AlertType.ALLOCATION_DRIFT)
+
+
+def _bucket(is_active: bool, is_triggered: bool) -> Optional[str]:
+    """Which counter an alert in this state contributes to"""
+    if not is_active:
+        return None
+    return "triggered_count" if is_triggered else "active_count"
+
+
+def encode_cursor(alert: Alert) -> str:
+    raw = json.dumps([alert.created_at.isoformat(), alert.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        created_at, alert_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), alert_id
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+async def count_triggered(db: AsyncSession, alert_ids: List[str]):
+    """Move newly triggered alerts from each owner's active to triggered count in one statement"""
+    if not alert_ids:
+        return
+    fired = (
+        select(func.count())
+        .where(Alert.id.in_(alert_ids), Alert.user_id == AlertCounter.user_id, Alert.is_active.is_(True))
+        .scalar_subquery()
+    )
+    await db.execute(
+        update(AlertCounter)
+        .where(AlertCounter.user_id.in_(select(Alert.user_id).where(Alert.id.in_(alert_ids))))
+        .values(
+            active_count=AlertCounter.active_count - fired,
+            triggered_count=AlertCounter.triggered_count + fired
+        )
+        .execution_options(synchronize_session=False)
+    )
+    # Note: Commit is handled by the calling function
+
+
+class AlertService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def list_alerts(
+        self,
+        user_id: str,
+        is_active: Optional[bool] = None,
+        alert_type: Optional[AlertType] = None,
+        symbol: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = 50
+    ) -> Tuple[List[Alert], Optional[str]]:
+        """One page of the user's alerts, newest first, and the cursor of the next page.
+
+        Pages are keyed on (created_at, id) rather than offsets, so each
+        page is a range read after the previous one however deep it is.
+        """
+        query = select(Alert).where(Alert.user_id == user_id)
+        if is_active is not None:
+            query = query.where(Alert.is_active.is_(is_active))
+        if alert_type is not None:
+            query = query.where(Alert.alert_type == alert_type)
+        if symbol:
+            query = query.where(Alert.symbol == symbol.upper())
+        if cursor:
+            created_at, alert_id = decode_cursor(cursor)
+            query = query.where(or_(
+                Alert.created_at < created_at,
+                and_(Alert.created_at == created_at, Alert.id < alert_id)
+            ))
+        query = query.order_by(Alert.created_at.desc(), Alert.id.desc()).limit(limit + 1)
+
+        alerts = list((await self.db.execute(query)).scalars().all())
+        next_cursor = encode_cursor(alerts[limit - 1]) if len(alerts) > limit else None
+        return alerts[:limit], next_cursor
+
+    async def get_alert(self, alert_id: str, user_id: str) -> Alert:
+        alert = (await self.db.execute(
+            select(Alert).where(Alert.id == alert_id, Alert.user_id == user_id)
+        )).scalar_one_or_none()
+        if not alert:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Alert not found"
+            )
+        return alert
+
+    async def create_alerts(self, user_id: str, alerts_data: List[AlertCreate]) -> List[Alert]:
+        """Create alerts in one transaction, seeding price alerts with the cached quote"""
+        await self._validate(user_id, alerts_data)
+        quotes = await get_quote_cache().get_many({
+            a.symbol.upper() for a in alerts_data if a.alert_type in SYMBOL_TYPES
+        })
+
+        now = datetime.utcnow()
+        alerts = []
+        for data in alerts_data:
+            symbol = data.symbol.upper() if data.symbol else None
+            is_price = data.alert_type in (AlertType.PRICE_ABOVE, AlertType.PRICE_BELOW)
+            quote = quotes.get(symbol) if is_price else None
+            alerts.append(Alert(
+                user_id=user_id,
+                portfolio_id=data.portfolio_id,
+                symbol=symbol,
+                alert_type=data.alert_type,
+                condition_operator=data.condition_operator,
+                target_value=data.target_value,
+                current_value=quote.price if quote else Decimal("0.0000"),
+                window_minutes=data.window_minutes,
+                message=data.message or self._default_message(data, symbol),
+                created_at=now
+            ))
+        self.db.add_all(alerts)
+        await self._adjust_counts(user_id, {"active_count": len(alerts)})
+        await self.db.commit()
+        return alerts
+
+    async def update_alert(self, alert_id: str, user_id: str, alert_data: AlertUpdate) -> Alert:
+        alert = await self.get_alert(alert_id, user_id)
+        before = _bucket(alert.is_active, alert.is_triggered)
+
+        changes = alert_data.model_dump(exclude_unset=True, exclude_none=True)
+        for field, value in changes.items():
+            setattr(alert, field, value)
+        if changes.get("is_triggered") is False:
+            alert.triggered_at = None
+
+        after = _bucket(alert.is_active, alert.is_triggered)
+        if before != after:
+            await self._adjust_counts(user_id, {
+                bucket: delta for bucket, delta in ((before, -1), (after, 1)) if bucket
+            })
+        await self.db.commit()
+        return alert
+
+    async def delete_alerts(self, alert_ids: Iterable[str], user_id: str) -> int:
+        """Delete the user's alerts among the ids; returns the number deleted"""
+        deleted = await self._delete_where(user_id, Alert.id.in_(list(alert_ids)))
+        await self.db.commit()
+        return deleted
+
+    async def delete_portfolio_alerts(self, portfolio_id: str, user_id: str) -> int:
+        """Delete a portfolio's alerts before the portfolio itself, so its owner's counts follow"""
+        deleted = await self._delete_where(user_id, Alert.portfolio_id == portfolio_id)
+        # Note: Commit is handled by the calling function
+        return deleted
+
+    async def _delete_where(self, user_id: str, condition) -> int:
+        alerts = (await self.db.execute(
+            select(Alert).where(condition, Alert.user_id == user_id)
+        )).scalars().all()
+        deltas: Dict[str, int] = {}
+        for alert in alerts:
+            bucket = _bucket(alert.is_active, alert.is_triggered)
+            if bucket:
+                deltas[bucket] = deltas.get(bucket, 0) - 1
+            await self.db.delete(alert)
+        await self._adjust_counts(user_id, deltas)
+        return len(alerts)
+
+    async def get_counts(self, user_id: str) -> AlertCounts:
+        """Counts for the notification badge, read from the maintained counter row"""
+        counter = await self.db.get(AlertCounter, user_id, populate_existing=True)
+        if counter is None:
+            await self.db.execute(self._seed_counter(user_id).on_conflict_do_nothing(
+                index_elements=[AlertCounter.user_id]
+            ))
+            await self.db.commit()
+            counter = await self.db.get(AlertCounter, user_id, populate_existing=True)
+        return AlertCounts(active=counter.active_count, triggered=counter.triggered_count)
+
+    def _insert(self):
+        """Dialect-specific INSERT supporting ON CONFLICT"""
+        if self.db.get_bind().dialect.name == "sqlite":
+            return sqlite.insert(AlertCounter)
+        return postgresql.insert(AlertCounter)
+
+    def _seed_counter(self, user_id: str):
+        """INSERT of the user's counter counted from their alerts over idx_alert_user_active"""
+        def count(triggered: bool):
+            return (
+                select(func.count())
+                .where(Alert.user_id == user_id, Alert.is_active.is_(True), Alert.is_triggered.is_(triggered))
+                .scalar_subquery()
+            )
+
+        return self._insert().values(
+            user_id=user_id, active_count=count(False), triggered_count=count(True)
+        )
+
+    async def _adjust_counts(self, user_id: str, deltas: Dict[str, int]):
+        """Apply count deltas in SQL; a missing counter is built from the alerts once flushed.
+
+        One upsert, so concurrent first writes cannot both insert the counter.
+        """
+        if not any(deltas.values()):
+            return
+        await self.db.execute(
+            self._seed_counter(user_id).on_conflict_do_update(
+                index_elements=[AlertCounter.user_id],
+                set_={
+                    **{bucket: getattr(AlertCounter, bucket) + delta for bucket, delta in deltas.items()},
+                    "updated_at": func.now()
+                }
+            ).execution_options(synchronize_session=False)
+        )
+
+    async def _validate(self, user_id: str, alerts_data: List[AlertCreate]):
+        for data in alerts_data:
+            if data.alert_type in SYMBOL_TYPES and not data.symbol:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"{data.alert_type.value} alerts need a symbol"
+                )
+            if data.alert_type == AlertType.PERCENT_CHANGE and not data.window_minutes:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="percent_change alerts need window_minutes"
+                )
+            if data.alert_type in PORTFOLIO_TYPES and not data.portfolio_id:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"{data.alert_type.value} alerts need a portfolio_id"
+                )
+
+        portfolio_ids = {a.portfolio_id for a in alerts_data if a.portfolio_id}
+        if portfolio_ids:
+            owned = set((await self.db.execute(
+                select(Portfolio.id).where(Portfolio.id.in_(portfolio_ids), Portfolio.user_id == user_id)
+            )).scalars().all())
+            if owned != portfolio_ids:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Portfolio not found"
+                )
+
+    @staticmethod
+    def _default_message(data: AlertCreate, symbol: Optional[str]) -> str:
+        subject = symbol or "Portfolio"
+        if data.alert_type == AlertType.PERCENT_CHANGE:
+            return f"{subject} moved {data.target_value}% within {data.window_minutes} minutes"
+        operator = data.condition_operator.replace("_", " ")
+        return f"{subject} {data.alert_type.value.replace('_', ' ')} {operator} {data.target_value}"
+
+    async def latest_prices(self, alerts: Iterable[Alert]) -> Dict[str, Decimal]:
+        """Cached latest quote of each armed price alert's symbol, for display only"""
+        symbols = {
+            a.symbol for a in alerts
+            if a.alert_type in (AlertType.PRICE_ABOVE, AlertType.PRICE_BELOW) and not a.is_triggered and a.symbol
+        }
+        if not symbols:
+            return {}
+        return {symbol: quote.price for symbol, quote in (await get_quote_cache().get_many(symbols)).items()}
@@ -0,0 +1,223 @@
+"""
+Backfill Service
+Resumable, chunked download of daily price history for symbols that have none
+"""
+
+import asyncio
+import time
+from datetime import date, datetime, time as day_start, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import select, delete, insert, func, or_, union
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.models import Asset, BackfillCheckpoint, BarResolution, MarketData, PriceBar, WatchlistItem
+from app.services.compaction_service import (
+    INSERT_CHUNK_ROWS, RESOLUTION_SECONDS, CompactionService, aggregate_bars, from_epoch,
+    rows_to_arrays, _price
+)
+from app.services.market_data_provider import MarketDataProvider
+from app.services.price_store import get_price_store
+
+
+class RateLimiter:
+    """Token bucket allowing `rate` acquisitions per second in bursts of up to `burst`"""
+
+    def __init__(self, rate: float, burst: int = 1, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = float(burst)
+        self.updated = clock()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = self.clock()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class HistoryBackfillJob:
+    """Downloads daily history per symbol in date-range chunks.
+
+    Each chunk is folded into DAY price bars, written with multi-row
+    inserts and committed together with the symbol's checkpoint, so a
+    restarted job resumes after the last finished chunk. Symbols run
+    concurrently up to BACKFILL_CONCURRENCY while every history request
+    passes one shared rate limiter.
+    """
+
+    def __init__(
+        self,
+        fetcher: MarketDataProvider,
+        session_factory,
+        concurrency: Optional[int] = None,
+        requests_per_second: Optional[float] = None,
+        chunk_days: Optional[int] = None
+    ):
+        self.fetcher = fetcher
+        self.session_factory = session_factory
+        self.semaphore = asyncio.Semaphore(concurrency or settings.BACKFILL_CONCURRENCY)
+        self.rate_limiter = RateLimiter(requests_per_second or settings.BACKFILL_REQUESTS_PER_SECOND)
+        self.chunk = timedelta(days=chunk_days or settings.BACKFILL_CHUNK_DAYS)
+
+    @staticmethod
+    async def history_limit(db: AsyncSession) -> date:
+        """First day backfill must not write.
+
+        Daily compaction continues from the latest DAY bar using finer bars
+        and raw ticks, so backfilled days stop where that finer data begins;
+        those days are compacted from it instead.
+        """
+        mark = await CompactionService(db).watermark(BarResolution.DAY)
+        finer = select(func.min(PriceBar.bucket_start)).where(PriceBar.resolution != BarResolution.DAY)
+        raw = select(func.min(MarketData.timestamp))
+        if mark is not None:
+            finer = finer.where(PriceBar.bucket_start >= mark)
+            raw = raw.where(MarketData.timestamp >= mark)
+
+        today = datetime.utcnow().date()
+        earliest = [e for e in [(await db.execute(q)).scalar() for q in (finer, raw)] if e is not None]
+        if not earliest:
+            return today
+        first = min(e.astimezone(timezone.utc).replace(tzinfo=None) if e.tzinfo else e for e in earliest)
+        return min(today, first.date())
+
+    async def run(
+        self,
+        symbols: Iterable[str],
+        start: Optional[date] = None,
+        end: Optional[date] = None
+    ) -> Dict[str, int]:
+        """Backfill [start, end) for each symbol; returns bars written per symbol"""
+        symbols = sorted({s.upper() for s in symbols})
+        start = start or datetime.utcnow().date() - timedelta(days=settings.BACKFILL_LOOKBACK_DAYS)
+        async with self.session_factory() as session:
+            limit = await self.history_limit(session)
+        end = min(end, limit) if end else limit
+
+        async def bounded(symbol: str) -> int:
+            async with self.semaphore:
+                return await self.backfill_symbol(symbol, start, end)
+
+        written = await asyncio.gather(*[bounded(symbol) for symbol in symbols])
+        return dict(zip(symbols, written))
+
+    async def backfill_symbol(self, symbol: str, start: date, end: date) -> int:
+        """Fetch and store one symbol chunk by chunk, resuming from its checkpoint.
+
+        A failed chunk stops the symbol; finished chunks stay committed and
+        the next run picks up from there. Returns bars written.
+        """
+        written = 0
+        async with self.session_factory() as session:
+            checkpoint = await session.get(BackfillCheckpoint, symbol)
+            if checkpoint is None:
+                checkpoint = BackfillCheckpoint(symbol=symbol, start_date=start, end_date=end)
+                session.add(checkpoint)
+            elif checkpoint.start_date > start:
+                # A request reaching further back than the checkpointed one starts over
+                checkpoint.start_date = start
+                checkpoint.completed_until = None
+            checkpoint.end_date = end
+
+            cursor = max(start, checkpoint.completed_until or start)
+
+            while cursor < end:
+                stop = min(cursor + self.chunk, end)
+                try:
+                    await self.rate_limiter.acquire()
+                    quotes = await self.fetcher.get_history(
+                        symbol,
+                        datetime.combine(cursor, day_start.min),
+                        datetime.combine(stop, day_start.min) - timedelta(microseconds=1)
+                    )
+                    written += await self._write_chunk(session, symbol, quotes, cursor, stop)
+                    checkpoint.completed_until = stop
+                    await session.commit()
+                except Exception as e:
+                    await session.rollback()
+                    print(f"Warning: Backfill of {symbol} stopped at {cursor}: {e}")
+                    return written
+                cursor = stop
+            if checkpoint.completed_until is None:
+                # Nothing to fetch before the limit; the empty range counts as done
+                checkpoint.completed_until = end
+            await session.commit()
+        return written
+
+    async def _write_chunk(self, db: AsyncSession, symbol: str, quotes: List, start: date, stop: date) -> int:
+        """Replace the symbol's DAY bars in [start, stop) with bars folded from the fetched quotes"""
+        lower = datetime.combine(start, day_start.min)
+        upper = datetime.combine(stop, day_start.min)
+        await db.execute(delete(PriceBar).where(
+            PriceBar.symbol == symbol,
+            PriceBar.resolution == BarResolution.DAY,
+            PriceBar.bucket_start >= lower,
+            PriceBar.bucket_start < upper
+        ))
+        quotes = [q for q in quotes if lower <= q.timestamp < upper]
+        if not quotes:
+            return 0
+
+        bars = aggregate_bars(*rows_to_arrays(quotes, raw=True), step=RESOLUTION_SECONDS[BarResolution.DAY])
+        records = [
+            {
+                "symbol": symbol,
+                "resolution": BarResolution.DAY,
+                "bucket_start": from_epoch(bucket),
+                "open": _price(o),
+                "high": _price(h),
+                "low": _price(l),
+                "close": _price(c),
+                "volume": int(v),
+                "tick_count": int(n),
+            }
+            for _, bucket, o, h, l, c, v, n in zip(*bars)
+        ]
+        for i in range(0, len(records), INSERT_CHUNK_ROWS):
+            await db.execute(insert(PriceBar), records[i:i + INSERT_CHUNK_ROWS])
+
+        store = get_price_store()
+        if store is not None:
+            store.append(symbol, bars[1], bars[5])
+        return len(records)
+
+
+async def pending_backfill_symbols(db: AsyncSession) -> List[str]:
+    """Held or watched symbols whose backfill never started or never finished"""
+    referenced = union(
+        select(Asset.symbol).where(Asset.quantity > 0),
+        select(WatchlistItem.symbol)
+    ).subquery()
+    query = (
+        select(referenced.c.symbol)
+        .outerjoin(BackfillCheckpoint, BackfillCheckpoint.symbol == referenced.c.symbol)
+        .where(or_(
+            BackfillCheckpoint.symbol.is_(None),
+            BackfillCheckpoint.completed_until.is_(None),
+            BackfillCheckpoint.completed_until < BackfillCheckpoint.end_date
+        ))
+    )
+    return sorted({symbol.upper() for symbol in (await db.execute(query)).scalars().all()})
+
+
+async def run_history_backfill(fetcher: MarketDataProvider, session_factory):
+    """Backfill new symbols every BACKFILL_INTERVAL_SECONDS"""
+    job = HistoryBackfillJob(fetcher, session_factory)
+    while True:
+        try:
+            async with session_factory() as session:
+                symbols = await pending_backfill_symbols(session)
+            if symbols:
+                await job.run(symbols)
+        except Exception as e:
+            print(f"Warning: History backfill failed: {e}")
+        await asyncio.sleep(settings.BACKFILL_INTERVAL_SECONDS)
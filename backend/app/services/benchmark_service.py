@@ -0,0 +1,285 @@
+"""
+Benchmark Service
+Benchmark-relative analytics against locally stored index series
+"""
+
+import csv
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from itertools import groupby
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi import HTTPException, status
+from sqlalchemy import select, delete, insert, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.models import Portfolio, PortfolioBenchmark, PortfolioValuation, PriceBar, BarResolution
+from app.schemas.analytics import BenchmarkAnalytics
+from app.services.history_service import HistoryService
+from app.services.performance_service import PerformanceService, ValuationSeries
+from app.services.price_store import get_price_store
+
+
+TRADING_DAYS = 252
+
+
+def relative_metrics(portfolio_returns: np.ndarray, benchmark_returns: np.ndarray) -> Dict[str, np.ndarray]:
+    """Regress rows of daily portfolio returns on aligned benchmark returns.
+
+    Inputs are broadcast to (k, T); NaN marks a missing day and is excluded
+    pairwise, so rows of different lengths can share one call. Alpha,
+    tracking error and information ratio are annualized.
+    """
+    p, b = np.broadcast_arrays(np.atleast_2d(portfolio_returns), np.atleast_2d(benchmark_returns))
+    mask = ~(np.isnan(p) | np.isnan(b))
+    n = mask.sum(axis=1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_p = np.where(mask, p, 0.0).sum(axis=1) / n
+        mean_b = np.where(mask, b, 0.0).sum(axis=1) / n
+        dev_p = np.where(mask, p - mean_p[:, None], 0.0)
+        dev_b = np.where(mask, b - mean_b[:, None], 0.0)
+
+        cov = (dev_p * dev_b).sum(axis=1) / (n - 1)
+        var_p = (dev_p ** 2).sum(axis=1) / (n - 1)
+        var_b = (dev_b ** 2).sum(axis=1) / (n - 1)
+        beta = cov / var_b
+        alpha = (mean_p - beta * mean_b) * TRADING_DAYS
+        correlation = cov / np.sqrt(var_p * var_b)
+
+        active = np.where(mask, p - b, 0.0)
+        active_mean = active.sum(axis=1) / n
+        active_dev = np.where(mask, active - active_mean[:, None], 0.0)
+        tracking_error = np.sqrt((active_dev ** 2).sum(axis=1) / (n - 1)) * np.sqrt(TRADING_DAYS)
+        information_ratio = active_mean * TRADING_DAYS / tracking_error
+
+    metrics = {
+        "beta": beta,
+        "alpha": alpha,
+        "correlation": correlation,
+        "tracking_error": tracking_error,
+        "information_ratio": information_ratio,
+    }
+    for values in metrics.values():
+        values[n < 2] = np.nan
+    metrics["observations"] = n
+    return metrics
+
+
+def _optional_decimal(value: float, places: int = 4) -> Optional[Decimal]:
+    if not np.isfinite(value):
+        return None
+    return Decimal(str(round(float(value), places)))
+
+
+def _stack_rows(rows: List[np.ndarray]) -> np.ndarray:
+    """Stack 1-D arrays of different lengths into a NaN-padded matrix"""
+    width = max((len(r) for r in rows), default=0)
+    matrix = np.full((len(rows), width), np.nan)
+    for i, row in enumerate(rows):
+        matrix[i, :len(row)] = row
+    return matrix
+
+
+class BenchmarkService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_benchmarks(self, portfolio_id: str) -> List[PortfolioBenchmark]:
+        """Get the benchmarks configured for a portfolio"""
+        query = select(PortfolioBenchmark).where(
+            PortfolioBenchmark.portfolio_id == portfolio_id
+        ).order_by(PortfolioBenchmark.symbol)
+        result = await self.db.execute(query)
+        return result.scalars().all()
+
+    async def add_benchmark(self, portfolio_id: str, symbol: str) -> PortfolioBenchmark:
+        """Attach a benchmark series to a portfolio"""
+        symbol = symbol.upper()
+        existing = await self.db.execute(select(PortfolioBenchmark).where(
+            PortfolioBenchmark.portfolio_id == portfolio_id,
+            PortfolioBenchmark.symbol == symbol
+        ))
+        if existing.scalar_one_or_none():
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Benchmark already added to this portfolio"
+            )
+
+        benchmark = PortfolioBenchmark(portfolio_id=portfolio_id, symbol=symbol)
+        self.db.add(benchmark)
+        await self.db.commit()
+        await self.db.refresh(benchmark)
+        return benchmark
+
+    async def remove_benchmark(self, portfolio_id: str, symbol: str) -> bool:
+        """Detach a benchmark series from a portfolio"""
+        result = await self.db.execute(delete(PortfolioBenchmark).where(
+            PortfolioBenchmark.portfolio_id == portfolio_id,
+            PortfolioBenchmark.symbol == symbol.upper()
+        ))
+        await self.db.commit()
+        return result.rowcount > 0
+
+    async def get_daily_closes(
+        self,
+        symbols: List[str],
+        start: date,
+        end: date
+    ) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """Daily closes (last quote of each day) per symbol from stored bars and recent ticks"""
+        return await HistoryService(self.db).get_daily_closes(symbols, start, end)
+
+    async def calculate_portfolio_analytics(
+        self,
+        portfolio: Portfolio,
+        symbols: Optional[List[str]] = None,
+        lookback_days: int = 365
+    ) -> List[BenchmarkAnalytics]:
+        """Compare one portfolio against each requested benchmark"""
+        if not symbols:
+            configured = await self.get_benchmarks(portfolio.id)
+            symbols = [b.symbol for b in configured] or [settings.DEFAULT_BENCHMARK_SYMBOL]
+        symbols = [s.upper() for s in symbols]
+
+        series = await PerformanceService(self.db).get_valuation_series(portfolio)
+        end = datetime.utcnow().date()
+        closes = await self.get_daily_closes(symbols, end - timedelta(days=lookback_days), end)
+
+        portfolio_rows, benchmark_rows, windows = [], [], []
+        for symbol in symbols:
+            dates, prices = closes.get(symbol, (np.array([], dtype="datetime64[D]"), np.array([])))
+            portfolio_rows.append(series.returns_between(dates))
+            benchmark_rows.append(prices[1:] / prices[:-1] - 1 if len(prices) > 1 else np.array([]))
+            windows.append(dates)
+
+        metrics = relative_metrics(_stack_rows(portfolio_rows), _stack_rows(benchmark_rows))
+        return [self._to_analytics(symbol, metrics, i, windows[i]) for i, symbol in enumerate(symbols)]
+
+    async def calculate_for_benchmark(
+        self,
+        symbol: str,
+        lookback_days: int = 365
+    ) -> Dict[str, BenchmarkAnalytics]:
+        """Compare every portfolio tracking a benchmark in one vectorized pass"""
+        symbol = symbol.upper()
+        end = datetime.utcnow().date()
+        start = end - timedelta(days=lookback_days)
+
+        id_query = select(PortfolioBenchmark.portfolio_id).where(PortfolioBenchmark.symbol == symbol)
+        portfolio_ids = list((await self.db.execute(id_query)).scalars().all())
+        if not portfolio_ids:
+            return {}
+
+        await self._refresh_stale_series(portfolio_ids, end)
+
+        query = select(
+            PortfolioValuation.portfolio_id,
+            PortfolioValuation.valuation_date,
+            PortfolioValuation.total_value,
+            PortfolioValuation.net_flow
+        ).where(
+            PortfolioValuation.portfolio_id.in_(portfolio_ids),
+            PortfolioValuation.valuation_date >= start
+        ).order_by(PortfolioValuation.portfolio_id, PortfolioValuation.valuation_date)
+        rows = (await self.db.execute(query)).all()
+
+        closes = await self.get_daily_closes([symbol], start, end)
+        dates, prices = closes.get(symbol, (np.array([], dtype="datetime64[D]"), np.array([])))
+        benchmark_returns = prices[1:] / prices[:-1] - 1 if len(prices) > 1 else np.array([])
+
+        series_by_portfolio = {}
+        for portfolio_id, group in groupby(rows, key=lambda r: r.portfolio_id):
+            group = list(group)
+            series_by_portfolio[portfolio_id] = ValuationSeries(
+                np.array([r.valuation_date for r in group], dtype="datetime64[D]"),
+                np.array([float(r.total_value) for r in group]),
+                np.array([float(r.net_flow) for r in group])
+            )
+        if not series_by_portfolio:
+            return {}
+
+        ordered_ids = list(series_by_portfolio)
+        portfolio_returns = np.vstack([series_by_portfolio[pid].returns_between(dates) for pid in ordered_ids])
+        metrics = relative_metrics(portfolio_returns, benchmark_returns)
+        return {pid: self._to_analytics(symbol, metrics, i, dates) for i, pid in enumerate(ordered_ids)}
+
+    async def import_series_file(self, symbol: str, path: str) -> int:
+        """Load a local CSV of daily closes (date,close) as daily bars for offline use"""
+        symbol = symbol.upper()
+        with open(path, newline="") as handle:
+            records = sorted(
+                (
+                    datetime.fromisoformat(row.get("date") or row["timestamp"]),
+                    Decimal(row.get("close") or row["price"])
+                )
+                for row in csv.DictReader(handle)
+            )
+
+        rows = [
+            {
+                "symbol": symbol,
+                "resolution": BarResolution.DAY,
+                "bucket_start": datetime.combine(timestamp.date(), time.min),
+                "open": price,
+                "high": price,
+                "low": price,
+                "close": price,
+                "tick_count": 1,
+            }
+            for timestamp, price in records
+        ]
+
+        if rows:
+            await self.db.execute(
+                delete(PriceBar).where(
+                    PriceBar.symbol == symbol,
+                    PriceBar.resolution == BarResolution.DAY,
+                    PriceBar.bucket_start.in_([r["bucket_start"] for r in rows])
+                )
+            )
+            await self.db.execute(insert(PriceBar), rows)
+            await self.db.commit()
+
+            store = get_price_store()
+            if store is not None:
+                store.append(
+                    symbol,
+                    np.array([r["bucket_start"] for r in rows], dtype="datetime64[s]").astype(np.int64),
+                    np.array([float(r["close"]) for r in rows])
+                )
+        return len(rows)
+
+    async def _refresh_stale_series(self, portfolio_ids: List[str], today: date):
+        """Rebuild valuation series that are missing or behind the last closed day"""
+        query = select(Portfolio.id, Portfolio.valued_through).where(Portfolio.id.in_(portfolio_ids))
+        valued_through = dict((await self.db.execute(query)).all())
+
+        performance_service = PerformanceService(self.db)
+        for portfolio_id in portfolio_ids:
+            last_date = valued_through.get(portfolio_id)
+            if last_date is None or last_date < today - timedelta(days=1):
+                await performance_service.rebuild_valuation_series(
+                    portfolio_id, today, last_date + timedelta(days=1) if last_date else None
+                )
+
+    def _to_analytics(
+        self,
+        symbol: str,
+        metrics: Dict[str, np.ndarray],
+        row: int,
+        dates: np.ndarray
+    ) -> BenchmarkAnalytics:
+        return BenchmarkAnalytics(
+            symbol=symbol,
+            observations=int(metrics["observations"][row]),
+            beta=_optional_decimal(metrics["beta"][row]),
+            alpha=_optional_decimal(metrics["alpha"][row]),
+            correlation=_optional_decimal(metrics["correlation"][row]),
+            tracking_error=_optional_decimal(metrics["tracking_error"][row]),
+            information_ratio=_optional_decimal(metrics["information_ratio"][row]),
+            start_date=dates[0].astype(date) if len(dates) else None,
+            end_date=dates[-1].astype(date) if len(dates) else None
+        )
@@ -0,0 +1,286 @@
+"""
+Compaction Service
+Rolls raw market_data ticks into 1-minute, 1-hour and 1-day OHLCV bars and enforces retention
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select, delete, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.models import BarResolution, MarketData, PriceBar
+from app.services.price_store import get_price_store
+
+
+RESOLUTION_SECONDS = {
+    BarResolution.MINUTE: 60,
+    BarResolution.HOUR: 3600,
+    BarResolution.DAY: 86400,
+}
+
+# Each resolution is built from the next finer one; None means raw ticks
+SOURCE_RESOLUTION = {
+    BarResolution.MINUTE: None,
+    BarResolution.HOUR: BarResolution.MINUTE,
+    BarResolution.DAY: BarResolution.HOUR,
+}
+
+# Source time covered by one compaction query, bounding memory per pass
+COMPACTION_WINDOW = {
+    BarResolution.MINUTE: timedelta(hours=1),
+    BarResolution.HOUR: timedelta(days=1),
+    BarResolution.DAY: timedelta(days=31),
+}
+
+INSERT_CHUNK_ROWS = 1000
+
+
+def to_epoch(timestamps) -> np.ndarray:
+    """Naive-UTC or aware datetimes as int64 epoch seconds"""
+    return np.array([
+        (t.astimezone(timezone.utc).replace(tzinfo=None) if t.tzinfo else t) for t in timestamps
+    ], dtype="datetime64[s]").astype(np.int64)
+
+
+def from_epoch(seconds: int) -> datetime:
+    return datetime(1970, 1, 1) + timedelta(seconds=int(seconds))
+
+
+def floor_time(moment: datetime, resolution: BarResolution) -> datetime:
+    step = RESOLUTION_SECONDS[resolution]
+    return from_epoch(int(to_epoch([moment])[0]) // step * step)
+
+
+def aggregate_bars(
+    symbols: np.ndarray,
+    epoch: np.ndarray,
+    opens: np.ndarray,
+    highs: np.ndarray,
+    lows: np.ndarray,
+    closes: np.ndarray,
+    volumes: np.ndarray,
+    counts: np.ndarray,
+    step: int
+) -> Tuple[np.ndarray, ...]:
+    """Fold rows sorted by (symbol, time) into bars of `step` seconds.
+
+    Returns (symbol, bucket_start, open, high, low, close, volume, count)
+    arrays with one entry per (symbol, bucket); every reduction is a single
+    reduceat over the group boundaries.
+    """
+    if not len(epoch):
+        return tuple(np.array([]) for _ in range(8))
+
+    buckets = epoch // step * step
+    boundary = np.ones(len(epoch), dtype=bool)
+    boundary[1:] = (symbols[1:] != symbols[:-1]) | (buckets[1:] != buckets[:-1])
+    starts = np.flatnonzero(boundary)
+    ends = np.append(starts[1:], len(epoch)) - 1
+
+    return (
+        symbols[starts],
+        buckets[starts],
+        opens[starts],
+        np.maximum.reduceat(highs, starts),
+        np.minimum.reduceat(lows, starts),
+        closes[ends],
+        np.add.reduceat(volumes, starts),
+        np.add.reduceat(counts, starts),
+    )
+
+
+def rows_to_arrays(rows, raw: bool) -> Tuple[np.ndarray, ...]:
+    """Query rows (sorted by symbol, time) as the column arrays aggregate_bars expects"""
+    symbols = np.array([r.symbol for r in rows], dtype=object)
+    if raw:
+        epoch = to_epoch([r.timestamp for r in rows])
+        prices = np.array([float(r.price) for r in rows])
+        volumes = np.array([r.volume or 0 for r in rows], dtype=np.int64)
+        return symbols, epoch, prices, prices, prices, prices, volumes, np.ones(len(rows), dtype=np.int64)
+    return (
+        symbols,
+        to_epoch([r.bucket_start for r in rows]),
+        np.array([float(r.open) for r in rows]),
+        np.array([float(r.high) for r in rows]),
+        np.array([float(r.low) for r in rows]),
+        np.array([float(r.close) for r in rows]),
+        np.array([r.volume or 0 for r in rows], dtype=np.int64),
+        np.array([r.tick_count for r in rows], dtype=np.int64),
+    )
+
+
+def _price(value: float) -> Decimal:
+    return Decimal(str(round(float(value), 4)))
+
+
+class CompactionService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    def _insert(self):
+        """Dialect-specific INSERT supporting ON CONFLICT"""
+        if self.db.get_bind().dialect.name == "sqlite":
+            return sqlite.insert(PriceBar)
+        return postgresql.insert(PriceBar)
+
+    def _upsert(self):
+        """INSERT of bars that overwrites a bar already written for the same bucket"""
+        stmt = self._insert()
+        return stmt.on_conflict_do_update(
+            index_elements=[PriceBar.symbol, PriceBar.resolution, PriceBar.bucket_start],
+            set_={
+                column: stmt.excluded[column]
+                for column in ("open", "high", "low", "close", "volume", "tick_count")
+            }
+        )
+
+    async def watermark(self, resolution: BarResolution) -> Optional[datetime]:
+        """End of the last compacted bucket at a resolution"""
+        query = select(func.max(PriceBar.bucket_start)).where(PriceBar.resolution == resolution)
+        last = (await self.db.execute(query)).scalar()
+        if last is None:
+            return None
+        if last.tzinfo:
+            last = last.astimezone(timezone.utc).replace(tzinfo=None)
+        return last + timedelta(seconds=RESOLUTION_SECONDS[resolution])
+
+    async def _source_rows(
+        self,
+        source: Optional[BarResolution],
+        start: Optional[datetime],
+        end: datetime
+    ) -> List:
+        if source is None:
+            query = select(
+                MarketData.symbol, MarketData.timestamp, MarketData.price, MarketData.volume
+            ).where(MarketData.timestamp < end).order_by(MarketData.symbol, MarketData.timestamp)
+            if start is not None:
+                query = query.where(MarketData.timestamp >= start)
+        else:
+            query = select(
+                PriceBar.symbol, PriceBar.bucket_start, PriceBar.open, PriceBar.high,
+                PriceBar.low, PriceBar.close, PriceBar.volume, PriceBar.tick_count
+            ).where(
+                PriceBar.resolution == source,
+                PriceBar.bucket_start < end
+            ).order_by(PriceBar.symbol, PriceBar.bucket_start)
+            if start is not None:
+                query = query.where(PriceBar.bucket_start >= start)
+        return (await self.db.execute(query)).all()
+
+    async def _earliest_source(self, source: Optional[BarResolution]) -> Optional[datetime]:
+        if source is None:
+            query = select(func.min(MarketData.timestamp))
+        else:
+            query = select(func.min(PriceBar.bucket_start)).where(PriceBar.resolution == source)
+        earliest = (await self.db.execute(query)).scalar()
+        if earliest is not None and earliest.tzinfo:
+            earliest = earliest.astimezone(timezone.utc).replace(tzinfo=None)
+        return earliest
+
+    async def compact_resolution(self, resolution: BarResolution, now: datetime) -> int:
+        """Build bars for every completed bucket after the watermark; returns bars written.
+
+        Bars are upserted, so a pass re-run over buckets already written
+        (after a failed commit or by an overlapping worker) rewrites them.
+        """
+        source = SOURCE_RESOLUTION[resolution]
+        step = RESOLUTION_SECONDS[resolution]
+        end = floor_time(now, resolution)
+
+        start = await self.watermark(resolution)
+        if start is None:
+            earliest = await self._earliest_source(source)
+            if earliest is None:
+                return 0
+            start = floor_time(earliest, resolution)
+
+        written = 0
+        window = COMPACTION_WINDOW[resolution]
+        while start < end:
+            stop = min(start + window, end)
+            rows = await self._source_rows(source, start, stop)
+            if rows:
+                bars = aggregate_bars(*rows_to_arrays(rows, raw=source is None), step=step)
+                records = [
+                    {
+                        "symbol": symbol,
+                        "resolution": resolution,
+                        "bucket_start": from_epoch(bucket),
+                        "open": _price(o),
+                        "high": _price(h),
+                        "low": _price(l),
+                        "close": _price(c),
+                        "volume": int(v),
+                        "tick_count": int(n),
+                    }
+                    for symbol, bucket, o, h, l, c, v, n in zip(*bars)
+                ]
+                for i in range(0, len(records), INSERT_CHUNK_ROWS):
+                    await self.db.execute(self._upsert(), records[i:i + INSERT_CHUNK_ROWS])
+                written += len(records)
+                if resolution == BarResolution.DAY:
+                    self._append_to_store(*bars)
+            start = stop
+        return written
+
+    @staticmethod
+    def _append_to_store(symbols, buckets, opens, highs, lows, closes, volumes, counts):
+        """Extend the columnar store with new daily closes; re-appending a day overwrites it"""
+        store = get_price_store()
+        if store is None:
+            return
+        boundaries = np.flatnonzero(symbols[1:] != symbols[:-1]) + 1
+        for start, stop in zip(np.r_[0, boundaries], np.r_[boundaries, len(symbols)]):
+            store.append(symbols[start], buckets[start:stop], closes[start:stop])
+
+    async def apply_retention(self, now: datetime) -> Dict[str, int]:
+        """Delete raw ticks and fine bars past their retention, never before they are compacted"""
+        deleted = {}
+
+        minute_mark = await self.watermark(BarResolution.MINUTE)
+        if minute_mark is not None:
+            cutoff = min(now - timedelta(days=settings.MARKET_DATA_RAW_RETENTION_DAYS), minute_mark)
+            result = await self.db.execute(delete(MarketData).where(MarketData.timestamp < cutoff))
+            deleted["raw"] = result.rowcount
+
+        for resolution, days, parent in (
+            (BarResolution.MINUTE, settings.PRICE_BAR_MINUTE_RETENTION_DAYS, BarResolution.HOUR),
+            (BarResolution.HOUR, settings.PRICE_BAR_HOUR_RETENTION_DAYS, BarResolution.DAY),
+        ):
+            parent_mark = await self.watermark(parent)
+            if parent_mark is None:
+                continue
+            cutoff = min(now - timedelta(days=days), parent_mark)
+            result = await self.db.execute(
+                delete(PriceBar).where(PriceBar.resolution == resolution, PriceBar.bucket_start < cutoff)
+            )
+            deleted[resolution.value] = result.rowcount
+        return deleted
+
+    async def run(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """One compaction pass over all resolutions followed by retention"""
+        now = now or datetime.utcnow()
+        summary = {}
+        for resolution in (BarResolution.MINUTE, BarResolution.HOUR, BarResolution.DAY):
+            summary[resolution.value] = await self.compact_resolution(resolution, now)
+        summary.update({f"deleted_{k}": v for k, v in (await self.apply_retention(now)).items()})
+        await self.db.commit()
+        return summary
+
+
+async def run_market_data_compaction(session_factory):
+    """Compact market data every MARKET_DATA_COMPACTION_INTERVAL_SECONDS"""
+    while True:
+        try:
+            async with session_factory() as session:
+                await CompactionService(session).run()
+        except Exception as e:
+            print(f"Warning: Market data compaction failed: {e}")
+        await asyncio.sleep(settings.MARKET_DATA_COMPACTION_INTERVAL_SECONDS)
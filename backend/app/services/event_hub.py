@@ -0,0 +1,239 @@
+"""
+Event Hub
+In-process fan-out of quote and alert events to streaming subscribers
+"""
+
+import asyncio
+import json
+import time
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, Iterable, List, NamedTuple, Optional, Set
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import Alert
+from app.services.message_bus import MessageBus, get_message_bus
+
+
+# Topic names are shared with the message bus, so other workers' events need no translation
+def quote_topic(symbol: str) -> str:
+    return f"quote.{symbol.upper()}"
+
+
+def alert_topic(user_id: str) -> str:
+    return f"alert.{user_id}"
+
+
+class EncodedEvent(NamedTuple):
+    id: int
+    topic: str
+    # Events with the same key supersede each other in a subscriber's backlog; None never conflates
+    conflate_key: Optional[str]
+    frame: bytes
+
+
+def encode_frame(event_id: int, event_type: str, data: dict) -> bytes:
+    """One Server-Sent Events frame"""
+    payload = json.dumps(data, separators=(",", ":"), default=str)
+    return f"id: {event_id}\nevent: {event_type}\ndata: {payload}\n\n".encode()
+
+
+class Subscription:
+    """One stream's topics and backlog.
+
+    Conflatable events keep only the latest per key, so a consumer that
+    falls behind gets the current price of each symbol rather than every
+    tick. Other events queue up to max_pending; past that the subscription
+    is marked overflowed and the stream ends, and the client resumes from
+    its Last-Event-ID.
+    """
+
+    def __init__(self, topics: Iterable[str], max_pending: int):
+        self.topics: Set[str] = set(topics)
+        self.max_pending = max_pending
+        self.latest: Dict[str, EncodedEvent] = {}
+        self.queued: Deque[EncodedEvent] = deque()
+        self.overflowed = False
+        self.ready = asyncio.Event()
+
+    def offer(self, encoded: EncodedEvent):
+        if encoded.conflate_key is not None:
+            self.latest[encoded.conflate_key] = encoded
+        elif len(self.queued) >= self.max_pending:
+            self.overflowed = True
+        else:
+            self.queued.append(encoded)
+        self.ready.set()
+
+    def drain(self) -> List[EncodedEvent]:
+        """Everything pending, oldest first, emptying the backlog"""
+        self.ready.clear()
+        events = sorted(list(self.queued) + list(self.latest.values()), key=lambda e: e.id)
+        self.queued.clear()
+        self.latest.clear()
+        return events
+
+
+class EventHub:
+    """Topic fan-out where each event is encoded once for all its subscribers.
+
+    Recent events are kept in a ring for Last-Event-ID resume, and the
+    latest event of each conflatable topic is kept for new subscribers
+    and for resumes older than the ring. Event ids are microseconds since
+    the epoch, assigned by the worker where the event happened and carried
+    with it over the message bus, so an event has the same id on every
+    worker and ids keep increasing across restarts. Events relayed from
+    other workers can arrive after newer local ones, so with peers a
+    resume also replays the SSE_RESUME_OVERLAP_SECONDS before its
+    Last-Event-ID; clients skip the ids they have already handled.
+    """
+
+    def __init__(self, replay_size: Optional[int] = None):
+        self.subscribers: Dict[str, Set[Subscription]] = {}
+        self.recent: Deque[EncodedEvent] = deque(maxlen=replay_size or settings.SSE_REPLAY_EVENTS)
+        self.latest: Dict[str, EncodedEvent] = {}
+        self.last_id = 0
+
+    def next_id(self) -> int:
+        self.last_id = max(self.last_id + 1, time.time_ns() // 1000)
+        return self.last_id
+
+    def wants(self, topic: str) -> bool:
+        return topic in self.subscribers
+
+    def publish(
+        self,
+        topic: str,
+        event_type: str,
+        data: dict,
+        conflate: bool = False,
+        event_id: Optional[int] = None
+    ) -> EncodedEvent:
+        """Fan an event out under a new id, or under the id its origin worker gave it"""
+        if event_id is None:
+            event_id = self.next_id()
+        else:
+            # Ids made here afterwards stay above ids seen from other workers
+            self.last_id = max(self.last_id, event_id)
+        encoded = EncodedEvent(
+            event_id, topic, topic if conflate else None, encode_frame(event_id, event_type, data)
+        )
+        self.recent.append(encoded)
+        if conflate:
+            self.latest[topic] = encoded
+        for subscription in self.subscribers.get(topic, ()):
+            subscription.offer(encoded)
+        return encoded
+
+    def subscribe(self, topics: Iterable[str], last_event_id: Optional[int] = None) -> Subscription:
+        """Register a subscription with its backlog primed for a fresh start or a resume"""
+        subscription = Subscription(topics, settings.SSE_MAX_PENDING)
+        if last_event_id is not None and get_message_bus().has_peers:
+            last_event_id -= int(settings.SSE_RESUME_OVERLAP_SECONDS * 1_000_000)
+        replay_complete = (
+            last_event_id is not None and bool(self.recent) and self.recent[0].id <= last_event_id + 1
+        )
+        if not replay_complete:
+            # Nothing to resume from: start with the current value of every conflatable topic
+            for topic in subscription.topics:
+                if topic in self.latest and (last_event_id is None or self.latest[topic].id > last_event_id):
+                    subscription.offer(self.latest[topic])
+        if last_event_id is not None:
+            for encoded in self.recent:
+                if encoded.id > last_event_id and encoded.topic in subscription.topics:
+                    subscription.offer(encoded)
+        for topic in subscription.topics:
+            self.subscribers.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        for topic in subscription.topics:
+            subscriptions = self.subscribers.get(topic)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self.subscribers[topic]
+
+    def clear(self):
+        self.subscribers.clear()
+        self.recent.clear()
+        self.latest.clear()
+
+
+_event_hub = EventHub()
+
+
+def get_event_hub() -> EventHub:
+    return _event_hub
+
+
+def stage_quote_events(db: AsyncSession, prices: Dict, now: Optional[datetime] = None):
+    """Queue quote events, published to streams and other workers once the caller commits"""
+    if not get_message_bus().has_peers:
+        prices = {symbol: price for symbol, price in prices.items() if _event_hub.wants(quote_topic(symbol))}
+        if not prices:
+            return
+    now = now or datetime.utcnow()
+    staged = db.sync_session.info.setdefault("hub_events", [])
+    for symbol, price in prices.items():
+        data = {"symbol": symbol, "price": float(price), "timestamp": now.isoformat()}
+        staged.append((quote_topic(symbol), "quote", data, True))
+
+
+async def stage_alert_events(db: AsyncSession, alert_ids: List[str]):
+    """Queue triggered-alert events, published to streams and other workers once the caller commits.
+
+    Alerts are kept for resume even with no stream open, since their user may be between reconnects.
+    """
+    if not alert_ids:
+        return
+    rows = (await db.execute(
+        select(
+            Alert.id, Alert.user_id, Alert.portfolio_id, Alert.symbol, Alert.alert_type,
+            Alert.message, Alert.current_value, Alert.triggered_at
+        ).where(Alert.id.in_(alert_ids))
+    )).all()
+    staged = db.sync_session.info.setdefault("hub_events", [])
+    for row in rows:
+        staged.append((alert_topic(row.user_id), "alert", {
+            "id": row.id,
+            "alertType": row.alert_type.value,
+            "symbol": row.symbol,
+            "portfolioId": row.portfolio_id,
+            "message": row.message,
+            "currentValue": float(row.current_value),
+            "triggeredAt": row.triggered_at.isoformat() if row.triggered_at else None
+        }, False))
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_hub_events(session: Session):
+    bus = get_message_bus()
+    for topic, event_type, data, conflate in session.info.pop("hub_events", []):
+        event_id = _event_hub.next_id()
+        if not conflate or _event_hub.wants(topic):
+            _event_hub.publish(topic, event_type, data, conflate, event_id)
+        bus.publish(topic, {**data, "eventId": event_id})
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_hub_events(session: Session):
+    session.info.pop("hub_events", None)
+
+
+def register_bus_handlers(bus: MessageBus):
+    """Stream quotes ticked and alerts triggered on other workers"""
+    def relay(event_type: str, conflate: bool):
+        def handler(topic: str, data: dict):
+            if not conflate or _event_hub.wants(topic):
+                data = dict(data)
+                event_id = data.pop("eventId", None)
+                _event_hub.publish(topic, event_type, data, conflate, event_id)
+        return handler
+
+    bus.subscribe(quote_topic("*"), relay("quote", True))
+    bus.subscribe(alert_topic("*"), relay("alert", False))
@@ -0,0 +1,187 @@
+"""
+FX Service
+Exchange rates by date, cached per (pair, date), with vectorized conversion of value arrays
+"""
+
+import csv
+from datetime import date
+from decimal import Decimal
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+from fastapi import HTTPException, status
+from sqlalchemy import select, delete, insert, and_, or_, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Currency, FxRate
+from app.services.message_bus import MessageBus, get_message_bus
+
+
+# Pairs without a published rate are crossed through this currency
+PIVOT = Currency.USD
+
+Pair = Tuple[Currency, Currency]
+
+_rate_cache: Dict[Tuple[Currency, Currency, date], Decimal] = {}
+
+
+def clear_rate_cache():
+    _rate_cache.clear()
+
+
+def register_bus_handlers(bus: MessageBus):
+    """Drop cached rates when another worker publishes new ones"""
+    bus.subscribe("cache.fx", lambda topic, data: clear_rate_cache())
+
+
+class FxService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def _histories(self, pairs: Iterable[Pair], until: date) -> Dict[Pair, Tuple[np.ndarray, np.ndarray]]:
+        """Published rates per pair up to a date as (datetime64[D] dates, rates), one query for all pairs"""
+        pairs = sorted({p for p in pairs if p[0] != p[1]})
+        if not pairs:
+            return {}
+        query = (
+            select(FxRate.base, FxRate.quote, FxRate.rate_date, FxRate.rate)
+            .where(
+                or_(*[and_(FxRate.base == b, FxRate.quote == q) for b, q in pairs]),
+                FxRate.rate_date <= until
+            )
+            .order_by(FxRate.base, FxRate.quote, FxRate.rate_date)
+        )
+        grouped: Dict[Pair, Tuple[List[date], List[float]]] = {}
+        for row in (await self.db.execute(query)).all():
+            dates, rates = grouped.setdefault((row.base, row.quote), ([], []))
+            dates.append(row.rate_date)
+            rates.append(float(row.rate))
+        return {
+            pair: (np.array(dates, dtype="datetime64[D]"), np.array(rates))
+            for pair, (dates, rates) in grouped.items()
+        }
+
+    @staticmethod
+    def _legs(base: Currency, quote: Currency) -> List[Pair]:
+        """Every stored pair that can express base -> quote: direct, inverse, or both legs through the pivot"""
+        legs = [(base, quote), (quote, base)]
+        for a, b in ((base, PIVOT), (PIVOT, quote)):
+            legs += [(a, b), (b, a)]
+        return legs
+
+    @staticmethod
+    def _resolve(
+        base: Currency,
+        quote: Currency,
+        dates: np.ndarray,
+        histories: Dict[Pair, Tuple[np.ndarray, np.ndarray]]
+    ) -> np.ndarray:
+        """Rate in effect on each date, NaN where none can be derived"""
+
+        def lookup(pair: Pair) -> np.ndarray:
+            if pair[0] == pair[1]:
+                return np.ones(len(dates))
+            if pair not in histories:
+                return np.full(len(dates), np.nan)
+            history_dates, rates = histories[pair]
+            idx = np.searchsorted(history_dates, dates, side="right") - 1
+            return np.where(idx >= 0, rates[np.maximum(idx, 0)], np.nan)
+
+        def either(a: Currency, b: Currency) -> np.ndarray:
+            direct = lookup((a, b))
+            return np.where(np.isnan(direct), 1 / lookup((b, a)), direct)
+
+        rates = either(base, quote)
+        crossed = either(base, PIVOT) * either(PIVOT, quote)
+        return np.where(np.isnan(rates), crossed, rates)
+
+    @staticmethod
+    def _missing(base: Currency, quote: Currency, on) -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"No exchange rate for {base.value}/{quote.value} on {on}"
+        )
+
+    async def get_rates(self, bases: Iterable[Currency], quote: Currency, on: date) -> Dict[Currency, Decimal]:
+        """Rate from each base currency to quote as of a date"""
+        rates: Dict[Currency, Decimal] = {}
+        missing = []
+        for base in set(bases):
+            if base == quote:
+                rates[base] = Decimal("1")
+            elif (base, quote, on) in _rate_cache:
+                rates[base] = _rate_cache[(base, quote, on)]
+            else:
+                missing.append(base)
+
+        if missing:
+            histories = await self._histories(
+                [leg for base in missing for leg in self._legs(base, quote)], on
+            )
+            day = np.array([on], dtype="datetime64[D]")
+            for base in missing:
+                rate = self._resolve(base, quote, day, histories)[0]
+                if np.isnan(rate):
+                    raise self._missing(base, quote, on)
+                rates[base] = _rate_cache[(base, quote, on)] = Decimal(str(round(float(rate), 8)))
+        return rates
+
+    async def get_rate(self, base: Currency, quote: Currency, on: date) -> Decimal:
+        return (await self.get_rates([base], quote, on))[base]
+
+    async def convert_array(
+        self,
+        values: np.ndarray,
+        currencies: Sequence[Currency],
+        quote: Currency,
+        on: date
+    ) -> np.ndarray:
+        """Convert rows of values, each in its own currency, to quote with one multiply"""
+        values = np.asarray(values, dtype=np.float64)
+        if not len(currencies):
+            return values
+        codes, inverse = np.unique(np.array([Currency(c).value for c in currencies]), return_inverse=True)
+        rates = await self.get_rates([Currency(c) for c in codes], quote, on)
+        factors = np.array([float(rates[Currency(c)]) for c in codes])[inverse]
+        return values * factors.reshape((-1,) + (1,) * (values.ndim - 1))
+
+    async def rate_series(self, base: Currency, quote: Currency, dates: np.ndarray) -> np.ndarray:
+        """Rate in effect on each date, from a single query over the whole range"""
+        dates = np.asarray(dates, dtype="datetime64[D]")
+        if base == quote or not len(dates):
+            return np.ones(len(dates))
+        last = dates.max().astype(date)
+        rates = self._resolve(base, quote, dates, await self._histories(self._legs(base, quote), last))
+        if np.isnan(rates).any():
+            raise self._missing(base, quote, dates[np.isnan(rates)][0].astype(date))
+        return rates
+
+    async def set_rates(self, records: Iterable[Tuple[Currency, Currency, date, Decimal]]) -> int:
+        """Store rates, replacing any already published for the same pair and date"""
+        rows = [
+            {"base": Currency(b), "quote": Currency(q), "rate_date": d, "rate": Decimal(str(r))}
+            for b, q, d, r in records
+        ]
+        if not rows:
+            return 0
+        keys = [(r["base"], r["quote"], r["rate_date"]) for r in rows]
+        await self.db.execute(
+            delete(FxRate).where(tuple_(FxRate.base, FxRate.quote, FxRate.rate_date).in_(keys))
+        )
+        await self.db.execute(insert(FxRate), rows)
+        clear_rate_cache()
+        get_message_bus().publish("cache.fx", {})
+        # Note: Commit is handled by the calling function
+        return len(rows)
+
+    async def import_rates_file(self, path: str) -> int:
+        """Load a local CSV of rates (date,base,quote,rate) for offline use"""
+        with open(path, newline="") as handle:
+            records = [
+                (Currency(row["base"].upper()), Currency(row["quote"].upper()),
+                 date.fromisoformat(row["date"]), Decimal(row["rate"]))
+                for row in csv.DictReader(handle)
+            ]
+        written = await self.set_rates(records)
+        await self.db.commit()
+        return written
@@ -0,0 +1,121 @@
+"""
+History Service
+Price history served from the coarsest bar resolution that fits the requested range
+"""
+
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.models import BarResolution, MarketData, PriceBar
+from app.services.compaction_service import (
+    RESOLUTION_SECONDS, CompactionService, aggregate_bars, from_epoch, rows_to_arrays, _price
+)
+
+
+RETENTION_DAYS = {
+    BarResolution.MINUTE: lambda: settings.PRICE_BAR_MINUTE_RETENTION_DAYS,
+    BarResolution.HOUR: lambda: settings.PRICE_BAR_HOUR_RETENTION_DAYS,
+    BarResolution.DAY: lambda: None,
+}
+
+
+def choose_resolution(start: datetime, end: datetime, now: Optional[datetime] = None) -> BarResolution:
+    """Coarsest resolution giving at least HISTORY_TARGET_POINTS bars whose retention still covers start"""
+    now = now or datetime.utcnow()
+    span = (end - start).total_seconds()
+    for resolution in (BarResolution.DAY, BarResolution.HOUR, BarResolution.MINUTE):
+        if span / RESOLUTION_SECONDS[resolution] >= settings.HISTORY_TARGET_POINTS:
+            return resolution
+        finer = {BarResolution.DAY: BarResolution.HOUR, BarResolution.HOUR: BarResolution.MINUTE}.get(resolution)
+        retention = RETENTION_DAYS[finer]() if finer else None
+        if retention is not None and start < now - timedelta(days=retention):
+            # Finer bars no longer exist that far back
+            return resolution
+    return BarResolution.MINUTE
+
+
+class HistoryService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_bars(
+        self,
+        symbols: List[str],
+        start: datetime,
+        end: datetime,
+        resolution: Optional[BarResolution] = None
+    ) -> Tuple[BarResolution, Dict[str, List[dict]]]:
+        """OHLCV bars per symbol; stored bars up to the watermark, then raw ticks folded on the fly"""
+        resolution = resolution or choose_resolution(start, end)
+        symbols = [s.upper() for s in symbols]
+        watermark = await CompactionService(self.db).watermark(resolution)
+
+        bars: Dict[str, List[dict]] = {s: [] for s in symbols}
+        stored_end = min(end, watermark) if watermark else start
+        if stored_end > start:
+            query = select(PriceBar).where(
+                PriceBar.symbol.in_(symbols),
+                PriceBar.resolution == resolution,
+                PriceBar.bucket_start >= start,
+                PriceBar.bucket_start < stored_end
+            ).order_by(PriceBar.symbol, PriceBar.bucket_start)
+            for bar in (await self.db.execute(query)).scalars().all():
+                bars[bar.symbol].append({
+                    "timestamp": bar.bucket_start,
+                    "open": bar.open,
+                    "high": bar.high,
+                    "low": bar.low,
+                    "close": bar.close,
+                    "volume": bar.volume,
+                })
+
+        # Ticks after the watermark have not been compacted yet
+        tail_start = max(start, stored_end)
+        if tail_start < end:
+            query = select(
+                MarketData.symbol, MarketData.timestamp, MarketData.price, MarketData.volume
+            ).where(
+                MarketData.symbol.in_(symbols),
+                MarketData.timestamp >= tail_start,
+                MarketData.timestamp < end
+            ).order_by(MarketData.symbol, MarketData.timestamp)
+            rows = (await self.db.execute(query)).all()
+            if rows:
+                folded = aggregate_bars(*rows_to_arrays(rows, raw=True), step=RESOLUTION_SECONDS[resolution])
+                for symbol, bucket, o, h, l, c, v, _ in zip(*folded):
+                    bars[symbol].append({
+                        "timestamp": from_epoch(bucket),
+                        "open": _price(o),
+                        "high": _price(h),
+                        "low": _price(l),
+                        "close": _price(c),
+                        "volume": int(v),
+                    })
+        return resolution, bars
+
+    async def get_daily_closes(
+        self,
+        symbols: List[str],
+        start: date,
+        end: date
+    ) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """Daily closes per symbol as (datetime64[D] dates, prices), omitting symbols without data"""
+        _, bars = await self.get_bars(
+            symbols,
+            datetime.combine(start, time.min),
+            datetime.combine(end + timedelta(days=1), time.min),
+            BarResolution.DAY
+        )
+        return {
+            symbol: (
+                np.array([b["timestamp"].date() for b in rows], dtype="datetime64[D]"),
+                np.array([float(b["close"]) for b in rows])
+            )
+            for symbol, rows in bars.items()
+            if rows
+        }
@@ -0,0 +1,224 @@
+"""
+Holdings Index
+In-memory inverted index from symbol to the positions holding it, for targeted revaluation on ticks
+"""
+
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import event, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.db.models import Asset, AssetType, Portfolio
+from app.services.message_bus import MessageBus, get_message_bus
+
+
+CENT = Decimal("0.01")
+BASIS = Decimal("0.0001")
+
+HOLDINGS_TOPIC = "index.holdings"
+
+
+@dataclass
+class Holding:
+    portfolio_id: str
+    asset_id: str
+    symbol: str
+    quantity: Decimal
+    total_cost: Decimal
+    market_value: Decimal
+    asset_type: Optional[AssetType] = None
+
+
+class HoldingsIndex:
+    """symbol -> {asset_id: Holding}, plus the same holdings grouped by portfolio.
+
+    Asset inserts, updates and deletes reach the index through session
+    events once their transaction commits, and reach the other workers'
+    indexes over the message bus along with the prices they tick.
+    apply_prices revalues only the holdings of the quoted symbols and the
+    portfolios that own them, queueing primary-key updates that flush()
+    writes in one executemany per table.
+    """
+
+    def __init__(self):
+        self.by_symbol: Dict[str, Dict[str, Holding]] = {}
+        self.by_portfolio: Dict[str, Dict[str, Holding]] = {}
+        self.holdings: Dict[str, Holding] = {}
+        self.loaded = False
+        self.pending_assets: Dict[str, dict] = {}
+        self.pending_portfolios: Dict[str, dict] = {}
+
+    async def load(self, db: AsyncSession) -> int:
+        """Build the index from every position; returns the number indexed"""
+        self.clear()
+        query = select(
+            Asset.id, Asset.portfolio_id, Asset.symbol, Asset.asset_type,
+            Asset.quantity, Asset.total_cost, Asset.market_value
+        )
+        for row in (await db.execute(query)).all():
+            self.upsert(Holding(
+                portfolio_id=row.portfolio_id,
+                asset_id=row.id,
+                symbol=row.symbol,
+                quantity=row.quantity,
+                total_cost=row.total_cost,
+                market_value=row.market_value,
+                asset_type=row.asset_type
+            ))
+        self.loaded = True
+        return len(self.holdings)
+
+    def clear(self):
+        self.by_symbol.clear()
+        self.by_portfolio.clear()
+        self.holdings.clear()
+        self.pending_assets.clear()
+        self.pending_portfolios.clear()
+        self.loaded = False
+
+    def upsert(self, holding: Holding):
+        self.remove(holding.asset_id)
+        self.holdings[holding.asset_id] = holding
+        self.by_symbol.setdefault(holding.symbol, {})[holding.asset_id] = holding
+        self.by_portfolio.setdefault(holding.portfolio_id, {})[holding.asset_id] = holding
+
+    def remove(self, asset_id: str):
+        holding = self.holdings.pop(asset_id, None)
+        if holding is None:
+            return
+        for group, key in ((self.by_symbol, holding.symbol), (self.by_portfolio, holding.portfolio_id)):
+            members = group.get(key)
+            if members is not None:
+                members.pop(asset_id, None)
+                if not members:
+                    del group[key]
+
+    def revalue(self, symbol: str, price: Decimal):
+        """Mark a symbol's holders to a price another worker has already written"""
+        for holding in self.by_symbol.get(symbol.upper(), {}).values():
+            holding.market_value = (holding.quantity * price).quantize(CENT, ROUND_HALF_UP)
+
+    def holders(self, symbol: str) -> List[Holding]:
+        return list(self.by_symbol.get(symbol.upper(), {}).values())
+
+    def apply_prices(self, prices: Dict[str, Decimal], now: Optional[datetime] = None) -> Set[str]:
+        """Revalue holders of the quoted symbols in memory; returns the affected portfolio ids"""
+        now = now or datetime.utcnow()
+        affected: Set[str] = set()
+        for symbol, price in prices.items():
+            for holding in self.by_symbol.get(symbol.upper(), {}).values():
+                holding.market_value = (holding.quantity * price).quantize(CENT, ROUND_HALF_UP)
+                self.pending_assets.setdefault(holding.asset_id, {"id": holding.asset_id}).update(
+                    current_price=price,
+                    market_value=holding.market_value,
+                    unrealized_gain_loss=holding.market_value - holding.total_cost,
+                    last_price_update=now
+                )
+                affected.add(holding.portfolio_id)
+
+        for portfolio_id in affected:
+            members = self.by_portfolio[portfolio_id].values()
+            total_value = sum((h.market_value for h in members), Decimal("0.00"))
+            self.pending_portfolios[portfolio_id] = {"id": portfolio_id, "total_value": total_value}
+            for holding in members:
+                weight = holding.market_value / total_value * 100 if total_value > 0 else Decimal("0")
+                self.pending_assets.setdefault(holding.asset_id, {"id": holding.asset_id})["weight"] = (
+                    weight.quantize(BASIS, ROUND_HALF_UP)
+                )
+        return affected
+
+    async def flush(self, db: AsyncSession) -> int:
+        """Write queued revaluations by primary key; returns the number of asset rows written"""
+        assets, self.pending_assets = list(self.pending_assets.values()), {}
+        portfolios, self.pending_portfolios = list(self.pending_portfolios.values()), {}
+        if assets:
+            await db.execute(update(Asset), assets)
+        if portfolios:
+            await db.execute(update(Portfolio), portfolios)
+        # Note: Commit is handled by the calling function
+        return len(assets)
+
+
+def _snapshot(asset: Asset) -> Holding:
+    return Holding(
+        portfolio_id=asset.portfolio_id,
+        asset_id=asset.id,
+        symbol=asset.symbol.upper(),
+        quantity=Decimal(asset.quantity),
+        total_cost=Decimal(asset.total_cost or 0),
+        market_value=Decimal(asset.market_value or 0),
+        asset_type=asset.asset_type
+    )
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_asset_changes(session: Session, flush_context):
+    """Stage asset changes on the session until its transaction commits"""
+    if not _holdings_index.loaded:
+        return
+    changes = session.info.setdefault("holdings_index_changes", [])
+    for asset in session.deleted:
+        if isinstance(asset, Asset):
+            changes.append(("remove", asset.id))
+    for asset in list(session.new) + list(session.dirty):
+        if isinstance(asset, Asset) and asset not in session.deleted:
+            changes.append(("upsert", _snapshot(asset)))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_asset_changes(session: Session):
+    changes = session.info.pop("holdings_index_changes", [])
+    if not changes:
+        return
+    bus = get_message_bus()
+    for action, value in changes:
+        if action == "remove":
+            _holdings_index.remove(value)
+            bus.publish(HOLDINGS_TOPIC, {"id": value, "holding": None})
+        else:
+            _holdings_index.upsert(value)
+            bus.publish(HOLDINGS_TOPIC, {"id": value.asset_id, "holding": asdict(value)})
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_asset_changes(session: Session):
+    session.info.pop("holdings_index_changes", None)
+
+
+def register_bus_handlers(bus: MessageBus):
+    """Follow positions changed and prices ticked on other workers"""
+    def apply_change(topic: str, data: dict):
+        if not _holdings_index.loaded:
+            return
+        holding = data["holding"]
+        if holding is None:
+            _holdings_index.remove(data["id"])
+            return
+        _holdings_index.upsert(Holding(
+            portfolio_id=holding["portfolio_id"],
+            asset_id=holding["asset_id"],
+            symbol=holding["symbol"],
+            quantity=Decimal(str(holding["quantity"])),
+            total_cost=Decimal(str(holding["total_cost"])),
+            market_value=Decimal(str(holding["market_value"])),
+            asset_type=AssetType(holding["asset_type"]) if holding["asset_type"] else None
+        ))
+
+    def revalue(topic: str, data: dict):
+        if _holdings_index.loaded:
+            _holdings_index.revalue(data["symbol"], Decimal(str(data["price"])))
+
+    bus.subscribe(HOLDINGS_TOPIC, apply_change)
+    bus.subscribe("quote.*", revalue)
+
+
+_holdings_index = HoldingsIndex()
+
+
+def get_holdings_index() -> HoldingsIndex:
+    """The process-wide index; empty and unused until load() is called on startup"""
+    return _holdings_index
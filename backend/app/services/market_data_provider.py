@@ -0,0 +1,248 @@
+"""
+Market Data Providers
+Pluggable sources of quotes and price history
+"""
+
+import asyncio
+import csv
+import json
+from abc import ABC, abstractmethod
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+
+import httpx
+
+from app.core.config import settings
+
+
+@dataclass(frozen=True)
+class Quote:
+    symbol: str
+    price: Decimal
+    timestamp: datetime
+    volume: Optional[int] = None
+
+
+def _parse_timestamp(value) -> datetime:
+    if isinstance(value, (int, float)):
+        return datetime.utcfromtimestamp(value)
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00")).replace(tzinfo=None)
+
+
+def _parse_quote(record: dict) -> Quote:
+    volume = record.get("volume")
+    return Quote(
+        symbol=str(record["symbol"]).upper(),
+        price=Decimal(str(record["price"])),
+        timestamp=_parse_timestamp(record["timestamp"]),
+        volume=int(volume) if volume not in (None, "") else None
+    )
+
+
+class MarketDataProvider(ABC):
+    """Async source of quotes and history; implementations fetch in batches"""
+
+    @abstractmethod
+    async def get_quotes(self, symbols: Iterable[str]) -> Dict[str, Quote]:
+        """Latest quote for each symbol the provider knows"""
+
+    @abstractmethod
+    async def get_history(self, symbol: str, start: datetime, end: datetime) -> List[Quote]:
+        """Quotes for one symbol between start and end, oldest first"""
+
+    async def stream_quotes(
+        self,
+        symbols: Iterable[str],
+        interval: float = 5.0
+    ) -> AsyncIterator[List[Quote]]:
+        """Batches of quotes as they change; polls get_quotes unless overridden.
+
+        symbols is read again on every poll, so a set the caller keeps
+        updating changes what is streamed.
+        """
+        while True:
+            current = list(symbols)
+            quotes = await self.get_quotes(current) if current else {}
+            if quotes:
+                yield list(quotes.values())
+            await asyncio.sleep(interval)
+
+    async def close(self):
+        """Release any connections held by the provider"""
+
+
+class HttpMarketDataProvider(MarketDataProvider):
+    """REST provider configured by MARKET_DATA_BASE_URL and MARKET_DATA_API_KEY.
+
+    Expects `GET /quotes?symbols=A,B` returning a list of quote objects and
+    `GET /history/{symbol}?start=..&end=..` returning the same shape.
+    """
+
+    def __init__(self, base_url: str, api_key: str = "", batch_size: int = 100, timeout: float = 10.0):
+        if not base_url:
+            raise ValueError("MARKET_DATA_BASE_URL is not configured")
+        self.batch_size = batch_size
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            headers={"Authorization": f"Bearer {api_key}"} if api_key else {},
+            timeout=timeout
+        )
+
+    async def get_quotes(self, symbols: Iterable[str]) -> Dict[str, Quote]:
+        symbols = sorted({s.upper() for s in symbols})
+        batches = [symbols[i:i + self.batch_size] for i in range(0, len(symbols), self.batch_size)]
+        responses = await asyncio.gather(*[
+            self.client.get("/quotes", params={"symbols": ",".join(batch)}) for batch in batches
+        ])
+
+        quotes = {}
+        for response in responses:
+            response.raise_for_status()
+            for record in response.json():
+                quote = _parse_quote(record)
+                quotes[quote.symbol] = quote
+        return quotes
+
+    async def get_history(self, symbol: str, start: datetime, end: datetime) -> List[Quote]:
+        response = await self.client.get(
+            f"/history/{symbol.upper()}",
+            params={"start": start.isoformat(), "end": end.isoformat()}
+        )
+        response.raise_for_status()
+        return sorted((_parse_quote({"symbol": symbol, **r}) for r in response.json()), key=lambda q: q.timestamp)
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class StaticMarketDataProvider(MarketDataProvider):
+    """In-memory stand-in that answers from a fixed set of quotes and records each batch requested"""
+
+    def __init__(self, quotes: Optional[Dict[str, Decimal]] = None):
+        self.quotes = {symbol.upper(): Decimal(price) for symbol, price in (quotes or {}).items()}
+        self.requests: List[List[str]] = []
+
+    async def get_quotes(self, symbols: Iterable[str]) -> Dict[str, Quote]:
+        symbols = sorted({s.upper() for s in symbols})
+        self.requests.append(symbols)
+        now = datetime.utcnow()
+        return {s: Quote(symbol=s, price=self.quotes[s], timestamp=now) for s in symbols if s in self.quotes}
+
+    async def get_history(self, symbol: str, start: datetime, end: datetime) -> List[Quote]:
+        return []
+
+
+class ReplayMarketDataProvider(MarketDataProvider):
+    """Replays recorded ticks from a CSV or NDJSON file for offline runs and load tests.
+
+    Each record has timestamp, symbol, price and optionally volume. Ticks
+    sharing a timestamp are emitted as one batch; the gap between batches is
+    the recorded gap divided by speed, and speed <= 0 replays as fast as
+    possible. get_quotes answers with the latest tick replayed so far.
+    """
+
+    def __init__(self, path: str, speed: float = 1.0, loop: bool = False):
+        self.path = Path(path)
+        self.speed = speed
+        self.loop = loop
+        self.ticks = self._load(self.path)
+        self.latest: Dict[str, Quote] = {}
+
+    @staticmethod
+    def _load(path: Path) -> List[Quote]:
+        with path.open() as f:
+            if path.suffix.lower() in (".ndjson", ".jsonl"):
+                records = [json.loads(line) for line in f if line.strip()]
+            else:
+                records = list(csv.DictReader(f))
+        return sorted((_parse_quote(r) for r in records), key=lambda q: q.timestamp)
+
+    async def get_quotes(self, symbols: Iterable[str]) -> Dict[str, Quote]:
+        return {s.upper(): self.latest[s.upper()] for s in symbols if s.upper() in self.latest}
+
+    async def get_history(self, symbol: str, start: datetime, end: datetime) -> List[Quote]:
+        symbol = symbol.upper()
+        return [q for q in self.ticks if q.symbol == symbol and start <= q.timestamp <= end]
+
+    async def stream_quotes(
+        self,
+        symbols: Optional[Iterable[str]] = None,
+        interval: float = 0.0
+    ) -> AsyncIterator[List[Quote]]:
+        # A set is kept by reference so the caller can add symbols while streaming
+        if symbols is None or isinstance(symbols, set):
+            wanted = symbols
+        else:
+            wanted = {s.upper() for s in symbols}
+        timestamps = [q.timestamp for q in self.ticks]
+        while True:
+            start, previous = 0, None
+            while start < len(self.ticks):
+                stop = bisect_right(timestamps, timestamps[start], lo=start)
+                current = timestamps[start]
+                if previous is not None and self.speed > 0:
+                    await asyncio.sleep((current - previous).total_seconds() / self.speed)
+                batch = [q for q in self.ticks[start:stop] if wanted is None or q.symbol in wanted]
+                for quote in batch:
+                    self.latest[quote.symbol] = quote
+                if batch:
+                    yield batch
+                start, previous = stop, current
+            if not self.loop:
+                return
+
+
+class CsvHistoryProvider(MarketDataProvider):
+    """Local stand-in for a history vendor: one `{SYMBOL}.csv` per symbol in a directory.
+
+    Rows need a timestamp (or date) and a price (or close) column, and may
+    carry volume. get_quotes answers with each file's latest row.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+
+    def _read(self, symbol: str) -> List[Quote]:
+        path = self.directory / f"{symbol.upper()}.csv"
+        if not path.exists():
+            return []
+        with path.open() as f:
+            rows = list(csv.DictReader(f))
+        return sorted((
+            _parse_quote({
+                "symbol": symbol,
+                "timestamp": row.get("timestamp") or row["date"],
+                "price": row.get("price") or row["close"],
+                "volume": row.get("volume"),
+            })
+            for row in rows
+        ), key=lambda q: q.timestamp)
+
+    async def get_quotes(self, symbols: Iterable[str]) -> Dict[str, Quote]:
+        latest = {s.upper(): self._read(s) for s in symbols}
+        return {symbol: history[-1] for symbol, history in latest.items() if history}
+
+    async def get_history(self, symbol: str, start: datetime, end: datetime) -> List[Quote]:
+        return [q for q in self._read(symbol) if start <= q.timestamp <= end]
+
+
+def get_market_data_provider(name: Optional[str] = None) -> MarketDataProvider:
+    """Build the provider selected by MARKET_DATA_PROVIDER"""
+    name = (name or settings.MARKET_DATA_PROVIDER).lower()
+    if name == "replay":
+        return ReplayMarketDataProvider(
+            settings.MARKET_DATA_REPLAY_PATH,
+            speed=settings.MARKET_DATA_REPLAY_SPEED,
+            loop=settings.MARKET_DATA_REPLAY_LOOP
+        )
+    if name == "http":
+        return HttpMarketDataProvider(settings.MARKET_DATA_BASE_URL, settings.MARKET_DATA_API_KEY)
+    if name == "csv":
+        return CsvHistoryProvider(settings.MARKET_DATA_HISTORY_PATH)
+    if name == "static":
+        return StaticMarketDataProvider()
+    raise ValueError(f"Unknown market data provider: {name}")
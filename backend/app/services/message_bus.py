@@ -0,0 +1,307 @@
+"""
+Message Bus
+Cross-worker publish/subscribe with batched publishing and wildcard topics
+"""
+
+import asyncio
+import json
+from abc import ABC, abstractmethod
+from fnmatch import fnmatchcase
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from uuid import uuid4
+
+import redis.asyncio as redis
+
+from app.core.config import settings
+
+
+# Called with (topic, message) for each message published by another node
+Handler = Callable[[str, dict], None]
+
+LEADER_KEY = "financeflow:leader"
+
+# Extend the lease if this node holds it, otherwise take it if nobody does
+CLAIM_LEADERSHIP = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+if redis.call('set', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return 1
+end
+return 0
+"""
+
+RELEASE_LEADERSHIP = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def topic_matches(pattern: str, topic: str) -> bool:
+    """Glob match as Redis PSUBSCRIBE does: quote.* matches quote.AAPL"""
+    return fnmatchcase(topic, pattern)
+
+
+class MessageBus(ABC):
+    """Publish/subscribe between the workers of a deployment.
+
+    Topics are dotted names such as quote.AAPL or portfolio.<id>, and
+    subscriptions are glob patterns such as quote.* or portfolio.*.
+    publish only buffers, so it can be called from synchronous code like
+    session events; buffered messages go out together, grouped by topic,
+    every MESSAGE_BUS_FLUSH_SECONDS or as soon as MESSAGE_BUS_BATCH_SIZE
+    are waiting. Handlers only see messages from other nodes, since the
+    publishing worker has already applied its own changes.
+
+    One node at a time is the leader, holding a lease it renews every
+    third of MESSAGE_BUS_LEADER_LEASE_SECONDS; loops that must run once per
+    deployment run only there (see run_while_leader).
+    """
+
+    def __init__(self, batch_size: Optional[int] = None, flush_seconds: Optional[float] = None):
+        self.node_id = uuid4().hex
+        self.batch_size = batch_size or settings.MESSAGE_BUS_BATCH_SIZE
+        self.flush_seconds = flush_seconds or settings.MESSAGE_BUS_FLUSH_SECONDS
+        self.buffer: List[Tuple[str, dict]] = []
+        self.handlers: Dict[str, List[Handler]] = {}
+        self.wakeup: Optional[asyncio.Event] = None
+        self.leader = True
+
+    @property
+    def is_leader(self) -> bool:
+        return self.leader
+
+    @property
+    def has_peers(self) -> bool:
+        """Whether other nodes may be listening; publishers can skip building messages otherwise"""
+        return True
+
+    def publish(self, topic: str, message: dict):
+        self.buffer.append((topic, message))
+        if self.wakeup is not None and len(self.buffer) >= self.batch_size:
+            self.wakeup.set()
+
+    def subscribe(self, pattern: str, handler: Handler):
+        self.handlers.setdefault(pattern, []).append(handler)
+
+    async def flush(self) -> int:
+        """Send everything buffered as one batch; returns the number of messages"""
+        batch, self.buffer = self.buffer, []
+        if not batch:
+            return 0
+        grouped: Dict[str, List[dict]] = {}
+        for topic, message in batch:
+            grouped.setdefault(topic, []).append(message)
+        await self._send(grouped)
+        return len(batch)
+
+    def dispatch(self, pattern: str, topic: str, origin: str, messages: List[dict]):
+        """Hand a received batch to the pattern's handlers, skipping this node's own messages"""
+        if origin == self.node_id:
+            return
+        for handler in self.handlers.get(pattern, ()):
+            for message in messages:
+                try:
+                    handler(topic, message)
+                except Exception as e:
+                    print(f"Warning: Message bus handler for {topic} failed: {e}")
+
+    @abstractmethod
+    async def _send(self, grouped: Dict[str, List[dict]]):
+        """Deliver messages grouped by topic to every node"""
+
+    async def start(self):
+        """Connect and start receiving for the patterns subscribed so far"""
+
+    async def _claim_leadership(self) -> bool:
+        """Take or renew the leader lease; returns whether this node holds it"""
+        return True
+
+    async def lead(self):
+        """Hold or contend for the leader lease until cancelled"""
+        while True:
+            try:
+                self.leader = await self._claim_leadership()
+            except Exception as e:
+                print(f"Warning: Leader lease renewal failed: {e}")
+                self.leader = False
+            await asyncio.sleep(settings.MESSAGE_BUS_LEADER_LEASE_SECONDS / 3)
+
+    async def run(self):
+        """Flush buffered messages until cancelled"""
+        self.wakeup = asyncio.Event()
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Warning: Message bus flush failed: {e}")
+
+    async def close(self):
+        await self.flush()
+
+
+class InMemoryBroker:
+    """Routes between in-process nodes, standing in for Redis in tests and single-node setups"""
+
+    def __init__(self):
+        self.nodes: List["InMemoryMessageBus"] = []
+
+
+class InMemoryMessageBus(MessageBus):
+    def __init__(self, broker: Optional[InMemoryBroker] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.broker = broker or InMemoryBroker()
+        self.broker.nodes.append(self)
+
+    @property
+    def has_peers(self) -> bool:
+        return len(self.broker.nodes) > 1
+
+    @property
+    def is_leader(self) -> bool:
+        # The longest-running node leads
+        return bool(self.broker.nodes) and self.broker.nodes[0] is self
+
+    def publish(self, topic: str, message: dict):
+        # Alone on the broker there is nobody to tell
+        if self.has_peers:
+            super().publish(topic, message)
+
+    async def _send(self, grouped: Dict[str, List[dict]]):
+        for node in self.broker.nodes:
+            for topic, messages in grouped.items():
+                for pattern in list(node.handlers):
+                    if topic_matches(pattern, topic):
+                        node.dispatch(pattern, topic, self.node_id, messages)
+
+    async def close(self):
+        await super().close()
+        if self in self.broker.nodes:
+            self.broker.nodes.remove(self)
+
+
+class RedisMessageBus(MessageBus):
+    """Redis pub/sub: one PUBLISH per topic per batch, all in a single pipelined round trip"""
+
+    def __init__(self, url: str, **kwargs):
+        super().__init__(**kwargs)
+        self.url = url
+        self.client: Optional[redis.Redis] = None
+        self.pubsub = None
+        self.listener: Optional[asyncio.Task] = None
+        # Not leading until the lease is taken
+        self.leader = False
+
+    def subscribe(self, pattern: str, handler: Handler):
+        new = pattern not in self.handlers
+        super().subscribe(pattern, handler)
+        if new and self.pubsub is not None:
+            asyncio.get_running_loop().create_task(self.pubsub.psubscribe(pattern))
+
+    async def start(self):
+        # Kept even if Redis is unreachable now, so lead() can take the lease once it is back
+        self.client = redis.from_url(self.url)
+        self.pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        if self.handlers:
+            await self.pubsub.psubscribe(*self.handlers)
+            self.listener = asyncio.create_task(self._listen())
+        self.leader = await self._claim_leadership()
+
+    async def _claim_leadership(self) -> bool:
+        if self.client is None:
+            # Without Redis the lease cannot be checked, and every worker leading would duplicate the loops
+            return False
+        lease_ms = int(settings.MESSAGE_BUS_LEADER_LEASE_SECONDS * 1000)
+        return bool(await self.client.eval(CLAIM_LEADERSHIP, 1, LEADER_KEY, self.node_id, lease_ms))
+
+    async def _listen(self):
+        while True:
+            try:
+                async for received in self.pubsub.listen():
+                    if received["type"] != "pmessage":
+                        continue
+                    payload = json.loads(received["data"])
+                    self.dispatch(
+                        received["pattern"].decode(), received["channel"].decode(),
+                        payload["origin"], payload["messages"]
+                    )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Warning: Message bus listener failed: {e}")
+            await asyncio.sleep(1)
+
+    async def _send(self, grouped: Dict[str, List[dict]]):
+        if self.client is None:
+            # Not connected; this worker runs on its own
+            return
+        async with self.client.pipeline(transaction=False) as pipe:
+            for topic, messages in grouped.items():
+                pipe.publish(topic, json.dumps({"origin": self.node_id, "messages": messages}, default=str))
+            await pipe.execute()
+
+    async def close(self):
+        if self.client is None:
+            return
+        await super().close()
+        if self.leader:
+            # Hand over at once instead of when the lease runs out
+            try:
+                await self.client.eval(RELEASE_LEADERSHIP, 1, LEADER_KEY, self.node_id)
+            except Exception as e:
+                print(f"Warning: Could not release leader lease: {e}")
+            self.leader = False
+        if self.listener:
+            self.listener.cancel()
+        await self.pubsub.aclose()
+        await self.client.aclose()
+
+
+async def run_while_leader(bus: MessageBus, factory: Callable[[], Awaitable]):
+    """Run a loop that must run once per deployment only while this node is the leader.
+
+    The loop starts when this node takes the lease, is cancelled when it
+    loses it, and is restarted if it ends while the node still leads.
+    """
+    task: Optional[asyncio.Task] = None
+    try:
+        while True:
+            if bus.is_leader and (task is None or task.done()):
+                task = asyncio.create_task(factory())
+            elif not bus.is_leader and task is not None:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                task = None
+            await asyncio.sleep(settings.MESSAGE_BUS_LEADER_LEASE_SECONDS / 3)
+    finally:
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+
+def create_message_bus(name: Optional[str] = None) -> MessageBus:
+    """Bus for the configured backend: "redis" uses REDIS_URL, "memory" stays in process"""
+    name = (name or settings.MESSAGE_BUS).lower()
+    if name == "redis":
+        return RedisMessageBus(settings.REDIS_URL)
+    if name == "memory":
+        return InMemoryMessageBus()
+    raise ValueError(f"Unknown message bus: {name}")
+
+
+_message_bus: Optional[MessageBus] = None
+
+
+def get_message_bus() -> MessageBus:
+    """The process-wide bus, created from settings on first use"""
+    global _message_bus
+    if _message_bus is None:
+        _message_bus = create_message_bus()
+    return _message_bus
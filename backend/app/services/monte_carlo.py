@@ -0,0 +1,70 @@
+"""
+Monte Carlo Kernels
+NumPy-only simulation code executed inside the risk process pool
+"""
+
+from multiprocessing import shared_memory
+from typing import Sequence
+
+import numpy as np
+
+
+def simulate_pnl(
+    factor: np.ndarray,
+    drift: np.ndarray,
+    exposures: np.ndarray,
+    horizons: Sequence[int],
+    paths: int,
+    seed
+) -> np.ndarray:
+    """Simulate portfolio P&L for each horizon from correlated log-normal asset returns.
+
+    factor is any matrix with factor @ factor.T equal to the daily log-return
+    covariance; returns an array of shape (len(horizons), paths).
+    """
+    rng = np.random.default_rng(seed)
+    shocks = rng.standard_normal((paths, factor.shape[0])) @ factor.T
+
+    pnl = np.empty((len(horizons), paths))
+    log_returns = np.empty_like(shocks)
+    for i, horizon in enumerate(horizons):
+        np.multiply(shocks, np.sqrt(horizon), out=log_returns)
+        log_returns += drift * horizon
+        np.expm1(log_returns, out=log_returns)
+        pnl[i] = log_returns @ exposures
+    return pnl
+
+
+def simulate_chunk_shared(layout: dict, start: int, stop: int, seed) -> int:
+    """Simulate paths [start, stop) reading inputs from and writing P&L to shared memory.
+
+    layout names the two shared blocks: inputs holds factor, drift and
+    exposures back to back, output is a (len(horizons), paths) matrix.
+    """
+    n = layout["assets"]
+    horizons = layout["horizons"]
+    inputs = _attach(layout["inputs"])
+    output = _attach(layout["output"])
+    try:
+        params = np.ndarray((n * n + 2 * n,), dtype=np.float64, buffer=inputs.buf)
+        factor = params[:n * n].reshape(n, n)
+        drift = params[n * n:n * n + n]
+        exposures = params[n * n + n:]
+        pnl = np.ndarray((len(horizons), layout["paths"]), dtype=np.float64, buffer=output.buf)
+
+        pnl[:, start:stop] = simulate_pnl(factor, drift, exposures, horizons, stop - start, seed)
+        del params, factor, drift, exposures, pnl
+    finally:
+        inputs.close()
+        output.close()
+    return stop - start
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Attach to a block owned by the parent.
+
+    Spawned workers share the parent's resource tracker, where the block is
+    already registered, so attaching here is a no-op for cleanup; only the
+    parent, which created the block, unregisters it by unlinking.
+    """
+    return shared_memory.SharedMemory(name=name)
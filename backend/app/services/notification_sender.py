@@ -0,0 +1,80 @@
+"""
+Notification Senders
+Pluggable delivery of alert notifications to users
+"""
+
+import asyncio
+import json
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from app.core.config import settings
+
+
+@dataclass(frozen=True)
+class Notification:
+    user_id: str
+    email: str
+    channels: Tuple[str, ...]
+    subject: str
+    messages: Tuple[str, ...]
+    alert_ids: Tuple[str, ...]
+
+
+class NotificationSender(ABC):
+    """Delivers one notification over its channels; raising marks it for retry"""
+
+    @abstractmethod
+    async def send(self, notification: Notification):
+        """Deliver the notification to the user"""
+
+
+class LogNotificationSender(NotificationSender):
+    """Prints deliveries; for development"""
+
+    async def send(self, notification: Notification):
+        print(
+            f"Notification to {notification.email} via {','.join(notification.channels)}: "
+            f"{notification.subject}"
+        )
+
+
+class FileNotificationSender(NotificationSender):
+    """Appends each delivery as a JSON line to a local file"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _append(self, line: str):
+        with open(self.path, "a") as handle:
+            handle.write(line + "\n")
+
+    async def send(self, notification: Notification):
+        record = {**asdict(notification), "sent_at": datetime.utcnow().isoformat()}
+        await asyncio.to_thread(self._append, json.dumps(record))
+
+
+class RecordingNotificationSender(NotificationSender):
+    """Keeps deliveries in memory; for tests"""
+
+    def __init__(self):
+        self.sent: List[Notification] = []
+
+    async def send(self, notification: Notification):
+        self.sent.append(notification)
+
+
+def get_notification_sender(name: Optional[str] = None) -> NotificationSender:
+    """Build the sender selected by NOTIFICATION_SENDER"""
+    name = (name or settings.NOTIFICATION_SENDER).lower()
+    if name == "log":
+        return LogNotificationSender()
+    if name == "file":
+        if not settings.NOTIFICATION_FILE_PATH:
+            raise ValueError("NOTIFICATION_FILE_PATH must be set for the file notification sender")
+        return FileNotificationSender(settings.NOTIFICATION_FILE_PATH)
+    if name == "memory":
+        return RecordingNotificationSender()
+    raise ValueError(f"Unknown notification sender: {name}")
@@ -0,0 +1,224 @@
+"""
+Notification Service
+Transactional outbox for triggered alerts and the worker that delivers it in batches
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import select, update, insert, literal, and_, or_, exists
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.core.config import settings
+from app.db.models import Alert, AlertNotification, NotificationStatus, User
+from app.services.notification_sender import Notification, NotificationSender
+
+
+OUTBOX_CHUNK_ROWS = 500
+
+
+async def enqueue_alert_notifications(
+    db: AsyncSession,
+    alert_ids: Iterable[str],
+    now: Optional[datetime] = None
+) -> int:
+    """Queue one outbox row per triggered alert with INSERT ... SELECT, in the caller's transaction.
+
+    Only the alert ids are needed; recipient and message are copied from
+    the alerts by the database, so triggering does not wait on any read.
+    """
+    alert_ids = list(alert_ids)
+    now = now or datetime.utcnow()
+    for start in range(0, len(alert_ids), OUTBOX_CHUNK_ROWS):
+        await db.execute(
+            insert(AlertNotification).from_select(
+                ["alert_id", "user_id", "portfolio_id", "message", "status", "attempts", "created_at"],
+                select(
+                    Alert.id, Alert.user_id, Alert.portfolio_id, Alert.message,
+                    literal(NotificationStatus.PENDING, AlertNotification.status.type),
+                    literal(0),
+                    literal(now, AlertNotification.created_at.type)
+                ).where(Alert.id.in_(alert_ids[start:start + OUTBOX_CHUNK_ROWS]))
+            )
+        )
+    # Note: Commit is handled by the calling function
+    return len(alert_ids)
+
+
+class NotificationDeliveryWorker:
+    """Claims pending outbox rows in batches and hands them to a sender.
+
+    Claiming locks rows with FOR UPDATE SKIP LOCKED, so several workers
+    can drain the outbox side by side, and marks them processing under a
+    lease: rows of a worker that dies are claimed again once the lease
+    runs out. A user who was sent a notification within the dedupe window
+    is not claimed until it passes; everything queued for them meanwhile
+    then goes out as one notification. Channels follow the user's email
+    and push flags, and portfolio alerts also need portfolio_alerts; rows
+    with nowhere to go are marked skipped. Failed sends are retried until
+    NOTIFICATION_MAX_ATTEMPTS, each after twice the delay of the one
+    before, starting from NOTIFICATION_RETRY_SECONDS.
+    """
+
+    def __init__(
+        self,
+        sender: NotificationSender,
+        session_factory,
+        batch_size: Optional[int] = None,
+        dedupe_seconds: Optional[int] = None,
+        lease_seconds: Optional[int] = None,
+        retry_seconds: Optional[float] = None,
+        clock: Callable[[], datetime] = datetime.utcnow
+    ):
+        self.sender = sender
+        self.session_factory = session_factory
+        self.batch_size = batch_size or settings.NOTIFICATION_BATCH_SIZE
+        self.dedupe = timedelta(
+            seconds=settings.NOTIFICATION_DEDUPE_SECONDS if dedupe_seconds is None else dedupe_seconds
+        )
+        self.lease = timedelta(seconds=lease_seconds or settings.NOTIFICATION_LEASE_SECONDS)
+        self.retry = timedelta(
+            seconds=settings.NOTIFICATION_RETRY_SECONDS if retry_seconds is None else retry_seconds
+        )
+        self.clock = clock
+
+    async def claim(self, db: AsyncSession, now: datetime) -> List[int]:
+        """Lock and mark up to a batch of deliverable rows; returns their ids"""
+        recent = aliased(AlertNotification)
+        query = (
+            select(AlertNotification.id)
+            .where(
+                or_(
+                    and_(
+                        AlertNotification.status == NotificationStatus.PENDING,
+                        or_(AlertNotification.next_attempt_at.is_(None), AlertNotification.next_attempt_at <= now)
+                    ),
+                    and_(
+                        AlertNotification.status == NotificationStatus.PROCESSING,
+                        AlertNotification.claimed_at < now - self.lease
+                    )
+                ),
+                ~exists().where(
+                    recent.user_id == AlertNotification.user_id,
+                    recent.status == NotificationStatus.SENT,
+                    recent.delivered_at > now - self.dedupe
+                )
+            )
+            .order_by(AlertNotification.id)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True, of=AlertNotification)
+        )
+        ids = list((await db.execute(query)).scalars().all())
+        if ids:
+            await db.execute(
+                update(AlertNotification)
+                .where(AlertNotification.id.in_(ids))
+                .values(
+                    status=NotificationStatus.PROCESSING,
+                    claimed_at=now,
+                    attempts=AlertNotification.attempts + 1
+                )
+                .execution_options(synchronize_session=False)
+            )
+        await db.commit()
+        return ids
+
+    async def deliver_batch(self) -> int:
+        """Claim, send and settle one batch; returns the number of rows claimed"""
+        now = self.clock()
+        async with self.session_factory() as session:
+            ids = await self.claim(session, now)
+            if not ids:
+                return 0
+            rows = (await session.execute(
+                select(
+                    AlertNotification.id, AlertNotification.alert_id, AlertNotification.user_id,
+                    AlertNotification.portfolio_id, AlertNotification.message, AlertNotification.attempts,
+                    User.email, User.email_notifications, User.push_notifications, User.portfolio_alerts
+                )
+                .join(User, User.id == AlertNotification.user_id)
+                .where(AlertNotification.id.in_(ids))
+                .order_by(AlertNotification.id)
+            )).all()
+
+        by_user: Dict[str, list] = {}
+        for row in rows:
+            by_user.setdefault(row.user_id, []).append(row)
+
+        outcomes: Dict[int, dict] = {}
+        deliveries = []
+        for user_rows in by_user.values():
+            user = user_rows[0]
+            channels = tuple(
+                channel
+                for channel, enabled in (("email", user.email_notifications), ("push", user.push_notifications))
+                if enabled
+            )
+            deliverable = []
+            for row in user_rows:
+                if not channels or (row.portfolio_id and not user.portfolio_alerts):
+                    outcomes[row.id] = {"id": row.id, "status": NotificationStatus.SKIPPED}
+                else:
+                    deliverable.append(row)
+            if deliverable:
+                deliveries.append((deliverable, self._compose(user, channels, deliverable)))
+
+        results = await asyncio.gather(
+            *[self.sender.send(notification) for _, notification in deliveries], return_exceptions=True
+        )
+        delivered_at = self.clock()
+        for (deliverable, notification), result in zip(deliveries, results):
+            for row in deliverable:
+                if isinstance(result, Exception):
+                    outcomes[row.id] = {
+                        "id": row.id,
+                        "status": (
+                            NotificationStatus.FAILED if row.attempts >= settings.NOTIFICATION_MAX_ATTEMPTS
+                            else NotificationStatus.PENDING
+                        ),
+                        "last_error": str(result)[:1000],
+                        "next_attempt_at": delivered_at + self.retry * 2 ** (row.attempts - 1)
+                    }
+                else:
+                    outcomes[row.id] = {
+                        "id": row.id,
+                        "status": NotificationStatus.SENT,
+                        "channels": ",".join(notification.channels),
+                        "delivered_at": delivered_at
+                    }
+
+        async with self.session_factory() as session:
+            await session.execute(update(AlertNotification), list(outcomes.values()))
+            await session.commit()
+        return len(ids)
+
+    @staticmethod
+    def _compose(user, channels, rows) -> Notification:
+        """One notification per user, with duplicate alerts collapsed"""
+        messages: Dict[str, str] = {}
+        for row in rows:
+            messages.setdefault(row.alert_id, row.message)
+        count = len(messages)
+        subject = next(iter(messages.values())) if count == 1 else f"{count} alerts triggered"
+        return Notification(
+            user_id=user.user_id,
+            email=user.email,
+            channels=channels,
+            subject=subject,
+            messages=tuple(messages.values()),
+            alert_ids=tuple(messages)
+        )
+
+
+async def run_notification_delivery(sender: NotificationSender, session_factory):
+    """Drain the outbox continuously, polling every NOTIFICATION_POLL_SECONDS once it is empty"""
+    worker = NotificationDeliveryWorker(sender, session_factory)
+    while True:
+        try:
+            if await worker.deliver_batch():
+                continue
+        except Exception as e:
+            print(f"Warning: Notification delivery failed: {e}")
+        await asyncio.sleep(settings.NOTIFICATION_POLL_SECONDS)
@@ -0,0 +1,372 @@
+"""
+Performance Service
+Daily valuation series and period returns for portfolios
+"""
+
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+import numpy as np
+from dateutil.relativedelta import relativedelta
+from fastapi import HTTPException, status
+from sqlalchemy import select, update, delete, func, case
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import (
+    Portfolio, Transaction, TransactionType, PortfolioValuation
+)
+from app.schemas.portfolio import PerformancePeriod
+from app.services.history_service import HistoryService
+
+
+# Lookback of each named period in PerformanceData (inception is handled separately)
+PERIOD_LOOKBACKS = {
+    "one_day": relativedelta(days=1),
+    "one_week": relativedelta(weeks=1),
+    "one_month": relativedelta(months=1),
+    "three_months": relativedelta(months=3),
+    "six_months": relativedelta(months=6),
+    "one_year": relativedelta(years=1),
+    "three_years": relativedelta(years=3),
+    "five_years": relativedelta(years=5),
+}
+
+
+def _as_date(value) -> date:
+    """Normalize a datetime or date to a date"""
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _to_decimal(value: float, places: int = 2) -> Decimal:
+    """Convert a float result to a rounded Decimal"""
+    return Decimal(str(round(float(value), places)))
+
+
+def forward_fill(matrix: np.ndarray) -> np.ndarray:
+    """Carry the last observed value down each column; leading gaps become 0"""
+    rows = np.arange(matrix.shape[0])[:, None]
+    last_seen = np.where(np.isnan(matrix), 0, rows)
+    np.maximum.accumulate(last_seen, axis=0, out=last_seen)
+    filled = matrix[last_seen, np.arange(matrix.shape[1])]
+    return np.nan_to_num(filled, nan=0.0)
+
+
+class ValuationSeries:
+    """Daily portfolio values plus prefix sums of external cash flows.
+
+    With the prefix arrays any (start, end] window is answered with two
+    binary searches and a handful of array lookups, so the cost of
+    computing a period does not depend on its length.
+    """
+
+    def __init__(self, dates: np.ndarray, values: np.ndarray, flows: np.ndarray):
+        self.dates = dates.astype("datetime64[D]")
+        self.values = values.astype(np.float64)
+        self.flows = flows.astype(np.float64)
+
+        # cum_flows[k] is the sum of flows over days [0, k); cum_day_flows weights each by its day index
+        day_index = np.arange(len(self.flows), dtype=np.float64)
+        self.cum_flows = np.concatenate(([0.0], np.cumsum(self.flows)))
+        self.cum_day_flows = np.concatenate(([0.0], np.cumsum(self.flows * day_index)))
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def scaled(self, factors: np.ndarray) -> "ValuationSeries":
+        """The same series with each day's values and flows multiplied by that day's factor"""
+        return ValuationSeries(self.dates, self.values * factors, self.flows * factors)
+
+    @property
+    def first_date(self) -> Optional[date]:
+        return self.dates[0].astype(date) if len(self) else None
+
+    def returns_between(self, dates: np.ndarray) -> np.ndarray:
+        """Flow-adjusted return between each pair of consecutive dates (NaN where undefined)"""
+        dates = np.asarray(dates, dtype="datetime64[D]")
+        if not len(self) or len(dates) < 2:
+            return np.full(max(len(dates) - 1, 0), np.nan)
+
+        idx = np.searchsorted(self.dates, dates, side="right") - 1
+        covered = (idx >= 0) & (dates <= self.dates[-1])
+        safe_idx = np.maximum(idx, 0)
+        values = np.where(covered, self.values[safe_idx], 0.0)
+        cum_flows = np.where(covered, self.cum_flows[safe_idx + 1], 0.0)
+
+        previous = values[:-1]
+        growth = values[1:] - (cum_flows[1:] - cum_flows[:-1])
+        defined = covered[:-1] & covered[1:] & (previous > 0)
+        return np.divide(
+            growth, previous, out=np.full(len(previous), np.nan), where=defined
+        ) - 1
+
+    def period_returns(
+        self,
+        start_dates: List[Optional[date]],
+        end_date: date
+    ) -> List[Optional[PerformancePeriod]]:
+        """Modified Dietz return for every window ending at end_date, in one vectorized pass.
+
+        A start of None (or any date before the first valuation) means since
+        inception, i.e. starting from a zero value before the first day.
+        """
+        if not len(self) or not start_dates:
+            return [None] * len(start_dates)
+
+        end_idx = int(np.searchsorted(self.dates, np.datetime64(end_date, "D"), side="right")) - 1
+        if end_idx < 0:
+            return [None] * len(start_dates)
+
+        before_first = self.dates[0] - np.timedelta64(1, "D")
+        starts = np.array(
+            [np.datetime64(d, "D") if d is not None else before_first for d in start_dates],
+            dtype="datetime64[D]"
+        )
+        start_idx = np.searchsorted(self.dates, starts, side="right") - 1
+
+        start_value = np.where(start_idx >= 0, self.values[np.maximum(start_idx, 0)], 0.0)
+        end_value = self.values[end_idx]
+        flows = self.cum_flows[end_idx + 1] - self.cum_flows[start_idx + 1]
+
+        # Each flow on day t is weighted by the share of the window it was invested for
+        span = np.maximum(end_idx - start_idx, 1)
+        day_flows = self.cum_day_flows[end_idx + 1] - self.cum_day_flows[start_idx + 1]
+        weighted_flows = ((end_idx + 1) * flows - day_flows) / span
+
+        gain = end_value - start_value - flows
+        capital = start_value + weighted_flows
+        percent = np.divide(gain * 100, capital, out=np.zeros_like(gain), where=capital > 0)
+
+        periods: List[Optional[PerformancePeriod]] = []
+        for i, s in enumerate(start_idx):
+            if s >= end_idx:
+                periods.append(None)
+                continue
+            first_day = self.dates[max(s, 0)].astype(date)
+            periods.append(PerformancePeriod(
+                return_value=_to_decimal(gain[i]),
+                return_percent=_to_decimal(percent[i], 4),
+                start_value=_to_decimal(start_value[i]),
+                end_value=_to_decimal(end_value),
+                start_date=datetime.combine(first_day, time.min),
+                end_date=datetime.combine(self.dates[end_idx].astype(date), time.min)
+            ))
+        return periods
+
+
+class PerformanceService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    def _insert(self):
+        """Dialect-specific INSERT supporting ON CONFLICT"""
+        if self.db.get_bind().dialect.name == "sqlite":
+            return sqlite.insert(PortfolioValuation)
+        return postgresql.insert(PortfolioValuation)
+
+    async def get_valuation_series(self, portfolio: Portfolio) -> ValuationSeries:
+        """Get the daily valuation series, rebuilding the persisted part when stale.
+
+        Closed days are persisted in portfolio_valuations; today's point is
+        always taken from the live portfolio totals. Rebuilt days are left
+        for the caller to commit.
+        """
+        today = datetime.utcnow().date()
+
+        if portfolio.valued_through is None or portfolio.valued_through < today - timedelta(days=1):
+            resume_from = portfolio.valued_through + timedelta(days=1) if portfolio.valued_through else None
+            await self.rebuild_valuation_series(portfolio.id, today, resume_from)
+        rows = await self._load_persisted(portfolio.id)
+
+        today_flow = await self._get_flows_for_day(portfolio.id, today)
+        if not rows and today_flow == 0 and portfolio.total_value == 0:
+            return ValuationSeries(np.array([], dtype="datetime64[D]"), np.array([]), np.array([]))
+
+        dates = np.array(
+            [r.valuation_date for r in rows] + [today], dtype="datetime64[D]"
+        )
+        values = np.array([float(r.total_value) for r in rows] + [float(portfolio.total_value)])
+        flows = np.array([float(r.net_flow) for r in rows] + [today_flow])
+        return ValuationSeries(dates, values, flows)
+
+    async def rebuild_valuation_series(
+        self, portfolio_id: str, as_of: date, from_date: Optional[date] = None
+    ) -> int:
+        """Rebuild and persist valuations for every closed day before as_of.
+
+        Holdings come from cumulative BUY/SELL quantities, prices from the
+        daily close (or trade price) of each day carried forward. With
+        from_date only the days from then on are rewritten and earlier
+        persisted days are kept. Days are upserted, so concurrent rebuilds
+        of the same portfolio write the same rows instead of conflicting,
+        and the portfolio is marked valued through the day before as_of
+        even when it has nothing to persist.
+        """
+        query = select(
+            Transaction.symbol,
+            Transaction.transaction_type,
+            Transaction.quantity,
+            Transaction.price,
+            Transaction.transaction_date
+        ).where(
+            Transaction.portfolio_id == portfolio_id,
+            Transaction.transaction_type.in_([TransactionType.BUY, TransactionType.SELL])
+        ).order_by(Transaction.transaction_date)
+        transactions = (await self.db.execute(query)).all()
+
+        first_day = _as_date(transactions[0].transaction_date) if transactions else None
+        if first_day is None or first_day >= as_of:
+            await self._mark_valued_through(portfolio_id, as_of - timedelta(days=1))
+            return 0
+
+        dates = np.arange(np.datetime64(first_day, "D"), np.datetime64(as_of, "D"))
+        symbols = sorted({t.symbol for t in transactions})
+        columns = {symbol: i for i, symbol in enumerate(symbols)}
+        shape = (len(dates), len(symbols))
+
+        day_idx = (
+            np.array([_as_date(t.transaction_date) for t in transactions], dtype="datetime64[D]")
+            - dates[0]
+        ).astype(np.int64)
+        sym_idx = np.array([columns[t.symbol] for t in transactions], dtype=np.int64)
+        sign = np.array([1.0 if t.transaction_type == TransactionType.BUY else -1.0 for t in transactions])
+        quantity = np.array([float(t.quantity) for t in transactions])
+        price = np.array([float(t.price) for t in transactions])
+        closed = day_idx < len(dates)
+        day_idx, sym_idx, sign, quantity, price = (
+            day_idx[closed], sym_idx[closed], sign[closed], quantity[closed], price[closed]
+        )
+
+        deltas = np.zeros(shape)
+        np.add.at(deltas, (day_idx, sym_idx), sign * quantity)
+        holdings = np.cumsum(deltas, axis=0)
+
+        flows = np.zeros(len(dates))
+        np.add.at(flows, day_idx, sign * quantity * price)
+
+        # Trade prices first, then market quotes; the last observation of a day wins
+        closes = np.full(shape, np.nan)
+        closes[day_idx, sym_idx] = price
+
+        quotes = await HistoryService(self.db).get_daily_closes(symbols, first_day, as_of - timedelta(days=1))
+        for symbol, (quote_dates, quote_prices) in quotes.items():
+            closes[(quote_dates - dates[0]).astype(np.int64), columns[symbol]] = quote_prices
+
+        values = (holdings * forward_fill(closes)).sum(axis=1)
+
+        rows = [
+            {
+                "portfolio_id": portfolio_id,
+                "valuation_date": d.astype(date),
+                "total_value": _to_decimal(v),
+                "net_flow": _to_decimal(f),
+            }
+            for d, v, f in zip(dates, values, flows)
+            if from_date is None or d.astype(date) >= from_date
+        ]
+        if rows:
+            stmt = self._insert()
+            await self.db.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[PortfolioValuation.portfolio_id, PortfolioValuation.valuation_date],
+                    set_={
+                        "total_value": stmt.excluded.total_value,
+                        "net_flow": stmt.excluded.net_flow,
+                    }
+                ),
+                rows
+            )
+        await self._mark_valued_through(portfolio_id, as_of - timedelta(days=1))
+        # Note: Commit is handled by the calling function
+        return len(rows)
+
+    async def invalidate_series(self, portfolio_id: str, from_date: Optional[date] = None):
+        """Drop persisted valuations so the next read rebuilds them"""
+        query = delete(PortfolioValuation).where(PortfolioValuation.portfolio_id == portfolio_id)
+        if from_date:
+            query = query.where(PortfolioValuation.valuation_date >= from_date)
+        await self.db.execute(query)
+
+        marker = update(Portfolio).where(Portfolio.id == portfolio_id)
+        if from_date:
+            marker = marker.where(Portfolio.valued_through >= from_date).values(
+                valued_through=from_date - timedelta(days=1)
+            )
+        else:
+            marker = marker.values(valued_through=None)
+        await self.db.execute(marker)
+        # Note: Commit is handled by the calling function
+
+    async def _mark_valued_through(self, portfolio_id: str, last_day: date):
+        """Record the last closed day the persisted series covers"""
+        await self.db.execute(
+            update(Portfolio).where(Portfolio.id == portfolio_id).values(
+                valued_through=last_day,
+                # Bookkeeping only; a rebuild is not a change to the portfolio
+                updated_at=Portfolio.updated_at
+            )
+        )
+
+    def calculate_periods(
+        self,
+        series: ValuationSeries,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None
+    ) -> Dict[str, Optional[PerformancePeriod]]:
+        """Calculate every named period, inception and an optional custom window"""
+        if start_date and end_date and start_date > end_date:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="start_date must be on or before end_date"
+            )
+
+        periods: Dict[str, Optional[PerformancePeriod]] = {
+            name: None for name in list(PERIOD_LOOKBACKS) + ["inception"]
+        }
+        if not len(series):
+            return periods
+
+        last_date = series.dates[-1].astype(date)
+        names = []
+        starts: List[Optional[date]] = []
+        for name, lookback in PERIOD_LOOKBACKS.items():
+            start = last_date - lookback
+            # Periods reaching back before the first valuation are not meaningful
+            if start >= series.first_date:
+                names.append(name)
+                starts.append(start)
+        names.append("inception")
+        starts.append(None)
+
+        for name, period in zip(names, series.period_returns(starts, last_date)):
+            periods[name] = period
+
+        if start_date or end_date:
+            periods["custom"] = series.period_returns([start_date], end_date or last_date)[0]
+
+        return periods
+
+    async def _load_persisted(self, portfolio_id: str) -> list:
+        query = select(
+            PortfolioValuation.valuation_date,
+            PortfolioValuation.total_value,
+            PortfolioValuation.net_flow
+        ).where(
+            PortfolioValuation.portfolio_id == portfolio_id
+        ).order_by(PortfolioValuation.valuation_date)
+        return (await self.db.execute(query)).all()
+
+    async def _get_flows_for_day(self, portfolio_id: str, day: date) -> float:
+        """Net external flow (buys - sells) booked on a given day"""
+        signed_amount = case(
+            (Transaction.transaction_type == TransactionType.BUY, Transaction.quantity * Transaction.price),
+            else_=-(Transaction.quantity * Transaction.price)
+        )
+        query = select(func.coalesce(func.sum(signed_amount), 0)).where(
+            Transaction.portfolio_id == portfolio_id,
+            Transaction.transaction_type.in_([TransactionType.BUY, TransactionType.SELL]),
+            Transaction.transaction_date >= datetime.combine(day, time.min),
+            Transaction.transaction_date < datetime.combine(day + timedelta(days=1), time.min)
+        )
+        return float((await self.db.execute(query)).scalar_one())
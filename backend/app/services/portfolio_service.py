@@ -4,21 +4,79 @@ Business logic for portfolio management
 """
 
 from decimal import Decimal
-from typing import List, Optional
-from datetime import datetime
+from typing import Dict, List, Optional
+from datetime import datetime, date, timezone
+
+import numpy as np
 
 from fastapi import HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
+from sqlalchemy import select, delete, func
 from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 
-from app.db.models import Portfolio, Asset, Transaction, User, TransactionType, AssetType
+from app.db.models import Portfolio, Asset, Transaction, User, TransactionType, AssetType, Currency
 from app.schemas.portfolio import (
     PortfolioCreate, PortfolioUpdate, PortfolioResponse, PortfolioSummary,
     AssetCreate, AssetUpdate, AssetResponse, 
     TransactionCreate, TransactionResponse,
-    AssetAllocation, PerformanceData
+    AssetAllocation, PerformanceData, HouseholdPosition, HouseholdSummary
 )
+from app.services.alert_engine import get_alert_engine
+from app.services.alert_service import AlertService
+from app.services.performance_service import PerformanceService, _as_date, _to_decimal
+from app.services.fx_service import FxService
+from app.services.rebalance_service import RebalanceService
+from app.services.quote_service import QuoteService
+from app.services.quote_cache import get_quote_cache
+
+
+# When a holding was last priced: by the feed, or else by its last edit
+_PRICED_AT = func.coalesce(Asset.last_price_update, Asset.updated_at)
+
+
+def _naive_utc(moment: datetime) -> datetime:
+    return moment.astimezone(timezone.utc).replace(tzinfo=None) if moment.tzinfo else moment
+
+
+def determine_asset_type(symbol: str) -> AssetType:
+    """Determine asset type from symbol"""
+    symbol = symbol.upper()
+    
+    # Common crypto symbols
+    crypto_symbols = {
+        'BTC', 'ETH', 'ADA', 'DOT', 'SOL', 'AVAX', 'MATIC', 'LINK', 'UNI', 'ATOM',
+        'XRP', 'LTC', 'BCH', 'EOS', 'TRX', 'XLM', 'ALGO', 'VET', 'FIL', 'THETA',
+        'AAVE', 'MKR', 'COMP', 'YFI', 'SNX', 'CRV', 'BAL', 'SUSHI', '1INCH', 'ENJ',
+        'MANA', 'SAND', 'AXS', 'SHIB', 'DOGE', 'ICP', 'NEAR', 'FTT', 'LUNA', 'UST'
+    }
+    
+    # ETF patterns (usually end with specific suffixes)
+    if any(symbol.endswith(suffix) for suffix in ['ETF', 'SPDR', 'IVV', 'VOO', 'VTI', 'QQQ']):
+        return AssetType.ETF
+    
+    # Bond patterns
+    if any(pattern in symbol for pattern in ['BOND', 'TLT', 'IEF', 'SHY', 'AGG']):
+        return AssetType.BOND
+    
+    # Commodity patterns
+    if any(pattern in symbol for pattern in ['GLD', 'SLV', 'OIL', 'GAS', 'GOLD', 'SILVER']):
+        return AssetType.COMMODITY
+    
+    # Real estate patterns
+    if any(pattern in symbol for pattern in ['REIT', 'VNQ', 'SCHH', 'IYR']):
+        return AssetType.REAL_ESTATE
+    
+    # Cash equivalents
+    if any(pattern in symbol for pattern in ['CASH', 'USD', 'EUR', 'GBP', 'JPY']):
+        return AssetType.CASH
+    
+    # Check if it's a known crypto
+    if symbol in crypto_symbols:
+        return AssetType.CRYPTO
+    
+    # Default to stock for traditional stock symbols
+    return AssetType.STOCK
 
 
 class PortfolioService:
@@ -35,6 +93,79 @@ class PortfolioService:
         result = await self.db.execute(query)
         return result.scalars().all()
 
+    async def _newer_cached_prices(self, priced_at: Dict[str, Optional[datetime]]) -> Dict[str, Decimal]:
+        """Cached prices quoted after the stored ones, for symbols mapped to when they were last priced"""
+        quotes = await get_quote_cache().get_many(priced_at)
+        return {
+            symbol: quote.price
+            for symbol, quote in quotes.items()
+            if quote.price > 0 and (
+                priced_at[symbol] is None or _naive_utc(quote.timestamp) > _naive_utc(priced_at[symbol])
+            )
+        }
+
+    async def overlay_cached_prices(self, portfolios: List[Portfolio]):
+        """Show cached quotes newer than the stored prices on loaded portfolios, for display only.
+
+        Values are set as if loaded from the database, so nothing is flushed;
+        holdings are repriced in the database by the price feed and the
+        refresh scheduler, never by a read.
+        """
+        by_id = {portfolio.id: portfolio for portfolio in portfolios}
+        if not by_id:
+            return
+        rows = (await self.db.execute(
+            select(Asset.symbol, func.max(_PRICED_AT))
+            .where(Asset.portfolio_id.in_(list(by_id)), Asset.quantity > 0)
+            .group_by(Asset.symbol)
+        )).all()
+        prices = await self._newer_cached_prices(dict(rows))
+        if not prices:
+            return
+
+        # The identity map hands back the same objects the caller already holds
+        assets = (await self.db.execute(
+            select(Asset).where(
+                Asset.portfolio_id.in_(
+                    select(Asset.portfolio_id).where(
+                        Asset.portfolio_id.in_(list(by_id)), Asset.symbol.in_(list(prices))
+                    )
+                )
+            )
+        )).scalars().all()
+        previous_closes = await QuoteService(self.db).get_previous_closes(prices)
+
+        held: Dict[str, List[Asset]] = {}
+        for asset in assets:
+            held.setdefault(asset.portfolio_id, []).append(asset)
+            price = prices.get(asset.symbol)
+            if price is None or asset.quantity <= 0:
+                continue
+            market_value = asset.quantity * price
+            set_committed_value(asset, "current_price", price)
+            set_committed_value(asset, "market_value", market_value)
+            set_committed_value(asset, "unrealized_gain_loss", market_value - asset.total_cost)
+            previous_close = previous_closes.get(asset.symbol)
+            if previous_close:
+                set_committed_value(asset, "day_change", asset.quantity * (price - previous_close))
+                set_committed_value(asset, "day_change_percent", (price - previous_close) / previous_close * 100)
+
+        for portfolio_id, portfolio_assets in held.items():
+            portfolio = by_id[portfolio_id]
+            total_value = sum((asset.market_value for asset in portfolio_assets), Decimal("0.00"))
+            day_change = sum((asset.day_change for asset in portfolio_assets), Decimal("0.00"))
+            previous_value = total_value - day_change
+            set_committed_value(portfolio, "total_value", total_value)
+            set_committed_value(portfolio, "day_change", day_change)
+            set_committed_value(
+                portfolio, "day_change_percent",
+                (day_change / previous_value * 100) if previous_value > 0 else Decimal("0.00")
+            )
+            for asset in portfolio_assets:
+                set_committed_value(
+                    asset, "weight", (asset.market_value / total_value * 100) if total_value > 0 else Decimal("0.00")
+                )
+
     async def get_portfolio(
         self, 
         portfolio_id: str, 
@@ -128,6 +259,8 @@ class PortfolioService:
         if not portfolio:
             return False
 
+        # Portfolio alerts would go with the cascade, leaving them in their owner's counts
+        await AlertService(self.db).delete_portfolio_alerts(portfolio_id, user_id)
         await self.db.delete(portfolio)
         await self.db.commit()
         
@@ -172,6 +305,8 @@ class PortfolioService:
             # Update current price to the latest purchase price and recalculate market value
             existing_asset.current_price = asset_data.price
             existing_asset.market_value = existing_asset.quantity * existing_asset.current_price
+            if asset_data.price > 0:
+                await QuoteService(self.db).record_prices({existing_asset.symbol: asset_data.price})
             
             # Create transaction for the additional purchase
             transaction_date = datetime.utcnow()
@@ -208,9 +343,11 @@ class PortfolioService:
 
             
             # Update portfolio totals after adding asset
-            await self._update_portfolio_totals(portfolio_id)
+            await self._update_portfolio_totals(portfolio_id, _as_date(transaction_date))
             await self.db.commit()
             
+            get_quote_cache().invalidate([existing_asset.symbol])
+            
             # Refresh the asset to ensure it's still attached to the session
             await self.db.refresh(existing_asset)
             
@@ -220,7 +357,7 @@ class PortfolioService:
         total_cost = asset_data.quantity * asset_data.price
         
         # Determine asset type from symbol
-        asset_type = self._determine_asset_type(asset_data.symbol)
+        asset_type = determine_asset_type(asset_data.symbol)
         
         asset = Asset(
             portfolio_id=portfolio_id,
@@ -265,10 +402,15 @@ class PortfolioService:
         )
 
         self.db.add(transaction)
+
+        # The entered price is the symbol's latest known price, and rolls into its previous close
+        if asset_data.price > 0:
+            await QuoteService(self.db).record_prices({asset.symbol: asset_data.price})
         
         # Update portfolio totals after adding asset
-        await self._update_portfolio_totals(portfolio_id)
+        await self._update_portfolio_totals(portfolio_id, _as_date(transaction_date))
         await self.db.commit()
+        get_quote_cache().invalidate([asset.symbol])
         
         # Refresh the asset to ensure it's still attached to the session
         await self.db.refresh(asset)
@@ -312,17 +454,26 @@ class PortfolioService:
             asset.market_value = asset.quantity * asset.current_price
 
         # Create transaction if quantity changed
+        history_from = None
         if "quantity" in update_data and asset.quantity != original_quantity:
             await self._create_transaction_from_quantity_change(
                 asset, original_quantity, asset.quantity
             )
+            history_from = datetime.utcnow().date()
             
             # Recalculate asset totals from all transactions to ensure accuracy
             await self._recalculate_asset_totals(asset)
 
-        # Update portfolio totals after updating asset
-        await self._update_portfolio_totals(portfolio_id)
+        # A manually set price becomes the symbol's latest price, and rolls into its previous close
+        price_set = "current_price" in update_data and asset.current_price > 0
+        if price_set:
+            await QuoteService(self.db).record_prices({asset.symbol: asset.current_price})
+
+        # Update portfolio totals after updating asset; price-only edits leave the history alone
+        await self._update_portfolio_totals(portfolio_id, history_from)
         await self.db.commit()
+        if price_set:
+            get_quote_cache().invalidate([asset.symbol])
         await self.db.refresh(asset)
         
         return asset
@@ -350,30 +501,52 @@ class PortfolioService:
         if not asset:
             return False
 
+        # The asset's trades go with it, so the history changes from its first trade on
+        first_trade = (await self.db.execute(
+            select(func.min(Transaction.transaction_date)).where(Transaction.asset_id == asset.id)
+        )).scalar()
+
         await self.db.delete(asset)
         
         # Update portfolio totals after removing asset
-        await self._update_portfolio_totals(portfolio_id)
+        await self._update_portfolio_totals(portfolio_id, _as_date(first_trade) if first_trade else None)
         await self.db.commit()
         
         return True
 
-    async def get_portfolio_allocation(self, portfolio_id: str, user_id: str) -> List[AssetAllocation]:
-        """Get portfolio asset allocation"""
+    async def get_portfolio_allocation(
+        self,
+        portfolio_id: str,
+        user_id: str,
+        currency: Optional[Currency] = None
+    ) -> List[AssetAllocation]:
+        """Get portfolio asset allocation, valued in the portfolio's currency unless another is given"""
         portfolio = await self.get_portfolio(portfolio_id, user_id, include_assets=True)
         
         if not portfolio:
             return []
 
+        rate = Decimal("1")
+        if currency and currency != portfolio.currency:
+            rate = await FxService(self.db).get_rate(portfolio.currency, currency, datetime.utcnow().date())
+
         # Calculate allocation by asset type
         allocation_map = {}
-        total_value = portfolio.total_value
+        total_value = portfolio.total_value * rate
 
         for asset in portfolio.assets:
             asset_type = asset.asset_type
             if asset_type not in allocation_map:
                 allocation_map[asset_type] = Decimal("0.00")
-            allocation_map[asset_type] += asset.market_value
+            allocation_map[asset_type] += asset.market_value * rate
+
+        # Targets set by symbol roll up to the asset type of the held symbol
+        target_map = {}
+        asset_types = {asset.symbol: asset.asset_type for asset in portfolio.assets}
+        for target in await RebalanceService(self.db).get_targets(portfolio_id):
+            asset_type = target.asset_type or asset_types.get(target.symbol)
+            if asset_type is not None:
+                target_map[asset_type] = target_map.get(asset_type, Decimal("0.00")) + target.target_percent
 
         # Convert to allocation objects
         allocations = []
@@ -382,36 +555,168 @@ class PortfolioService:
             allocations.append(AssetAllocation(
                 asset_type=asset_type,
                 value=value,
-                percentage=percentage
+                percentage=percentage,
+                target=target_map.get(asset_type)
             ))
 
         return allocations
 
+    async def get_household_summary(self, user_id: str, currency: Currency = Currency.USD) -> HouseholdSummary:
+        """Consolidate every portfolio of a user in one currency, merging positions by symbol"""
+        portfolio_count = (
+            select(func.count(Portfolio.id))
+            .where(Portfolio.user_id == user_id)
+            .scalar_subquery()
+        )
+        query = (
+            select(
+                Asset.symbol,
+                Asset.asset_type,
+                Portfolio.currency,
+                func.sum(Asset.quantity).label("quantity"),
+                func.sum(Asset.market_value).label("market_value"),
+                func.sum(Asset.total_cost).label("total_cost"),
+                func.sum(Asset.unrealized_gain_loss).label("unrealized_gain_loss"),
+                func.sum(Asset.day_change).label("day_change"),
+                func.count(func.distinct(Asset.portfolio_id)).label("portfolio_count"),
+                func.max(_PRICED_AT).label("priced_at"),
+                portfolio_count.label("total_portfolios")
+            )
+            .join(Portfolio, Asset.portfolio_id == Portfolio.id)
+            .where(Portfolio.user_id == user_id, Asset.quantity > 0)
+            .group_by(Asset.symbol, Asset.asset_type, Portfolio.currency)
+        )
+        rows = (await self.db.execute(query)).all()
+
+        if rows:
+            total_portfolios = rows[0].total_portfolios
+        else:
+            total_portfolios = (await self.db.execute(select(portfolio_count))).scalar()
+
+        # Cached quotes newer than the stored prices are shown without being written
+        priced_at: Dict[str, Optional[datetime]] = {}
+        for row in rows:
+            if row.symbol not in priced_at or (
+                row.priced_at is not None and _naive_utc(row.priced_at) > _naive_utc(priced_at[row.symbol])
+            ):
+                priced_at[row.symbol] = row.priced_at
+        prices = await self._newer_cached_prices(priced_at) if rows else {}
+        previous_closes = await QuoteService(self.db).get_previous_closes(prices) if prices else {}
+
+        # Convert every group's amounts at once, then merge a symbol's groups across currencies
+        amounts = np.array([
+            self._household_amounts(row, prices.get(row.symbol), previous_closes.get(row.symbol))
+            for row in rows
+        ]).reshape(-1, 4)
+        converted = await FxService(self.db).convert_array(
+            amounts, [row.currency for row in rows], currency, datetime.utcnow().date()
+        )
+        keys = {}
+        for row in rows:
+            keys.setdefault((row.symbol, row.asset_type), len(keys))
+        groups = np.array([keys[(row.symbol, row.asset_type)] for row in rows], dtype=np.int64)
+        merged = np.zeros((len(keys), 4))
+        np.add.at(merged, groups, converted)
+        quantities = [Decimal("0")] * len(keys)
+        holder_counts = [0] * len(keys)
+        for group, row in zip(groups, rows):
+            quantities[group] += Decimal(row.quantity)
+            holder_counts[group] += row.portfolio_count
+
+        total_value, total_cost, _, day_change = (_to_decimal(v) for v in merged.sum(axis=0))
+
+        positions = []
+        allocation_map = {}
+        for (symbol, asset_type), group in keys.items():
+            market_value, cost, gain_loss, change = (_to_decimal(v) for v in merged[group])
+            positions.append(HouseholdPosition(
+                symbol=symbol,
+                asset_type=asset_type,
+                quantity=quantities[group],
+                average_cost=cost / quantities[group],
+                market_value=market_value,
+                total_cost=cost,
+                unrealized_gain_loss=gain_loss,
+                day_change=change,
+                weight=(market_value / total_value * 100) if total_value > 0 else Decimal("0.00"),
+                portfolio_count=holder_counts[group]
+            ))
+            allocation_map[asset_type] = allocation_map.get(asset_type, Decimal("0.00")) + market_value
+        positions.sort(key=lambda position: position.market_value, reverse=True)
+
+        allocation = [
+            AssetAllocation(
+                asset_type=asset_type,
+                value=value,
+                percentage=(value / total_value * 100) if total_value > 0 else Decimal("0.00")
+            )
+            for asset_type, value in allocation_map.items()
+        ]
+
+        total_gain_loss = total_value - total_cost
+        previous_value = total_value - day_change
+        return HouseholdSummary(
+            user_id=user_id,
+            currency=currency,
+            portfolio_count=total_portfolios or 0,
+            total_value=total_value,
+            total_cost=total_cost,
+            total_gain_loss=total_gain_loss,
+            total_gain_loss_percent=(total_gain_loss / total_cost * 100) if total_cost > 0 else Decimal("0.00"),
+            day_change=day_change,
+            day_change_percent=(day_change / previous_value * 100) if previous_value > 0 else Decimal("0.00"),
+            positions=positions,
+            allocation=allocation
+        )
+
+    def _household_amounts(self, row, price: Optional[Decimal], previous_close: Optional[Decimal]) -> List[float]:
+        """Market value, cost, unrealized gain and day change of a household row, at price when given"""
+        if price is None:
+            return [float(row.market_value), float(row.total_cost), float(row.unrealized_gain_loss), float(row.day_change)]
+        market_value = row.quantity * price
+        day_change = row.quantity * (price - previous_close) if previous_close else row.day_change
+        return [float(market_value), float(row.total_cost), float(market_value - row.total_cost), float(day_change)]
+
     async def calculate_portfolio_performance(
         self,
         portfolio_id: str,
-        user_id: str
+        user_id: str,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        currency: Optional[Currency] = None
     ) -> Optional[PerformanceData]:
-        """Calculate portfolio performance metrics"""
+        """Calculate portfolio performance metrics, in another currency when one is given"""
         portfolio = await self.get_portfolio(portfolio_id, user_id)
         
         if not portfolio:
             return None
 
+        fx = FxService(self.db)
+        rate = Decimal("1")
+        if currency and currency != portfolio.currency:
+            rate = await fx.get_rate(portfolio.currency, currency, datetime.utcnow().date())
+
         # Basic performance calculation
-        total_return = portfolio.total_value - portfolio.total_cost
+        total_return = (portfolio.total_value - portfolio.total_cost) * rate
         total_return_percent = (
-            (total_return / portfolio.total_cost * 100) 
+            (total_return / (portfolio.total_cost * rate) * 100) 
             if portfolio.total_cost > 0 
             else Decimal("0.00")
         )
 
+        # Time-period specific returns from the daily valuation series
+        performance_service = PerformanceService(self.db)
+        series = await performance_service.get_valuation_series(portfolio)
+        if currency and currency != portfolio.currency and len(series):
+            # Each day is valued at that day's rate, so currency moves show up in the returns
+            series = series.scaled(await fx.rate_series(portfolio.currency, currency, series.dates))
+        periods = performance_service.calculate_periods(series, start_date, end_date)
+
         # TODO: Implement more sophisticated performance calculations
         # - Annualized return
         # - Volatility
         # - Sharpe ratio
         # - Maximum drawdown
-        # - Time-period specific returns
 
         return PerformanceData(
             total_return=total_return,
@@ -419,11 +724,12 @@ class PortfolioService:
             annualized_return=Decimal("0.00"),  # Placeholder
             volatility=Decimal("0.00"),  # Placeholder
             sharpe_ratio=Decimal("0.00"),  # Placeholder
-            max_drawdown=Decimal("0.00")  # Placeholder
+            max_drawdown=Decimal("0.00"),  # Placeholder
+            **periods
         )
 
-    async def _update_portfolio_totals(self, portfolio_id: str):
-        """Update portfolio total values based on assets"""
+    async def _update_portfolio_totals(self, portfolio_id: str, history_from: Optional[date] = None):
+        """Update portfolio total values based on assets; history_from is the first day a trade changed"""
         # Get portfolio with assets
         query = select(Portfolio).where(Portfolio.id == portfolio_id).options(
             selectinload(Portfolio.assets)
@@ -437,24 +743,17 @@ class PortfolioService:
         # Calculate totals
         total_value = sum(asset.market_value for asset in portfolio.assets)
         total_cost = sum(asset.total_cost for asset in portfolio.assets)
-        total_unrealized_gain_loss = total_value - total_cost
-
-
 
         # Update portfolio
         portfolio.total_value = total_value
         portfolio.total_cost = total_cost
-        
-        # Update portfolio day change (for now, equals unrealized gain/loss)
-        portfolio.day_change = total_unrealized_gain_loss
-        
-        # Calculate portfolio day change percentage
-        if total_cost > 0:
-            portfolio.day_change_percent = (total_unrealized_gain_loss / total_cost) * 100
-        else:
-            portfolio.day_change_percent = Decimal("0.00")
 
-        # Calculate weights and gains/losses for assets
+        # Day change is measured against each symbol's previous close
+        previous_closes = await QuoteService(self.db).get_previous_closes(
+            {asset.symbol for asset in portfolio.assets}
+        )
+
+        # Calculate weights, gains/losses and day change for assets
         for asset in portfolio.assets:
             if total_value > 0:
                 asset.weight = (asset.market_value / total_value) * 100
@@ -464,58 +763,34 @@ class PortfolioService:
             # Calculate unrealized gain/loss (market value - total cost)
             asset.unrealized_gain_loss = asset.market_value - asset.total_cost
             
-            # For now, day_change equals unrealized_gain_loss
-            # TODO: Implement proper day change calculation based on previous day's price
-            asset.day_change = asset.unrealized_gain_loss
-            
-            # Calculate day change percentage
-            if asset.total_cost > 0:
-                asset.day_change_percent = (asset.unrealized_gain_loss / asset.total_cost) * 100
+            previous_close = previous_closes.get(asset.symbol)
+            if previous_close:
+                asset.day_change = asset.quantity * (asset.current_price - previous_close)
+                asset.day_change_percent = (asset.current_price - previous_close) / previous_close * 100
             else:
+                asset.day_change = Decimal("0.00")
                 asset.day_change_percent = Decimal("0.00")
-            
 
-        
-        # Note: Commit is handled by the calling function
+        # Portfolio day change relative to yesterday's closing value
+        day_change = sum((asset.day_change for asset in portfolio.assets), Decimal("0.00"))
+        previous_value = total_value - day_change
+        portfolio.day_change = day_change
+        if previous_value > 0:
+            portfolio.day_change_percent = (day_change / previous_value) * 100
+        else:
+            portfolio.day_change_percent = Decimal("0.00")
 
-    def _determine_asset_type(self, symbol: str) -> AssetType:
-        """Determine asset type from symbol"""
-        symbol = symbol.upper()
-        
-        # Common crypto symbols
-        crypto_symbols = {
-            'BTC', 'ETH', 'ADA', 'DOT', 'SOL', 'AVAX', 'MATIC', 'LINK', 'UNI', 'ATOM',
-            'XRP', 'LTC', 'BCH', 'EOS', 'TRX', 'XLM', 'ALGO', 'VET', 'FIL', 'THETA',
-            'AAVE', 'MKR', 'COMP', 'YFI', 'SNX', 'CRV', 'BAL', 'SUSHI', '1INCH', 'ENJ',
-            'MANA', 'SAND', 'AXS', 'SHIB', 'DOGE', 'ICP', 'NEAR', 'FTT', 'LUNA', 'UST'
-        }
-        
-        # ETF patterns (usually end with specific suffixes)
-        if any(symbol.endswith(suffix) for suffix in ['ETF', 'SPDR', 'IVV', 'VOO', 'VTI', 'QQQ']):
-            return AssetType.ETF
-        
-        # Bond patterns
-        if any(pattern in symbol for pattern in ['BOND', 'TLT', 'IEF', 'SHY', 'AGG']):
-            return AssetType.BOND
-        
-        # Commodity patterns
-        if any(pattern in symbol for pattern in ['GLD', 'SLV', 'OIL', 'GAS', 'GOLD', 'SILVER']):
-            return AssetType.COMMODITY
-        
-        # Real estate patterns
-        if any(pattern in symbol for pattern in ['REIT', 'VNQ', 'SCHH', 'IYR']):
-            return AssetType.REAL_ESTATE
-        
-        # Cash equivalents
-        if any(pattern in symbol for pattern in ['CASH', 'USD', 'EUR', 'GBP', 'JPY']):
-            return AssetType.CASH
-        
-        # Check if it's a known crypto
-        if symbol in crypto_symbols:
-            return AssetType.CRYPTO
+        # Trades changed from history_from on, so the persisted valuation history is rebuilt from there
+        if history_from:
+            await PerformanceService(self.db).invalidate_series(portfolio_id, history_from)
+
+        # Value and weights changed, so this portfolio's alerts are checked again
+        alerts = get_alert_engine()
+        if alerts.loaded:
+            await alerts.evaluate_portfolio_ids(self.db, [portfolio_id])
+            await alerts.flush(self.db)
         
-        # Default to stock for traditional stock symbols
-        return AssetType.STOCK
+        # Note: Commit is handled by the calling function
 
     async def get_recent_activities(self, user_id: str, limit: int = 10) -> List[dict]:
         """Get recent activities based on transactions and portfolio changes"""
@@ -0,0 +1,229 @@
+"""
+Price Service
+Set-based ingestion of quote batches into every position holding the symbols
+"""
+
+import asyncio
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import select, update, insert, func, values, column, literal, union, union_all, String, Numeric
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.core.config import settings
+from app.db.models import Asset, Portfolio, MarketData, WatchlistItem
+from app.services.market_data_provider import MarketDataProvider, Quote
+from app.services.quote_service import QuoteService
+from app.services.quote_cache import get_quote_cache
+from app.services.holdings_index import get_holdings_index
+from app.services.alert_engine import get_alert_engine
+from app.services.event_hub import stage_quote_events
+
+
+# Rows per statement: PostgreSQL binds at most 32767 parameters, SQLite caps compound SELECTs at 500 terms
+POSTGRES_CHUNK_ROWS = 10000
+SQLITE_CHUNK_ROWS = 500
+
+
+class PriceService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    def _quotes_clause(self, rows: List[Tuple[str, Decimal]], dialect: str):
+        """Quotes as a FROM clause with symbol and price columns"""
+        if dialect == "postgresql":
+            return values(
+                column("symbol", String(20)), column("price", Numeric(15, 4)), name="quotes"
+            ).data(rows)
+        # SQLite cannot name the columns of a VALUES alias, so build the same rows with UNION ALL
+        return union_all(*[
+            select(
+                literal(symbol, String(20)).label("symbol"),
+                literal(price, Numeric(15, 4)).label("price")
+            )
+            for symbol, price in rows
+        ]).subquery("quotes")
+
+    async def apply_quotes(self, quotes: Dict[str, Decimal]) -> int:
+        """Reprice every asset holding the quoted symbols, refresh their portfolios and fire price alerts.
+
+        With the holdings index loaded only the indexed holders are revalued
+        in memory and written by primary key; otherwise each step is one
+        set-based statement per chunk of quotes. Returns the number of asset
+        rows repriced.
+        """
+        prices = {symbol.upper(): Decimal(price) for symbol, price in quotes.items() if price and price > 0}
+        if not prices:
+            return 0
+
+        await QuoteService(self.db).record_prices(prices)
+        stage_quote_events(self.db, prices)
+
+        alerts = get_alert_engine()
+        index = get_holdings_index()
+        if index.loaded:
+            # Only the indexed holders and their portfolios are revalued and written, by primary key
+            affected = index.apply_prices(prices)
+            updated = sum(len(index.holders(symbol)) for symbol in prices)
+            await index.flush(self.db)
+            if alerts.loaded:
+                await alerts.evaluate_portfolios(self.db, {
+                    portfolio_id: [
+                        (h.symbol, h.asset_type, h.market_value) for h in index.by_portfolio[portfolio_id].values()
+                    ]
+                    for portfolio_id in affected if portfolio_id in alerts.by_portfolio
+                })
+        else:
+            updated = await self._reprice_holders(prices)
+            await self.refresh_portfolio_totals(list(prices))
+            if alerts.loaded:
+                await alerts.evaluate_holders(self.db, list(prices))
+        await QuoteService(self.db).refresh_day_changes(list(prices))
+
+        if alerts.loaded:
+            alerts.evaluate_prices(self.db, prices)
+            await alerts.flush(self.db)
+
+        # Note: Commit is handled by the calling function
+        return updated
+
+    async def _reprice_holders(self, prices: Dict[str, Decimal]) -> int:
+        """Set-based repricing of every asset holding the symbols, one statement per chunk"""
+        dialect = self.db.get_bind().dialect.name
+        chunk = POSTGRES_CHUNK_ROWS if dialect == "postgresql" else SQLITE_CHUNK_ROWS
+        rows = list(prices.items())
+        now = datetime.utcnow()
+
+        updated = 0
+        for start in range(0, len(rows), chunk):
+            quotes_clause = self._quotes_clause(rows[start:start + chunk], dialect)
+            result = await self.db.execute(
+                update(Asset)
+                .where(Asset.symbol == quotes_clause.c.symbol)
+                .values(
+                    current_price=quotes_clause.c.price,
+                    market_value=Asset.quantity * quotes_clause.c.price,
+                    unrealized_gain_loss=Asset.quantity * quotes_clause.c.price - Asset.total_cost,
+                    last_price_update=now
+                )
+                .execution_options(synchronize_session=False)
+            )
+            updated += result.rowcount
+        return updated
+
+    async def refresh_portfolio_totals(self, symbols: List[str]):
+        """Recompute totals and asset weights of every portfolio holding the symbols"""
+        holder = aliased(Asset)
+        affected = select(holder.portfolio_id).where(holder.symbol.in_(symbols))
+
+        totals = (
+            select(
+                Asset.portfolio_id,
+                func.sum(Asset.market_value).label("total_value"),
+                func.sum(Asset.total_cost).label("total_cost")
+            )
+            .where(Asset.portfolio_id.in_(affected))
+            .group_by(Asset.portfolio_id)
+            .subquery("totals")
+        )
+        await self.db.execute(
+            update(Portfolio)
+            .where(Portfolio.id == totals.c.portfolio_id)
+            .values(total_value=totals.c.total_value, total_cost=totals.c.total_cost)
+            .execution_options(synchronize_session=False)
+        )
+
+        await self.db.execute(
+            update(Asset)
+            .where(
+                Asset.portfolio_id == Portfolio.id,
+                Portfolio.id.in_(affected),
+                Portfolio.total_value > 0
+            )
+            .values(weight=Asset.market_value / Portfolio.total_value * 100)
+            .execution_options(synchronize_session=False)
+        )
+
+    async def record_ticks(self, quotes: Iterable[Quote]) -> int:
+        """Append ticks to market_data with one multi-row insert, change measured from previous close"""
+        quotes = list(quotes)
+        if not quotes:
+            return 0
+
+        previous_closes = await QuoteService(self.db).get_previous_closes({q.symbol for q in quotes})
+        rows = []
+        for quote in quotes:
+            previous = previous_closes.get(quote.symbol)
+            change = quote.price - previous if previous else Decimal("0.0000")
+            rows.append({
+                "symbol": quote.symbol,
+                "price": quote.price,
+                "change": change,
+                "change_percent": (change / previous * 100) if previous else Decimal("0.0000"),
+                "volume": quote.volume,
+                "timestamp": quote.timestamp,
+            })
+        await self.db.execute(insert(MarketData), rows)
+        # Note: Commit is handled by the calling function
+        return len(rows)
+
+
+async def feed_symbols(db: AsyncSession) -> Set[str]:
+    """Symbols held in any portfolio or on any watchlist"""
+    referenced = union(
+        select(Asset.symbol).where(Asset.quantity > 0),
+        select(WatchlistItem.symbol)
+    )
+    return {symbol.upper() for symbol in (await db.execute(referenced)).scalars().all()}
+
+
+async def _reload_feed_symbols(session_factory, symbols: Set[str]):
+    """Add newly held or watched symbols to a running feed every MARKET_DATA_SYMBOL_RELOAD_SECONDS"""
+    while True:
+        await asyncio.sleep(settings.MARKET_DATA_SYMBOL_RELOAD_SECONDS)
+        try:
+            async with session_factory() as session:
+                symbols.update(await feed_symbols(session))
+        except Exception as e:
+            print(f"Warning: Price feed symbol reload failed: {e}")
+
+
+async def run_price_feed(provider: MarketDataProvider, session_factory, symbols: Optional[List[str]] = None) -> int:
+    """Feed provider quote batches through tick storage and bulk repricing.
+
+    Without explicit symbols, every held or watched symbol is streamed and
+    symbols referenced later are picked up as the feed runs. Each batch is
+    committed on its own session; a failed batch is skipped and a failed
+    stream is reopened. Returns the number of batches processed.
+    """
+    wanted: Set[str] = {symbol.upper() for symbol in symbols or ()}
+    reloader = None
+    if symbols is None:
+        async with session_factory() as session:
+            wanted.update(await feed_symbols(session))
+        reloader = asyncio.create_task(_reload_feed_symbols(session_factory, wanted))
+
+    batches = 0
+    try:
+        while True:
+            try:
+                async for batch in provider.stream_quotes(wanted, settings.MARKET_DATA_POLL_SECONDS):
+                    get_quote_cache().prime(batch)
+                    try:
+                        async with session_factory() as session:
+                            service = PriceService(session)
+                            await service.record_ticks(batch)
+                            await service.apply_quotes({quote.symbol: quote.price for quote in batch})
+                            await session.commit()
+                        batches += 1
+                    except Exception as e:
+                        print(f"Warning: Price feed batch failed: {e}")
+                return batches
+            except Exception as e:
+                print(f"Warning: Price feed stream failed: {e}")
+                await asyncio.sleep(settings.MARKET_DATA_POLL_SECONDS)
+    finally:
+        if reloader is not None:
+            reloader.cancel()
@@ -0,0 +1,170 @@
+"""
+Price Store
+Local columnar price history: one pair of memory-mapped arrays per symbol
+"""
+
+import os
+from datetime import date, datetime, time
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select, union
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.models import MarketData, PriceBar
+
+
+TIMESTAMP_DTYPE = np.dtype("<i8")   # epoch seconds
+PRICE_DTYPE = np.dtype("<f8")
+
+
+class PriceStore:
+    """Append-only per-symbol column files under root.
+
+    `{SYMBOL}.ts` holds int64 epoch seconds and `{SYMBOL}.px` float64
+    prices, both raw little-endian so reads are plain memory maps and an
+    append is a file write. Appends out of timestamp order mark the symbol
+    for compaction, which rewrites both files sorted with duplicates
+    resolved to the last write.
+    """
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _paths(self, symbol: str) -> Tuple[Path, Path]:
+        symbol = symbol.upper()
+        return self.root / f"{symbol}.ts", self.root / f"{symbol}.px"
+
+    def symbols(self) -> List[str]:
+        return sorted(p.stem for p in self.root.glob("*.ts"))
+
+    def load(self, symbol: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Zero-copy read-only views of (epoch seconds, prices)"""
+        ts_path, px_path = self._paths(symbol)
+        if not ts_path.exists() or ts_path.stat().st_size == 0:
+            return np.empty(0, TIMESTAMP_DTYPE), np.empty(0, PRICE_DTYPE)
+        return (
+            np.memmap(ts_path, dtype=TIMESTAMP_DTYPE, mode="r"),
+            np.memmap(px_path, dtype=PRICE_DTYPE, mode="r"),
+        )
+
+    def append(self, symbol: str, timestamps: np.ndarray, prices: np.ndarray):
+        """Append observations, compacting when they do not extend the series in order"""
+        timestamps = np.asarray(timestamps, dtype=TIMESTAMP_DTYPE)
+        prices = np.asarray(prices, dtype=PRICE_DTYPE)
+        if not len(timestamps):
+            return
+
+        existing, _ = self.load(symbol)
+        in_order = bool(np.all(np.diff(timestamps) > 0)) and (
+            not len(existing) or timestamps[0] > existing[-1]
+        )
+        del existing
+
+        ts_path, px_path = self._paths(symbol)
+        with open(ts_path, "ab") as ts_file, open(px_path, "ab") as px_file:
+            ts_file.write(timestamps.tobytes())
+            px_file.write(prices.tobytes())
+        if not in_order:
+            self.compact(symbol)
+
+    def compact(self, symbol: str):
+        """Rewrite a symbol's files sorted by time, keeping the last value written per timestamp"""
+        timestamps, prices = self.load(symbol)
+        if not len(timestamps):
+            return
+        order = np.argsort(timestamps, kind="stable")
+        sorted_ts = timestamps[order]
+        sorted_px = prices[order]
+        # Stable sort keeps write order within a timestamp, so the last duplicate wins
+        keep = np.append(sorted_ts[1:] != sorted_ts[:-1], True)
+        self._write(symbol, sorted_ts[keep], sorted_px[keep])
+
+    def _write(self, symbol: str, timestamps: np.ndarray, prices: np.ndarray):
+        """Replace both files atomically"""
+        ts_path, px_path = self._paths(symbol)
+        for path, values in ((ts_path, timestamps.astype(TIMESTAMP_DTYPE)), (px_path, prices.astype(PRICE_DTYPE))):
+            tmp = path.with_suffix(path.suffix + ".tmp")
+            values.tofile(tmp)
+            os.replace(tmp, path)
+
+    def load_matrix(
+        self,
+        symbols: List[str],
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Prices aligned on the union of timestamps as (epoch seconds, dates x symbols matrix).
+
+        Each symbol's range is located by binary search on its memory map
+        and scattered into one preallocated matrix; NaN marks a missing
+        observation.
+        """
+        lo = _epoch(start) if start else np.iinfo(np.int64).min
+        hi = _epoch(end) if end else np.iinfo(np.int64).max
+
+        slices = []
+        for symbol in symbols:
+            timestamps, prices = self.load(symbol)
+            a, b = np.searchsorted(timestamps, [lo, hi], side="left")
+            slices.append((timestamps[a:b], prices[a:b]))
+
+        non_empty = [ts for ts, _ in slices if len(ts)]
+        if not non_empty:
+            return np.empty(0, TIMESTAMP_DTYPE), np.empty((0, len(symbols)))
+
+        grid = non_empty[0] if all(
+            len(ts) == len(non_empty[0]) and np.array_equal(ts, non_empty[0]) for ts in non_empty
+        ) else np.unique(np.concatenate(non_empty))
+        matrix = np.full((len(grid), len(symbols)), np.nan)
+        for col, (timestamps, prices) in enumerate(slices):
+            if len(timestamps):
+                matrix[np.searchsorted(grid, timestamps), col] = prices
+        return np.asarray(grid), matrix
+
+    async def rebuild(
+        self, db: AsyncSession, symbols: Optional[Iterable[str]] = None, missing_only: bool = False
+    ) -> int:
+        """Rewrite the store from daily bars in the database; returns the number of symbols written.
+
+        With missing_only, symbols that already have files are left as they are.
+        """
+        # Imported here because compaction, which history builds on, appends to the store
+        from app.services.history_service import HistoryService
+
+        if symbols is None:
+            query = union(select(PriceBar.symbol), select(MarketData.symbol))
+            symbols = (await db.execute(query)).scalars().all()
+        if missing_only:
+            stored = set(self.symbols())
+            symbols = [s for s in symbols if s not in stored]
+        if not symbols:
+            return 0
+        closes = await HistoryService(db).get_daily_closes(
+            list(symbols), date(1970, 1, 1), datetime.utcnow().date()
+        )
+        for symbol, (dates, prices) in closes.items():
+            self._write(symbol, dates.astype("datetime64[s]").astype(np.int64), prices)
+        return len(closes)
+
+
+def _epoch(moment) -> int:
+    if isinstance(moment, date) and not isinstance(moment, datetime):
+        moment = datetime.combine(moment, time.min)
+    return int(np.datetime64(moment.replace(tzinfo=None), "s").astype(np.int64))
+
+
+_price_store: Optional[PriceStore] = None
+
+
+def get_price_store() -> Optional[PriceStore]:
+    """The configured store, or None when PRICE_STORE_PATH is empty"""
+    global _price_store
+    if not settings.PRICE_STORE_PATH:
+        return None
+    if _price_store is None or _price_store.root != Path(settings.PRICE_STORE_PATH):
+        _price_store = PriceStore(settings.PRICE_STORE_PATH)
+    return _price_store
@@ -0,0 +1,104 @@
+"""
+Price Windows
+Fixed-size ring buffers of recent ticks with O(1) rolling-window min and max
+"""
+
+from collections import deque
+from typing import Dict
+
+import numpy as np
+
+
+class PriceRing:
+    """The last `capacity` ticks of one symbol in preallocated arrays.
+
+    Ticks are addressed by a running sequence number; slot = seq % capacity,
+    so appending overwrites the oldest tick in place. Each registered window
+    keeps monotonic deques of sequence numbers, updated on append.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.times = np.zeros(capacity)
+        self.prices = np.zeros(capacity)
+        self.count = 0
+        self.windows: Dict[int, "RollingWindow"] = {}
+
+    def __len__(self) -> int:
+        return min(self.count, self.capacity)
+
+    @property
+    def oldest(self) -> int:
+        """Sequence number of the oldest tick still held"""
+        return max(0, self.count - self.capacity)
+
+    def time(self, seq: int) -> float:
+        return self.times[seq % self.capacity]
+
+    def price(self, seq: int) -> float:
+        return self.prices[seq % self.capacity]
+
+    @property
+    def last(self) -> float:
+        return self.price(self.count - 1)
+
+    def append(self, timestamp: float, price: float):
+        seq = self.count
+        self.times[seq % self.capacity] = timestamp
+        self.prices[seq % self.capacity] = price
+        self.count += 1
+        for window in self.windows.values():
+            window.push(self, seq)
+
+    def window(self, seconds: int) -> "RollingWindow":
+        """The rolling window of the given length, seeded from the held ticks when first asked for"""
+        window = self.windows.get(seconds)
+        if window is None:
+            window = self.windows[seconds] = RollingWindow(seconds)
+            for seq in range(self.oldest, self.count):
+                window.push(self, seq)
+        return window
+
+
+class RollingWindow:
+    """Min and max of a ring's prices over the trailing `seconds` before its latest tick.
+
+    Ascending (lows) and descending (highs) deques of sequence numbers make
+    push amortized O(1) and min/max O(1). A window longer than the ring
+    holds covers only the ticks still in the ring.
+    """
+
+    def __init__(self, seconds: int):
+        self.seconds = seconds
+        self.lows: deque = deque()
+        self.highs: deque = deque()
+
+    def push(self, ring: PriceRing, seq: int):
+        price = ring.price(seq)
+        while self.lows and ring.price(self.lows[-1]) >= price:
+            self.lows.pop()
+        self.lows.append(seq)
+        while self.highs and ring.price(self.highs[-1]) <= price:
+            self.highs.pop()
+        self.highs.append(seq)
+
+        cutoff = ring.time(seq) - self.seconds
+        oldest = ring.oldest
+        for ends in (self.lows, self.highs):
+            while ends[0] < oldest or ring.time(ends[0]) < cutoff:
+                ends.popleft()
+
+    def low(self, ring: PriceRing) -> float:
+        return ring.price(self.lows[0])
+
+    def high(self, ring: PriceRing) -> float:
+        return ring.price(self.highs[0])
+
+    def move_percent(self, ring: PriceRing) -> float:
+        """Largest move into the latest price from the window's low or high, in percent"""
+        if not ring.count:
+            return 0.0
+        last, low, high = ring.last, self.low(ring), self.high(ring)
+        rise = (last - low) / low * 100 if low > 0 else 0.0
+        fall = (high - last) / high * 100 if high > 0 else 0.0
+        return max(rise, fall)
@@ -0,0 +1,168 @@
+"""
+Quote Cache
+Process-wide latest-quote cache with TTL, stale-while-revalidate and single-flight fetches
+"""
+
+import asyncio
+import time
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.db.models import SymbolQuote
+from app.services.market_data_provider import MarketDataProvider, Quote, StaticMarketDataProvider
+from app.services.message_bus import MessageBus
+
+
+class DatabaseQuoteProvider(MarketDataProvider):
+    """Local source reading the symbol_quotes table kept current by the price feed"""
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+
+    async def get_quotes(self, symbols: Iterable[str]) -> Dict[str, Quote]:
+        async with self.session_factory() as session:
+            query = select(SymbolQuote).where(SymbolQuote.symbol.in_([s.upper() for s in symbols]))
+            rows = (await session.execute(query)).scalars().all()
+        return {
+            row.symbol: Quote(symbol=row.symbol, price=row.price, timestamp=row.updated_at)
+            for row in rows
+        }
+
+    async def get_history(self, symbol, start, end):
+        return []
+
+
+class QuoteCache:
+    """Per-symbol quotes fresh for ttl seconds and servable for stale seconds more.
+
+    Stale hits are answered immediately while a background refresh runs.
+    Misses for many symbols go upstream as one batched get_quotes call, and
+    a symbol already being fetched is awaited rather than fetched again, so
+    concurrent requests collapse into a single upstream call per symbol.
+    """
+
+    def __init__(self, source: MarketDataProvider, ttl: float = 15.0, stale: float = 60.0):
+        self.source = source
+        self.ttl = ttl
+        self.stale = stale
+        self.entries: Dict[str, Tuple[Quote, float]] = {}
+        self.inflight: Dict[str, asyncio.Future] = {}
+        self.misses: Dict[str, float] = {}
+        # Last read per symbol, for refresh scheduling
+        self.accessed: Dict[str, float] = {}
+
+    def prime(self, quotes: Iterable[Quote]):
+        """Write-through from a feed that already has fresh quotes"""
+        now = time.monotonic()
+        for quote in quotes:
+            self.entries[quote.symbol] = (quote, now)
+            self.misses.pop(quote.symbol, None)
+
+    def invalidate(self, symbols: Optional[Iterable[str]] = None):
+        if symbols is None:
+            self.entries.clear()
+            self.misses.clear()
+            self.accessed.clear()
+        else:
+            for symbol in symbols:
+                self.entries.pop(symbol.upper(), None)
+                self.misses.pop(symbol.upper(), None)
+
+    async def get(self, symbol: str) -> Optional[Quote]:
+        return (await self.get_many([symbol])).get(symbol.upper())
+
+    async def get_many(self, symbols: Iterable[str]) -> Dict[str, Quote]:
+        """Quotes for the symbols that have one, fetching only what is missing or expired"""
+        now = time.monotonic()
+        result: Dict[str, Quote] = {}
+        missing, stale = [], []
+        for symbol in {s.upper() for s in symbols}:
+            self.accessed[symbol] = now
+            entry = self.entries.get(symbol)
+            age = now - entry[1] if entry else None
+            if entry and age < self.ttl:
+                result[symbol] = entry[0]
+            elif not entry and now - self.misses.get(symbol, -self.ttl) < self.ttl:
+                # Recently unknown upstream, don't ask again until the TTL passes
+                continue
+            elif entry and age < self.ttl + self.stale:
+                result[symbol] = entry[0]
+                stale.append(symbol)
+            else:
+                missing.append(symbol)
+
+        if stale:
+            stale = [s for s in stale if s not in self.inflight]
+            if stale:
+                self._start_fetch(stale)
+
+        if missing:
+            waiting = {s: self.inflight[s] for s in missing if s in self.inflight}
+            to_fetch = [s for s in missing if s not in waiting]
+            if to_fetch:
+                waiting.update(self._start_fetch(to_fetch))
+            for symbol, future in waiting.items():
+                quote = await asyncio.shield(future)
+                if quote is not None:
+                    result[symbol] = quote
+        return result
+
+    def _start_fetch(self, symbols) -> Dict[str, asyncio.Future]:
+        """Register one future per symbol and fetch them all with a single upstream call"""
+        loop = asyncio.get_running_loop()
+        futures = {symbol: loop.create_future() for symbol in symbols}
+        self.inflight.update(futures)
+        loop.create_task(self._fetch(futures))
+        return futures
+
+    async def _fetch(self, futures: Dict[str, asyncio.Future]):
+        try:
+            quotes = await self.source.get_quotes(list(futures))
+        except Exception as e:
+            print(f"Warning: Quote fetch failed: {e}")
+            quotes = {}
+        self.prime(quotes.values())
+        now = time.monotonic()
+        for symbol, future in futures.items():
+            self.inflight.pop(symbol, None)
+            if symbol not in self.entries:
+                self.misses[symbol] = now
+            if not future.done():
+                # A failed refresh keeps serving the last known quote
+                entry = self.entries.get(symbol)
+                future.set_result(quotes.get(symbol) or (entry[0] if entry else None))
+
+
+_quote_cache: Optional[QuoteCache] = None
+
+
+def configure_quote_cache(source: MarketDataProvider) -> QuoteCache:
+    """Install the process-wide cache over a quote source (called on startup)"""
+    global _quote_cache
+    _quote_cache = QuoteCache(
+        source, ttl=settings.QUOTE_CACHE_TTL_SECONDS, stale=settings.QUOTE_CACHE_STALE_SECONDS
+    )
+    return _quote_cache
+
+
+def get_quote_cache() -> QuoteCache:
+    """The process-wide cache; an empty stand-in source until one is configured"""
+    if _quote_cache is None:
+        return configure_quote_cache(StaticMarketDataProvider())
+    return _quote_cache
+
+
+def register_bus_handlers(bus: MessageBus):
+    """Keep this worker's cache current with ticks applied by other workers"""
+    def prime(topic: str, data: dict):
+        get_quote_cache().prime([Quote(
+            symbol=data["symbol"],
+            price=Decimal(str(data["price"])),
+            timestamp=datetime.fromisoformat(data["timestamp"])
+        )])
+
+    bus.subscribe("quote.*", prime)
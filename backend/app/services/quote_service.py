@@ -0,0 +1,141 @@
+"""
+Quote Service
+Latest price and previous close per symbol, and the daily close rollover
+"""
+
+import asyncio
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import select, update, func, case, or_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.models import Asset, Portfolio, SymbolQuote
+from app.services.valuation_stream import mark_valuations_changed
+
+
+def last_close_date(now: Optional[datetime] = None) -> date:
+    """Date of the most recent daily close according to DAILY_CLOSE_HOUR_UTC"""
+    now = now or datetime.utcnow()
+    if now.hour >= settings.DAILY_CLOSE_HOUR_UTC:
+        return now.date()
+    return now.date() - timedelta(days=1)
+
+
+class QuoteService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    def _insert(self):
+        """Dialect-specific INSERT supporting ON CONFLICT"""
+        if self.db.get_bind().dialect.name == "sqlite":
+            return sqlite.insert(SymbolQuote)
+        return postgresql.insert(SymbolQuote)
+
+    async def get_previous_closes(self, symbols: Iterable[str]) -> Dict[str, Decimal]:
+        """Previous close for each symbol that has one"""
+        query = select(SymbolQuote.symbol, SymbolQuote.previous_close).where(
+            SymbolQuote.symbol.in_(list(symbols)),
+            SymbolQuote.previous_close.is_not(None)
+        )
+        return {row.symbol: row.previous_close for row in (await self.db.execute(query)).all()}
+
+    async def record_prices(self, prices: Dict[str, Decimal]):
+        """Upsert the latest price of many symbols in one statement"""
+        if not prices:
+            return
+        stmt = self._insert().values([
+            {"symbol": symbol, "price": price} for symbol, price in prices.items()
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[SymbolQuote.symbol],
+            set_={"price": stmt.excluded.price, "updated_at": func.now()}
+        )
+        await self.db.execute(stmt)
+        # Note: Commit is handled by the calling function
+
+    async def rollover_daily_close(self, close_date: date) -> int:
+        """Make the current price every symbol's previous close, as set-based statements.
+
+        Symbols held in portfolios but not yet quoted are seeded from the
+        assets' current prices. Quotes already rolled for close_date are left
+        alone, so running this more than once a day is harmless. Returns the
+        number of symbols rolled.
+        """
+        seed = self._insert().from_select(
+            ["symbol", "price"],
+            select(Asset.symbol, func.max(Asset.current_price))
+            .where(Asset.current_price > 0)
+            .group_by(Asset.symbol)
+        ).on_conflict_do_nothing(index_elements=[SymbolQuote.symbol])
+        await self.db.execute(seed)
+
+        result = await self.db.execute(
+            update(SymbolQuote)
+            .where(or_(SymbolQuote.close_date.is_(None), SymbolQuote.close_date < close_date))
+            .values(previous_close=SymbolQuote.price, close_date=close_date)
+            .execution_options(synchronize_session=False)
+        )
+
+        await self.refresh_day_changes()
+        # Note: Commit is handled by the calling function
+        return result.rowcount
+
+    async def refresh_day_changes(self, symbols: Optional[Iterable[str]] = None):
+        """Recompute asset and portfolio day change from previous closes in bulk"""
+        asset_update = (
+            update(Asset)
+            .where(Asset.symbol == SymbolQuote.symbol, SymbolQuote.previous_close > 0)
+            .values(
+                day_change=Asset.quantity * (Asset.current_price - SymbolQuote.previous_close),
+                day_change_percent=(Asset.current_price - SymbolQuote.previous_close)
+                / SymbolQuote.previous_close * 100
+            )
+            .execution_options(synchronize_session=False)
+        )
+        portfolio_update = update(Portfolio).execution_options(synchronize_session=False)
+        if symbols is not None:
+            symbols = list(symbols)
+            asset_update = asset_update.where(Asset.symbol.in_(symbols))
+            portfolio_update = portfolio_update.where(
+                Portfolio.id.in_(select(Asset.portfolio_id).where(Asset.symbol.in_(symbols)))
+            )
+        await self.db.execute(asset_update)
+
+        day_change = func.coalesce(
+            select(func.sum(Asset.day_change))
+            .where(Asset.portfolio_id == Portfolio.id)
+            .scalar_subquery(),
+            0
+        )
+        previous_value = Portfolio.total_value - day_change
+        await self.db.execute(portfolio_update.values(
+            day_change=day_change,
+            day_change_percent=case(
+                (previous_value > 0, day_change / previous_value * 100),
+                else_=0
+            )
+        ))
+
+        # Bulk statements bypass ORM events, so live valuation streams are told directly
+        mark_valuations_changed(self.db, symbols)
+
+
+async def run_daily_close_rollover(session_factory):
+    """Roll previous closes once at startup and then after every daily close"""
+    while True:
+        try:
+            async with session_factory() as session:
+                await QuoteService(session).rollover_daily_close(last_close_date())
+                await session.commit()
+        except Exception as e:
+            print(f"Warning: Daily close rollover failed: {e}")
+
+        now = datetime.utcnow()
+        next_run = now.replace(hour=settings.DAILY_CLOSE_HOUR_UTC, minute=0, second=0, microsecond=0)
+        if next_run <= now:
+            next_run += timedelta(days=1)
+        await asyncio.sleep((next_run - now).total_seconds())
@@ -0,0 +1,316 @@
+"""
+Rebalance Service
+Allocation targets and the trade lists needed to reach them
+"""
+
+from decimal import Decimal, ROUND_DOWN
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from fastapi import HTTPException, status
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Asset, AllocationTarget, AssetType
+from app.schemas.analytics import (
+    AllocationTargetItem, RebalanceMode, RebalanceRequest, RebalanceResponse, RebalanceTrade
+)
+from app.services.performance_service import _to_decimal
+from app.services.alert_engine import get_alert_engine
+from app.services.quote_cache import get_quote_cache
+
+
+class NewPosition(NamedTuple):
+    """A symbol target not held yet, bought at its quoted price"""
+    id: Optional[str]
+    portfolio_id: str
+    symbol: str
+    asset_type: AssetType
+    quantity: Decimal
+    current_price: Decimal
+    market_value: Decimal
+
+
+def solve_rebalance(
+    values: np.ndarray,
+    position_group: np.ndarray,
+    group_target: np.ndarray,
+    group_book: np.ndarray,
+    book_cash: np.ndarray,
+    mode: RebalanceMode,
+    tolerance: float,
+    min_trade_value: float = 0.0,
+    buyable: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """Trade value per position (positive buys, negative sells) for many books at once.
+
+    Positions map to groups (an asset type or a symbol of one book) and
+    groups map to books (portfolios); group_target is the target weight of
+    each group within its book as a fraction. Groups without value cannot
+    be filled and are ignored unless marked buyable (a quoted symbol with
+    a zero-value placeholder position). Every step is a vectorized reduction,
+    so thousands of positions across a household solve in one call.
+    """
+    n_groups = len(group_target)
+    n_books = len(book_cash)
+    group_value = np.bincount(position_group, weights=values, minlength=n_groups)
+    fillable = group_value > 0
+    if buyable is not None:
+        fillable |= buyable
+
+    total = np.bincount(group_book, weights=group_value, minlength=n_books) + book_cash
+    group_total = total[group_book]
+    target_value = group_target * group_total
+    weight = np.divide(group_value, group_total, out=np.zeros(n_groups), where=group_total > 0)
+    drift = weight - group_target
+    outside = np.abs(drift) > tolerance
+
+    if mode == RebalanceMode.CASH_ONLY:
+        # Invest new cash into underweight groups, never selling
+        shortfall = np.where(fillable, np.maximum(target_value - group_value, 0.0), 0.0)
+        book_shortfall = np.bincount(group_book, weights=shortfall, minlength=n_books)
+        scale = np.divide(book_cash, book_shortfall, out=np.ones(n_books), where=book_shortfall > 0)
+        delta = shortfall * np.minimum(scale, 1.0)[group_book]
+
+        # Any cash left once every group reaches target is spread by target weight
+        remainder = book_cash - np.bincount(group_book, weights=delta, minlength=n_books)
+        fillable_target = np.where(fillable, group_target, 0.0)
+        book_target = np.bincount(group_book, weights=fillable_target, minlength=n_books)
+        share = np.divide(fillable_target, book_target[group_book], out=np.zeros(n_groups),
+                          where=book_target[group_book] > 0)
+        delta += np.maximum(remainder, 0.0)[group_book] * share
+    elif mode == RebalanceMode.MIN_TRADE:
+        # Only breaching groups trade, and only back to the edge of their band
+        sells = np.where(outside & (drift > 0), group_value - (group_target + tolerance) * group_total, 0.0)
+        buys = np.where(
+            outside & (drift < 0) & fillable,
+            (group_target - tolerance) * group_total - group_value,
+            0.0
+        )
+        funds = np.bincount(group_book, weights=sells, minlength=n_books) + book_cash
+        needed = np.bincount(group_book, weights=buys, minlength=n_books)
+        scale = np.divide(funds, needed, out=np.ones(n_books), where=needed > funds)
+        delta = buys * np.minimum(scale, 1.0)[group_book] - sells
+    else:
+        # Any breach (or new cash to deploy) moves every group in that book back to target
+        breaches = np.bincount(group_book, weights=outside.astype(float), minlength=n_books)
+        triggered = (breaches > 0) | (book_cash > 0)
+        delta = np.where(triggered[group_book] & fillable, target_value - group_value, 0.0)
+
+    # Spread each group's trade across its positions pro rata to their value
+    # (evenly when the group is bought into from nothing)
+    owner_value = group_value[position_group]
+    owner_count = np.bincount(position_group, minlength=n_groups)[position_group]
+    trades = np.divide(values, owner_value, out=np.zeros(len(values)), where=owner_value > 0)
+    trades = np.where(owner_value > 0, trades, 1.0 / np.maximum(owner_count, 1))
+    trades *= delta[position_group]
+    trades[np.abs(trades) < max(min_trade_value, 0.005)] = 0.0
+    return trades
+
+
+class RebalanceService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_targets(self, portfolio_id: str) -> List[AllocationTarget]:
+        """Get a portfolio's allocation targets"""
+        query = select(AllocationTarget).where(AllocationTarget.portfolio_id == portfolio_id)
+        result = await self.db.execute(query)
+        return result.scalars().all()
+
+    async def set_targets(
+        self,
+        portfolio_id: str,
+        targets: List[AllocationTargetItem]
+    ) -> List[AllocationTarget]:
+        """Replace a portfolio's allocation targets"""
+        self._validate_targets(targets)
+
+        await self.db.execute(delete(AllocationTarget).where(AllocationTarget.portfolio_id == portfolio_id))
+        rows = [
+            AllocationTarget(
+                portfolio_id=portfolio_id,
+                asset_type=t.asset_type,
+                symbol=t.symbol.upper() if t.symbol else None,
+                target_percent=t.target_percent
+            )
+            for t in targets
+        ]
+        self.db.add_all(rows)
+        await self.db.commit()
+        get_alert_engine().forget_targets(portfolio_id)
+        return await self.get_targets(portfolio_id)
+
+    def _validate_targets(self, targets: List[AllocationTargetItem]):
+        """Targets are all by asset type or all by symbol, unique, and add up to 100%"""
+        if not targets:
+            return
+        if any((t.asset_type is None) == (t.symbol is None) for t in targets):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Each target must set exactly one of asset_type or symbol"
+            )
+        if len({t.symbol is None for t in targets}) > 1:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Targets must be all by asset_type or all by symbol"
+            )
+        keys = [t.symbol.upper() if t.symbol else t.asset_type for t in targets]
+        if len(keys) != len(set(keys)):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Duplicate allocation targets"
+            )
+        if abs(sum(t.target_percent for t in targets) - 100) > Decimal("0.01"):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Targets must add up to 100 percent"
+            )
+
+    async def rebalance(
+        self,
+        portfolio_ids: List[str],
+        request: RebalanceRequest
+    ) -> List[RebalanceResponse]:
+        """Solve the trade lists for one or many portfolios in a single vectorized pass.
+
+        New cash is split across the portfolios pro rata to their holdings
+        (evenly if none hold anything). Symbol targets not held yet are
+        bought at their cached quote; asset type targets without holdings
+        have no symbol to buy and are reported as unfilled.
+        """
+        asset_query = select(
+            Asset.id, Asset.portfolio_id, Asset.symbol, Asset.asset_type,
+            Asset.quantity, Asset.current_price, Asset.market_value
+        ).where(Asset.portfolio_id.in_(portfolio_ids), Asset.quantity > 0)
+        positions = (await self.db.execute(asset_query)).all()
+
+        target_query = select(AllocationTarget).where(AllocationTarget.portfolio_id.in_(portfolio_ids))
+        targets_by_portfolio: Dict[str, List[AllocationTarget]] = {}
+        for target in (await self.db.execute(target_query)).scalars().all():
+            targets_by_portfolio.setdefault(target.portfolio_id, []).append(target)
+
+        books = [pid for pid in portfolio_ids if pid in targets_by_portfolio]
+        book_index = {pid: i for i, pid in enumerate(books)}
+
+        # Groups are (portfolio, asset type) or (portfolio, symbol) depending on the portfolio's targets
+        group_index: Dict[Tuple[str, object], int] = {}
+        group_targets: List[float] = []
+        group_books: List[int] = []
+        group_labels: List[str] = []
+        for pid in books:
+            for target in targets_by_portfolio[pid]:
+                key = target.symbol or target.asset_type
+                group_index[(pid, key)] = len(group_targets)
+                group_targets.append(float(target.target_percent) / 100)
+                group_books.append(book_index[pid])
+                group_labels.append(target.symbol or target.asset_type.value)
+
+        included, position_groups = [], []
+        for position in positions:
+            if position.portfolio_id not in book_index:
+                continue
+            by_symbol = targets_by_portfolio[position.portfolio_id][0].symbol is not None
+            key = (position.portfolio_id, position.symbol if by_symbol else position.asset_type)
+            if key not in group_index:
+                # Holdings without a target have a target of zero
+                group_index[key] = len(group_targets)
+                group_targets.append(0.0)
+                group_books.append(book_index[position.portfolio_id])
+                group_labels.append(position.symbol if by_symbol else position.asset_type.value)
+            included.append(position)
+            position_groups.append(group_index[key])
+
+        # Symbol targets nobody holds yet get a zero-value position priced from the quote cache
+        held_groups = set(position_groups)
+        unheld = [
+            (pid, key) for (pid, key), g in group_index.items()
+            if g not in held_groups and not isinstance(key, AssetType) and group_targets[g] > 0
+        ]
+        buyable = np.zeros(len(group_targets), dtype=bool)
+        if unheld:
+            from app.services.portfolio_service import determine_asset_type
+
+            quotes = await get_quote_cache().get_many({key for _, key in unheld})
+            for pid, symbol in unheld:
+                quote = quotes.get(symbol)
+                if quote is None or quote.price <= 0:
+                    continue
+                included.append(NewPosition(
+                    id=None,
+                    portfolio_id=pid,
+                    symbol=symbol,
+                    asset_type=determine_asset_type(symbol),
+                    quantity=Decimal("0"),
+                    current_price=quote.price,
+                    market_value=Decimal("0")
+                ))
+                position_groups.append(group_index[(pid, symbol)])
+                buyable[group_index[(pid, symbol)]] = True
+
+        values = np.array([float(p.market_value) for p in included])
+        position_group = np.array(position_groups, dtype=np.int64)
+        group_target = np.array(group_targets)
+        group_book = np.array(group_books, dtype=np.int64)
+        held = np.bincount(group_book[position_group], weights=values, minlength=len(books))
+        if held.sum() > 0:
+            book_cash = float(request.cash_amount) * held / held.sum()
+        else:
+            book_cash = np.full(len(books), float(request.cash_amount) / max(len(books), 1))
+
+        trades = solve_rebalance(
+            values, position_group, group_target, group_book, book_cash,
+            request.mode, float(request.tolerance_percent) / 100, float(request.min_trade_value),
+            buyable
+        )
+
+        group_value = np.bincount(position_group, weights=values, minlength=len(group_target))
+        book_value = np.bincount(group_book, weights=group_value, minlength=len(books))
+        book_total = book_value + book_cash
+
+        responses = {
+            pid: RebalanceResponse(
+                portfolio_id=pid,
+                mode=request.mode,
+                total_value=_to_decimal(book_total[i]),
+                cash_remaining=Decimal("0.00"),
+                turnover=Decimal("0.00"),
+                unfilled_targets=[
+                    group_labels[g] for g in range(len(group_target))
+                    if group_book[g] == i and group_target[g] > 0 and group_value[g] == 0 and not buyable[g]
+                ]
+            )
+            for pid, i in book_index.items()
+        }
+
+        net_flow = np.zeros(len(books))
+        turnover = np.zeros(len(books))
+        for position, group, trade in zip(included, position_group, trades):
+            if trade == 0 or position.current_price <= 0:
+                continue
+            book = book_index[position.portfolio_id]
+            quantity = (Decimal(str(abs(trade))) / position.current_price).quantize(
+                Decimal("0.00000001"), rounding=ROUND_DOWN
+            )
+            if trade < 0:
+                quantity = min(quantity, position.quantity)
+            value = quantity * position.current_price
+            net_flow[book] += float(value) if trade > 0 else -float(value)
+            turnover[book] += float(value)
+            responses[position.portfolio_id].trades.append(RebalanceTrade(
+                asset_id=position.id,
+                symbol=position.symbol,
+                asset_type=position.asset_type,
+                action="buy" if trade > 0 else "sell",
+                quantity=quantity,
+                price=position.current_price,
+                value=_to_decimal(value),
+                current_weight=_to_decimal(group_value[group] / book_total[book] * 100 if book_total[book] else 0, 4),
+                target_weight=_to_decimal(group_target[group] * 100, 4)
+            ))
+
+        for pid, i in book_index.items():
+            responses[pid].cash_remaining = _to_decimal(book_cash[i] - net_flow[i])
+            responses[pid].turnover = _to_decimal(turnover[i])
+
+        return [responses[pid] for pid in books]
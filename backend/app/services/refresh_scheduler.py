@@ -0,0 +1,226 @@
+"""
+Quote Refresh Scheduler
+Spends the provider's request budget on the symbols people hold, watch and look at
+"""
+
+import asyncio
+import heapq
+import math
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import select, func
+
+from app.core.config import settings
+from app.db.models import Asset, AssetType, WatchlistItem
+from app.services.market_data_provider import MarketDataProvider, Quote
+from app.services.portfolio_service import determine_asset_type
+from app.services.quote_cache import QuoteCache, get_quote_cache
+
+
+EXCHANGE_TYPES = {AssetType.STOCK, AssetType.ETF, AssetType.BOND, AssetType.REAL_ESTATE}
+
+
+def is_market_open(asset_type: AssetType, now: Optional[datetime] = None) -> bool:
+    """Whether quotes for an asset type move at a UTC moment.
+
+    Crypto trades around the clock, commodity futures through the weekday
+    nights, exchange-listed assets between MARKET_OPEN_HOUR_UTC and
+    DAILY_CLOSE_HOUR_UTC on weekdays; cash never moves.
+    """
+    now = now or datetime.utcnow()
+    if asset_type == AssetType.CRYPTO:
+        return True
+    if asset_type == AssetType.CASH:
+        return False
+    hour = now.hour + now.minute / 60
+    if asset_type == AssetType.COMMODITY:
+        # Sunday evening through Friday's close
+        weekday = now.weekday()
+        if weekday == 5:
+            return False
+        if weekday == 6:
+            return hour >= settings.DAILY_CLOSE_HOUR_UTC + 2
+        if weekday == 4:
+            return hour < settings.DAILY_CLOSE_HOUR_UTC + 1
+        return True
+    return now.weekday() < 5 and settings.MARKET_OPEN_HOUR_UTC <= hour < settings.DAILY_CLOSE_HOUR_UTC
+
+
+@dataclass
+class SymbolDemand:
+    references: int
+    asset_type: AssetType
+
+
+def refresh_interval(references: int, access_age: Optional[float], market_open: bool) -> Optional[float]:
+    """Seconds until a symbol's next refresh, or None when nobody needs it.
+
+    More holders and watchers shorten the interval logarithmically, and a
+    recent read shortens it up to fourfold, fading out over the access window.
+    """
+    recent = access_age is not None and access_age < settings.QUOTE_REFRESH_ACCESS_WINDOW_SECONDS
+    if references <= 0 and not recent:
+        return None
+    if not market_open:
+        return settings.QUOTE_REFRESH_CLOSED_SECONDS
+
+    weight = 1 + math.log2(1 + references)
+    if recent:
+        weight *= 1 + 3 * (1 - access_age / settings.QUOTE_REFRESH_ACCESS_WINDOW_SECONDS)
+    return max(settings.QUOTE_REFRESH_MIN_SECONDS, settings.QUOTE_REFRESH_BASE_SECONDS / weight)
+
+
+class QuoteRefreshScheduler:
+    """Refreshes due symbols from a priority queue ordered by next due time.
+
+    Demand (Asset and WatchlistItem references per symbol) is reloaded
+    periodically; reads through the quote cache count as access. Due symbols
+    are fetched in batches with at most QUOTE_REFRESH_MAX_CONCURRENCY
+    provider calls in flight, then written through the price pipeline in one
+    session.
+    """
+
+    def __init__(
+        self,
+        provider: MarketDataProvider,
+        session_factory,
+        cache: Optional[QuoteCache] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.provider = provider
+        self.session_factory = session_factory
+        self.cache = cache
+        self.clock = clock
+        self.demand: Dict[str, SymbolDemand] = {}
+        self.due: Dict[str, float] = {}
+        self.queue: List[Tuple[float, str]] = []
+        self.semaphore = asyncio.Semaphore(settings.QUOTE_REFRESH_MAX_CONCURRENCY)
+
+    @property
+    def quote_cache(self) -> QuoteCache:
+        return self.cache or get_quote_cache()
+
+    async def load_demand(self):
+        """Count references per symbol across holdings and watchlists"""
+        async with self.session_factory() as session:
+            held = (await session.execute(
+                select(Asset.symbol, Asset.asset_type, func.count()).where(Asset.quantity > 0)
+                .group_by(Asset.symbol, Asset.asset_type)
+            )).all()
+            watched = (await session.execute(
+                select(WatchlistItem.symbol, func.count()).group_by(WatchlistItem.symbol)
+            )).all()
+
+        demand: Dict[str, SymbolDemand] = {}
+        for symbol, asset_type, count in held:
+            entry = demand.setdefault(symbol.upper(), SymbolDemand(0, asset_type))
+            entry.references += count
+        for symbol, count in watched:
+            symbol = symbol.upper()
+            entry = demand.setdefault(symbol, SymbolDemand(0, determine_asset_type(symbol)))
+            entry.references += count
+        self.demand = demand
+
+        for symbol in demand:
+            if symbol not in self.due:
+                self._schedule(symbol, self.clock())
+
+    def _schedule(self, symbol: str, at: float):
+        self.due[symbol] = at
+        heapq.heappush(self.queue, (at, symbol))
+
+    def reschedule(self, symbol: str, now: float, utc_now: Optional[datetime] = None):
+        """Queue a symbol's next refresh, or drop it when it has no demand left"""
+        demand = self.demand.get(symbol)
+        accessed = self.quote_cache.accessed.get(symbol)
+        asset_type = demand.asset_type if demand else AssetType.STOCK
+        interval = refresh_interval(
+            demand.references if demand else 0,
+            now - accessed if accessed is not None else None,
+            is_market_open(asset_type, utc_now)
+        )
+        if interval is None:
+            self.due.pop(symbol, None)
+        else:
+            self._schedule(symbol, now + interval)
+
+    def take_due(self, now: float) -> List[str]:
+        """Pop symbols due by now, most overdue first, up to one cycle's budget"""
+        # Symbols read recently through the cache join the queue even if nobody holds them
+        accessed = self.quote_cache.accessed
+        for symbol, at in list(accessed.items()):
+            if now - at >= settings.QUOTE_REFRESH_ACCESS_WINDOW_SECONDS:
+                del accessed[symbol]
+            elif symbol not in self.due:
+                self._schedule(symbol, now)
+
+        due = []
+        while self.queue and self.queue[0][0] <= now and len(due) < settings.QUOTE_REFRESH_CYCLE_BUDGET:
+            at, symbol = heapq.heappop(self.queue)
+            if self.due.get(symbol) == at:
+                due.append(symbol)
+        return due
+
+    async def _fetch(self, symbols: List[str]) -> Dict[str, Quote]:
+        async with self.semaphore:
+            try:
+                return await self.provider.get_quotes(symbols)
+            except Exception as e:
+                print(f"Warning: Quote refresh failed for {len(symbols)} symbols: {e}")
+                return {}
+
+    async def refresh(self, symbols: List[str]) -> Dict[str, Quote]:
+        """Fetch the symbols in concurrent batches and feed the results through the price pipeline"""
+        from app.services.price_service import PriceService
+
+        size = settings.QUOTE_REFRESH_BATCH_SIZE
+        results = await asyncio.gather(*[
+            self._fetch(symbols[i:i + size]) for i in range(0, len(symbols), size)
+        ])
+        quotes = {symbol: quote for batch in results for symbol, quote in batch.items()}
+        if quotes:
+            self.quote_cache.prime(quotes.values())
+            async with self.session_factory() as session:
+                service = PriceService(session)
+                await service.record_ticks(quotes.values())
+                await service.apply_quotes({quote.symbol: quote.price for quote in quotes.values()})
+                await session.commit()
+        return quotes
+
+    async def run_once(self, utc_now: Optional[datetime] = None) -> int:
+        """Refresh everything due and requeue it; returns the number of symbols refreshed"""
+        now = self.clock()
+        due = self.take_due(now)
+        try:
+            if due:
+                await self.refresh(due)
+        finally:
+            # Popped symbols are requeued even when the refresh fails, or they would never be due again
+            for symbol in due:
+                self.reschedule(symbol, now, utc_now)
+        return len(due)
+
+    def seconds_until_due(self) -> float:
+        while self.queue and self.due.get(self.queue[0][1]) != self.queue[0][0]:
+            heapq.heappop(self.queue)
+        if not self.queue:
+            return settings.QUOTE_REFRESH_MIN_SECONDS
+        return min(max(self.queue[0][0] - self.clock(), 0.0), settings.QUOTE_REFRESH_MIN_SECONDS)
+
+
+async def run_quote_refresh_scheduler(provider: MarketDataProvider, session_factory):
+    """Refresh quotes by demand, reloading reference counts every QUOTE_REFRESH_DEMAND_RELOAD_SECONDS"""
+    scheduler = QuoteRefreshScheduler(provider, session_factory)
+    loaded_at = None
+    while True:
+        try:
+            if loaded_at is None or time.monotonic() - loaded_at >= settings.QUOTE_REFRESH_DEMAND_RELOAD_SECONDS:
+                await scheduler.load_demand()
+                loaded_at = time.monotonic()
+            await scheduler.run_once()
+        except Exception as e:
+            print(f"Warning: Quote refresh cycle failed: {e}")
+        await asyncio.sleep(scheduler.seconds_until_due())
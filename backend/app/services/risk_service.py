@@ -0,0 +1,278 @@
+"""
+Risk Service
+Value-at-Risk and expected shortfall from stored price history
+"""
+
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.models import Asset
+from app.schemas.analytics import RiskMethod, RiskMetrics
+from app.services.benchmark_service import BenchmarkService
+from app.services.monte_carlo import simulate_pnl, simulate_chunk_shared
+from app.services.performance_service import forward_fill, _to_decimal
+from app.services.price_store import get_price_store
+
+
+HORIZONS = (1, 10)
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_workers = 0
+
+
+def get_process_pool(max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """Get the shared Monte Carlo process pool, creating it on first use or when resized"""
+    global _process_pool, _process_pool_workers
+    max_workers = max_workers or settings.RISK_MC_WORKERS
+    if _process_pool is not None and _process_pool_workers != max_workers:
+        # Chunks already submitted still finish on the old workers
+        _process_pool.shutdown(wait=False)
+        _process_pool = None
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+        _process_pool_workers = max_workers
+    return _process_pool
+
+
+def shutdown_process_pool():
+    """Stop the Monte Carlo workers (called on application shutdown)"""
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(cancel_futures=True)
+        _process_pool = None
+
+
+def value_at_risk(pnl: np.ndarray, confidence: float) -> Tuple[float, float]:
+    """VaR and CVaR (expected shortfall) of a P&L sample, both as positive losses"""
+    if not len(pnl):
+        return 0.0, 0.0
+    var = -float(np.quantile(pnl, 1 - confidence))
+    tail = pnl[pnl <= -var]
+    cvar = -float(tail.mean()) if len(tail) else var
+    return max(var, 0.0), max(cvar, 0.0)
+
+
+def covariance_factor(covariance: np.ndarray) -> np.ndarray:
+    """Matrix A with A @ A.T == covariance, tolerating singular estimates"""
+    try:
+        return np.linalg.cholesky(covariance)
+    except np.linalg.LinAlgError:
+        eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+        return eigenvectors * np.sqrt(np.clip(eigenvalues, 0.0, None))
+
+
+class RiskService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_price_matrix(
+        self,
+        symbols: List[str],
+        lookback_days: int
+    ) -> Tuple[List[str], np.ndarray]:
+        """Aligned daily closes (dates x symbols) over the period all symbols have history"""
+        end = datetime.utcnow().date()
+        start = end - timedelta(days=lookback_days)
+        closes: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        recent_start = start
+        store = get_price_store()
+        if store is not None:
+            timestamps, stored = store.load_matrix(symbols, start, end + timedelta(days=1))
+            stored_dates = timestamps.astype("datetime64[s]").astype("datetime64[D]")
+            for col, symbol in enumerate(symbols):
+                observed = ~np.isnan(stored[:, col])
+                if observed.any():
+                    closes[symbol] = (stored_dates[observed], stored[observed, col])
+            # The store lags the database by the uncompacted tail and by symbols it does not hold yet,
+            # so only the days after the stalest symbol's last stored close are read from the database
+            recent_start = min(
+                closes[s][0][-1].astype(date) + timedelta(days=1) if s in closes else start for s in symbols
+            )
+
+        if recent_start <= end:
+            recent = await BenchmarkService(self.db).get_daily_closes(symbols, recent_start, end)
+            for symbol, (recent_dates, recent_prices) in recent.items():
+                if symbol in closes:
+                    stored_dates, stored_prices = closes[symbol]
+                    keep = stored_dates < recent_dates[0]
+                    recent_dates = np.concatenate((stored_dates[keep], recent_dates))
+                    recent_prices = np.concatenate((stored_prices[keep], recent_prices))
+                closes[symbol] = (recent_dates, recent_prices)
+
+        dates = np.unique(np.concatenate([closes[s][0] for s in closes] or [np.array([], "datetime64[D]")]))
+        matrix = np.full((len(dates), len(symbols)), np.nan)
+        for col, symbol in enumerate(symbols):
+            if symbol in closes:
+                symbol_dates, prices = closes[symbol]
+                matrix[np.searchsorted(dates, symbol_dates), col] = prices
+
+        observed = ~np.isnan(matrix)
+        keep = observed.sum(axis=0) > 1
+        available = [s for s, k in zip(symbols, keep) if k]
+        if not available:
+            return [], np.empty((0, 0))
+        matrix, observed = matrix[:, keep], observed[:, keep]
+
+        # Start where every symbol has a price so forward fill never yields zeros
+        common_start = observed.argmax(axis=0).max()
+        return available, forward_fill(matrix[common_start:])
+
+    async def calculate_risk(
+        self,
+        portfolio_id: str,
+        method: RiskMethod = RiskMethod.HISTORICAL,
+        confidence: float = 0.95,
+        lookback_days: Optional[int] = None,
+        paths: int = 10000,
+        workers: Optional[int] = None,
+        seed: Optional[int] = None
+    ) -> RiskMetrics:
+        """Calculate 1-day and 10-day VaR/CVaR for a portfolio's current holdings"""
+        query = select(Asset.symbol, Asset.market_value).where(
+            Asset.portfolio_id == portfolio_id,
+            Asset.quantity > 0
+        )
+        holdings: Dict[str, float] = {}
+        for row in (await self.db.execute(query)).all():
+            holdings[row.symbol] = holdings.get(row.symbol, 0.0) + float(row.market_value)
+
+        return await self.calculate_for_holdings(
+            holdings, method, confidence, lookback_days, paths, workers, seed
+        )
+
+    async def calculate_for_holdings(
+        self,
+        holdings: Dict[str, float],
+        method: RiskMethod = RiskMethod.HISTORICAL,
+        confidence: float = 0.95,
+        lookback_days: Optional[int] = None,
+        paths: int = 10000,
+        workers: Optional[int] = None,
+        seed: Optional[int] = None
+    ) -> RiskMetrics:
+        """Calculate VaR/CVaR for arbitrary market value exposures by symbol"""
+        portfolio_value = sum(holdings.values())
+
+        symbols, prices = await self.get_price_matrix(
+            sorted(holdings), lookback_days or settings.RISK_LOOKBACK_DAYS
+        )
+        missing = sorted(set(holdings) - set(symbols))
+        exposures = np.array([holdings[s] for s in symbols])
+
+        if method == RiskMethod.MONTE_CARLO:
+            pnl, observations = await self._monte_carlo_pnl(prices, exposures, paths, workers, seed)
+        else:
+            pnl, observations = self._historical_pnl(prices, exposures)
+            paths = None
+
+        var_1d, cvar_1d = value_at_risk(pnl[1], confidence)
+        var_10d, cvar_10d = value_at_risk(pnl[10], confidence)
+        return RiskMetrics(
+            method=method,
+            confidence=Decimal(str(confidence)),
+            portfolio_value=_to_decimal(portfolio_value),
+            var_1d=_to_decimal(var_1d),
+            cvar_1d=_to_decimal(cvar_1d),
+            var_10d=_to_decimal(var_10d),
+            cvar_10d=_to_decimal(cvar_10d),
+            observations=observations,
+            paths=paths,
+            missing_symbols=missing
+        )
+
+    def _historical_pnl(self, prices: np.ndarray, exposures: np.ndarray) -> Tuple[Dict[int, np.ndarray], int]:
+        """Replay every historical daily and overlapping 10-day move on today's exposures"""
+        if prices.shape[0] < 2 or not len(exposures):
+            return {h: np.array([]) for h in HORIZONS}, 0
+
+        pnl = {}
+        for horizon in HORIZONS:
+            if prices.shape[0] > horizon:
+                pnl[horizon] = (prices[horizon:] / prices[:-horizon] - 1) @ exposures
+            else:
+                # Too little history for overlapping windows: scale the daily sample
+                pnl[horizon] = pnl[1] * np.sqrt(horizon)
+        return pnl, prices.shape[0] - 1
+
+    async def _monte_carlo_pnl(
+        self,
+        prices: np.ndarray,
+        exposures: np.ndarray,
+        paths: int,
+        workers: Optional[int],
+        seed: Optional[int]
+    ) -> Tuple[Dict[int, np.ndarray], int]:
+        """Simulate correlated log-normal returns from the estimated covariance matrix"""
+        if prices.shape[0] < 3 or not len(exposures):
+            return {h: np.array([]) for h in HORIZONS}, 0
+
+        log_returns = np.diff(np.log(prices), axis=0)
+        drift = log_returns.mean(axis=0)
+        factor = covariance_factor(np.atleast_2d(np.cov(log_returns, rowvar=False)))
+        workers = settings.RISK_MC_WORKERS if workers is None else workers
+
+        if workers <= 0:
+            simulated = await asyncio.to_thread(
+                simulate_pnl, factor, drift, exposures, HORIZONS, paths, seed
+            )
+        else:
+            simulated = await self._simulate_in_pool(factor, drift, exposures, paths, workers, seed)
+        return dict(zip(HORIZONS, simulated)), log_returns.shape[0]
+
+    async def _simulate_in_pool(
+        self,
+        factor: np.ndarray,
+        drift: np.ndarray,
+        exposures: np.ndarray,
+        paths: int,
+        workers: int,
+        seed: Optional[int]
+    ) -> np.ndarray:
+        """Fan path chunks out to the process pool over shared-memory matrices"""
+        n = len(exposures)
+        params = np.concatenate((factor.ravel(), drift, exposures))
+        inputs = shared_memory.SharedMemory(create=True, size=params.nbytes)
+        output = shared_memory.SharedMemory(create=True, size=len(HORIZONS) * paths * 8)
+        try:
+            np.ndarray(params.shape, dtype=np.float64, buffer=inputs.buf)[:] = params
+            layout = {
+                "inputs": inputs.name,
+                "output": output.name,
+                "assets": n,
+                "paths": paths,
+                "horizons": HORIZONS,
+            }
+
+            chunk = max(1, settings.RISK_MC_CHUNK_PATHS)
+            bounds = [(start, min(start + chunk, paths)) for start in range(0, paths, chunk)]
+            seeds = np.random.SeedSequence(seed).spawn(len(bounds))
+
+            loop = asyncio.get_running_loop()
+            pool = get_process_pool(workers)
+            await asyncio.gather(*[
+                loop.run_in_executor(pool, simulate_chunk_shared, layout, start, stop, chunk_seed)
+                for (start, stop), chunk_seed in zip(bounds, seeds)
+            ])
+
+            pnl = np.ndarray((len(HORIZONS), paths), dtype=np.float64, buffer=output.buf)
+            result = pnl.copy()
+            del pnl
+            return result
+        finally:
+            inputs.close()
+            inputs.unlink()
+            output.close()
+            output.unlink()
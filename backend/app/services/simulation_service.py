@@ -0,0 +1,201 @@
+"""
+Simulation Service
+What-if analysis of hypothetical trades without touching stored positions
+"""
+
+from decimal import Decimal
+from typing import Dict, List
+
+import numpy as np
+from fastapi import HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Asset, AssetType
+from app.schemas.analytics import SimulatedPosition, SimulatedTrade, SimulationRequest, SimulationResponse
+from app.schemas.portfolio import AssetAllocation
+from app.services.performance_service import _to_decimal
+from app.services.risk_service import RiskService
+
+
+class PositionBook:
+    """Positions of one portfolio as parallel arrays, one row per symbol.
+
+    The arrays are views over preallocated columns whose capacity doubles
+    when full, so symbols bought during a simulation are appended in
+    amortized constant time and applying a trade only touches its row.
+    """
+
+    # Rows of the backing matrix
+    QUANTITY, COST, PRICE, INITIAL_QUANTITY = range(4)
+
+    def __init__(self, symbols: List[str], asset_types: List[AssetType], quantities, costs, prices):
+        self.symbols = list(symbols)
+        self.asset_types = list(asset_types)
+        self.index: Dict[str, int] = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self._columns = np.zeros((4, max(len(self.symbols), 8)), dtype=np.float64)
+        self.quantities[:] = quantities
+        self.costs[:] = costs
+        self.prices[:] = prices
+        self.initial_quantities[:] = self.quantities
+        self.cash_flow = 0.0
+        self.realized_gain_loss = 0.0
+
+    @property
+    def quantities(self) -> np.ndarray:
+        return self._columns[self.QUANTITY, :len(self.symbols)]
+
+    @property
+    def costs(self) -> np.ndarray:
+        return self._columns[self.COST, :len(self.symbols)]
+
+    @property
+    def prices(self) -> np.ndarray:
+        return self._columns[self.PRICE, :len(self.symbols)]
+
+    @property
+    def initial_quantities(self) -> np.ndarray:
+        return self._columns[self.INITIAL_QUANTITY, :len(self.symbols)]
+
+    @classmethod
+    def from_rows(cls, rows) -> "PositionBook":
+        """Build from (symbol, asset_type, quantity, total_cost, current_price) rows, merging lots per symbol"""
+        merged: Dict[str, list] = {}
+        for row in rows:
+            entry = merged.setdefault(row.symbol, [row.asset_type, 0.0, 0.0, float(row.current_price or 0)])
+            entry[1] += float(row.quantity)
+            entry[2] += float(row.total_cost)
+        symbols = list(merged)
+        return cls(
+            symbols,
+            [merged[s][0] for s in symbols],
+            [merged[s][1] for s in symbols],
+            [merged[s][2] for s in symbols],
+            [merged[s][3] for s in symbols]
+        )
+
+    @property
+    def market_values(self) -> np.ndarray:
+        return self.quantities * self.prices
+
+    def _row(self, trade: SimulatedTrade) -> int:
+        symbol = trade.symbol.upper()
+        if symbol not in self.index:
+            if trade.action == "sell":
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Cannot sell {symbol}: position not held"
+                )
+            if trade.price is None:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Price is required to buy {symbol}"
+                )
+            row = len(self.symbols)
+            if row == self._columns.shape[1]:
+                grown = np.zeros((4, row * 2), dtype=np.float64)
+                grown[:, :row] = self._columns
+                self._columns = grown
+            self.index[symbol] = row
+            self.symbols.append(symbol)
+            self.asset_types.append(trade.asset_type)
+            self._columns[self.PRICE, row] = float(trade.price)
+        return self.index[symbol]
+
+    def apply(self, trade: SimulatedTrade):
+        """Apply one hypothetical trade at its price (or the current price) using average cost"""
+        row = self._row(trade)
+        quantity = float(trade.quantity)
+        price = float(trade.price) if trade.price is not None else self.prices[row]
+        if self.prices[row] <= 0:
+            self.prices[row] = price
+
+        if trade.action == "buy":
+            self.quantities[row] += quantity
+            self.costs[row] += quantity * price
+            self.cash_flow -= quantity * price
+            return
+
+        held = self.quantities[row]
+        if quantity > held + 1e-9:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Cannot sell {quantity:g} {trade.symbol.upper()}: only {held:g} held"
+            )
+        cost_sold = self.costs[row] * min(quantity / held, 1.0)
+        self.realized_gain_loss += quantity * price - cost_sold
+        self.cash_flow += quantity * price
+        self.quantities[row] = max(held - quantity, 0.0)
+        self.costs[row] -= cost_sold
+
+
+class SimulationService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def load_book(self, portfolio_id: str) -> PositionBook:
+        """Load a portfolio's positions with a single read-only query"""
+        query = select(
+            Asset.symbol, Asset.asset_type, Asset.quantity, Asset.total_cost, Asset.current_price
+        ).where(Asset.portfolio_id == portfolio_id, Asset.quantity > 0)
+        return PositionBook.from_rows((await self.db.execute(query)).all())
+
+    async def simulate(self, portfolio_id: str, request: SimulationRequest) -> SimulationResponse:
+        """Apply hypothetical trades in memory and report the resulting portfolio"""
+        book = await self.load_book(portfolio_id)
+        value_before = float(book.market_values.sum())
+
+        for trade in request.trades:
+            book.apply(trade)
+
+        values = book.market_values
+        total_value = float(values.sum())
+        total_cost = float(book.costs[book.quantities > 0].sum())
+        weights = values / total_value * 100 if total_value > 0 else np.zeros(len(values))
+        gain_loss = total_value - total_cost
+
+        positions = [
+            SimulatedPosition(
+                symbol=book.symbols[i],
+                asset_type=book.asset_types[i],
+                quantity=Decimal(str(round(book.quantities[i], 8))),
+                quantity_change=Decimal(str(round(book.quantities[i] - book.initial_quantities[i], 8))),
+                price=_to_decimal(book.prices[i], 4),
+                market_value=_to_decimal(values[i]),
+                total_cost=_to_decimal(book.costs[i]),
+                weight=_to_decimal(weights[i], 4)
+            )
+            for i in range(len(book.symbols))
+        ]
+
+        allocation_map: Dict[AssetType, float] = {}
+        for asset_type, value in zip(book.asset_types, values):
+            if value > 0:
+                allocation_map[asset_type] = allocation_map.get(asset_type, 0.0) + value
+        allocation = [
+            AssetAllocation(
+                asset_type=asset_type,
+                value=_to_decimal(value),
+                percentage=_to_decimal(value / total_value * 100, 4)
+            )
+            for asset_type, value in allocation_map.items()
+        ]
+
+        holdings = {symbol: float(value) for symbol, value in zip(book.symbols, values) if value > 0}
+        risk = await RiskService(self.db).calculate_for_holdings(
+            holdings, request.risk_method, float(request.confidence)
+        )
+
+        return SimulationResponse(
+            portfolio_id=portfolio_id,
+            total_value=_to_decimal(total_value),
+            total_cost=_to_decimal(total_cost),
+            total_gain_loss=_to_decimal(gain_loss),
+            total_gain_loss_percent=_to_decimal(gain_loss / total_cost * 100 if total_cost > 0 else 0, 4),
+            value_change=_to_decimal(total_value - value_before),
+            cash_flow=_to_decimal(book.cash_flow),
+            realized_gain_loss=_to_decimal(book.realized_gain_loss),
+            positions=positions,
+            allocation=allocation,
+            risk=risk
+        )
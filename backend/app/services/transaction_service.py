@@ -5,7 +5,7 @@ Business logic for transaction management
 
 from decimal import Decimal
 from typing import List, Optional
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 
 from fastapi import HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -14,6 +14,8 @@ from sqlalchemy.orm import selectinload
 
 from app.db.models import Transaction, Portfolio, Asset, User, TransactionType
 from app.schemas.portfolio import TransactionCreate, TransactionResponse
+from app.services.alert_engine import get_alert_engine
+from app.services.performance_service import PerformanceService, _as_date
 
 
 class TransactionService:
@@ -144,6 +146,7 @@ class TransactionService:
         old_quantity = transaction.quantity
         old_price = transaction.price
         old_type = transaction.transaction_type
+        old_date = _as_date(transaction.transaction_date)
 
         # Update transaction fields
         for field, value in transaction_data.items():
@@ -166,7 +169,9 @@ class TransactionService:
         asset = asset_result.scalar_one_or_none()
         
         if asset:
-            await self._recalculate_asset_totals(asset)
+            await self._recalculate_asset_totals(
+                asset, min(old_date, _as_date(transaction.transaction_date))
+            )
         
         return transaction
 
@@ -185,13 +190,14 @@ class TransactionService:
         asset_query = select(Asset).where(Asset.id == transaction.asset_id)
         asset_result = await self.db.execute(asset_query)
         asset = asset_result.scalar_one_or_none()
+        transaction_date = _as_date(transaction.transaction_date)
 
         await self.db.delete(transaction)
         await self.db.commit()
 
         # Recalculate asset totals
         if asset:
-            await self._recalculate_asset_totals(asset)
+            await self._recalculate_asset_totals(asset, transaction_date)
         
         return True
 
@@ -243,10 +249,10 @@ class TransactionService:
         """Update asset based on transaction"""
         # Instead of incremental updates, recalculate everything from transactions
         # This ensures accuracy and consistency
-        await self._recalculate_asset_totals(asset)
+        await self._recalculate_asset_totals(asset, _as_date(transaction.transaction_date))
 
-    async def _recalculate_asset_totals(self, asset: Asset):
-        """Recalculate asset totals from all transactions"""
+    async def _recalculate_asset_totals(self, asset: Asset, history_from: Optional[date] = None):
+        """Recalculate asset totals from all transactions; history_from is the first day a trade changed"""
         # Get all transactions for this asset
         query = select(Transaction).where(
             Transaction.asset_id == asset.id
@@ -283,11 +289,11 @@ class TransactionService:
         asset.market_value = total_quantity * asset.current_price
         
         # Update portfolio totals
-        await self._update_portfolio_totals(asset.portfolio_id)
+        await self._update_portfolio_totals(asset.portfolio_id, history_from)
         
         await self.db.commit()
 
-    async def _update_portfolio_totals(self, portfolio_id: str):
+    async def _update_portfolio_totals(self, portfolio_id: str, history_from: Optional[date] = None):
         """Update portfolio total values based on assets"""
         # Get portfolio with assets
         query = select(Portfolio).where(Portfolio.id == portfolio_id).options(
@@ -313,5 +319,15 @@ class TransactionService:
                 asset.weight = (asset.market_value / total_value) * 100
             else:
                 asset.weight = Decimal("0.00")
+
+        # Trades changed from history_from on, so the persisted valuation history is rebuilt from there
+        if history_from:
+            await PerformanceService(self.db).invalidate_series(portfolio_id, history_from)
+
+        # Value and weights changed, so this portfolio's alerts are checked again
+        alerts = get_alert_engine()
+        if alerts.loaded:
+            await alerts.evaluate_portfolio_ids(self.db, [portfolio_id])
+            await alerts.flush(self.db)
         
         # Note: Commit is handled by the calling function
\ No newline at end of file
@@ -0,0 +1,287 @@
+"""
+Valuation Stream
+Fan-out of portfolio valuation changes to live connections as conflated diffs
+"""
+
+import asyncio
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import Asset, Portfolio
+from app.services.message_bus import MessageBus, get_message_bus
+
+
+# {"totalValue": float, "dayChange": float, "dayChangePercent": float, "weights": {symbol: float}}
+Snapshot = Dict[str, Any]
+
+VALUE_FIELDS = ("totalValue", "dayChange", "dayChangePercent")
+
+
+def valuation_diff(previous: Optional[Snapshot], current: Snapshot) -> Dict[str, Any]:
+    """Fields of current that differ from previous; weights of dropped symbols become null"""
+    if previous is None:
+        return dict(current)
+    diff = {field: current[field] for field in VALUE_FIELDS if current[field] != previous.get(field)}
+    weights = {
+        symbol: weight for symbol, weight in current["weights"].items()
+        if previous["weights"].get(symbol) != weight
+    }
+    weights.update({symbol: None for symbol in previous["weights"] if symbol not in current["weights"]})
+    if weights:
+        diff["weights"] = weights
+    return diff
+
+
+def _number(value: Optional[Decimal]) -> float:
+    return float(value or 0)
+
+
+async def load_snapshots(db: AsyncSession, portfolio_ids: Iterable[str]) -> Dict[str, Snapshot]:
+    """Current valuation of each existing portfolio, in two queries"""
+    portfolio_ids = list(portfolio_ids)
+    if not portfolio_ids:
+        return {}
+    rows = (await db.execute(
+        select(Portfolio.id, Portfolio.total_value, Portfolio.day_change, Portfolio.day_change_percent)
+        .where(Portfolio.id.in_(portfolio_ids))
+    )).all()
+    snapshots = {
+        row.id: {
+            "totalValue": _number(row.total_value),
+            "dayChange": _number(row.day_change),
+            "dayChangePercent": _number(row.day_change_percent),
+            "weights": {}
+        }
+        for row in rows
+    }
+    holdings = (await db.execute(
+        select(Asset.portfolio_id, Asset.symbol, Asset.weight).where(Asset.portfolio_id.in_(list(snapshots)))
+    )).all()
+    for holding in holdings:
+        snapshots[holding.portfolio_id]["weights"][holding.symbol] = _number(holding.weight)
+    return snapshots
+
+
+class ValuationConnection:
+    """One client's subscriptions and conflating outbox.
+
+    The outbox keeps only the latest snapshot per subscribed portfolio, so
+    a client reading slower than valuations change skips the intermediate
+    states instead of queueing them, and its memory is bounded by its
+    subscriptions. Each message is the diff against what this client was
+    last sent.
+    """
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        # portfolio id -> channel its updates are sent on
+        self.channels: Dict[str, str] = {}
+        self.sent: Dict[str, Snapshot] = {}
+        # None marks a deleted portfolio
+        self.pending: Dict[str, Optional[Snapshot]] = {}
+        # Protocol replies, sent ahead of data and never conflated
+        self.replies: List[dict] = []
+        self.ready = asyncio.Event()
+
+    def reply(self, message: dict):
+        self.replies.append(message)
+        self.ready.set()
+
+    def offer(self, portfolio_id: str, snapshot: Optional[Snapshot]):
+        if portfolio_id in self.channels:
+            self.pending[portfolio_id] = snapshot
+            self.ready.set()
+
+    def forget(self, portfolio_ids: Iterable[str]):
+        for portfolio_id in portfolio_ids:
+            self.channels.pop(portfolio_id, None)
+            self.sent.pop(portfolio_id, None)
+            self.pending.pop(portfolio_id, None)
+
+    def take_messages(self) -> List[dict]:
+        """Diff messages for everything pending, emptying the outbox"""
+        self.ready.clear()
+        pending, self.pending = self.pending, {}
+        messages, self.replies = self.replies, []
+        for portfolio_id, snapshot in pending.items():
+            channel = self.channels.get(portfolio_id)
+            if channel is None:
+                continue
+            if snapshot is None:
+                messages.append({
+                    "type": "data", "channel": channel, "data": {"portfolioId": portfolio_id, "deleted": True}
+                })
+                self.forget([portfolio_id])
+                continue
+            diff = valuation_diff(self.sent.get(portfolio_id), snapshot)
+            self.sent[portfolio_id] = snapshot
+            if diff:
+                messages.append({
+                    "type": "data", "channel": channel, "data": {"portfolioId": portfolio_id, **diff}
+                })
+        return messages
+
+    async def next_messages(self) -> List[dict]:
+        await self.ready.wait()
+        return self.take_messages()
+
+
+class ValuationHub:
+    """Connections by portfolio and the valuations changed since the last publish.
+
+    Committed changes only mark portfolios (or symbols, resolved to their
+    holders) as changed; publish then loads one snapshot per changed
+    portfolio that somebody watches and offers it to each watcher, so a
+    burst of ticks costs one load per publish interval however many
+    clients are connected.
+    """
+
+    def __init__(self):
+        self.watchers: Dict[str, Set[ValuationConnection]] = {}
+        self.changed_portfolios: Set[str] = set()
+        self.changed_symbols: Set[str] = set()
+        self.everything_changed = False
+
+    @property
+    def active(self) -> bool:
+        return bool(self.watchers)
+
+    async def subscribe(
+        self, db: AsyncSession, connection: ValuationConnection, channel: str, portfolio_ids: List[str]
+    ):
+        """Watch the portfolios and queue their full current valuation"""
+        for portfolio_id in portfolio_ids:
+            connection.channels[portfolio_id] = channel
+            connection.sent.pop(portfolio_id, None)
+            self.watchers.setdefault(portfolio_id, set()).add(connection)
+        snapshots = await load_snapshots(db, portfolio_ids)
+        for portfolio_id in portfolio_ids:
+            connection.offer(portfolio_id, snapshots.get(portfolio_id))
+
+    def unsubscribe(self, connection: ValuationConnection, portfolio_ids: Optional[Iterable[str]] = None):
+        portfolio_ids = list(connection.channels if portfolio_ids is None else portfolio_ids)
+        for portfolio_id in portfolio_ids:
+            watchers = self.watchers.get(portfolio_id)
+            if watchers is not None:
+                watchers.discard(connection)
+                if not watchers:
+                    del self.watchers[portfolio_id]
+        connection.forget(portfolio_ids)
+
+    def mark(self, portfolio_ids: Iterable[str] = (), symbols: Optional[Iterable[str]] = ()):
+        """Record changed valuations; symbols=None means every portfolio"""
+        if not self.watchers:
+            return
+        self.changed_portfolios.update(portfolio_ids)
+        if symbols is None:
+            self.everything_changed = True
+        else:
+            self.changed_symbols.update(symbols)
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.changed_portfolios or self.changed_symbols or self.everything_changed)
+
+    async def publish(self, db: AsyncSession) -> int:
+        """Offer fresh snapshots of changed, watched portfolios to their watchers; returns how many"""
+        watched = set(self.watchers)
+        if self.everything_changed:
+            changed = watched
+        else:
+            changed = self.changed_portfolios & watched
+            if self.changed_symbols:
+                changed |= set((await db.execute(
+                    select(Asset.portfolio_id).distinct().where(
+                        Asset.symbol.in_(list(self.changed_symbols)),
+                        Asset.portfolio_id.in_(list(watched - changed))
+                    )
+                )).scalars().all())
+        self.changed_portfolios.clear()
+        self.changed_symbols.clear()
+        self.everything_changed = False
+
+        snapshots = await load_snapshots(db, changed)
+        for portfolio_id in changed:
+            for connection in list(self.watchers.get(portfolio_id, ())):
+                connection.offer(portfolio_id, snapshots.get(portfolio_id))
+        return len(changed)
+
+    def clear(self):
+        self.watchers.clear()
+        self.changed_portfolios.clear()
+        self.changed_symbols.clear()
+        self.everything_changed = False
+
+
+_valuation_hub = ValuationHub()
+
+
+def get_valuation_hub() -> ValuationHub:
+    return _valuation_hub
+
+
+def mark_valuations_changed(db: AsyncSession, symbols: Optional[Iterable[str]]):
+    """Publish changes made by bulk statements once the caller commits; symbols=None means all"""
+    if not _valuation_hub.active:
+        return
+    changes = db.sync_session.info.setdefault("valuation_changes", {"portfolios": set(), "symbols": set()})
+    if symbols is None or changes["symbols"] is None:
+        changes["symbols"] = None
+    else:
+        changes["symbols"].update(symbols)
+
+
+@event.listens_for(Session, "after_flush")
+def _track_valuation_changes(session: Session, flush_context):
+    """Stage portfolios changed through the ORM until the transaction commits"""
+    if not _valuation_hub.active and not get_message_bus().has_peers:
+        return
+    portfolio_ids = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Portfolio):
+            portfolio_ids.add(obj.id)
+        elif isinstance(obj, Asset):
+            portfolio_ids.add(obj.portfolio_id)
+    if portfolio_ids:
+        changes = session.info.setdefault("valuation_changes", {"portfolios": set(), "symbols": set()})
+        changes["portfolios"].update(portfolio_ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_valuation_changes(session: Session):
+    changes = session.info.pop("valuation_changes", None)
+    if changes:
+        _valuation_hub.mark(changes["portfolios"], changes["symbols"])
+        # Symbol changes reach other workers with the quote ticks themselves
+        bus = get_message_bus()
+        for portfolio_id in changes["portfolios"]:
+            bus.publish(f"portfolio.{portfolio_id}", {})
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_valuation_changes(session: Session):
+    session.info.pop("valuation_changes", None)
+
+
+def register_bus_handlers(bus: MessageBus):
+    """Push valuations changed on other workers to this worker's connections"""
+    bus.subscribe("portfolio.*", lambda topic, data: _valuation_hub.mark([topic.split(".", 1)[1]]))
+    bus.subscribe("quote.*", lambda topic, data: _valuation_hub.mark(symbols=[data["symbol"]]))
+
+
+async def run_valuation_stream(session_factory):
+    """Publish changed valuations every WS_PUBLISH_SECONDS while anyone is connected"""
+    hub = get_valuation_hub()
+    while True:
+        try:
+            if hub.has_changes:
+                async with session_factory() as session:
+                    await hub.publish(session)
+        except Exception as e:
+            print(f"Warning: Valuation stream publish failed: {e}")
+        await asyncio.sleep(settings.WS_PUBLISH_SECONDS)
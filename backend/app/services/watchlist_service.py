@@ -0,0 +1,105 @@
+"""
+Watchlist Service
+Watchlist items hydrated from the shared per-symbol quote table and the quote cache
+"""
+
+from decimal import Decimal
+from typing import List, Sequence
+
+from fastapi import HTTPException, status
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import SymbolQuote, WatchlistItem
+from app.schemas.watchlist import WatchlistItemCreate, WatchlistItemResponse
+from app.services.portfolio_service import _naive_utc
+from app.services.quote_cache import get_quote_cache
+
+
+class WatchlistService:
+    """Watchlist items carry no market data of their own.
+
+    Prices live once per symbol in symbol_quotes, written by the price feed,
+    so a tick is one row however many users watch the symbol, and a
+    watchlist is read with a single outer join against it. Prices come
+    through the process-wide quote cache when it holds a newer quote than
+    the table; previous closes always come from the table.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    def _hydrated(self):
+        return select(
+            WatchlistItem, SymbolQuote.price, SymbolQuote.previous_close, SymbolQuote.updated_at
+        ).outerjoin(SymbolQuote, SymbolQuote.symbol == WatchlistItem.symbol)
+
+    async def _with_cached_prices(self, rows: Sequence) -> List[WatchlistItemResponse]:
+        """Responses for hydrated rows, taking the cached quote where it is newer"""
+        quotes = await get_quote_cache().get_many({row[0].symbol for row in rows})
+        responses = []
+        for item, price, previous_close, updated_at in rows:
+            quote = quotes.get(item.symbol)
+            if quote is not None and quote.price > 0 and (
+                updated_at is None or _naive_utc(quote.timestamp) > _naive_utc(updated_at)
+            ):
+                price, updated_at = quote.price, quote.timestamp
+            responses.append(self._to_response(item, price, previous_close, updated_at))
+        return responses
+
+    async def get_watchlist(self, user_id: str) -> List[WatchlistItemResponse]:
+        """The user's watchlist with latest quotes, in the order items were added"""
+        rows = (await self.db.execute(
+            self._hydrated()
+            .where(WatchlistItem.user_id == user_id)
+            .order_by(WatchlistItem.added_at, WatchlistItem.symbol)
+        )).all()
+        return await self._with_cached_prices(rows)
+
+    async def add_item(self, user_id: str, item_data: WatchlistItemCreate) -> WatchlistItemResponse:
+        symbol = item_data.symbol.upper()
+        existing = await self.db.execute(select(WatchlistItem.id).where(
+            WatchlistItem.user_id == user_id,
+            WatchlistItem.symbol == symbol
+        ))
+        if existing.scalar_one_or_none():
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Symbol already in watchlist"
+            )
+
+        item = WatchlistItem(user_id=user_id, symbol=symbol, name=item_data.name or symbol)
+        self.db.add(item)
+        await self.db.commit()
+
+        row = (await self.db.execute(self._hydrated().where(WatchlistItem.id == item.id))).one()
+        return (await self._with_cached_prices([row]))[0]
+
+    async def remove_item(self, user_id: str, symbol: str) -> bool:
+        result = await self.db.execute(
+            delete(WatchlistItem).where(
+                WatchlistItem.user_id == user_id,
+                WatchlistItem.symbol == symbol.upper()
+            )
+        )
+        await self.db.commit()
+        return result.rowcount > 0
+
+    @staticmethod
+    def _to_response(item: WatchlistItem, price, previous_close, updated_at) -> WatchlistItemResponse:
+        response = WatchlistItemResponse(
+            id=item.id,
+            user_id=item.user_id,
+            symbol=item.symbol,
+            name=item.name,
+            added_at=item.added_at,
+            last_price_update=updated_at
+        )
+        if price is not None:
+            response.current_price = price
+            if previous_close:
+                response.change = price - previous_close
+                response.change_percent = (
+                    response.change / previous_close * 100
+                ).quantize(Decimal("0.0001"))
+        return response
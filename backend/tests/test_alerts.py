@@ -0,0 +1,428 @@
+"""
+Tests for alert evaluation
+"""
+
+import pytest
+from datetime import datetime, timedelta
+from decimal import Decimal
+from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.db.models import Alert, AlertNotification, AlertType, AllocationTarget, AssetType
+from app.services.alert_engine import PENDING_KEY, AlertEngine, allocation_drift, get_alert_engine
+from app.services.alert_service import AlertService
+from app.services.holdings_index import get_holdings_index
+from app.services.price_service import PriceService
+from app.services.price_windows import PriceRing
+from tests.test_prices import create_holders
+
+
+def price_alert(user_id: str, symbol: str, alert_type: AlertType, target: str) -> Alert:
+    return Alert(
+        user_id=user_id,
+        symbol=symbol,
+        alert_type=alert_type,
+        condition_operator="greater_than" if alert_type == AlertType.PRICE_ABOVE else "less_than",
+        target_value=Decimal(target),
+        message=f"{symbol} {alert_type.value} {target}"
+    )
+
+
+def portfolio_alert(user_id: str, portfolio_id: str, alert_type: AlertType, target: str) -> Alert:
+    return Alert(
+        user_id=user_id,
+        portfolio_id=portfolio_id,
+        alert_type=alert_type,
+        condition_operator="greater_than",
+        target_value=Decimal(target),
+        message=f"{alert_type.value} above {target}"
+    )
+
+
+@pytest.fixture
+async def alert_engine():
+    engine = get_alert_engine()
+    yield engine
+    engine.clear()
+    get_holdings_index().clear()
+
+
+class TestPriceAlertEngine:
+    """Test threshold-indexed price alert evaluation."""
+
+    def test_crossed_thresholds_fire_once(self):
+        """Test that a move fires exactly the thresholds between the previous and new price."""
+        engine = AlertEngine()
+        session = Session()
+        for alert_id, target in (("a1", "105"), ("a2", "110"), ("a3", "120")):
+            engine.add(alert_id, "aapl", AlertType.PRICE_ABOVE, Decimal(target))
+        for alert_id, target in (("b1", "95"), ("b2", "90")):
+            engine.add(alert_id, "AAPL", AlertType.PRICE_BELOW, Decimal(target))
+
+        assert engine.evaluate_prices(session, {"AAPL": Decimal("100")}) == []
+        assert engine.evaluate_prices(session, {"AAPL": Decimal("110")}) == ["a1", "a2"]
+        assert engine.evaluate_prices(session, {"AAPL": Decimal("112")}) == []
+        assert engine.evaluate_prices(session, {"AAPL": Decimal("91")}) == ["b1"]
+        assert engine.evaluate_prices(session, {"MSFT": Decimal("1")}) == []
+        assert set(session.info[PENDING_KEY]) == {"a1", "a2", "b1"}
+        assert session.info[PENDING_KEY]["b1"]["current_value"] == Decimal("91")
+
+        # An alert already satisfied when added fires on the next tick
+        engine.add("a4", "AAPL", AlertType.PRICE_ABOVE, Decimal("80"))
+        assert engine.evaluate_prices(session, {"AAPL": Decimal("91")}) == ["a4"]
+
+    def test_removed_and_changed_alerts(self):
+        """Test that removed alerts never fire and changed thresholds use the new value."""
+        engine = AlertEngine()
+        session = Session()
+        for i in range(10):
+            engine.add(f"a{i}", "AAPL", AlertType.PRICE_ABOVE, Decimal(100 + i))
+        for i in range(6):
+            engine.remove(f"a{i}")
+        assert len(engine.books[("AAPL", AlertType.PRICE_ABOVE, None)]) < 10
+
+        engine.add("a9", "AAPL", AlertType.PRICE_ABOVE, Decimal("200"))
+        assert engine.evaluate_prices(session, {"AAPL": Decimal("150")}) == ["a6", "a7", "a8"]
+        assert engine.evaluate_prices(session, {"AAPL": Decimal("200")}) == ["a9"]
+        assert engine.indexed == {}
+
+
+class TestPercentChangeAlerts:
+    """Test rolling-window percent-change alerts."""
+
+    def test_ring_window_min_max(self):
+        """Test that window extremes expire by time and by ring capacity."""
+        ring = PriceRing(capacity=4)
+        window = ring.window(60)
+        for t, price in ((0, 100.0), (10, 90.0), (20, 110.0), (30, 105.0)):
+            ring.append(t, price)
+        assert (window.low(ring), window.high(ring)) == (90.0, 110.0)
+
+        ring.append(75, 104.0)
+        assert (window.low(ring), window.high(ring)) == (104.0, 110.0)
+        assert window.move_percent(ring) == pytest.approx(6 / 110 * 100)
+
+        # A window added later is seeded from the ticks still held
+        assert ring.window(600).low(ring) == 90.0
+        for t in range(80, 84):
+            ring.append(t, 200.0)
+        assert ring.window(600).low(ring) == 200.0
+
+    def test_moves_within_window_fire(self):
+        """Test that each alert fires once its window sees a large enough move either way."""
+        engine = AlertEngine(ring_capacity=64)
+        session = Session()
+        engine.add_alert("fast", AlertType.PERCENT_CHANGE, Decimal("5"), "AAPL", window_minutes=5)
+        engine.add_alert("slow", AlertType.PERCENT_CHANGE, Decimal("5"), "AAPL", window_minutes=60)
+        engine.add_alert("drop", AlertType.PERCENT_CHANGE, Decimal("8"), "AAPL", window_minutes=60)
+        engine.add_alert("none", AlertType.PERCENT_CHANGE, Decimal("5"), "AAPL")
+        assert "none" not in engine.indexed
+
+        start = datetime(2024, 3, 5, 15, 0)
+        assert engine.evaluate_prices(session, {"AAPL": Decimal("100")}, start) == []
+        assert engine.evaluate_prices(session, {"AAPL": Decimal("103")}, start + timedelta(minutes=10)) == []
+        assert engine.evaluate_prices(session, {"AAPL": Decimal("106")}, start + timedelta(minutes=12)) == ["slow"]
+        assert session.info[PENDING_KEY]["slow"]["current_value"] == Decimal("6")
+        assert engine.evaluate_prices(session, {"AAPL": Decimal("97")}, start + timedelta(minutes=14)) == ["fast", "drop"]
+
+
+class TestPriceAlertEvaluation:
+    """Test price alerts fired from quote ingestion."""
+
+    async def test_apply_quotes_marks_triggered_alerts(
+        self, test_db: AsyncSession, test_user, alert_engine
+    ):
+        """Test that loaded and newly committed alerts are marked triggered by price updates."""
+        test_db.add_all([
+            price_alert(test_user.id, "AAPL", AlertType.PRICE_ABOVE, "200"),
+            price_alert(test_user.id, "AAPL", AlertType.PRICE_BELOW, "150"),
+        ])
+        await test_db.commit()
+        assert await alert_engine.load(test_db) == 2
+
+        late = price_alert(test_user.id, "AAPL", AlertType.PRICE_ABOVE, "210")
+        test_db.add(late)
+        await test_db.commit()
+        assert len(alert_engine.indexed) == 3
+
+        await PriceService(test_db).apply_quotes({"AAPL": Decimal("205")})
+        await test_db.commit()
+
+        alerts = (await test_db.execute(
+            select(Alert).order_by(Alert.target_value).execution_options(populate_existing=True)
+        )).scalars().all()
+        assert [a.is_triggered for a in alerts] == [False, True, False]
+        assert alerts[1].triggered_at is not None
+        assert alerts[1].current_value == Decimal("205")
+
+        # Deactivated alerts leave the index
+        late.is_active = False
+        await test_db.commit()
+        await PriceService(test_db).apply_quotes({"AAPL": Decimal("215")})
+        await test_db.commit()
+        await test_db.refresh(late)
+        assert not late.is_triggered
+
+    async def test_rolled_back_triggers_return_to_the_index(
+        self, test_db: AsyncSession, test_user, test_portfolio, alert_engine
+    ):
+        """Test that alerts fired in a transaction that rolls back fire again on the next tick."""
+        price = price_alert(test_user.id, "AAPL", AlertType.PRICE_ABOVE, "200")
+        value = portfolio_alert(test_user.id, test_portfolio.id, AlertType.PORTFOLIO_VALUE, "0")
+        test_db.add_all([price, value])
+        await test_db.commit()
+        price_id, value_id, portfolio_id = price.id, value.id, test_portfolio.id
+        assert await alert_engine.load(test_db) == 2
+
+        assert alert_engine.evaluate_prices(test_db, {"AAPL": Decimal("205")}) == [price_id]
+        assert await alert_engine.evaluate_portfolios(
+            test_db, {portfolio_id: [("AAPL", AssetType.STOCK, Decimal("205"))]}
+        ) == [value_id]
+        await alert_engine.flush(test_db)
+        assert not alert_engine.indexed and not alert_engine.portfolio_of
+        await test_db.rollback()
+
+        assert set(alert_engine.indexed) == {price_id}
+        assert alert_engine.portfolio_of == {value_id: portfolio_id}
+        assert alert_engine.evaluate_prices(test_db, {"AAPL": Decimal("206")}) == [price_id]
+        await alert_engine.flush(test_db)
+        await test_db.commit()
+        assert price_id not in alert_engine.indexed
+
+    async def test_sessions_keep_their_own_pending_alerts(self, test_db: AsyncSession, test_user, alert_engine):
+        """Test that one session's flush and commit leave another session's evaluations alone."""
+        aapl = price_alert(test_user.id, "AAPL", AlertType.PRICE_ABOVE, "200")
+        msft = price_alert(test_user.id, "MSFT", AlertType.PRICE_ABOVE, "100")
+        test_db.add_all([aapl, msft])
+        await test_db.commit()
+        aapl_id, msft_id = aapl.id, msft.id
+        await alert_engine.load(test_db)
+
+        other = AsyncSession(test_db.bind, expire_on_commit=False)
+        try:
+            assert alert_engine.evaluate_prices(test_db, {"AAPL": Decimal("205")}) == [aapl_id]
+            assert alert_engine.evaluate_prices(other, {"MSFT": Decimal("105")}) == [msft_id]
+            await alert_engine.flush(other)
+            await other.commit()
+
+            triggered = (await other.execute(
+                select(Alert.id).where(Alert.is_triggered.is_(True))
+            )).scalars().all()
+            assert triggered == [msft_id]
+            await other.commit()
+        finally:
+            await other.close()
+
+        await alert_engine.flush(test_db)
+        await test_db.rollback()
+        assert set(alert_engine.indexed) == {aapl_id}
+        triggered = (await test_db.execute(select(Alert.id).where(Alert.is_triggered.is_(True)))).scalars().all()
+        assert triggered == [msft_id]
+
+    async def test_trigger_written_once(self, test_db: AsyncSession, test_user, alert_engine):
+        """Test that an alert fired by two evaluations is counted and notified once."""
+        alert = price_alert(test_user.id, "AAPL", AlertType.PRICE_ABOVE, "200")
+        test_db.add(alert)
+        await test_db.commit()
+        alert_id = alert.id
+        await AlertService(test_db).get_counts(test_user.id)
+        await alert_engine.load(test_db)
+
+        # Another worker with the same alert indexed fires it on the same tick
+        for _ in range(2):
+            alert_engine.add(alert_id, "AAPL", AlertType.PRICE_ABOVE, Decimal("200"))
+            await PriceService(test_db).apply_quotes({"AAPL": Decimal("205")})
+            await test_db.commit()
+
+        assert (await AlertService(test_db).get_counts(test_user.id)).model_dump() == {"active": 0, "triggered": 1}
+        outbox = (await test_db.execute(select(AlertNotification.alert_id))).scalars().all()
+        assert outbox == [alert_id]
+
+
+class TestPortfolioAlertEvaluation:
+    """Test portfolio value and allocation drift alerts checked on revaluation."""
+
+    def test_allocation_drift(self):
+        """Test drift against symbol and asset type targets."""
+        positions = [
+            ("AAPL", AssetType.STOCK, Decimal("600")),
+            ("MSFT", AssetType.STOCK, Decimal("200")),
+            ("AGG", AssetType.BOND, Decimal("200")),
+        ]
+        by_type = [(AssetType.STOCK, None, Decimal("70")), (AssetType.BOND, None, Decimal("30"))]
+        by_symbol = [(None, "AAPL", Decimal("50")), (None, "MSFT", Decimal("25")), (None, "AGG", Decimal("25"))]
+
+        assert allocation_drift(positions, by_type) == Decimal("10")
+        assert allocation_drift(positions, by_symbol) == Decimal("10")
+        assert allocation_drift(positions, by_symbol, "MSFT") == Decimal("5")
+        assert allocation_drift(positions, []) == Decimal("0")
+
+    async def test_rollback_keeps_changes_other_sessions_committed(
+        self, test_db: AsyncSession, test_user, test_portfolio, alert_engine
+    ):
+        """Test that a rolled-back evaluation does not restore alerts another session changed meanwhile."""
+        edited = portfolio_alert(test_user.id, test_portfolio.id, AlertType.PORTFOLIO_VALUE, "100")
+        deleted = portfolio_alert(test_user.id, test_portfolio.id, AlertType.PORTFOLIO_VALUE, "50")
+        kept = portfolio_alert(test_user.id, test_portfolio.id, AlertType.PORTFOLIO_VALUE, "10")
+        test_db.add_all([edited, deleted, kept])
+        await test_db.commit()
+        edited_id, deleted_id, kept_id, portfolio_id = edited.id, deleted.id, kept.id, test_portfolio.id
+        await alert_engine.load(test_db)
+
+        fired = await alert_engine.evaluate_portfolios(
+            test_db, {portfolio_id: [("AAPL", AssetType.STOCK, Decimal("200"))]}
+        )
+        assert set(fired) == {edited_id, deleted_id, kept_id}
+
+        other = AsyncSession(test_db.bind, expire_on_commit=False)
+        try:
+            (await other.get(Alert, edited_id)).target_value = Decimal("500")
+            await other.delete(await other.get(Alert, deleted_id))
+            await other.commit()
+        finally:
+            await other.close()
+
+        await alert_engine.flush(test_db)
+        await test_db.rollback()
+
+        assert set(alert_engine.portfolio_of) == {edited_id, kept_id}
+        assert alert_engine.by_portfolio[portfolio_id][edited_id].target_value == Decimal("500")
+
+    @pytest.mark.parametrize("indexed", [False, True])
+    async def test_apply_quotes_checks_portfolio_alerts(
+        self, test_db: AsyncSession, test_user, test_portfolio, alert_engine, indexed
+    ):
+        """Test that only alerts of revalued portfolios are checked, with values written in bulk."""
+        second = await create_holders(test_db, test_user, test_portfolio)
+        second_id = second.id
+        test_db.add_all([
+            AllocationTarget(portfolio_id=test_portfolio.id, symbol="AAPL", target_percent=Decimal("50")),
+            AllocationTarget(portfolio_id=test_portfolio.id, symbol="AGG", target_percent=Decimal("50")),
+            portfolio_alert(test_user.id, test_portfolio.id, AlertType.PORTFOLIO_VALUE, "2500"),
+            portfolio_alert(test_user.id, test_portfolio.id, AlertType.ALLOCATION_DRIFT, "4"),
+            portfolio_alert(test_user.id, second_id, AlertType.PORTFOLIO_VALUE, "100"),
+        ])
+        await test_db.commit()
+        if indexed:
+            await get_holdings_index().load(test_db)
+        assert await alert_engine.load(test_db) == 3
+
+        # Only the first portfolio holds AGG
+        await PriceService(test_db).apply_quotes({"AGG": Decimal("100")})
+        await test_db.commit()
+        alerts = {
+            (a.portfolio_id, a.alert_type): a
+            for a in (await test_db.execute(
+                select(Alert).execution_options(populate_existing=True)
+            )).scalars().all()
+        }
+        value_alert = alerts[(test_portfolio.id, AlertType.PORTFOLIO_VALUE)]
+        assert value_alert.current_value == Decimal("2000")
+        assert value_alert.last_checked_at is not None
+        assert alerts[(test_portfolio.id, AlertType.ALLOCATION_DRIFT)].current_value == Decimal("0")
+        assert alerts[(second_id, AlertType.PORTFOLIO_VALUE)].last_checked_at is None
+
+        await PriceService(test_db).apply_quotes({"AAPL": Decimal("120")})
+        await test_db.commit()
+        for alert in alerts.values():
+            await test_db.refresh(alert)
+        drift_alert = alerts[(test_portfolio.id, AlertType.ALLOCATION_DRIFT)]
+        assert float(drift_alert.current_value) == pytest.approx(1200 / 2200 * 100 - 50, abs=1e-4)
+        assert drift_alert.is_triggered
+        assert not value_alert.is_triggered
+        assert value_alert.current_value == Decimal("2200")
+        assert alerts[(second_id, AlertType.PORTFOLIO_VALUE)].is_triggered
+        assert set(alert_engine.portfolio_of) == {value_alert.id}
+
+
+class TestAlertsAPI:
+    """Test alert endpoints, keyset pagination and maintained counts."""
+
+    @staticmethod
+    async def auth_headers(client: AsyncClient, test_user_data: dict) -> dict:
+        register_response = await client.post("/api/v1/auth/register", json=test_user_data)
+        return {"Authorization": f"Bearer {register_response.json()['tokens']['access_token']}"}
+
+    async def test_bulk_create_and_paginate(self, client: AsyncClient, test_user_data: dict):
+        """Test bulk creation, filters and walking pages by cursor."""
+        headers = await self.auth_headers(client, test_user_data)
+        response = await client.post("/api/v1/alerts/bulk", json={"alerts": [
+            {"alertType": "price_above", "symbol": "aapl", "targetValue": 200},
+            {"alertType": "price_below", "symbol": "AAPL", "targetValue": 150},
+            {"alertType": "percent_change", "symbol": "MSFT", "targetValue": 5, "windowMinutes": 15},
+        ]}, headers=headers)
+        assert response.status_code == 201
+        assert [a["symbol"] for a in response.json()] == ["AAPL", "AAPL", "MSFT"]
+
+        seen, cursor = [], None
+        while True:
+            params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+            page = (await client.get("/api/v1/alerts/", params=params, headers=headers)).json()
+            seen += [a["id"] for a in page["items"]]
+            cursor = page["nextCursor"]
+            if cursor is None:
+                break
+        assert len(seen) == len(set(seen)) == 3
+
+        response = await client.get("/api/v1/alerts/?symbol=msft", headers=headers)
+        assert [a["alertType"] for a in response.json()["items"]] == ["percent_change"]
+        response = await client.get("/api/v1/alerts/?alert_type=price_below", headers=headers)
+        assert len(response.json()["items"]) == 1
+
+        response = await client.get("/api/v1/alerts/?cursor=garbage", headers=headers)
+        assert response.status_code == 400
+        response = await client.post(
+            "/api/v1/alerts/", json={"alertType": "percent_change", "symbol": "AAPL", "targetValue": 5},
+            headers=headers
+        )
+        assert response.status_code == 400
+
+    async def test_counts_follow_changes(
+        self, client: AsyncClient, test_db: AsyncSession, test_user_data: dict, alert_engine
+    ):
+        """Test that badge counts track creates, triggers, dismissals, re-arming and deletes."""
+        headers = await self.auth_headers(client, test_user_data)
+        created = (await client.post("/api/v1/alerts/bulk", json={"alerts": [
+            {"alertType": "price_above", "symbol": "AAPL", "targetValue": t} for t in (200, 210, 220)
+        ]}, headers=headers)).json()
+        counts_url = "/api/v1/alerts/counts"
+        assert (await client.get(counts_url, headers=headers)).json() == {"active": 3, "triggered": 0}
+
+        await alert_engine.load(test_db)
+        await PriceService(test_db).apply_quotes({"AAPL": Decimal("215")})
+        await test_db.commit()
+        assert (await client.get(counts_url, headers=headers)).json() == {"active": 1, "triggered": 2}
+
+        first, second, third = (a["id"] for a in created)
+        response = await client.patch(f"/api/v1/alerts/{first}", json={"isActive": False}, headers=headers)
+        assert response.json()["isActive"] is False
+        response = await client.patch(f"/api/v1/alerts/{second}", json={"isTriggered": False}, headers=headers)
+        assert response.json()["triggeredAt"] is None
+        assert (await client.get(counts_url, headers=headers)).json() == {"active": 2, "triggered": 0}
+
+        response = await client.post(
+            "/api/v1/alerts/bulk-delete", json={"ids": [second, third, "missing"]}, headers=headers
+        )
+        assert response.json() == {"active": 0, "triggered": 0}
+        assert (await client.delete(f"/api/v1/alerts/{third}", headers=headers)).status_code == 404
+        assert (await client.get(f"/api/v1/alerts/{first}", headers=headers)).status_code == 200
+
+    async def test_portfolio_delete_adjusts_counts(
+        self, client: AsyncClient, test_user_data: dict, test_portfolio_data: dict
+    ):
+        """Test that alerts removed with their portfolio leave the owner's counts."""
+        headers = await self.auth_headers(client, test_user_data)
+        response = await client.post("/api/v1/portfolios/", json=test_portfolio_data, headers=headers)
+        portfolio_id = response.json()["id"]
+        await client.post("/api/v1/alerts/bulk", json={"alerts": [
+            {"alertType": "price_above", "symbol": "AAPL", "targetValue": 200},
+            {"alertType": "portfolio_value", "portfolioId": portfolio_id, "targetValue": 1000},
+        ]}, headers=headers)
+        counts_url = "/api/v1/alerts/counts"
+        assert (await client.get(counts_url, headers=headers)).json() == {"active": 2, "triggered": 0}
+
+        assert (await client.delete(f"/api/v1/portfolios/{portfolio_id}", headers=headers)).status_code == 204
+        assert (await client.get(counts_url, headers=headers)).json() == {"active": 1, "triggered": 0}
+        assert len((await client.get("/api/v1/alerts/", headers=headers)).json()["items"]) == 1
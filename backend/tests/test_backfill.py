@@ -0,0 +1,121 @@
+"""
+Tests for resumable historical price backfill
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Asset, AssetType, BackfillCheckpoint, BarResolution, MarketData, PriceBar
+from app.services.backfill_service import HistoryBackfillJob, RateLimiter, pending_backfill_symbols
+from app.services.market_data_provider import CsvHistoryProvider
+
+
+class FlakyProvider(CsvHistoryProvider):
+    """Fails the nth history request once, recording every request"""
+
+    def __init__(self, directory, fail_on=None):
+        super().__init__(directory)
+        self.fail_on = fail_on
+        self.calls = []
+
+    async def get_history(self, symbol, start, end):
+        self.calls.append((symbol, start.date()))
+        if len(self.calls) == self.fail_on:
+            raise RuntimeError("provider unavailable")
+        return await super().get_history(symbol, start, end)
+
+
+def write_history(directory, symbol: str, start, days: int):
+    lines = ["date,close,volume"]
+    for i in range(days):
+        # Two prints per day; the later one is the close
+        day = start + timedelta(days=i)
+        lines.append(f"{day.isoformat()}T14:00:00,{100 + i - 0.5},10")
+        lines.append(f"{day.isoformat()}T20:00:00,{100 + i},20")
+    (directory / f"{symbol}.csv").write_text("\n".join(lines) + "\n")
+
+
+class TestHistoryBackfill:
+    """Test chunked, checkpointed backfill into daily bars."""
+
+    @staticmethod
+    def _session_factory(test_db: AsyncSession):
+        @asynccontextmanager
+        async def factory():
+            yield test_db
+        return factory
+
+    async def test_backfill_resumes_from_checkpoint(self, test_db: AsyncSession, tmp_path):
+        """Test that a failed chunk is retried from the checkpoint without refetching finished ones."""
+        start = datetime.utcnow().date() - timedelta(days=20)
+        write_history(tmp_path, "AAPL", start, 20)
+        provider = FlakyProvider(tmp_path, fail_on=2)
+        job = HistoryBackfillJob(
+            provider, self._session_factory(test_db), concurrency=1, requests_per_second=1000, chunk_days=7
+        )
+
+        assert await job.run(["aapl"], start) == {"AAPL": 7}
+        checkpoint = await test_db.get(BackfillCheckpoint, "AAPL")
+        assert checkpoint.completed_until == start + timedelta(days=7)
+        assert await pending_backfill_symbols(test_db) == []
+
+        assert await job.run(["AAPL"], start) == {"AAPL": 13}
+        assert [day for _, day in provider.calls] == [
+            start, start + timedelta(days=7), start + timedelta(days=7), start + timedelta(days=14)
+        ]
+        await test_db.refresh(checkpoint)
+        assert checkpoint.completed_until == datetime.utcnow().date()
+
+        bars = (await test_db.execute(
+            select(PriceBar).where(PriceBar.resolution == BarResolution.DAY).order_by(PriceBar.bucket_start)
+        )).scalars().all()
+        assert len(bars) == 20
+        assert bars[0].open == Decimal("99.5")
+        assert bars[0].close == Decimal("100")
+        assert bars[-1].volume == 30
+
+        # A finished symbol is not fetched again
+        assert await job.run(["AAPL"], start) == {"AAPL": 0}
+        assert len(provider.calls) == 4
+
+    async def test_pending_symbols_are_backfilled(self, test_db: AsyncSession, test_portfolio, tmp_path):
+        """Test that held symbols without finished history are picked up and stored."""
+        start = datetime.utcnow().date() - timedelta(days=5)
+        for symbol in ("MSFT", "NVDA"):
+            write_history(tmp_path, symbol, start, 5)
+            test_db.add(Asset(
+                portfolio_id=test_portfolio.id, symbol=symbol, name=symbol, asset_type=AssetType.STOCK,
+                quantity=Decimal("1"), average_cost=Decimal("10"), total_cost=Decimal("10")
+            ))
+        await test_db.commit()
+        assert await pending_backfill_symbols(test_db) == ["MSFT", "NVDA"]
+
+        job = HistoryBackfillJob(CsvHistoryProvider(str(tmp_path)), self._session_factory(test_db), concurrency=1)
+        assert await job.run(await pending_backfill_symbols(test_db), start) == {"MSFT": 5, "NVDA": 5}
+        assert await pending_backfill_symbols(test_db) == []
+        count = (await test_db.execute(select(func.count()).select_from(PriceBar))).scalar()
+        assert count == 10
+
+    async def test_limit_stops_at_uncompacted_data(self, test_db: AsyncSession):
+        """Test that backfill leaves days with raw ticks to daily compaction."""
+        today = datetime.utcnow().date()
+        assert await HistoryBackfillJob.history_limit(test_db) == today
+
+        test_db.add(MarketData(
+            symbol="AAPL", price=Decimal("100"), change=Decimal("0"), change_percent=Decimal("0"),
+            timestamp=datetime.combine(today - timedelta(days=2), datetime.min.time()) + timedelta(hours=15)
+        ))
+        await test_db.commit()
+        assert await HistoryBackfillJob.history_limit(test_db) == today - timedelta(days=2)
+
+    async def test_rate_limiter_spaces_requests(self):
+        """Test that acquisitions beyond the burst wait for tokens."""
+        limiter = RateLimiter(rate=50, burst=1)
+        started = time.monotonic()
+        await asyncio.gather(*[limiter.acquire() for _ in range(4)])
+        assert time.monotonic() - started >= 3 / 50 * 0.9
@@ -0,0 +1,168 @@
+"""
+Tests for benchmark-relative analytics
+"""
+
+import pytest
+import numpy as np
+from decimal import Decimal
+from datetime import datetime, timedelta
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import (
+    Asset, AssetType, MarketData, Portfolio, PortfolioBenchmark, Transaction, TransactionType
+)
+from app.services.benchmark_service import BenchmarkService, relative_metrics
+
+
+def _price_paths(days: int):
+    """Benchmark prices and an asset that moves exactly twice as much each day."""
+    rng = np.random.default_rng(7)
+    benchmark_returns = rng.normal(0.0005, 0.01, days - 1)
+    benchmark = 100 * np.concatenate(([1.0], np.cumprod(1 + benchmark_returns)))
+    asset = 50 * np.concatenate(([1.0], np.cumprod(1 + 2 * benchmark_returns)))
+    return benchmark, asset
+
+
+class TestRelativeMetrics:
+    """Test the vectorized regression."""
+
+    def test_beta_of_leveraged_series(self):
+        """Test that a 2x series has beta 2, correlation 1 and zero alpha."""
+        b = np.random.default_rng(1).normal(0, 0.01, 250)
+        metrics = relative_metrics(np.vstack([2 * b, b]), b)
+
+        assert metrics["beta"] == pytest.approx([2.0, 1.0])
+        assert metrics["correlation"] == pytest.approx([1.0, 1.0])
+        assert metrics["alpha"] == pytest.approx([0.0, 0.0], abs=1e-12)
+        assert metrics["tracking_error"][1] == pytest.approx(0.0)
+
+    def test_missing_days_are_excluded(self):
+        """Test that NaN padding does not affect the estimates."""
+        b = np.random.default_rng(2).normal(0, 0.01, 100)
+        padded = np.concatenate((np.full(20, np.nan), 3 * b[20:]))
+        metrics = relative_metrics(padded, b)
+
+        assert metrics["observations"][0] == 80
+        assert metrics["beta"][0] == pytest.approx(3.0)
+
+    def test_too_few_observations(self):
+        """Test that fewer than two aligned days yield no metrics."""
+        metrics = relative_metrics(np.array([0.01]), np.array([0.02]))
+
+        assert np.isnan(metrics["beta"][0])
+
+
+class TestBenchmarkService:
+    """Test benchmark analytics over stored price history."""
+
+    async def _create_tracked_portfolio(self, test_db: AsyncSession, user_id: str, name: str, days: int):
+        benchmark, asset_prices = _price_paths(days)
+        start = datetime.utcnow().replace(hour=12, minute=0, second=0, microsecond=0) - timedelta(days=days)
+
+        portfolio = Portfolio(user_id=user_id, name=name, currency="USD")
+        test_db.add(portfolio)
+        await test_db.flush()
+        asset = Asset(
+            portfolio_id=portfolio.id,
+            symbol="AAA",
+            name="AAA",
+            asset_type=AssetType.STOCK,
+            quantity=Decimal("10"),
+            average_cost=Decimal(str(round(asset_prices[0], 4))),
+        )
+        test_db.add(asset)
+        await test_db.flush()
+        test_db.add(Transaction(
+            portfolio_id=portfolio.id,
+            asset_id=asset.id,
+            transaction_type=TransactionType.BUY,
+            symbol="AAA",
+            quantity=Decimal("10"),
+            price=Decimal(str(round(asset_prices[0], 4))),
+            total_amount=Decimal(str(round(asset_prices[0] * 10, 2))),
+            transaction_date=start
+        ))
+        test_db.add(PortfolioBenchmark(portfolio_id=portfolio.id, symbol="SPY"))
+        return portfolio, benchmark, asset_prices, start
+
+    async def _store_prices(self, test_db: AsyncSession, symbol: str, prices, start: datetime):
+        for i, price in enumerate(prices):
+            test_db.add(MarketData(
+                symbol=symbol,
+                price=Decimal(str(round(price, 4))),
+                change=Decimal("0"),
+                change_percent=Decimal("0"),
+                timestamp=start + timedelta(days=i)
+            ))
+
+    async def test_calculate_for_benchmark_in_one_pass(self, test_db: AsyncSession, test_user):
+        """Test that every portfolio tracking a benchmark is analyzed together."""
+        days = 40
+        first, benchmark, asset_prices, start = await self._create_tracked_portfolio(
+            test_db, test_user.id, "First", days
+        )
+        second, _, _, _ = await self._create_tracked_portfolio(test_db, test_user.id, "Second", days)
+        await self._store_prices(test_db, "SPY", benchmark, start)
+        await self._store_prices(test_db, "AAA", asset_prices, start)
+        await test_db.commit()
+
+        results = await BenchmarkService(test_db).calculate_for_benchmark("spy", lookback_days=90)
+
+        assert set(results) == {first.id, second.id}
+        analytics = results[first.id]
+        assert analytics.observations == days - 1
+        assert float(analytics.beta) == pytest.approx(2.0, abs=1e-3)
+        assert float(analytics.correlation) == pytest.approx(1.0, abs=1e-3)
+
+    async def test_import_series_file(self, test_db: AsyncSession, tmp_path):
+        """Test loading a local CSV of closes as daily bars."""
+        path = tmp_path / "spy.csv"
+        path.write_text("date,close\n2024-01-02,470.00\n2024-01-03,475.00\n")
+
+        service = BenchmarkService(test_db)
+        count = await service.import_series_file("spy", str(path))
+        closes = await service.get_daily_closes(
+            ["SPY"], datetime(2024, 1, 1).date(), datetime(2024, 1, 31).date()
+        )
+
+        assert count == 2
+        assert closes["SPY"][1].tolist() == [470.0, 475.0]
+
+
+class TestBenchmarkEndpoints:
+    """Test benchmark API endpoints."""
+
+    async def test_add_list_and_analyze_benchmarks(
+        self,
+        client: AsyncClient,
+        test_user_data: dict,
+        test_portfolio_data: dict
+    ):
+        """Test configuring a benchmark and requesting analytics without price history."""
+        login_response = await client.post("/api/v1/auth/register", json=test_user_data)
+        tokens = login_response.json()["tokens"]
+        headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+        create_response = await client.post("/api/v1/portfolios/", json=test_portfolio_data, headers=headers)
+        portfolio_id = create_response.json()["id"]
+
+        response = await client.post(
+            f"/api/v1/portfolios/{portfolio_id}/benchmarks", json={"symbol": "spy"}, headers=headers
+        )
+        assert response.status_code == 201
+        assert response.json()["symbol"] == "SPY"
+
+        duplicate = await client.post(
+            f"/api/v1/portfolios/{portfolio_id}/benchmarks", json={"symbol": "SPY"}, headers=headers
+        )
+        assert duplicate.status_code == 400
+
+        analytics = await client.get(f"/api/v1/portfolios/{portfolio_id}/benchmarks/analytics", headers=headers)
+        assert analytics.status_code == 200
+        data = analytics.json()
+        assert data[0]["symbol"] == "SPY"
+        assert data[0]["observations"] == 0
+        assert data[0]["beta"] is None
+
+        removed = await client.delete(f"/api/v1/portfolios/{portfolio_id}/benchmarks/SPY", headers=headers)
+        assert removed.status_code == 204
@@ -0,0 +1,155 @@
+"""
+Tests for market data compaction, retention and history resolution
+"""
+
+import numpy as np
+from datetime import datetime, timedelta
+from decimal import Decimal
+from httpx import AsyncClient
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import BarResolution, MarketData, PriceBar
+from app.services.compaction_service import CompactionService, aggregate_bars
+from app.services.history_service import HistoryService, choose_resolution
+
+
+NOW = datetime(2024, 3, 1, 12, 0, 30)
+
+
+class TestAggregateBars:
+    """Test the OHLCV folding kernel."""
+
+    def test_groups_by_symbol_and_bucket(self):
+        """Test open, high, low, close, volume and count per bucket."""
+        symbols = np.array(["A", "A", "A", "B"], dtype=object)
+        epoch = np.array([0, 30, 61, 10])
+        prices = np.array([10.0, 12.0, 11.0, 50.0])
+        volumes = np.array([1, 2, 3, 4])
+
+        bars = aggregate_bars(symbols, epoch, prices, prices, prices, prices, volumes, np.ones(4, dtype=int), 60)
+
+        assert bars[0].tolist() == ["A", "A", "B"]
+        assert bars[1].tolist() == [0, 60, 0]
+        assert bars[2].tolist() == [10.0, 11.0, 50.0]
+        assert bars[3].tolist() == [12.0, 11.0, 50.0]
+        assert bars[5].tolist() == [12.0, 11.0, 50.0]
+        assert bars[6].tolist() == [3, 3, 4]
+        assert bars[7].tolist() == [2, 1, 1]
+
+    def test_resolution_choice(self):
+        """Test that the coarsest resolution with enough points is chosen."""
+        assert choose_resolution(NOW - timedelta(days=365), NOW, NOW) == BarResolution.DAY
+        assert choose_resolution(NOW - timedelta(days=7), NOW, NOW) == BarResolution.HOUR
+        assert choose_resolution(NOW - timedelta(hours=6), NOW, NOW) == BarResolution.MINUTE
+        # Minute bars are gone after their retention, so an old short range falls back to hours
+        assert choose_resolution(NOW - timedelta(days=90), NOW - timedelta(days=90, hours=-6), NOW) == BarResolution.HOUR
+
+
+class TestCompactionService:
+    """Test rolling ticks into bars and deleting expired rows."""
+
+    async def _add_ticks(self, test_db: AsyncSession, start: datetime, count: int, step_seconds: int):
+        for i in range(count):
+            test_db.add(MarketData(
+                symbol="AAPL",
+                price=Decimal(100 + i),
+                change=Decimal("0"),
+                change_percent=Decimal("0"),
+                volume=10,
+                timestamp=start + timedelta(seconds=i * step_seconds)
+            ))
+        await test_db.commit()
+
+    async def test_compaction_builds_each_resolution(self, test_db: AsyncSession):
+        """Test bars at every resolution and that reruns add nothing."""
+        await self._add_ticks(test_db, datetime(2024, 2, 28, 23, 0), 240, 30)
+        service = CompactionService(test_db)
+
+        summary = await service.run(NOW)
+        again = await service.run(NOW)
+
+        assert summary["1m"] == 120
+        assert summary["1h"] == 2
+        assert summary["1d"] == 2
+        assert again["1m"] == again["1h"] == again["1d"] == 0
+        day = (await test_db.execute(
+            select(PriceBar).where(PriceBar.resolution == BarResolution.DAY).order_by(PriceBar.bucket_start)
+        )).scalars().all()
+        assert day[0].open == Decimal("100") and day[0].close == Decimal("219")
+        assert day[1].high == Decimal("339") and day[1].tick_count == 120
+        assert sum(b.volume for b in day) == 2400
+
+    async def test_rerun_pass_rewrites_bars(self, test_db: AsyncSession, monkeypatch):
+        """Test that compacting buckets that already have bars updates them in place."""
+        await self._add_ticks(test_db, datetime(2024, 2, 29, 10, 0), 4, 30)
+        service = CompactionService(test_db)
+        assert await service.compact_resolution(BarResolution.MINUTE, NOW) == 2
+
+        # A late tick, then a pass that starts over as if the watermark was never committed
+        await self._add_ticks(test_db, datetime(2024, 2, 29, 10, 1, 45), 1, 30)
+
+        async def no_watermark(resolution):
+            return None
+
+        monkeypatch.setattr(service, "watermark", no_watermark)
+        assert await service.compact_resolution(BarResolution.MINUTE, NOW) == 2
+        await test_db.commit()
+
+        bars = (await test_db.execute(
+            select(PriceBar).where(PriceBar.resolution == BarResolution.MINUTE).order_by(PriceBar.bucket_start)
+        )).scalars().all()
+        assert len(bars) == 2
+        assert bars[1].tick_count == 3
+        assert bars[1].close == Decimal("100")
+
+    async def test_retention_keeps_uncompacted_ticks(self, test_db: AsyncSession):
+        """Test that raw rows are deleted only once compacted and past retention."""
+        await self._add_ticks(test_db, datetime(2024, 2, 1), 4, 60)
+        await CompactionService(test_db).run(NOW)
+
+        remaining = (await test_db.execute(select(func.count(MarketData.id)))).scalar()
+        assert remaining == 0
+
+        await self._add_ticks(test_db, NOW - timedelta(seconds=20), 1, 60)
+        await CompactionService(test_db).run(NOW)
+        remaining = (await test_db.execute(select(func.count(MarketData.id)))).scalar()
+        assert remaining == 1
+
+    async def test_history_merges_bars_and_recent_ticks(self, test_db: AsyncSession):
+        """Test that daily closes include today's uncompacted ticks."""
+        await self._add_ticks(test_db, datetime(2024, 2, 28, 23, 0), 240, 30)
+        await CompactionService(test_db).run(NOW)
+        await self._add_ticks(test_db, datetime(2024, 3, 1, 12, 1), 2, 60)
+
+        closes = await HistoryService(test_db).get_daily_closes(
+            ["AAPL"], datetime(2024, 2, 1).date(), datetime(2024, 3, 1).date()
+        )
+
+        dates, prices = closes["AAPL"]
+        assert dates.astype(str).tolist() == ["2024-02-28", "2024-02-29", "2024-03-01"]
+        assert prices.tolist() == [219.0, 339.0, 101.0]
+
+
+class TestHistoryEndpoints:
+    """Test the price history API endpoint."""
+
+    async def test_history_endpoint(self, client: AsyncClient, test_user_data: dict, test_db: AsyncSession):
+        """Test bars returned for a symbol with explicit resolution."""
+        login_response = await client.post("/api/v1/auth/register", json=test_user_data)
+        tokens = login_response.json()["tokens"]
+        headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+        test_db.add(MarketData(
+            symbol="MSFT", price=Decimal("400"), change=Decimal("0"), change_percent=Decimal("0"),
+            timestamp=datetime.utcnow() - timedelta(minutes=5)
+        ))
+        await test_db.commit()
+
+        response = await client.get(
+            "/api/v1/market-data/msft/history", params={"resolution": "1m"}, headers=headers
+        )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["resolution"] == "1m"
+        assert float(data["bars"][0]["close"]) == 400.0
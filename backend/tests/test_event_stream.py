@@ -0,0 +1,125 @@
+"""
+Tests for the event hub and the Server-Sent Events stream
+"""
+
+import json
+import pytest
+from decimal import Decimal
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.v1.stream import stream_events
+from app.db.models import Alert, AlertType
+from app.services.alert_engine import get_alert_engine
+from app.services.auth_service import AuthService
+from app.services.event_hub import EventHub, alert_topic, get_event_hub, quote_topic
+from app.services.price_service import PriceService
+
+
+def parse_frames(chunk: bytes):
+    """(id, event, data) of each SSE frame in a chunk"""
+    frames = []
+    for block in chunk.decode().strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if "event" in fields:
+            frames.append((int(fields["id"]), fields["event"], json.loads(fields["data"])))
+    return frames
+
+
+@pytest.fixture
+def event_hub():
+    hub = get_event_hub()
+    yield hub
+    hub.clear()
+
+
+class TestEventHub:
+    """Test fan-out, conflation and Last-Event-ID replay."""
+
+    def test_fan_out_encodes_once_and_conflates_quotes(self, monkeypatch):
+        """Test that subscribers share one frame and slow ones keep the latest quote per symbol."""
+        monkeypatch.setattr("app.core.config.settings.SSE_MAX_PENDING", 2)
+        hub = EventHub(replay_size=100)
+        fast = hub.subscribe([quote_topic("AAPL"), alert_topic("u1")])
+        slow = hub.subscribe([quote_topic("AAPL"), quote_topic("MSFT")])
+
+        first = hub.publish(quote_topic("AAPL"), "quote", {"price": 1}, conflate=True)
+        assert fast.drain()[0].frame is first.frame
+        hub.publish(quote_topic("AAPL"), "quote", {"price": 2}, conflate=True)
+        hub.publish(quote_topic("MSFT"), "quote", {"price": 3}, conflate=True)
+        hub.publish(quote_topic("AAPL"), "quote", {"price": 4}, conflate=True)
+        assert [json.loads(e.frame.split(b"data: ")[1]) for e in slow.drain()] == [{"price": 3}, {"price": 4}]
+
+        for n in range(3):
+            hub.publish(alert_topic("u1"), "alert", {"n": n})
+        assert fast.overflowed
+        hub.unsubscribe(fast)
+        hub.unsubscribe(slow)
+        assert not hub.subscribers
+
+    def test_resume_from_last_event_id(self):
+        """Test replay within the ring and the fallback to latest quotes past it."""
+        hub = EventHub(replay_size=3)
+        topics = [quote_topic("AAPL"), alert_topic("u1")]
+        quote = hub.publish(quote_topic("AAPL"), "quote", {"price": 1}, conflate=True)
+        alert = hub.publish(alert_topic("u1"), "alert", {"n": 1})
+        hub.publish(alert_topic("u2"), "alert", {"n": 2})
+
+        resumed = hub.subscribe(topics, last_event_id=quote.id)
+        assert [e.id for e in resumed.drain()] == [alert.id]
+        assert hub.subscribe(topics).drain() == [quote]
+
+        hub.publish(alert_topic("u2"), "alert", {"n": 3})
+        late = hub.publish(alert_topic("u1"), "alert", {"n": 4})
+        # The ring no longer reaches back to the quote: start over from the latest quote
+        assert [e.id for e in hub.subscribe(topics, last_event_id=quote.id - 1).drain()] == [quote.id, late.id]
+
+
+class TestEventStream:
+    """Test the SSE endpoint end to end."""
+
+    async def test_stream_quotes_and_triggered_alerts(self, test_db: AsyncSession, test_user, event_hub):
+        """Test that committed ticks and triggers are streamed and rollbacks are not."""
+        user_id = test_user.id
+        test_db.add(Alert(
+            user_id=user_id, symbol="AAPL", alert_type=AlertType.PRICE_ABOVE,
+            condition_operator="greater_than", target_value=Decimal("200"), message="AAPL above 200"
+        ))
+        await test_db.commit()
+        engine = get_alert_engine()
+        await engine.load(test_db)
+        try:
+            token = AuthService(test_db).create_access_token({"sub": user_id})
+            response = await stream_events(
+                symbols="aapl", token=token, last_event_id=None, credentials=None, db=test_db
+            )
+            assert response.media_type == "text/event-stream"
+            body = response.body_iterator
+            assert (await body.__anext__()).startswith(b"retry:")
+
+            await PriceService(test_db).apply_quotes({"AAPL": Decimal("250")})
+            await test_db.rollback()
+            await engine.load(test_db)
+            await PriceService(test_db).apply_quotes({"AAPL": Decimal("190")})
+            await test_db.commit()
+            [(first_id, kind, data)] = parse_frames(await body.__anext__())
+            assert (kind, data["symbol"], data["price"]) == ("quote", "AAPL", 190.0)
+
+            await PriceService(test_db).apply_quotes({"AAPL": Decimal("210")})
+            await test_db.commit()
+            frames = parse_frames(await body.__anext__())
+            assert [(kind, data.get("price") or data["message"]) for _, kind, data in frames] == [
+                ("quote", 210.0), ("alert", "AAPL above 200")
+            ]
+            await body.aclose()
+            assert not event_hub.subscribers
+
+            # Resuming after the first tick replays the rest
+            response = await stream_events(
+                symbols="AAPL", token=token, last_event_id=str(first_id), credentials=None, db=test_db
+            )
+            body = response.body_iterator
+            await body.__anext__()
+            assert [kind for _, kind, _ in parse_frames(await body.__anext__())] == ["quote", "alert"]
+            await body.aclose()
+        finally:
+            engine.clear()
@@ -0,0 +1,142 @@
+"""
+Tests for exchange rates and multi-currency reporting
+"""
+
+import pytest
+import numpy as np
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from fastapi import HTTPException
+from httpx import AsyncClient
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Currency, FxRate
+from app.services.fx_service import FxService, clear_rate_cache
+
+
+D1 = date(2024, 1, 1)
+D2 = date(2024, 1, 2)
+D3 = date(2024, 1, 3)
+
+
+@pytest.fixture(autouse=True)
+def rate_cache():
+    clear_rate_cache()
+    yield
+    clear_rate_cache()
+
+
+async def publish_rates(test_db: AsyncSession, on: date = D1):
+    await FxService(test_db).set_rates([
+        (Currency.EUR, Currency.USD, on, Decimal("1.10")),
+        (Currency.GBP, Currency.USD, on, Decimal("1.25")),
+    ])
+    await test_db.commit()
+
+
+class TestFxService:
+    """Test rate lookup, crossing, caching and array conversion."""
+
+    async def test_direct_inverse_and_cross_rates(self, test_db: AsyncSession):
+        """Test the latest rate on or before a date, inverted and crossed through USD."""
+        await publish_rates(test_db)
+        service = FxService(test_db)
+        await service.set_rates([(Currency.EUR, Currency.USD, D3, Decimal("1.20"))])
+        await test_db.commit()
+
+        assert await service.get_rate(Currency.EUR, Currency.USD, D2) == Decimal("1.1")
+        assert await service.get_rate(Currency.EUR, Currency.USD, D3) == Decimal("1.2")
+        assert float(await service.get_rate(Currency.USD, Currency.GBP, D2)) == pytest.approx(0.8)
+        assert float(await service.get_rate(Currency.EUR, Currency.GBP, D2)) == pytest.approx(0.88)
+
+        with pytest.raises(HTTPException) as error:
+            await service.get_rate(Currency.JPY, Currency.USD, D2)
+        assert error.value.status_code == 400
+        with pytest.raises(HTTPException):
+            await service.get_rate(Currency.EUR, Currency.USD, date(2023, 12, 31))
+
+    async def test_rates_cached_per_pair_and_date(self, test_db: AsyncSession):
+        """Test that a resolved (pair, date) is not read again, and writes invalidate it."""
+        await publish_rates(test_db)
+        service = FxService(test_db)
+        assert await service.get_rate(Currency.EUR, Currency.USD, D2) == Decimal("1.1")
+
+        await test_db.execute(delete(FxRate))
+        assert await service.get_rate(Currency.EUR, Currency.USD, D2) == Decimal("1.1")
+
+        await service.set_rates([(Currency.EUR, Currency.USD, D1, Decimal("1.05"))])
+        assert await service.get_rate(Currency.EUR, Currency.USD, D2) == Decimal("1.05")
+
+    async def test_array_and_series_conversion(self, test_db: AsyncSession):
+        """Test converting mixed-currency rows and a dated series in one step each."""
+        await publish_rates(test_db)
+        await FxService(test_db).set_rates([(Currency.EUR, Currency.USD, D3, Decimal("1.20"))])
+        service = FxService(test_db)
+
+        converted = await service.convert_array(
+            np.array([[100.0, 10.0], [200.0, 20.0], [50.0, 5.0]]),
+            [Currency.EUR, Currency.USD, Currency.GBP],
+            Currency.USD,
+            D2
+        )
+        assert np.allclose(converted, [[110.0, 11.0], [200.0, 20.0], [62.5, 6.25]])
+
+        rates = await service.rate_series(
+            Currency.EUR, Currency.USD, np.array([D1, D2, D3], dtype="datetime64[D]")
+        )
+        assert rates.tolist() == pytest.approx([1.1, 1.1, 1.2])
+
+
+class TestCurrencyReporting:
+    """Test household and allocation in a requested currency."""
+
+    async def test_household_and_allocation_in_currency(
+        self,
+        client: AsyncClient,
+        test_db: AsyncSession,
+        test_user_data: dict,
+        test_portfolio_data: dict
+    ):
+        """Test that portfolios in different currencies are summed after conversion."""
+        await publish_rates(test_db, datetime.utcnow().date() - timedelta(days=1))
+        register_response = await client.post("/api/v1/auth/register", json=test_user_data)
+        headers = {"Authorization": f"Bearer {register_response.json()['tokens']['access_token']}"}
+
+        portfolio_ids = {}
+        for name, currency in (("Dollars", "USD"), ("Euros", "EUR")):
+            create_response = await client.post(
+                "/api/v1/portfolios/",
+                json={**test_portfolio_data, "name": name, "currency": currency},
+                headers=headers
+            )
+            portfolio_ids[currency] = create_response.json()["id"]
+            await client.post(
+                f"/api/v1/portfolios/{portfolio_ids[currency]}/assets",
+                json={"symbol": "AAPL", "quantity": 10, "price": 100.00},
+                headers=headers
+            )
+
+        response = await client.get("/api/v1/portfolios/household?currency=USD", headers=headers)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["currency"] == "USD"
+        assert float(data["totalValue"]) == pytest.approx(2100.0)
+        assert len(data["positions"]) == 1
+        assert float(data["positions"][0]["quantity"]) == 20.0
+
+        response = await client.get("/api/v1/portfolios/household?currency=GBP", headers=headers)
+        assert float(response.json()["totalValue"]) == pytest.approx(2100.0 / 1.25)
+
+        response = await client.get(
+            f"/api/v1/portfolios/{portfolio_ids['EUR']}/allocation?currency=USD", headers=headers
+        )
+        assert response.status_code == 200
+        assert float(response.json()[0]["value"]) == pytest.approx(1100.0)
+
+        response = await client.get("/api/v1/portfolios/household?currency=JPY", headers=headers)
+        assert response.status_code == 400
+
+        response = await client.get("/api/v1/market-data/fx/EUR/GBP", headers=headers)
+        assert response.status_code == 200
+        assert float(response.json()["rate"]) == pytest.approx(0.88)
@@ -0,0 +1,139 @@
+"""
+Tests for market data providers and the price feed
+"""
+
+import asyncio
+import json
+import pytest
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.models import Asset, AssetType, MarketData, SymbolQuote, WatchlistItem
+from app.services.market_data_provider import (
+    MarketDataProvider, Quote, ReplayMarketDataProvider, get_market_data_provider
+)
+from app.services.price_service import PriceService, run_price_feed
+
+
+TICKS = [
+    {"timestamp": "2024-01-02T14:30:00", "symbol": "AAPL", "price": "185.10", "volume": 100},
+    {"timestamp": "2024-01-02T14:30:00", "symbol": "MSFT", "price": "370.00"},
+    {"timestamp": "2024-01-02T14:30:01", "symbol": "aapl", "price": "185.25"},
+]
+
+
+@pytest.fixture
+def ndjson_file(tmp_path):
+    path = tmp_path / "ticks.ndjson"
+    path.write_text("\n".join(json.dumps(t) for t in TICKS))
+    return path
+
+
+class TestReplayProvider:
+    """Test replaying recorded ticks."""
+
+    async def test_replay_batches_by_timestamp(self, ndjson_file):
+        """Test that ticks sharing a timestamp arrive together."""
+        provider = ReplayMarketDataProvider(str(ndjson_file), speed=0)
+
+        batches = [batch async for batch in provider.stream_quotes()]
+
+        assert [len(b) for b in batches] == [2, 1]
+        quotes = await provider.get_quotes(["AAPL", "TSLA"])
+        assert list(quotes) == ["AAPL"]
+        assert quotes["AAPL"].price == Decimal("185.25")
+
+    async def test_csv_history_and_symbol_filter(self, tmp_path):
+        """Test CSV input, history lookups and streaming a subset of symbols."""
+        path = tmp_path / "ticks.csv"
+        path.write_text("timestamp,symbol,price,volume\n" + "\n".join(
+            f"{t['timestamp']},{t['symbol']},{t['price']},{t.get('volume', '')}" for t in TICKS
+        ))
+        provider = ReplayMarketDataProvider(str(path), speed=0)
+
+        history = await provider.get_history("AAPL", datetime(2024, 1, 2), datetime(2024, 1, 3))
+        batches = [batch async for batch in provider.stream_quotes(["MSFT"])]
+
+        assert [q.price for q in history] == [Decimal("185.10"), Decimal("185.25")]
+        assert history[0].volume == 100
+        assert [[q.symbol for q in b] for b in batches] == [["MSFT"]]
+
+    def test_unknown_provider(self):
+        """Test that an unknown provider name is rejected."""
+        with pytest.raises(ValueError):
+            get_market_data_provider("carrier-pigeon")
+
+
+class TestPriceFeed:
+    """Test running the pricing pipeline from a replay file."""
+
+    async def test_feed_reprices_holdings(self, test_db: AsyncSession, test_portfolio, ndjson_file):
+        """Test that replayed ticks are stored and applied to held assets."""
+        test_db.add(Asset(
+            portfolio_id=test_portfolio.id,
+            symbol="AAPL",
+            name="Apple Inc.",
+            asset_type=AssetType.STOCK,
+            quantity=Decimal("10"),
+            average_cost=Decimal("150"),
+            current_price=Decimal("150"),
+            market_value=Decimal("1500"),
+            total_cost=Decimal("1500")
+        ))
+        await test_db.commit()
+        session_factory = async_sessionmaker(test_db.bind, expire_on_commit=False)
+
+        batches = await run_price_feed(ReplayMarketDataProvider(str(ndjson_file), speed=0), session_factory)
+
+        assert batches == 2
+        asset = (await test_db.execute(
+            select(Asset).execution_options(populate_existing=True)
+        )).scalar_one()
+        assert asset.current_price == Decimal("185.25")
+        assert asset.market_value == Decimal("1852.5")
+        ticks = (await test_db.execute(select(MarketData))).scalars().all()
+        assert len(ticks) == 2
+
+    async def test_feed_survives_failures_and_follows_new_symbols(
+        self, test_db: AsyncSession, test_user, monkeypatch
+    ):
+        """Test that a failed batch is skipped and symbols watched later are streamed."""
+        monkeypatch.setattr("app.core.config.settings.MARKET_DATA_SYMBOL_RELOAD_SECONDS", 0.01)
+        apply_quotes = PriceService.apply_quotes
+
+        async def failing_apply(self, quotes):
+            if "FAIL" in quotes:
+                raise RuntimeError("database unavailable")
+            return await apply_quotes(self, quotes)
+
+        monkeypatch.setattr(PriceService, "apply_quotes", failing_apply)
+        now = datetime(2024, 1, 2, 15)
+        user_id = test_user.id
+
+        class ScriptedProvider(MarketDataProvider):
+            async def get_quotes(self, symbols):
+                return {}
+
+            async def get_history(self, symbol, start, end):
+                return []
+
+            async def stream_quotes(self, symbols, interval=0.0):
+                yield [Quote(symbol="FAIL", price=Decimal("1"), timestamp=now)]
+                test_db.add(WatchlistItem(user_id=user_id, symbol="MSFT", name="Microsoft"))
+                await test_db.commit()
+                for _ in range(100):
+                    if "MSFT" in symbols:
+                        break
+                    await asyncio.sleep(0.01)
+                # Park the reloader so it does not share the test connection with the next batch
+                monkeypatch.setattr("app.core.config.settings.MARKET_DATA_SYMBOL_RELOAD_SECONDS", 60)
+                await asyncio.sleep(0.05)
+                yield [Quote(symbol="MSFT", price=Decimal("370"), timestamp=now)]
+
+        session_factory = async_sessionmaker(test_db.bind, expire_on_commit=False)
+        assert await run_price_feed(ScriptedProvider(), session_factory) == 1
+
+        quote = (await test_db.execute(select(SymbolQuote))).scalar_one()
+        assert (quote.symbol, quote.price) == ("MSFT", Decimal("370"))
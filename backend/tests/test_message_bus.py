@@ -0,0 +1,224 @@
+"""
+Tests for the cross-worker message bus
+"""
+
+import asyncio
+import pytest
+from decimal import Decimal
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.models import Alert, AlertType, Asset, AssetType
+from app.services import alert_engine, event_hub, fx_service, holdings_index, quote_cache, valuation_stream
+from app.services.alert_engine import get_alert_engine
+from app.services.event_hub import alert_topic, get_event_hub, quote_topic
+from app.services.holdings_index import get_holdings_index
+from app.services.message_bus import (
+    InMemoryBroker, InMemoryMessageBus, RedisMessageBus, run_while_leader, topic_matches
+)
+from app.services.price_service import PriceService
+from app.services.valuation_stream import ValuationConnection, get_valuation_hub
+
+
+@pytest.fixture
+def workers(monkeypatch):
+    """Two workers on one broker; the test session runs as the first"""
+    broker = InMemoryBroker()
+    local, remote = InMemoryMessageBus(broker), InMemoryMessageBus(broker)
+    monkeypatch.setattr("app.services.message_bus._message_bus", local)
+    yield local, remote
+    get_event_hub().clear()
+    get_valuation_hub().clear()
+    get_holdings_index().clear()
+    get_alert_engine().clear()
+
+
+class TestMessageBus:
+    """Test routing and batching between nodes."""
+
+    async def test_one_leader_runs_singleton_loops(self, monkeypatch):
+        """Test that only the leading node runs a singleton loop and that another takes over when it leaves."""
+        monkeypatch.setattr(settings, "MESSAGE_BUS_LEADER_LEASE_SECONDS", 0.03)
+        broker = InMemoryBroker()
+        first, second = InMemoryMessageBus(broker), InMemoryMessageBus(broker)
+        running = []
+
+        def loop(name):
+            async def run():
+                running.append(name)
+                try:
+                    await asyncio.Event().wait()
+                finally:
+                    running.remove(name)
+            return run
+
+        supervisors = [
+            asyncio.create_task(run_while_leader(bus, loop(name)))
+            for bus, name in ((first, "first"), (second, "second"))
+        ]
+        await asyncio.sleep(0.05)
+        assert (first.is_leader, second.is_leader) == (True, False)
+        assert running == ["first"]
+
+        await first.close()
+        await asyncio.sleep(0.05)
+        assert running == ["second"]
+        for supervisor in supervisors:
+            supervisor.cancel()
+        await asyncio.gather(*supervisors, return_exceptions=True)
+        assert running == []
+
+    async def test_unreachable_redis_never_leads(self, monkeypatch):
+        """Test that a worker that cannot reach Redis does not take leadership or run singleton loops."""
+        monkeypatch.setattr(settings, "MESSAGE_BUS_LEADER_LEASE_SECONDS", 0.03)
+        assert not await RedisMessageBus("redis://127.0.0.1:1/0")._claim_leadership()
+
+        bus = RedisMessageBus("redis://127.0.0.1:1/0")
+        bus.subscribe("quote.*", lambda topic, data: None)
+        with pytest.raises(Exception):
+            await bus.start()
+        assert not bus.is_leader
+
+        started = []
+
+        async def loop():
+            started.append(True)
+
+        tasks = [asyncio.create_task(bus.lead()), asyncio.create_task(run_while_leader(bus, loop))]
+        await asyncio.sleep(0.05)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        assert not bus.is_leader
+        assert started == []
+        await bus.close()
+
+    async def test_wildcards_and_own_messages(self):
+        """Test that patterns match dotted topics and publishers skip their own messages."""
+        assert topic_matches("quote.*", "quote.AAPL")
+        assert not topic_matches("quote.*", "portfolio.p1")
+        assert topic_matches("cache.fx", "cache.fx")
+
+        broker = InMemoryBroker()
+        first, second = InMemoryMessageBus(broker), InMemoryMessageBus(broker)
+        received = {"first": [], "second": []}
+        first.subscribe("quote.*", lambda topic, data: received["first"].append((topic, data)))
+        second.subscribe("quote.*", lambda topic, data: received["second"].append((topic, data)))
+
+        first.publish("quote.AAPL", {"price": 1})
+        first.publish("portfolio.p1", {})
+        assert await first.flush() == 2
+        assert received == {"first": [], "second": [("quote.AAPL", {"price": 1})]}
+
+        await second.close()
+        assert not first.has_peers
+        first.publish("quote.AAPL", {"price": 2})
+        assert first.buffer == []
+
+    async def test_flush_groups_messages_by_topic(self):
+        """Test that a batch is delivered as one send per topic."""
+        broker = InMemoryBroker()
+        sender, receiver = InMemoryMessageBus(broker), InMemoryMessageBus(broker)
+        batches = []
+        receiver.dispatch = lambda pattern, topic, origin, messages: batches.append((topic, len(messages)))
+        receiver.subscribe("*", lambda topic, data: None)
+
+        for n in range(5):
+            sender.publish("quote.AAPL", {"n": n})
+        sender.publish("quote.MSFT", {"n": 5})
+        assert await sender.flush() == 6
+        assert sorted(batches) == [("quote.AAPL", 5), ("quote.MSFT", 1)]
+        assert await sender.flush() == 0
+
+
+class TestCrossWorker:
+    """Test that committed changes reach another worker's handlers."""
+
+    async def test_tick_reaches_other_worker(self, test_db: AsyncSession, workers):
+        """Test that a committed tick is streamed, cached and marked for valuation on the other worker."""
+        local, remote = workers
+        event_hub.register_bus_handlers(remote)
+        valuation_stream.register_bus_handlers(remote)
+        quote_cache.register_bus_handlers(remote)
+        fx_service.register_bus_handlers(remote)
+        subscription = get_event_hub().subscribe([quote_topic("AAPL")])
+        # Someone on the other worker watches a portfolio
+        get_valuation_hub().watchers["p1"] = {ValuationConnection("user")}
+
+        await PriceService(test_db).apply_quotes({"AAPL": Decimal("123.45")})
+        await test_db.rollback()
+        assert local.buffer == []
+
+        await PriceService(test_db).apply_quotes({"AAPL": Decimal("123.45")})
+        await test_db.commit()
+        # The local publish and the relayed one both reach the shared in-process hub
+        assert len(local.buffer) == 1
+        subscription.drain()
+        await local.flush()
+
+        [relayed] = subscription.drain()
+        assert b'"price":123.45' in relayed.frame
+        assert "AAPL" in get_valuation_hub().changed_symbols
+        cached = await quote_cache.get_quote_cache().get_many(["AAPL"])
+        assert cached["AAPL"].price == Decimal("123.45")
+
+    async def test_relayed_events_keep_their_ids(self, workers):
+        """Test that relayed alerts keep their origin's id and that resumes reach back past late arrivals."""
+        local, remote = workers
+        event_hub.register_bus_handlers(local)
+        hub = get_event_hub()
+        seen = hub.publish(alert_topic("u1"), "alert", {"n": 2})
+
+        # An older alert from the other worker arrives after the client has seen a newer local one
+        remote.publish(alert_topic("u1"), {"n": 1, "eventId": seen.id - 1000})
+        await remote.flush()
+        late = hub.recent[-1]
+        assert late.id == seen.id - 1000
+        assert b"eventId" not in late.frame
+        assert hub.next_id() > seen.id
+
+        resumed = hub.subscribe([alert_topic("u1")], last_event_id=seen.id)
+        assert [e.id for e in resumed.drain()] == [late.id, seen.id]
+
+    async def test_index_changes_reach_other_worker(
+        self, test_db: AsyncSession, test_user, test_portfolio, workers
+    ):
+        """Test that positions, alerts and fired alerts committed here are applied by the other worker's indexes."""
+        local, remote = workers
+        holdings_index.register_bus_handlers(remote)
+        alert_engine.register_bus_handlers(remote)
+        index, engine = get_holdings_index(), get_alert_engine()
+        await index.load(test_db)
+        await engine.load(test_db)
+
+        asset = Asset(
+            portfolio_id=test_portfolio.id, symbol="AAPL", name="Apple", asset_type=AssetType.STOCK,
+            quantity=Decimal("10"), average_cost=Decimal("100"), total_cost=Decimal("1000")
+        )
+        alert = Alert(
+            user_id=test_user.id, symbol="AAPL", alert_type=AlertType.PRICE_ABOVE,
+            condition_operator="greater_than", target_value=Decimal("150"), message="AAPL above 150"
+        )
+        test_db.add_all([asset, alert])
+        await test_db.commit()
+        asset_id, alert_id = asset.id, alert.id
+
+        # The other worker never saw the commit: its indexes fill from the messages
+        index.clear()
+        index.loaded = True
+        engine.clear()
+        engine.loaded = True
+        await local.flush()
+        [holding] = index.holders("AAPL")
+        assert (holding.asset_id, holding.quantity, holding.asset_type) == (asset_id, Decimal("10"), AssetType.STOCK)
+        assert set(engine.indexed) == {alert_id}
+
+        # A tick here fires the alert and revalues the holding there
+        await PriceService(test_db).apply_quotes({"AAPL": Decimal("160")})
+        await test_db.commit()
+        engine.add("stale", "AAPL", AlertType.PRICE_ABOVE, Decimal("150"))
+        engine.add(alert_id, "AAPL", AlertType.PRICE_ABOVE, Decimal("150"))
+        holding.market_value = Decimal("1000")
+        await local.flush()
+        assert set(engine.indexed) == {"stale"}
+        assert holding.market_value == Decimal("1600.00")
@@ -0,0 +1,174 @@
+"""
+Tests for the alert notification outbox and delivery worker
+"""
+
+import json
+import pytest
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Alert, AlertNotification, AlertType, NotificationStatus, User
+from app.services.alert_engine import get_alert_engine
+from app.services.notification_sender import (
+    FileNotificationSender, Notification, RecordingNotificationSender, get_notification_sender
+)
+from app.services.notification_service import NotificationDeliveryWorker, enqueue_alert_notifications
+from app.services.price_service import PriceService
+
+
+class FailingSender(RecordingNotificationSender):
+    async def send(self, notification):
+        raise RuntimeError("smtp unavailable")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = datetime(2024, 3, 5, 15, 0)
+
+    def __call__(self):
+        return self.now
+
+
+def session_factory(test_db: AsyncSession):
+    @asynccontextmanager
+    async def factory():
+        yield test_db
+    return factory
+
+
+async def create_alerts(test_db: AsyncSession, user_id: str, count: int, portfolio_id=None):
+    alerts = [
+        Alert(
+            user_id=user_id, portfolio_id=portfolio_id, symbol="AAPL", alert_type=AlertType.PRICE_ABOVE,
+            condition_operator="greater_than", target_value=Decimal(100 + i), message=f"AAPL above {100 + i}"
+        )
+        for i in range(count)
+    ]
+    test_db.add_all(alerts)
+    await test_db.commit()
+    return [alert.id for alert in alerts]
+
+
+async def outbox(test_db: AsyncSession):
+    return (await test_db.execute(
+        select(AlertNotification).order_by(AlertNotification.id).execution_options(populate_existing=True)
+    )).scalars().all()
+
+
+@pytest.fixture
+async def alert_engine():
+    engine = get_alert_engine()
+    yield engine
+    engine.clear()
+
+
+class TestAlertOutbox:
+    """Test that triggering alerts queues notifications transactionally."""
+
+    async def test_outbox_rows_commit_with_trigger(self, test_db: AsyncSession, test_user, alert_engine):
+        """Test that notifications exist exactly when the trigger is committed."""
+        user_id = test_user.id
+        await create_alerts(test_db, user_id, 2)
+        await alert_engine.load(test_db)
+
+        await PriceService(test_db).apply_quotes({"AAPL": Decimal("100.5")})
+        await test_db.rollback()
+        assert await outbox(test_db) == []
+
+        await alert_engine.load(test_db)
+        await PriceService(test_db).apply_quotes({"AAPL": Decimal("100.5")})
+        await test_db.commit()
+        rows = await outbox(test_db)
+        assert len(rows) == 1
+        assert rows[0].user_id == user_id
+        assert rows[0].message == "AAPL above 100"
+        assert rows[0].status == NotificationStatus.PENDING
+
+
+class TestNotificationDeliveryWorker:
+    """Test batched claiming, per-user dedupe, preferences and retries."""
+
+    async def test_digest_dedupe_and_preferences(self, test_db: AsyncSession, test_user, test_portfolio):
+        """Test one notification per user per window, honoring notification flags."""
+        quiet = User(
+            email="quiet@example.com", password_hash="hashed_password", first_name="Quiet", last_name="User",
+            email_notifications=False, push_notifications=False
+        )
+        test_db.add(quiet)
+        await test_db.commit()
+        test_user.push_notifications = False
+        test_user.portfolio_alerts = False
+        await test_db.commit()
+
+        await enqueue_alert_notifications(test_db, await create_alerts(test_db, test_user.id, 2))
+        await enqueue_alert_notifications(test_db, await create_alerts(test_db, quiet.id, 1))
+        await enqueue_alert_notifications(
+            test_db, await create_alerts(test_db, test_user.id, 1, portfolio_id=test_portfolio.id)
+        )
+        await test_db.commit()
+
+        clock = FakeClock()
+        sender = RecordingNotificationSender()
+        worker = NotificationDeliveryWorker(sender, session_factory(test_db), dedupe_seconds=300, clock=clock)
+        assert await worker.deliver_batch() == 4
+        assert len(sender.sent) == 1
+        assert sender.sent[0].channels == ("email",)
+        assert sender.sent[0].subject == "2 alerts triggered"
+        assert [row.status for row in await outbox(test_db)] == [
+            NotificationStatus.SENT, NotificationStatus.SENT, NotificationStatus.SKIPPED, NotificationStatus.SKIPPED
+        ]
+
+        # Within the window the user's new notifications wait, then go out together
+        await enqueue_alert_notifications(test_db, await create_alerts(test_db, test_user.id, 1))
+        await test_db.commit()
+        clock.now += timedelta(seconds=60)
+        assert await worker.deliver_batch() == 0
+        clock.now += timedelta(seconds=300)
+        assert await worker.deliver_batch() == 1
+        assert len(sender.sent) == 2
+        assert await worker.deliver_batch() == 0
+
+    async def test_failed_sends_are_retried(self, test_db: AsyncSession, test_user, monkeypatch):
+        """Test that failures return rows to pending, retried after a growing delay until the attempt limit."""
+        monkeypatch.setattr("app.core.config.settings.NOTIFICATION_MAX_ATTEMPTS", 3)
+        await enqueue_alert_notifications(test_db, await create_alerts(test_db, test_user.id, 1))
+        await test_db.commit()
+        clock = FakeClock()
+        worker = NotificationDeliveryWorker(FailingSender(), session_factory(test_db), retry_seconds=30, clock=clock)
+
+        assert await worker.deliver_batch() == 1
+        row = (await outbox(test_db))[0]
+        assert (row.status, row.attempts, row.last_error) == (NotificationStatus.PENDING, 1, "smtp unavailable")
+        assert row.next_attempt_at.replace(tzinfo=None) == clock.now + timedelta(seconds=30)
+        assert await worker.deliver_batch() == 0
+
+        clock.now += timedelta(seconds=30)
+        assert await worker.deliver_batch() == 1
+        assert (await outbox(test_db))[0].next_attempt_at.replace(tzinfo=None) == clock.now + timedelta(seconds=60)
+        clock.now += timedelta(seconds=30)
+        assert await worker.deliver_batch() == 0
+        clock.now += timedelta(seconds=30)
+        assert await worker.deliver_batch() == 1
+        assert (await outbox(test_db))[0].status == NotificationStatus.FAILED
+        assert await worker.deliver_batch() == 0
+
+    async def test_file_sender_appends_json_lines(self, tmp_path):
+        """Test that the file sender writes one JSON record per notification."""
+        path = tmp_path / "notifications.jsonl"
+        sender = FileNotificationSender(str(path))
+        for subject in ("first", "second"):
+            await sender.send(Notification("u1", "a@example.com", ("email",), subject, (subject,), ("a1",)))
+        records = [json.loads(line) for line in path.read_text().splitlines()]
+        assert [r["subject"] for r in records] == ["first", "second"]
+        assert records[0]["channels"] == ["email"]
+
+    def test_file_sender_needs_a_path(self, monkeypatch):
+        """Test that selecting the file sender without a path fails at startup instead of on every send."""
+        monkeypatch.setattr("app.core.config.settings.NOTIFICATION_FILE_PATH", "")
+        with pytest.raises(ValueError):
+            get_notification_sender("file")
+        monkeypatch.setattr("app.core.config.settings.NOTIFICATION_FILE_PATH", "/tmp/notifications.jsonl")
+        assert isinstance(get_notification_sender("file"), FileNotificationSender)
@@ -0,0 +1,209 @@
+"""
+Tests for the daily valuation series and period returns
+"""
+
+import pytest
+import numpy as np
+from decimal import Decimal
+from datetime import date, datetime, timedelta
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import (
+    Asset, AssetType, MarketData, PortfolioValuation, Transaction, TransactionType
+)
+from app.services.performance_service import PerformanceService, ValuationSeries, forward_fill
+from app.services.portfolio_service import PortfolioService
+
+
+class TestValuationSeries:
+    """Test the vectorized period return calculation."""
+
+    def test_forward_fill(self):
+        """Test that gaps carry the last observation and leading gaps become zero."""
+        matrix = np.array([[np.nan, 1.0], [2.0, np.nan], [np.nan, 3.0]])
+        filled = forward_fill(matrix)
+
+        assert filled.tolist() == [[0.0, 1.0], [2.0, 1.0], [2.0, 3.0]]
+
+    def test_inception_return_with_single_buy(self):
+        """Test inception return when all capital was invested on day one."""
+        dates = np.arange(np.datetime64("2024-01-01"), np.datetime64("2024-01-11"))
+        values = np.linspace(1000, 1100, len(dates))
+        flows = np.zeros(len(dates))
+        flows[0] = 1000
+
+        series = ValuationSeries(dates, values, flows)
+        inception = series.period_returns([None], date(2024, 1, 10))[0]
+
+        assert inception.return_value == Decimal("100.0")
+        assert inception.return_percent == Decimal("10.0")
+        assert inception.start_value == Decimal("0.0")
+
+    def test_window_excludes_flows_from_gain(self):
+        """Test that deposits inside a window are not counted as gains."""
+        dates = np.arange(np.datetime64("2024-01-01"), np.datetime64("2024-01-04"))
+        values = np.array([1000.0, 1000.0, 2000.0])
+        flows = np.array([1000.0, 0.0, 1000.0])
+
+        series = ValuationSeries(dates, values, flows)
+        period = series.period_returns([date(2024, 1, 1)], date(2024, 1, 3))[0]
+
+        assert period.return_value == Decimal("0.0")
+        assert period.start_value == Decimal("1000.0")
+        assert period.end_value == Decimal("2000.0")
+
+    def test_empty_window_returns_none(self):
+        """Test that a window with no elapsed days yields no period."""
+        dates = np.array(["2024-01-01"], dtype="datetime64[D]")
+        series = ValuationSeries(dates, np.array([100.0]), np.array([100.0]))
+
+        assert series.period_returns([date(2024, 1, 1)], date(2024, 1, 1)) == [None]
+
+
+class TestPerformanceService:
+    """Test valuation series persistence and period calculation."""
+
+    async def _create_history(self, test_db: AsyncSession, test_portfolio, days_ago: int):
+        asset = Asset(
+            portfolio_id=test_portfolio.id,
+            symbol="AAPL",
+            name="Apple Inc.",
+            asset_type=AssetType.STOCK,
+            quantity=Decimal("10"),
+            average_cost=Decimal("100.00"),
+            current_price=Decimal("120.00"),
+            market_value=Decimal("1200.00"),
+            total_cost=Decimal("1000.00")
+        )
+        test_db.add(asset)
+        await test_db.flush()
+
+        start = datetime.utcnow() - timedelta(days=days_ago)
+        test_db.add(Transaction(
+            portfolio_id=test_portfolio.id,
+            asset_id=asset.id,
+            transaction_type=TransactionType.BUY,
+            symbol="AAPL",
+            quantity=Decimal("10"),
+            price=Decimal("100.00"),
+            total_amount=Decimal("1000.00"),
+            transaction_date=start
+        ))
+        test_db.add(MarketData(
+            symbol="AAPL",
+            price=Decimal("110.00"),
+            change=Decimal("10.00"),
+            change_percent=Decimal("10.00"),
+            timestamp=start + timedelta(days=days_ago // 2)
+        ))
+        test_portfolio.total_value = Decimal("1200.00")
+        test_portfolio.total_cost = Decimal("1000.00")
+        await test_db.commit()
+
+    async def test_series_is_persisted_for_closed_days(self, test_db: AsyncSession, test_portfolio):
+        """Test that rebuilding stores one row per closed day."""
+        await self._create_history(test_db, test_portfolio, days_ago=10)
+
+        series = await PerformanceService(test_db).get_valuation_series(test_portfolio)
+
+        result = await test_db.execute(
+            select(PortfolioValuation).where(PortfolioValuation.portfolio_id == test_portfolio.id)
+        )
+        persisted = result.scalars().all()
+        assert len(persisted) == 10
+        assert len(series) == 11
+        assert series.values[0] == 1000.0
+        assert series.values[5] == 1100.0
+        assert series.values[-1] == 1200.0
+
+    async def test_named_periods_and_custom_range(self, test_db: AsyncSession, test_user, test_portfolio):
+        """Test that periods within the history are filled and longer ones are left empty."""
+        await self._create_history(test_db, test_portfolio, days_ago=10)
+        service = PortfolioService(test_db)
+        today = datetime.utcnow().date()
+
+        performance = await service.calculate_portfolio_performance(
+            test_portfolio.id, test_user.id, start_date=today - timedelta(days=5)
+        )
+
+        assert performance.one_day is not None
+        assert performance.one_week is not None
+        assert performance.one_month is None
+        assert performance.inception.return_value == Decimal("200.0")
+        assert performance.inception.return_percent == Decimal("20.0")
+        assert performance.custom.start_value == Decimal("1100.0")
+        assert performance.custom.return_value == Decimal("100.0")
+
+    async def test_custom_range_must_be_ordered(self, test_db: AsyncSession, test_user, test_portfolio):
+        """Test that an inverted custom range is rejected."""
+        from fastapi import HTTPException
+
+        service = PortfolioService(test_db)
+        with pytest.raises(HTTPException) as exc_info:
+            await service.calculate_portfolio_performance(
+                test_portfolio.id, test_user.id,
+                start_date=date(2024, 2, 1), end_date=date(2024, 1, 1)
+            )
+
+        assert exc_info.value.status_code == 400
+
+    async def test_totals_update_invalidates_series_from_trade_date(self, test_db: AsyncSession, test_portfolio):
+        """Test that price-only updates keep the series and trade changes drop it from their date on."""
+        await self._create_history(test_db, test_portfolio, days_ago=6)
+        await PerformanceService(test_db).get_valuation_series(test_portfolio)
+        today = datetime.utcnow().date()
+
+        async def persisted_dates():
+            result = await test_db.execute(
+                select(PortfolioValuation.valuation_date)
+                .where(PortfolioValuation.portfolio_id == test_portfolio.id)
+                .order_by(PortfolioValuation.valuation_date)
+            )
+            return result.scalars().all()
+
+        await PortfolioService(test_db)._update_portfolio_totals(test_portfolio.id)
+        await test_db.commit()
+        assert len(await persisted_dates()) == 6
+
+        await PortfolioService(test_db)._update_portfolio_totals(
+            test_portfolio.id, today - timedelta(days=2)
+        )
+        await test_db.commit()
+        assert (await persisted_dates())[-1] == today - timedelta(days=3)
+
+        # The next read rebuilds only the dropped days
+        series = await PerformanceService(test_db).get_valuation_series(test_portfolio)
+        assert len(await persisted_dates()) == 6
+        assert len(series) == 7
+
+    async def test_overlapping_rebuilds_upsert_the_same_days(self, test_db: AsyncSession, test_portfolio):
+        """Test that a second rebuild of already persisted days updates them instead of conflicting."""
+        await self._create_history(test_db, test_portfolio, days_ago=5)
+        today = datetime.utcnow().date()
+        service = PerformanceService(test_db)
+
+        assert await service.rebuild_valuation_series(test_portfolio.id, today) == 5
+        assert await service.rebuild_valuation_series(test_portfolio.id, today) == 5
+        await test_db.commit()
+
+        result = await test_db.execute(
+            select(PortfolioValuation).where(PortfolioValuation.portfolio_id == test_portfolio.id)
+        )
+        assert len(result.scalars().all()) == 5
+        assert test_portfolio.valued_through == today - timedelta(days=1)
+
+    async def test_empty_series_is_not_rebuilt_on_every_read(
+        self, test_db: AsyncSession, test_portfolio, monkeypatch
+    ):
+        """Test that a portfolio without closed-day trades is marked up to date after one read."""
+        service = PerformanceService(test_db)
+        series = await service.get_valuation_series(test_portfolio)
+        assert len(series) == 0
+        assert test_portfolio.valued_through == datetime.utcnow().date() - timedelta(days=1)
+
+        async def fail(*args, **kwargs):
+            raise AssertionError("series rebuilt again")
+
+        monkeypatch.setattr(service, "rebuild_valuation_series", fail)
+        assert len(await service.get_valuation_series(test_portfolio)) == 0
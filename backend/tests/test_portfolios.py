@@ -409,6 +409,40 @@ class TestPortfolioEndpoints:
         assert "total_return" in data or response.status_code == 404  # May not have performance data initially
 
 
+    async def test_get_household_summary(
+        self,
+        client: AsyncClient,
+        test_user_data: dict,
+        test_portfolio_data: dict
+    ):
+        """Test the consolidated view across portfolios."""
+        login_response = await client.post("/api/v1/auth/register", json=test_user_data)
+        tokens = login_response.json()["tokens"]
+        headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+
+        for name in ("Taxable", "Retirement"):
+            create_response = await client.post(
+                "/api/v1/portfolios/",
+                json={**test_portfolio_data, "name": name},
+                headers=headers
+            )
+            await client.post(
+                f"/api/v1/portfolios/{create_response.json()['id']}/assets",
+                json={"symbol": "AAPL", "quantity": 10, "price": 150.00},
+                headers=headers
+            )
+
+        response = await client.get("/api/v1/portfolios/household", headers=headers)
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["portfolioCount"] == 2
+        assert len(data["positions"]) == 1
+        assert data["positions"][0]["portfolioCount"] == 2
+        assert float(data["positions"][0]["quantity"]) == 20.0
+        assert float(data["totalValue"]) == float(data["positions"][0]["marketValue"])
+
+
 class TestPortfolioService:
     """Test portfolio service methods."""
 
@@ -483,4 +517,42 @@ class TestPortfolioService:
             await service.create_portfolio(user_id, portfolio_data)
         
         assert exc_info.value.status_code == 400
-        assert "Portfolio with this name already exists" in str(exc_info.value.detail)
\ No newline at end of file
+        assert "Portfolio with this name already exists" in str(exc_info.value.detail)
+
+    async def test_household_summary_service(self, test_db: AsyncSession, test_user, test_portfolio):
+        """Test merging positions by symbol across portfolios."""
+        from decimal import Decimal
+        from app.db.models import Asset, AssetType, Portfolio
+
+        second = Portfolio(user_id=test_user.id, name="Second Portfolio")
+        test_db.add(second)
+        await test_db.flush()
+        for portfolio_id, symbol, asset_type, quantity, price in (
+            (test_portfolio.id, "AAPL", AssetType.STOCK, "10", "100"),
+            (second.id, "AAPL", AssetType.STOCK, "30", "100"),
+            (second.id, "AGG", AssetType.BOND, "20", "50"),
+        ):
+            test_db.add(Asset(
+                portfolio_id=portfolio_id,
+                symbol=symbol,
+                name=symbol,
+                asset_type=asset_type,
+                quantity=Decimal(quantity),
+                average_cost=Decimal(price),
+                current_price=Decimal(price),
+                market_value=Decimal(quantity) * Decimal(price),
+                total_cost=Decimal(quantity) * Decimal(price)
+            ))
+        await test_db.commit()
+
+        household = await PortfolioService(test_db).get_household_summary(test_user.id)
+
+        positions = {p.symbol: p for p in household.positions}
+        assert household.portfolio_count == 2
+        assert household.total_value == Decimal("5000")
+        assert positions["AAPL"].quantity == Decimal("40")
+        assert positions["AAPL"].weight == Decimal("80")
+        assert positions["AAPL"].portfolio_count == 2
+        assert {a.asset_type: a.value for a in household.allocation} == {
+            AssetType.STOCK: Decimal("4000"), AssetType.BOND: Decimal("1000")
+        }
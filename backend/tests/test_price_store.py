@@ -0,0 +1,109 @@
+"""
+Tests for the memory-mapped columnar price store
+"""
+
+import numpy as np
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.models import BarResolution, MarketData
+from app.services.compaction_service import CompactionService
+from app.services.price_store import PriceStore
+from app.services.risk_service import RiskService
+
+
+DAY = 86400
+
+
+class TestPriceStore:
+    """Test appends, compaction and aligned loads."""
+
+    def test_append_and_compaction(self, tmp_path):
+        """Test that out-of-order appends are sorted and the last write per timestamp wins."""
+        store = PriceStore(str(tmp_path))
+        store.append("aapl", np.array([0, DAY]), np.array([10.0, 11.0]))
+        store.append("AAPL", np.array([2 * DAY]), np.array([12.0]))
+        timestamps, prices = store.load("AAPL")
+        assert isinstance(timestamps, np.memmap)
+        assert timestamps.tolist() == [0, DAY, 2 * DAY]
+
+        store.append("AAPL", np.array([DAY, 3 * DAY]), np.array([11.5, 13.0]))
+        timestamps, prices = store.load("AAPL")
+        assert timestamps.tolist() == [0, DAY, 2 * DAY, 3 * DAY]
+        assert prices.tolist() == [10.0, 11.5, 12.0, 13.0]
+        assert store.symbols() == ["AAPL"]
+
+    def test_load_matrix_aligns_symbols(self, tmp_path):
+        """Test the union grid, range slicing and gaps for missing observations."""
+        store = PriceStore(str(tmp_path))
+        store.append("A", np.array([0, DAY, 2 * DAY, 3 * DAY]), np.array([1.0, 2.0, 3.0, 4.0]))
+        store.append("B", np.array([DAY, 3 * DAY]), np.array([20.0, 40.0]))
+
+        grid, matrix = store.load_matrix(["A", "B", "MISSING"], date(1970, 1, 2), date(1970, 1, 4))
+
+        assert grid.tolist() == [DAY, 2 * DAY]
+        assert matrix[:, 0].tolist() == [2.0, 3.0]
+        assert matrix[0, 1] == 20.0
+        assert np.isnan(matrix[1, 1])
+        assert np.isnan(matrix[:, 2]).all()
+
+    async def test_rebuild_and_risk_reads(self, test_db: AsyncSession, tmp_path, monkeypatch):
+        """Test rebuilding from market data and that risk reads the same matrix from the store."""
+        start = datetime.combine(datetime.utcnow().date(), datetime.min.time()) - timedelta(days=30)
+        for symbol, base in (("AAA", 100), ("BBB", 50)):
+            for i in range(30):
+                test_db.add(MarketData(
+                    symbol=symbol,
+                    price=Decimal(base + i),
+                    change=Decimal("0"),
+                    change_percent=Decimal("0"),
+                    timestamp=start + timedelta(days=i, hours=15)
+                ))
+        await test_db.commit()
+        from_db = await RiskService(test_db).get_price_matrix(["AAA", "BBB"], 60)
+
+        monkeypatch.setattr(settings, "PRICE_STORE_PATH", str(tmp_path))
+        store = PriceStore(str(tmp_path))
+        assert await store.rebuild(test_db) == 2
+        from_store = await RiskService(test_db).get_price_matrix(["AAA", "BBB"], 60)
+
+        assert from_store[0] == from_db[0] == ["AAA", "BBB"]
+        assert np.array_equal(from_store[1], from_db[1])
+        assert from_store[1].shape == (30, 2)
+
+        # Compaction appends new daily bars, overwriting the days the rebuild folded from ticks
+        await CompactionService(test_db).compact_resolution(BarResolution.MINUTE, datetime.utcnow())
+        await CompactionService(test_db).compact_resolution(BarResolution.HOUR, datetime.utcnow())
+        assert await CompactionService(test_db).compact_resolution(BarResolution.DAY, datetime.utcnow()) == 60
+        timestamps, prices = store.load("AAA")
+        assert len(timestamps) == 30
+        assert prices[-1] == 129.0
+
+    async def test_risk_reads_days_the_store_lacks(self, test_db: AsyncSession, tmp_path, monkeypatch):
+        """Test that symbols missing from the store and days past its last close come from the database."""
+        start = datetime.combine(datetime.utcnow().date(), datetime.min.time()) - timedelta(days=30)
+        for symbol, base in (("AAA", 100), ("BBB", 50)):
+            for i in range(30):
+                test_db.add(MarketData(
+                    symbol=symbol,
+                    price=Decimal(base + i),
+                    change=Decimal("0"),
+                    change_percent=Decimal("0"),
+                    timestamp=start + timedelta(days=i, hours=15)
+                ))
+        await test_db.commit()
+        from_db = await RiskService(test_db).get_price_matrix(["AAA", "BBB"], 60)
+
+        # The store holds only the first 20 days of AAA
+        monkeypatch.setattr(settings, "PRICE_STORE_PATH", str(tmp_path))
+        store = PriceStore(str(tmp_path))
+        first = int(np.datetime64(start.date(), "s").astype(np.int64))
+        store.append("AAA", first + DAY * np.arange(20), 100.0 + np.arange(20))
+        from_store = await RiskService(test_db).get_price_matrix(["AAA", "BBB"], 60)
+        assert np.array_equal(from_store[1], from_db[1])
+
+        assert await store.rebuild(test_db, missing_only=True) == 1
+        assert store.symbols() == ["AAA", "BBB"]
+        assert len(store.load("AAA")[0]) == 20
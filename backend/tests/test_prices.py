@@ -0,0 +1,151 @@
+"""
+Tests for set-based price ingestion
+"""
+
+import pytest
+from datetime import date
+from decimal import Decimal
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Asset, AssetType, Portfolio, SymbolQuote
+from app.services import price_service
+from app.services.holdings_index import get_holdings_index
+from app.services.price_service import PriceService
+from app.services.quote_service import QuoteService
+
+
+async def create_holders(test_db: AsyncSession, test_user, test_portfolio):
+    second = Portfolio(user_id=test_user.id, name="Second Portfolio")
+    test_db.add(second)
+    await test_db.flush()
+    for portfolio_id, symbol, quantity in (
+        (test_portfolio.id, "AAPL", "10"),
+        (test_portfolio.id, "AGG", "10"),
+        (second.id, "AAPL", "5"),
+    ):
+        test_db.add(Asset(
+            portfolio_id=portfolio_id,
+            symbol=symbol,
+            name=symbol,
+            asset_type=AssetType.STOCK,
+            quantity=Decimal(quantity),
+            average_cost=Decimal("100"),
+            current_price=Decimal("100"),
+            market_value=Decimal(quantity) * 100,
+            total_cost=Decimal(quantity) * 100
+        ))
+    await test_db.commit()
+    return second
+
+
+class TestPriceService:
+    """Test repricing every holder of a symbol in bulk."""
+
+    async def test_apply_quotes_reprices_all_holders(self, test_db: AsyncSession, test_user, test_portfolio):
+        """Test asset values, portfolio totals and weights after a tick."""
+        second = await create_holders(test_db, test_user, test_portfolio)
+        await QuoteService(test_db).rollover_daily_close(date(2024, 1, 2))
+
+        updated = await PriceService(test_db).apply_quotes({"aapl": Decimal("120"), "MSFT": Decimal("300")})
+        await test_db.commit()
+
+        assert updated == 2
+        assets = (await test_db.execute(select(Asset).execution_options(populate_existing=True))).scalars().all()
+        by_key = {(a.portfolio_id, a.symbol): a for a in assets}
+        aapl = by_key[(test_portfolio.id, "AAPL")]
+        assert aapl.current_price == Decimal("120")
+        assert aapl.market_value == Decimal("1200")
+        assert aapl.unrealized_gain_loss == Decimal("200")
+        assert aapl.day_change == Decimal("200")
+        assert aapl.last_price_update is not None
+        assert by_key[(test_portfolio.id, "AGG")].current_price == Decimal("100")
+
+        portfolios = {p.id: p for p in (await test_db.execute(select(Portfolio).execution_options(populate_existing=True))).scalars().all()}
+        assert portfolios[test_portfolio.id].total_value == Decimal("2200")
+        assert portfolios[second.id].total_value == Decimal("600")
+        assert portfolios[second.id].day_change == Decimal("100")
+        assert float(aapl.weight) == pytest.approx(1200 / 2200 * 100)
+
+        quotes = {q.symbol: q.price for q in (await test_db.execute(select(SymbolQuote))).scalars().all()}
+        assert quotes["MSFT"] == Decimal("300")
+
+    async def test_large_batches_are_chunked(self, test_db: AsyncSession, test_user, test_portfolio, monkeypatch):
+        """Test that batches larger than one statement still reach every holder."""
+        await create_holders(test_db, test_user, test_portfolio)
+        monkeypatch.setattr(price_service, "SQLITE_CHUNK_ROWS", 2)
+
+        quotes = {f"SYM{i}": Decimal("1") for i in range(5)}
+        quotes["AGG"] = Decimal("90")
+        updated = await PriceService(test_db).apply_quotes(quotes)
+        await test_db.commit()
+
+        assert updated == 1
+        portfolio = await test_db.get(Portfolio, test_portfolio.id)
+        await test_db.refresh(portfolio)
+        assert portfolio.total_value == Decimal("1900")
+
+
+
+@pytest.fixture
+async def holdings_index():
+    index = get_holdings_index()
+    yield index
+    index.clear()
+
+
+class TestHoldingsIndex:
+    """Test the symbol-to-holdings index and targeted repricing."""
+
+    async def test_index_follows_committed_asset_changes(
+        self, test_db: AsyncSession, test_user, test_portfolio, holdings_index
+    ):
+        """Test that creates and deletes reach the index only when committed."""
+        second = await create_holders(test_db, test_user, test_portfolio)
+        assert await holdings_index.load(test_db) == 3
+        second_id = second.id
+        assert {h.portfolio_id for h in holdings_index.holders("aapl")} == {test_portfolio.id, second_id}
+
+        asset = Asset(
+            portfolio_id=second_id, symbol="MSFT", name="MSFT", asset_type=AssetType.STOCK,
+            quantity=Decimal("2"), average_cost=Decimal("300"), total_cost=Decimal("600")
+        )
+        test_db.add(asset)
+        await test_db.flush()
+        assert holdings_index.holders("MSFT") == []
+        await test_db.rollback()
+        assert holdings_index.holders("MSFT") == []
+
+        test_db.add(asset)
+        await test_db.commit()
+        await test_db.refresh(asset)
+        assert [h.asset_id for h in holdings_index.holders("MSFT")] == [asset.id]
+
+        await test_db.delete(asset)
+        await test_db.commit()
+        assert holdings_index.holders("MSFT") == []
+        assert len(holdings_index.by_portfolio[second_id]) == 1
+
+    async def test_indexed_apply_quotes_matches_set_based(
+        self, test_db: AsyncSession, test_user, test_portfolio, holdings_index
+    ):
+        """Test that revaluing through the index writes the same values by primary key."""
+        second = await create_holders(test_db, test_user, test_portfolio)
+        await holdings_index.load(test_db)
+
+        updated = await PriceService(test_db).apply_quotes({"AAPL": Decimal("120")})
+        await test_db.commit()
+
+        assert updated == 2
+        assert holdings_index.pending_assets == {}
+        assets = (await test_db.execute(select(Asset).execution_options(populate_existing=True))).scalars().all()
+        by_key = {(a.portfolio_id, a.symbol): a for a in assets}
+        aapl = by_key[(test_portfolio.id, "AAPL")]
+        assert aapl.market_value == Decimal("1200")
+        assert aapl.unrealized_gain_loss == Decimal("200")
+        assert float(aapl.weight) == pytest.approx(1200 / 2200 * 100, abs=1e-4)
+        assert float(by_key[(test_portfolio.id, "AGG")].weight) == pytest.approx(1000 / 2200 * 100, abs=1e-4)
+
+        portfolios = {p.id: p for p in (await test_db.execute(select(Portfolio).execution_options(populate_existing=True))).scalars().all()}
+        assert portfolios[test_portfolio.id].total_value == Decimal("2200")
+        assert portfolios[second.id].total_value == Decimal("600")
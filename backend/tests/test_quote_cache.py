@@ -0,0 +1,137 @@
+"""
+Tests for the latest-quote cache
+"""
+
+import asyncio
+import pytest
+from decimal import Decimal
+from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.models import Asset
+from app.services.market_data_provider import StaticMarketDataProvider
+from app.services.quote_cache import DatabaseQuoteProvider, QuoteCache, configure_quote_cache
+
+
+class SlowProvider(StaticMarketDataProvider):
+    async def get_quotes(self, symbols):
+        await asyncio.sleep(0.01)
+        return await super().get_quotes(symbols)
+
+
+@pytest.fixture
+def quote_source():
+    source = StaticMarketDataProvider({"AAPL": Decimal("190.00")})
+    configure_quote_cache(source)
+    yield source
+    configure_quote_cache(StaticMarketDataProvider())
+
+
+class TestQuoteCache:
+    """Test TTL, stale-while-revalidate and request coalescing."""
+
+    async def test_concurrent_misses_share_one_fetch(self):
+        """Test single-flight coalescing and batching of misses."""
+        source = SlowProvider({"AAPL": Decimal("190"), "MSFT": Decimal("370")})
+        cache = QuoteCache(source, ttl=60)
+
+        results = await asyncio.gather(
+            cache.get_many(["AAPL", "MSFT"]),
+            cache.get("aapl"),
+            cache.get_many(["MSFT", "TSLA"]),
+        )
+
+        assert results[0]["MSFT"].price == Decimal("370")
+        assert results[1].price == Decimal("190")
+        assert "TSLA" not in results[2]
+        assert source.requests == [["AAPL", "MSFT"], ["TSLA"]]
+
+        await cache.get_many(["AAPL", "MSFT", "TSLA"])
+        assert len(source.requests) == 2
+
+    async def test_stale_entries_served_while_revalidating(self):
+        """Test that an expired entry is returned at once and refreshed in the background."""
+        source = StaticMarketDataProvider({"AAPL": Decimal("190")})
+        cache = QuoteCache(source, ttl=0, stale=60)
+        await cache.get("AAPL")
+        source.quotes["AAPL"] = Decimal("195")
+
+        stale = await cache.get("AAPL")
+        await asyncio.sleep(0)
+        fresh = cache.entries["AAPL"][0]
+
+        assert stale.price == Decimal("190")
+        assert fresh.price == Decimal("195")
+        assert len(source.requests) == 2
+
+
+class TestQuoteCacheReadThrough:
+    """Test that portfolio views read prices through the cache."""
+
+    async def test_portfolio_view_uses_cached_price(
+        self,
+        client: AsyncClient,
+        test_db: AsyncSession,
+        test_user_data: dict,
+        test_portfolio_data: dict,
+        quote_source
+    ):
+        """Test that a newer cached quote is shown on the portfolio without being written."""
+        login_response = await client.post("/api/v1/auth/register", json=test_user_data)
+        tokens = login_response.json()["tokens"]
+        headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+        create_response = await client.post("/api/v1/portfolios/", json=test_portfolio_data, headers=headers)
+        portfolio_id = create_response.json()["id"]
+        await client.post(
+            f"/api/v1/portfolios/{portfolio_id}/assets",
+            json={"symbol": "AAPL", "quantity": 10, "price": 150.00},
+            headers=headers
+        )
+
+        response = await client.get(f"/api/v1/portfolios/{portfolio_id}", headers=headers)
+
+        assert response.status_code == 200
+        data = response.json()
+        assert float(data["assets"][0]["currentPrice"]) == 190.0
+        assert float(data["totalValue"]) == 1900.0
+        assert quote_source.requests == [["AAPL"]]
+        household = (await client.get("/api/v1/portfolios/household", headers=headers)).json()
+        assert float(household["totalValue"]) == 1900.0
+        stored = (await test_db.execute(select(Asset.current_price, Asset.market_value))).one()
+        assert stored == (Decimal("150"), Decimal("1500"))
+
+    async def test_manual_price_survives_views(
+        self,
+        client: AsyncClient,
+        test_db: AsyncSession,
+        test_user_data: dict,
+        test_portfolio_data: dict
+    ):
+        """Test that a price set by hand is what the quote table, and so the cache, serves next."""
+        configure_quote_cache(DatabaseQuoteProvider(async_sessionmaker(test_db.bind, expire_on_commit=False)))
+        try:
+            login_response = await client.post("/api/v1/auth/register", json=test_user_data)
+            headers = {"Authorization": f"Bearer {login_response.json()['tokens']['access_token']}"}
+            create_response = await client.post("/api/v1/portfolios/", json=test_portfolio_data, headers=headers)
+            portfolio_id = create_response.json()["id"]
+            asset = (await client.post(
+                f"/api/v1/portfolios/{portfolio_id}/assets",
+                json={"symbol": "AAPL", "quantity": 10, "price": 100.00},
+                headers=headers
+            )).json()
+            await client.get(f"/api/v1/portfolios/{portfolio_id}", headers=headers)
+
+            await client.patch(
+                f"/api/v1/portfolios/{portfolio_id}/assets/{asset['id']}",
+                json={"currentPrice": 200.00},
+                headers=headers
+            )
+            data = (await client.get(f"/api/v1/portfolios/{portfolio_id}", headers=headers)).json()
+
+            assert float(data["assets"][0]["currentPrice"]) == 200.0
+            assert float(data["totalValue"]) == 2000.0
+            stored = (await test_db.execute(select(Asset.current_price))).scalar_one()
+            assert stored == Decimal("200")
+        finally:
+            configure_quote_cache(StaticMarketDataProvider())
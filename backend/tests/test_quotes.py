@@ -0,0 +1,105 @@
+"""
+Tests for previous-close storage and day change
+"""
+
+from datetime import date
+from decimal import Decimal
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Asset, AssetType, Portfolio, SymbolQuote
+from app.schemas.portfolio import AssetCreate, AssetUpdate
+from app.services.portfolio_service import PortfolioService
+from app.services.quote_service import QuoteService
+
+
+class TestQuoteService:
+    """Test the daily close rollover and day change calculation."""
+
+    async def _add_asset(self, test_db: AsyncSession, portfolio_id: str, price: str = "100") -> Asset:
+        asset = Asset(
+            portfolio_id=portfolio_id,
+            symbol="AAPL",
+            name="Apple Inc.",
+            asset_type=AssetType.STOCK,
+            quantity=Decimal("10"),
+            average_cost=Decimal("80"),
+            current_price=Decimal(price),
+            market_value=Decimal("10") * Decimal(price),
+            total_cost=Decimal("800")
+        )
+        test_db.add(asset)
+        await test_db.commit()
+        return asset
+
+    async def test_rollover_seeds_and_is_idempotent(self, test_db: AsyncSession, test_portfolio):
+        """Test that held symbols are seeded and rolled once per close date."""
+        await self._add_asset(test_db, test_portfolio.id)
+        service = QuoteService(test_db)
+
+        assert await service.rollover_daily_close(date(2024, 1, 2)) == 1
+        assert await service.rollover_daily_close(date(2024, 1, 2)) == 0
+        await test_db.commit()
+
+        quote = (await test_db.execute(select(SymbolQuote))).scalar_one()
+        assert quote.previous_close == Decimal("100")
+        assert quote.close_date == date(2024, 1, 2)
+
+    async def test_day_change_against_previous_close(self, test_db: AsyncSession, test_portfolio):
+        """Test that day change is no longer the unrealized gain."""
+        asset = await self._add_asset(test_db, test_portfolio.id)
+        await QuoteService(test_db).rollover_daily_close(date(2024, 1, 2))
+        await test_db.commit()
+
+        asset.current_price = Decimal("105")
+        asset.market_value = Decimal("1050")
+        await PortfolioService(test_db)._update_portfolio_totals(test_portfolio.id)
+        await test_db.commit()
+        await test_db.refresh(asset)
+
+        assert asset.unrealized_gain_loss == Decimal("250")
+        assert asset.day_change == Decimal("50")
+        assert asset.day_change_percent == Decimal("5")
+        portfolio = await test_db.get(Portfolio, test_portfolio.id)
+        await test_db.refresh(portfolio)
+        assert portfolio.day_change == Decimal("50")
+        assert portfolio.day_change_percent == Decimal("5")
+
+    async def test_bulk_refresh_of_day_changes(self, test_db: AsyncSession, test_portfolio):
+        """Test the set-based refresh after new prices are recorded."""
+        asset = await self._add_asset(test_db, test_portfolio.id, price="110")
+        service = QuoteService(test_db)
+        await service.record_prices({"AAPL": Decimal("100")})
+        await service.rollover_daily_close(date(2024, 1, 2))
+        await test_db.execute(
+            Portfolio.__table__.update().values(total_value=Decimal("1100"))
+        )
+        await service.refresh_day_changes(["AAPL"])
+        await test_db.commit()
+
+        await test_db.refresh(asset)
+        portfolio = await test_db.get(Portfolio, test_portfolio.id)
+        await test_db.refresh(portfolio)
+        assert asset.day_change == Decimal("100")
+        assert portfolio.day_change == Decimal("100")
+        assert portfolio.day_change_percent == Decimal("10")
+
+    async def test_manual_price_rolls_into_previous_close(self, test_db: AsyncSession, test_user, test_portfolio):
+        """Test that a price set by hand is recorded and becomes the next day's previous close."""
+        service = PortfolioService(test_db)
+        asset = await service.add_asset(test_portfolio.id, test_user.id, AssetCreate(
+            symbol="AAPL", quantity=Decimal("10"), price=Decimal("100")
+        ))
+        await QuoteService(test_db).rollover_daily_close(date(2024, 1, 2))
+        await test_db.commit()
+
+        await service.update_asset(
+            test_portfolio.id, asset.id, test_user.id, AssetUpdate(current_price=Decimal("200"))
+        )
+        await QuoteService(test_db).rollover_daily_close(date(2024, 1, 3))
+        await test_db.commit()
+
+        quote = (await test_db.execute(select(SymbolQuote))).scalar_one()
+        await test_db.refresh(quote)
+        assert quote.price == Decimal("200")
+        assert quote.previous_close == Decimal("200")
@@ -0,0 +1,215 @@
+"""
+Tests for allocation targets and rebalancing
+"""
+
+import pytest
+import numpy as np
+from decimal import Decimal
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Asset, AssetType, Portfolio
+from app.schemas.analytics import AllocationTargetItem, RebalanceMode, RebalanceRequest
+from app.services.market_data_provider import StaticMarketDataProvider
+from app.services.portfolio_service import PortfolioService
+from app.services.quote_cache import configure_quote_cache
+from app.services.rebalance_service import RebalanceService, solve_rebalance
+
+
+class TestSolveRebalance:
+    """Test the vectorized rebalancing solver."""
+
+    def _solve(self, values, groups, targets, mode, tolerance=0.05, cash=0.0, books=None):
+        targets = np.array(targets)
+        group_book = np.zeros(len(targets), dtype=np.int64) if books is None else np.array(books)
+        return solve_rebalance(
+            np.array(values, dtype=float), np.array(groups), targets, group_book,
+            np.full(group_book.max() + 1, cash), mode, tolerance
+        )
+
+    def test_full_mode_returns_to_target(self):
+        """Test that a breach trades every group back to target."""
+        trades = self._solve([7000, 3000], [0, 1], [0.6, 0.4], RebalanceMode.FULL)
+
+        assert trades.tolist() == pytest.approx([-1000, 1000])
+
+    def test_within_band_means_no_trades(self):
+        """Test that drift inside the tolerance band is left alone."""
+        trades = self._solve([6300, 3700], [0, 1], [0.6, 0.4], RebalanceMode.FULL)
+
+        assert not trades.any()
+
+    def test_min_trade_stops_at_band_edge(self):
+        """Test that minimum-trade mode only trades back to the band edge."""
+        trades = self._solve([7000, 3000], [0, 1], [0.6, 0.4], RebalanceMode.MIN_TRADE)
+
+        assert trades.tolist() == pytest.approx([-500, 500])
+
+    def test_cash_only_never_sells(self):
+        """Test that new cash goes to the underweight group first."""
+        trades = self._solve([7000, 3000], [0, 1], [0.6, 0.4], RebalanceMode.CASH_ONLY, cash=1000)
+
+        assert trades.tolist() == pytest.approx([0, 1000])
+
+    def test_group_trade_is_split_pro_rata(self):
+        """Test that positions sharing a group share its trade by value."""
+        trades = self._solve([3000, 1000, 6000], [0, 0, 1], [0.5, 0.5], RebalanceMode.FULL)
+
+        assert trades.tolist() == pytest.approx([750, 250, -1000])
+
+    def test_books_are_solved_independently(self):
+        """Test several portfolios in one call."""
+        trades = self._solve(
+            [7000, 3000, 5000, 5000], [0, 1, 2, 3], [0.6, 0.4, 0.5, 0.5],
+            RebalanceMode.FULL, books=[0, 0, 1, 1]
+        )
+
+        assert trades.tolist() == pytest.approx([-1000, 1000, 0, 0])
+
+
+class TestRebalanceService:
+    """Test targets persistence and trade list generation."""
+
+    async def _add_assets(self, test_db: AsyncSession, portfolio_id: str, holdings=(
+        ("AAPL", AssetType.STOCK, "70", "100"),
+        ("AGG", AssetType.BOND, "30", "100"),
+    )):
+        for symbol, asset_type, quantity, price in holdings:
+            test_db.add(Asset(
+                portfolio_id=portfolio_id,
+                symbol=symbol,
+                name=symbol,
+                asset_type=asset_type,
+                quantity=Decimal(quantity),
+                average_cost=Decimal(price),
+                current_price=Decimal(price),
+                market_value=Decimal(quantity) * Decimal(price)
+            ))
+        await test_db.commit()
+
+    async def test_rebalance_by_asset_type(self, test_db: AsyncSession, test_portfolio):
+        """Test the trade list for asset type targets."""
+        await self._add_assets(test_db, test_portfolio.id)
+        service = RebalanceService(test_db)
+        await service.set_targets(test_portfolio.id, [
+            AllocationTargetItem(asset_type=AssetType.STOCK, target_percent=Decimal("60")),
+            AllocationTargetItem(asset_type=AssetType.BOND, target_percent=Decimal("30")),
+            AllocationTargetItem(asset_type=AssetType.CASH, target_percent=Decimal("10")),
+        ])
+
+        result = (await service.rebalance([test_portfolio.id], RebalanceRequest()))[0]
+
+        trades = {t.symbol: t for t in result.trades}
+        assert trades["AAPL"].action == "sell"
+        assert trades["AAPL"].quantity == Decimal("10")
+        assert "AGG" not in trades
+        assert result.unfilled_targets == ["cash"]
+        assert result.cash_remaining == Decimal("1000.0")
+
+    async def test_household_cash_is_split_across_portfolios(
+        self, test_db: AsyncSession, test_user, test_portfolio
+    ):
+        """Test that new cash is shared pro rata so buys across portfolios equal cash plus sells."""
+        other = Portfolio(user_id=test_user.id, name="Second", currency="USD")
+        test_db.add(other)
+        await test_db.commit()
+        await self._add_assets(test_db, test_portfolio.id)
+        await self._add_assets(test_db, other.id, (
+            ("AAPL", AssetType.STOCK, "20", "100"),
+            ("AGG", AssetType.BOND, "20", "100"),
+        ))
+        service = RebalanceService(test_db)
+        targets = [
+            AllocationTargetItem(asset_type=AssetType.STOCK, target_percent=Decimal("50")),
+            AllocationTargetItem(asset_type=AssetType.BOND, target_percent=Decimal("50")),
+        ]
+        await service.set_targets(test_portfolio.id, targets)
+        await service.set_targets(other.id, targets)
+
+        results = await service.rebalance(
+            [test_portfolio.id, other.id], RebalanceRequest(cash_amount=Decimal("1400"))
+        )
+
+        trades = [t for result in results for t in result.trades]
+        buys = sum(t.value for t in trades if t.action == "buy")
+        sells = sum(t.value for t in trades if t.action == "sell")
+        assert buys == Decimal("1400") + sells
+        assert [r.total_value for r in results] == [Decimal("11000.0"), Decimal("4400.0")]
+        assert all(r.cash_remaining == 0 for r in results)
+
+    async def test_unheld_symbol_target_is_bought_at_quote(self, test_db: AsyncSession, test_portfolio):
+        """Test that a symbol target with no holding is bought at its cached quote."""
+        await self._add_assets(test_db, test_portfolio.id)
+        service = RebalanceService(test_db)
+        await service.set_targets(test_portfolio.id, [
+            AllocationTargetItem(symbol="AAPL", target_percent=Decimal("50")),
+            AllocationTargetItem(symbol="AGG", target_percent=Decimal("25")),
+            AllocationTargetItem(symbol="MSFT", target_percent=Decimal("25")),
+        ])
+
+        configure_quote_cache(StaticMarketDataProvider({"MSFT": Decimal("250")}))
+        try:
+            result = (await service.rebalance([test_portfolio.id], RebalanceRequest()))[0]
+        finally:
+            configure_quote_cache(StaticMarketDataProvider())
+
+        trades = {t.symbol: t for t in result.trades}
+        assert trades["MSFT"].action == "buy"
+        assert trades["MSFT"].quantity == Decimal("10")
+        assert trades["MSFT"].asset_id is None
+        assert trades["AAPL"].quantity == Decimal("20")
+        assert result.unfilled_targets == []
+
+    async def test_allocation_reports_targets(self, test_db: AsyncSession, test_user, test_portfolio):
+        """Test that allocation exposes the configured targets."""
+        await self._add_assets(test_db, test_portfolio.id)
+        await RebalanceService(test_db).set_targets(test_portfolio.id, [
+            AllocationTargetItem(symbol="aapl", target_percent=Decimal("50")),
+            AllocationTargetItem(symbol="AGG", target_percent=Decimal("50")),
+        ])
+        await PortfolioService(test_db)._update_portfolio_totals(test_portfolio.id)
+        await test_db.commit()
+
+        allocation = await PortfolioService(test_db).get_portfolio_allocation(test_portfolio.id, test_user.id)
+
+        targets = {a.asset_type: a.target for a in allocation}
+        assert targets == {AssetType.STOCK: Decimal("50"), AssetType.BOND: Decimal("50")}
+
+
+class TestRebalanceEndpoints:
+    """Test targets and rebalance API endpoints."""
+
+    async def test_targets_must_sum_to_100(
+        self,
+        client: AsyncClient,
+        test_user_data: dict,
+        test_portfolio_data: dict
+    ):
+        """Test target validation and the no-targets error."""
+        login_response = await client.post("/api/v1/auth/register", json=test_user_data)
+        tokens = login_response.json()["tokens"]
+        headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+        create_response = await client.post("/api/v1/portfolios/", json=test_portfolio_data, headers=headers)
+        portfolio_id = create_response.json()["id"]
+
+        response = await client.put(
+            f"/api/v1/portfolios/{portfolio_id}/targets",
+            json={"targets": [{"asset_type": "stock", "target_percent": 80}]},
+            headers=headers
+        )
+        assert response.status_code == 400
+
+        response = await client.post(f"/api/v1/portfolios/{portfolio_id}/rebalance", json={}, headers=headers)
+        assert response.status_code == 400
+
+        response = await client.put(
+            f"/api/v1/portfolios/{portfolio_id}/targets",
+            json={"targets": [{"asset_type": "stock", "target_percent": 100}]},
+            headers=headers
+        )
+        assert response.status_code == 200
+        assert response.json()[0]["asset_type"] == "stock"
+
+        response = await client.post("/api/v1/portfolios/rebalance", json={"mode": "min_trade"}, headers=headers)
+        assert response.status_code == 200
+        assert response.json()[0]["trades"] == []
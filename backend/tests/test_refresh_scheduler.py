@@ -0,0 +1,151 @@
+"""
+Tests for demand-driven quote refresh scheduling
+"""
+
+import asyncio
+import pytest
+from contextlib import asynccontextmanager
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.models import Asset, AssetType, WatchlistItem
+from app.services.market_data_provider import StaticMarketDataProvider
+from app.services.quote_cache import QuoteCache
+from app.services.refresh_scheduler import QuoteRefreshScheduler, is_market_open, refresh_interval
+
+
+SATURDAY = datetime(2024, 3, 2, 15, 0)
+TUESDAY = datetime(2024, 3, 5, 15, 0)
+
+
+class CountingProvider(StaticMarketDataProvider):
+    """Records the most provider calls in flight at once"""
+
+    def __init__(self, quotes):
+        super().__init__(quotes)
+        self.in_flight = 0
+        self.peak = 0
+
+    async def get_quotes(self, symbols):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return await super().get_quotes(symbols)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRefreshPolicy:
+    """Test market hours and refresh intervals."""
+
+    def test_market_hours(self):
+        """Test that crypto trades on weekends and exchanges keep their hours."""
+        assert is_market_open(AssetType.CRYPTO, SATURDAY)
+        assert not is_market_open(AssetType.STOCK, SATURDAY)
+        assert is_market_open(AssetType.STOCK, TUESDAY)
+        assert not is_market_open(AssetType.ETF, TUESDAY.replace(hour=22))
+        assert not is_market_open(AssetType.CASH, TUESDAY)
+        assert is_market_open(AssetType.COMMODITY, TUESDAY.replace(hour=23))
+
+    def test_interval_follows_demand(self):
+        """Test that references and recent reads shorten the interval."""
+        one = refresh_interval(1, None, True)
+        many = refresh_interval(15, None, True)
+        read = refresh_interval(1, 0.0, True)
+
+        assert one == settings.QUOTE_REFRESH_BASE_SECONDS / 2
+        assert many < one
+        assert read == pytest.approx(one / 4)
+        assert refresh_interval(0, None, True) is None
+        assert refresh_interval(0, settings.QUOTE_REFRESH_ACCESS_WINDOW_SECONDS + 1, True) is None
+        assert refresh_interval(3, None, False) == settings.QUOTE_REFRESH_CLOSED_SECONDS
+
+
+class TestQuoteRefreshScheduler:
+    """Test scheduling refreshes from holdings, watchlists and reads."""
+
+    async def test_due_symbols_refreshed_and_requeued(
+        self, test_db: AsyncSession, test_user, test_portfolio, monkeypatch
+    ):
+        """Test batching, bounded concurrency, write-through and requeue by market hours."""
+        for symbol, asset_type in (("AAPL", AssetType.STOCK), ("BTC", AssetType.CRYPTO)):
+            test_db.add(Asset(
+                portfolio_id=test_portfolio.id, symbol=symbol, name=symbol, asset_type=asset_type,
+                quantity=Decimal("1"), average_cost=Decimal("10"), total_cost=Decimal("10")
+            ))
+        test_db.add(WatchlistItem(user_id=test_user.id, symbol="TSLA", name="Tesla"))
+        await test_db.commit()
+
+        @asynccontextmanager
+        async def session_factory():
+            yield test_db
+
+        monkeypatch.setattr(settings, "QUOTE_REFRESH_BATCH_SIZE", 1)
+        monkeypatch.setattr(settings, "QUOTE_REFRESH_MAX_CONCURRENCY", 2)
+        provider = CountingProvider({"AAPL": Decimal("190"), "BTC": Decimal("60000"), "TSLA": Decimal("200")})
+        clock = FakeClock()
+        cache = QuoteCache(StaticMarketDataProvider(), ttl=60)
+        scheduler = QuoteRefreshScheduler(provider, session_factory, cache=cache, clock=clock)
+
+        await scheduler.load_demand()
+        assert set(scheduler.demand) == {"AAPL", "BTC", "TSLA"}
+        assert await scheduler.run_once(SATURDAY) == 3
+        assert sorted(provider.requests) == [["AAPL"], ["BTC"], ["TSLA"]]
+        assert provider.peak == 2
+        assert cache.entries["BTC"][0].price == Decimal("60000")
+
+        btc = (await test_db.execute(
+            select(Asset).where(Asset.symbol == "BTC").execution_options(populate_existing=True)
+        )).scalar_one()
+        assert btc.current_price == Decimal("60000")
+
+        # Only crypto is open on Saturday, so it comes due long before the stocks
+        assert scheduler.due["BTC"] == clock.now + settings.QUOTE_REFRESH_BASE_SECONDS / 2
+        assert scheduler.due["AAPL"] == clock.now + settings.QUOTE_REFRESH_CLOSED_SECONDS
+        clock.now += settings.QUOTE_REFRESH_BASE_SECONDS
+        assert scheduler.take_due(clock.now) == ["BTC"]
+
+    async def test_reads_schedule_unheld_symbols(self):
+        """Test that a symbol read through the cache is refreshed until the access window lapses."""
+        clock = FakeClock()
+        cache = QuoteCache(StaticMarketDataProvider(), ttl=60)
+        cache.accessed["NVDA"] = clock.now
+        scheduler = QuoteRefreshScheduler(StaticMarketDataProvider(), None, cache=cache, clock=clock)
+
+        assert scheduler.take_due(clock.now) == ["NVDA"]
+        scheduler.reschedule("NVDA", clock.now, TUESDAY)
+        assert scheduler.due["NVDA"] == pytest.approx(clock.now + settings.QUOTE_REFRESH_BASE_SECONDS / 4)
+
+        clock.now += settings.QUOTE_REFRESH_ACCESS_WINDOW_SECONDS
+        scheduler.reschedule("NVDA", clock.now, TUESDAY)
+        assert "NVDA" not in scheduler.due
+        assert scheduler.take_due(clock.now) == []
+        assert "NVDA" not in cache.accessed
+
+    async def test_failed_refresh_requeues_symbols(self):
+        """Test that symbols taken for a refresh that raises are still scheduled again."""
+        clock = FakeClock()
+        cache = QuoteCache(StaticMarketDataProvider(), ttl=60)
+        cache.accessed["NVDA"] = clock.now
+        scheduler = QuoteRefreshScheduler(StaticMarketDataProvider(), None, cache=cache, clock=clock)
+
+        async def failing_refresh(symbols):
+            raise RuntimeError("database unavailable")
+
+        scheduler.refresh = failing_refresh
+        with pytest.raises(RuntimeError):
+            await scheduler.run_once(TUESDAY)
+
+        assert scheduler.due["NVDA"] == pytest.approx(clock.now + settings.QUOTE_REFRESH_BASE_SECONDS / 4)
+        clock.now = scheduler.due["NVDA"]
+        assert scheduler.take_due(clock.now) == ["NVDA"]
@@ -0,0 +1,148 @@
+"""
+Tests for Value-at-Risk calculations
+"""
+
+import pytest
+import numpy as np
+from decimal import Decimal
+from datetime import datetime, timedelta
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Asset, AssetType, MarketData
+from app.schemas.analytics import RiskMethod
+from app.services.monte_carlo import simulate_pnl
+from app.services.risk_service import (
+    RiskService, covariance_factor, get_process_pool, shutdown_process_pool, value_at_risk
+)
+
+
+class TestRiskKernels:
+    """Test the numerical building blocks."""
+
+    def test_value_at_risk_of_uniform_losses(self):
+        """Test VaR and CVaR on a known distribution."""
+        pnl = -np.arange(1, 101, dtype=float)
+        var, cvar = value_at_risk(pnl, 0.95)
+
+        assert var == pytest.approx(95.05)
+        assert cvar == pytest.approx(98.0)
+
+    def test_covariance_factor_handles_singular_matrix(self):
+        """Test that perfectly correlated assets still factorize."""
+        covariance = np.array([[1.0, 1.0], [1.0, 1.0]])
+        factor = covariance_factor(covariance)
+
+        assert factor @ factor.T == pytest.approx(covariance)
+
+    def test_simulated_pnl_shape_and_scaling(self):
+        """Test that longer horizons produce wider P&L distributions."""
+        factor = np.array([[0.01]])
+        pnl = simulate_pnl(factor, np.zeros(1), np.array([1000.0]), (1, 10), 20000, seed=3)
+
+        assert pnl.shape == (2, 20000)
+        assert pnl[1].std() > 3 * pnl[0].std()
+
+
+class TestRiskService:
+    """Test VaR over stored price history."""
+
+    async def _create_book(self, test_db: AsyncSession, test_portfolio, days: int = 120):
+        rng = np.random.default_rng(11)
+        start = datetime.utcnow() - timedelta(days=days)
+        for symbol, value in (("AAA", Decimal("6000.00")), ("BBB", Decimal("4000.00"))):
+            test_db.add(Asset(
+                portfolio_id=test_portfolio.id,
+                symbol=symbol,
+                name=symbol,
+                asset_type=AssetType.STOCK,
+                quantity=Decimal("10"),
+                average_cost=Decimal("100"),
+                current_price=value / 10,
+                market_value=value
+            ))
+            prices = 100 * np.cumprod(1 + rng.normal(0, 0.02, days))
+            for i, price in enumerate(prices):
+                test_db.add(MarketData(
+                    symbol=symbol,
+                    price=Decimal(str(round(price, 4))),
+                    change=Decimal("0"),
+                    change_percent=Decimal("0"),
+                    timestamp=start + timedelta(days=i)
+                ))
+        test_db.add(Asset(
+            portfolio_id=test_portfolio.id,
+            symbol="NEW",
+            name="No history",
+            asset_type=AssetType.STOCK,
+            quantity=Decimal("1"),
+            average_cost=Decimal("10"),
+            market_value=Decimal("10.00")
+        ))
+        await test_db.commit()
+
+    async def test_historical_var(self, test_db: AsyncSession, test_portfolio):
+        """Test historical simulation on the stored closes."""
+        await self._create_book(test_db, test_portfolio)
+
+        risk = await RiskService(test_db).calculate_risk(test_portfolio.id, RiskMethod.HISTORICAL)
+
+        assert risk.observations == 119
+        assert risk.portfolio_value == Decimal("10010.0")
+        assert risk.missing_symbols == ["NEW"]
+        assert Decimal("0") < risk.var_1d <= risk.cvar_1d
+        assert risk.var_10d > risk.var_1d
+        assert risk.paths is None
+
+    async def test_monte_carlo_in_process_pool(self, test_db: AsyncSession, test_portfolio):
+        """Test that pooled shared-memory simulation agrees with the inline kernel."""
+        await self._create_book(test_db, test_portfolio)
+        service = RiskService(test_db)
+
+        pooled = await service.calculate_risk(
+            test_portfolio.id, RiskMethod.MONTE_CARLO, paths=20000, workers=2, seed=5
+        )
+        inline = await service.calculate_risk(
+            test_portfolio.id, RiskMethod.MONTE_CARLO, paths=20000, workers=0, seed=5
+        )
+        shutdown_process_pool()
+
+        assert pooled.paths == 20000
+        assert float(pooled.var_1d) == pytest.approx(float(inline.var_1d), rel=0.1)
+        assert pooled.var_10d > pooled.var_1d
+
+    def test_process_pool_follows_requested_size(self):
+        """Test that the shared pool is reused at the same size and replaced when resized."""
+        try:
+            pool = get_process_pool(1)
+            assert get_process_pool(1) is pool
+            resized = get_process_pool(2)
+            assert resized is not pool
+            assert resized._max_workers == 2
+        finally:
+            shutdown_process_pool()
+
+
+class TestRiskEndpoints:
+    """Test the risk API endpoint."""
+
+    async def test_risk_for_empty_portfolio(
+        self,
+        client: AsyncClient,
+        test_user_data: dict,
+        test_portfolio_data: dict
+    ):
+        """Test that an empty portfolio reports zero risk."""
+        login_response = await client.post("/api/v1/auth/register", json=test_user_data)
+        tokens = login_response.json()["tokens"]
+        headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+        create_response = await client.post("/api/v1/portfolios/", json=test_portfolio_data, headers=headers)
+        portfolio_id = create_response.json()["id"]
+
+        response = await client.get(f"/api/v1/portfolios/{portfolio_id}/risk", headers=headers)
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["method"] == "historical"
+        assert float(data["var_1d"]) == 0.0
+        assert data["observations"] == 0
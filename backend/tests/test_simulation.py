@@ -0,0 +1,129 @@
+"""
+Tests for what-if trade simulation
+"""
+
+import pytest
+from decimal import Decimal
+from fastapi import HTTPException
+from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Asset, AssetType, Transaction
+from app.schemas.analytics import SimulatedTrade, SimulationRequest
+from app.services.simulation_service import PositionBook, SimulationService
+
+
+class TestSimulationService:
+    """Test applying hypothetical trades to an in-memory position book."""
+
+    def test_book_grows_past_its_capacity(self):
+        """Test that appending many new symbols keeps every row intact."""
+        book = PositionBook(["AAPL"], [AssetType.STOCK], [10.0], [1000.0], [150.0])
+        for n in range(20):
+            book.apply(SimulatedTrade(symbol=f"S{n}", action="buy", quantity=Decimal("1"), price=Decimal(n + 1)))
+
+        assert len(book.quantities) == 21
+        assert book.quantities[0] == 10.0 and book.costs[0] == 1000.0
+        assert book.prices.tolist()[1:] == [float(n + 1) for n in range(20)]
+        assert book.initial_quantities.sum() == 10.0
+        assert book.cash_flow == -sum(range(1, 21))
+
+    async def _add_assets(self, test_db: AsyncSession, portfolio_id: str):
+        for symbol, asset_type, quantity, cost, price in (
+            ("AAPL", AssetType.STOCK, "10", "100", "150"),
+            ("AGG", AssetType.BOND, "20", "100", "100"),
+        ):
+            test_db.add(Asset(
+                portfolio_id=portfolio_id,
+                symbol=symbol,
+                name=symbol,
+                asset_type=asset_type,
+                quantity=Decimal(quantity),
+                average_cost=Decimal(cost),
+                current_price=Decimal(price),
+                market_value=Decimal(quantity) * Decimal(price),
+                total_cost=Decimal(quantity) * Decimal(cost)
+            ))
+        await test_db.commit()
+
+    async def test_buy_and_sell(self, test_db: AsyncSession, test_portfolio):
+        """Test resulting totals, weights and allocation."""
+        await self._add_assets(test_db, test_portfolio.id)
+
+        result = await SimulationService(test_db).simulate(test_portfolio.id, SimulationRequest(trades=[
+            SimulatedTrade(symbol="AAPL", action="sell", quantity=Decimal("5")),
+            SimulatedTrade(symbol="msft", action="buy", quantity=Decimal("2"), price=Decimal("250")),
+        ]))
+
+        positions = {p.symbol: p for p in result.positions}
+        assert positions["AAPL"].quantity == Decimal("5.0")
+        assert positions["AAPL"].quantity_change == Decimal("-5.0")
+        assert positions["MSFT"].market_value == Decimal("500.00")
+        assert result.total_value == Decimal("3250.00")
+        assert result.value_change == Decimal("-250.00")
+        assert result.cash_flow == Decimal("250.00")
+        assert result.realized_gain_loss == Decimal("250.00")
+        assert result.total_cost == Decimal("3000.00")
+        assert sum(p.weight for p in result.positions) == pytest.approx(Decimal("100"), abs=Decimal("0.001"))
+        allocation = {a.asset_type: a.value for a in result.allocation}
+        assert allocation == {AssetType.STOCK: Decimal("1250.00"), AssetType.BOND: Decimal("2000.00")}
+
+    async def test_database_is_untouched(self, test_db: AsyncSession, test_portfolio):
+        """Test that simulating writes no assets or transactions."""
+        await self._add_assets(test_db, test_portfolio.id)
+
+        await SimulationService(test_db).simulate(test_portfolio.id, SimulationRequest(trades=[
+            SimulatedTrade(symbol="AAPL", action="sell", quantity=Decimal("10")),
+        ]))
+
+        assets = (await test_db.execute(select(Asset).where(Asset.portfolio_id == test_portfolio.id))).scalars().all()
+        assert {a.symbol: a.quantity for a in assets}["AAPL"] == Decimal("10")
+        assert (await test_db.execute(select(Transaction))).scalars().all() == []
+
+    async def test_cannot_oversell(self, test_db: AsyncSession, test_portfolio):
+        """Test that selling more than is held is rejected."""
+        await self._add_assets(test_db, test_portfolio.id)
+
+        with pytest.raises(HTTPException) as exc_info:
+            await SimulationService(test_db).simulate(test_portfolio.id, SimulationRequest(trades=[
+                SimulatedTrade(symbol="AGG", action="sell", quantity=Decimal("21")),
+            ]))
+
+        assert exc_info.value.status_code == 400
+
+
+class TestSimulationEndpoints:
+    """Test the simulation API endpoint."""
+
+    async def test_simulate_new_position(
+        self,
+        client: AsyncClient,
+        test_user_data: dict,
+        test_portfolio_data: dict
+    ):
+        """Test simulating a first purchase in an empty portfolio."""
+        login_response = await client.post("/api/v1/auth/register", json=test_user_data)
+        tokens = login_response.json()["tokens"]
+        headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+        create_response = await client.post("/api/v1/portfolios/", json=test_portfolio_data, headers=headers)
+        portfolio_id = create_response.json()["id"]
+
+        response = await client.post(
+            f"/api/v1/portfolios/{portfolio_id}/simulate",
+            json={"trades": [{"symbol": "BTC", "action": "buy", "quantity": 0.5, "price": 40000, "asset_type": "crypto"}]},
+            headers=headers
+        )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert float(data["total_value"]) == 20000.0
+        assert data["allocation"][0]["asset_type"] == "crypto"
+        assert data["risk"]["missing_symbols"] == ["BTC"]
+
+        response = await client.post(
+            f"/api/v1/portfolios/{portfolio_id}/simulate",
+            json={"trades": [{"symbol": "ETH", "action": "buy", "quantity": 1}]},
+            headers=headers
+        )
+        assert response.status_code == 400
@@ -0,0 +1,166 @@
+"""
+Tests for live portfolio valuation streaming
+"""
+
+import asyncio
+import json
+import pytest
+from decimal import Decimal
+from fastapi import WebSocketDisconnect
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.websocket import valuation_socket
+from app.services.auth_service import AuthService
+from app.services.price_service import PriceService
+from app.services.valuation_stream import ValuationConnection, get_valuation_hub, valuation_diff
+from tests.test_prices import create_holders
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.incoming: asyncio.Queue = asyncio.Queue()
+        self.sent = []
+        self.accepted = False
+        self.close_code = None
+
+    async def accept(self):
+        self.accepted = True
+
+    async def close(self, code: int = 1000):
+        self.close_code = code
+
+    async def receive_text(self) -> str:
+        message = await self.incoming.get()
+        if message is None:
+            raise WebSocketDisconnect()
+        return json.dumps(message)
+
+    async def send_text(self, data: str):
+        self.sent.append(json.loads(data))
+
+    async def received(self, count: int):
+        for _ in range(100):
+            if len(self.sent) >= count:
+                return self.sent
+            await asyncio.sleep(0.01)
+        raise AssertionError(f"expected {count} messages, got {self.sent}")
+
+
+def snapshot(total_value: float, day_change: float = 0.0, **weights) -> dict:
+    return {"totalValue": total_value, "dayChange": day_change, "dayChangePercent": 0.0, "weights": weights}
+
+
+@pytest.fixture
+def valuation_hub():
+    hub = get_valuation_hub()
+    yield hub
+    hub.clear()
+
+
+class TestValuationDiffs:
+    """Test diffing and conflation of valuation snapshots."""
+
+    def test_diff_sends_only_changed_fields(self):
+        """Test that unchanged fields are omitted and dropped holdings are nulled."""
+        previous = snapshot(100.0, A=50.0, B=50.0)
+        current = snapshot(110.0, A=60.0, C=40.0)
+        assert valuation_diff(previous, current) == {
+            "totalValue": 110.0, "weights": {"A": 60.0, "C": 40.0, "B": None}
+        }
+        assert valuation_diff(current, current) == {}
+        assert valuation_diff(None, current) == current
+
+    def test_slow_reader_gets_latest_state_only(self):
+        """Test that updates offered between reads collapse into one diff."""
+        connection = ValuationConnection("user")
+        connection.channels["p1"] = "portfolios"
+        for value in (100.0, 105.0, 103.0):
+            connection.offer("p1", snapshot(value, A=100.0))
+        first = connection.take_messages()
+        assert len(first) == 1 and first[0]["data"]["totalValue"] == 103.0
+
+        connection.offer("p1", snapshot(103.0, A=100.0))
+        connection.offer("p1", snapshot(104.0, 1.0, A=100.0))
+        assert connection.take_messages() == [{
+            "type": "data", "channel": "portfolios",
+            "data": {"portfolioId": "p1", "totalValue": 104.0, "dayChange": 1.0}
+        }]
+        assert not connection.ready.is_set()
+
+
+class TestValuationHub:
+    """Test publishing committed valuation changes to subscribers."""
+
+    async def test_price_tick_reaches_watchers(
+        self, test_db: AsyncSession, test_user, test_portfolio, valuation_hub
+    ):
+        """Test that a committed tick publishes diffs of only the watched holders."""
+        second = await create_holders(test_db, test_user, test_portfolio)
+        await PriceService(test_db).apply_quotes({"AAPL": Decimal("100"), "AGG": Decimal("100")})
+        await test_db.commit()
+        portfolio_id, second_id = test_portfolio.id, second.id
+
+        connection = ValuationConnection(test_user.id)
+        await valuation_hub.subscribe(test_db, connection, f"portfolio:{portfolio_id}", [portfolio_id])
+        [initial] = connection.take_messages()
+        assert initial["data"] == {
+            "portfolioId": portfolio_id, "totalValue": 2000.0, "dayChange": 0.0, "dayChangePercent": 0.0,
+            "weights": {"AAPL": 50.0, "AGG": 50.0}
+        }
+
+        await PriceService(test_db).apply_quotes({"AAPL": Decimal("300")})
+        await test_db.rollback()
+        assert not valuation_hub.has_changes
+
+        await PriceService(test_db).apply_quotes({"AAPL": Decimal("300")})
+        await test_db.commit()
+        assert await valuation_hub.publish(test_db) == 1
+        [update] = connection.take_messages()
+        assert update["data"] == {
+            "portfolioId": portfolio_id, "totalValue": 4000.0, "weights": {"AAPL": 75.0, "AGG": 25.0}
+        }
+
+        # Unwatched portfolios are not loaded
+        await PriceService(test_db).apply_quotes({"AGG": Decimal("100.5")})
+        await test_db.commit()
+        valuation_hub.unsubscribe(connection)
+        assert not valuation_hub.active
+        assert await valuation_hub.publish(test_db) == 0
+        assert second_id not in valuation_hub.watchers
+
+
+class TestValuationSocket:
+    """Test the /ws protocol."""
+
+    async def test_rejects_bad_token(self, test_db: AsyncSession, valuation_hub):
+        """Test that connections without a valid access token are closed before accepting."""
+        websocket = FakeWebSocket()
+        await valuation_socket(websocket, token="garbage", db=test_db)
+        assert not websocket.accepted
+        assert websocket.close_code == 1008
+
+    async def test_subscribe_and_unsubscribe(
+        self, test_db: AsyncSession, test_user, test_portfolio, valuation_hub
+    ):
+        """Test subscription acks, initial valuations and channel ownership checks."""
+        user_id, portfolio_id = test_user.id, test_portfolio.id
+        token = AuthService(test_db).create_access_token({"sub": user_id})
+        websocket = FakeWebSocket()
+        socket_task = asyncio.create_task(valuation_socket(websocket, token=token, db=test_db))
+
+        await websocket.incoming.put({"type": "subscribe", "channel": "portfolios"})
+        sent = await websocket.received(2)
+        assert sent[0] == {"type": "subscribed", "channel": "portfolios"}
+        assert sent[1]["channel"] == "portfolios"
+        assert sent[1]["data"]["portfolioId"] == portfolio_id
+        assert valuation_hub.watchers.keys() == {portfolio_id}
+
+        await websocket.incoming.put({"type": "subscribe", "channel": "portfolio:someone-else"})
+        await websocket.incoming.put({"type": "unsubscribe", "channel": "portfolios"})
+        sent = await websocket.received(4)
+        assert sent[2]["type"] == "error"
+        assert sent[3] == {"type": "unsubscribed", "channel": "portfolios"}
+        assert not valuation_hub.active
+
+        await websocket.incoming.put(None)
+        await socket_task
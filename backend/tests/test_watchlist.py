@@ -0,0 +1,97 @@
+"""
+Tests for the watchlist API over the shared quote table
+"""
+
+from datetime import date
+from decimal import Decimal
+from httpx import AsyncClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import User
+from app.schemas.watchlist import WatchlistItemCreate
+from app.services.market_data_provider import StaticMarketDataProvider
+from app.services.quote_cache import configure_quote_cache
+from app.services.quote_service import QuoteService
+from app.services.watchlist_service import WatchlistService
+
+
+class TestWatchlistAPI:
+    """Test watchlist endpoints and quote hydration."""
+
+    async def test_add_list_and_remove(self, client: AsyncClient, test_db: AsyncSession, test_user_data: dict):
+        """Test adding symbols, reading them with quotes and removing them."""
+        register_response = await client.post("/api/v1/auth/register", json=test_user_data)
+        headers = {"Authorization": f"Bearer {register_response.json()['tokens']['access_token']}"}
+
+        await QuoteService(test_db).record_prices({"AAPL": Decimal("150.0000")})
+        await test_db.commit()
+
+        response = await client.post("/api/v1/watchlist/", json={"symbol": "aapl", "name": "Apple"}, headers=headers)
+        assert response.status_code == 201
+        assert response.json()["currentPrice"] == "150.0000"
+        response = await client.post("/api/v1/watchlist/", json={"symbol": "TSLA"}, headers=headers)
+        assert response.json()["name"] == "TSLA"
+        assert response.json()["lastPriceUpdate"] is None
+        response = await client.post("/api/v1/watchlist/", json={"symbol": "AAPL"}, headers=headers)
+        assert response.status_code == 400
+
+        response = await client.get("/api/v1/watchlist/", headers=headers)
+        assert [item["symbol"] for item in response.json()] == ["AAPL", "TSLA"]
+
+        assert (await client.delete("/api/v1/watchlist/tsla", headers=headers)).status_code == 204
+        assert (await client.delete("/api/v1/watchlist/TSLA", headers=headers)).status_code == 404
+
+    async def test_one_tick_serves_every_watcher(self, test_db: AsyncSession, test_user):
+        """Test that a single quote row prices all watchers and a read is one query."""
+        other = User(email="other@example.com", password_hash="hashed_password", first_name="O", last_name="U")
+        test_db.add(other)
+        await test_db.commit()
+
+        service = WatchlistService(test_db)
+        for user_id in (test_user.id, other.id):
+            for symbol in ("AAPL", "MSFT"):
+                await service.add_item(user_id, WatchlistItemCreate(symbol=symbol))
+
+        quotes = QuoteService(test_db)
+        await quotes.record_prices({"AAPL": Decimal("100.0000"), "MSFT": Decimal("300.0000")})
+        await quotes.rollover_daily_close(date(2024, 1, 2))
+        await quotes.record_prices({"AAPL": Decimal("110.0000")})
+        await test_db.commit()
+
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        sync_engine = test_db.bind.sync_engine
+        event.listen(sync_engine, "before_cursor_execute", record)
+        try:
+            watchlists = [await service.get_watchlist(user_id) for user_id in (test_user.id, other.id)]
+        finally:
+            event.remove(sync_engine, "before_cursor_execute", record)
+
+        assert len(statements) == 2
+        for items in watchlists:
+            aapl, msft = items
+            assert (aapl.current_price, aapl.change, aapl.change_percent) == (
+                Decimal("110.0000"), Decimal("10.0000"), Decimal("10.0000")
+            )
+            assert (msft.current_price, msft.change) == (Decimal("300.0000"), Decimal("0.0000"))
+
+    async def test_newer_cached_quote_wins(self, test_db: AsyncSession, test_user):
+        """Test that prices are read through the quote cache and previous closes from the table."""
+        service = WatchlistService(test_db)
+        await service.add_item(test_user.id, WatchlistItemCreate(symbol="AAPL"))
+        quotes = QuoteService(test_db)
+        await quotes.record_prices({"AAPL": Decimal("100.0000")})
+        await quotes.rollover_daily_close(date(2024, 1, 2))
+        await test_db.commit()
+
+        configure_quote_cache(StaticMarketDataProvider({"AAPL": Decimal("105.0000")}))
+        try:
+            item = (await service.get_watchlist(test_user.id))[0]
+        finally:
+            configure_quote_cache(StaticMarketDataProvider())
+
+        assert (item.current_price, item.change) == (Decimal("105.0000"), Decimal("5.0000"))
@@ -337,7 +337,7 @@ export class WebSocketClient {
   private listeners: Map<string, Set<(data: any) => void>> = new Map()
 
   constructor(url?: string) {
-    this.url = url || `${import.meta.env.VITE_WS_URL || 'ws://localhost:8000'}/ws`
+    this.url = url || import.meta.env.VITE_WS_URL || 'ws://localhost:8000/ws'
   }
 
   connect(): Promise<void> {